@@ -4,7 +4,7 @@ import time
 import uuid
 from collections import namedtuple
 from collections.abc import Generator, Iterable
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from itertools import chain
 from os.path import basename
 from typing import Any, Literal
@@ -1605,6 +1605,11 @@ class JobAdmin(QFieldCloudModelAdmin):
         "finished_at",
         "docker_started_at",
         "docker_finished_at",
+        "worker_wall_time_s",
+        "worker_cpu_time_s",
+        "worker_peak_rss_bytes",
+        "worker_bytes_received",
+        "worker_bytes_sent",
         "output__pre",
         "feedback__pre",
     )
@@ -1612,6 +1617,9 @@ class JobAdmin(QFieldCloudModelAdmin):
 
     change_form_template = "admin/job_change_form.html"
 
+    # the percentiles of the worker step metrics shown in the step metrics view
+    step_metrics_percentiles = (0.5, 0.9, 0.99)
+
     search_parser_config = {
         "created_by": {
             "filter": "created_by__username__iexact",
@@ -1650,6 +1658,11 @@ class JobAdmin(QFieldCloudModelAdmin):
     def get_urls(self):
         urls = super().get_urls()
         return [
+            path(
+                "step-metrics/",
+                self.admin_site.admin_view(self.step_metrics_view),
+                name="job_step_metrics",
+            ),
             path(
                 "<uuid:apply_job_id>/export-deltafile",
                 self.admin_site.admin_view(self.export_applyjob_deltafile),
@@ -1676,7 +1689,7 @@ class JobAdmin(QFieldCloudModelAdmin):
         return False
 
     def output__pre(self, instance):
-        return format_text(instance.output, "text")
+        return format_text(instance.get_full_output(), "text")
 
     def feedback__pre(self, instance):
         return format_text(instance.feedback, "json")
@@ -1705,6 +1718,83 @@ class JobAdmin(QFieldCloudModelAdmin):
         Job.objects.filter(pk=object_id).update(status="pending")
         return HttpResponseRedirect("..")
 
+    def step_metrics_view(self, request: HttpRequest) -> HttpResponse:
+        """Shows the percentiles of the worker step metrics of the recently finished jobs of a type.
+
+        Returns JSON instead of HTML with the `format=json` query parameter.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        job_type = request.GET.get("type", Job.Type.PACKAGE)
+
+        if job_type not in Job.Type.values:
+            raise Http404(_("Unknown job type."))
+
+        try:
+            days = max(int(request.GET.get("days", 7)), 1)
+        except ValueError:
+            days = 7
+
+        steps = jobs.get_step_metrics_percentiles(
+            Job.Type(job_type),
+            datetime.now(timezone.utc) - timedelta(days=days),
+            self.step_metrics_percentiles,
+        )
+
+        if request.GET.get("format") == "json":
+            return JsonResponse(
+                {
+                    "type": job_type,
+                    "days": days,
+                    "percentiles": self.step_metrics_percentiles,
+                    "steps": steps,
+                }
+            )
+
+        percentiles_label = " / ".join(
+            f"p{percentile * 100:g}" for percentile in self.step_metrics_percentiles
+        )
+        headers = {
+            "step_id": _("Step"),
+            "count": _("Count"),
+            **{
+                metric_name: f"{metric_name} ({percentiles_label})"
+                for metric_name in jobs.STEP_METRIC_NAMES
+            },
+        }
+        rows = []
+        for step in steps:
+            row = {
+                "step_id": escape(step["step_id"]),
+                "count": step["count"],
+            }
+
+            for metric_name in jobs.STEP_METRIC_NAMES:
+                if step[metric_name] is None:
+                    row[metric_name] = "-"
+                else:
+                    row[metric_name] = " / ".join(
+                        f"{value:.6g}" for value in step[metric_name]
+                    )
+
+            rows.append(row)
+
+        return TemplateResponse(
+            request,
+            "admin/job_step_metrics.html",
+            context={
+                **self.admin_site.each_context(request),
+                "title": _("Job step metrics"),
+                "opts": self.model._meta,
+                "job_types": Job.Type.choices,
+                "job_type": job_type,
+                "days": days,
+                "headers": headers,
+                "rows": rows,
+            },
+        )
+
 
 class ApplyJobDeltaInline(admin.TabularInline):
     model = ApplyJobDelta
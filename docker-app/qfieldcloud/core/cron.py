@@ -3,18 +3,29 @@ from datetime import timedelta
 
 from constance import config
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 from django_cron import CronJobBase, Schedule
 from invitations.utils import get_invitation_model
 from sentry_sdk import capture_message
 
 from qfieldcloud.core.invitations_utils import send_invitation
-from qfieldcloud.core.models import ApplyJob, ApplyJobDelta, Delta, Job
+from qfieldcloud.core.models import ApplyJob, ApplyJobDelta, Delta, DeltaClientPk, Job
 from qfieldcloud.core.utils2 import packages
+from qfieldcloud.core.utils2.delta_archive import archive_deltas
 from qfieldcloud.project.models import Project
 
 logger = logging.getLogger(__name__)
 
+# number of jobs whose output is cleared with a single query
+JOBS_OUTPUT_CLEAR_BATCH_SIZE = 1000
+
+# number of deltas moved to the archive table with a single transaction
+DELTAS_ARCHIVE_BATCH_SIZE = 5000
+
+# maximum number of deltas moved to the archive table in a single run, the remaining deltas are archived on the next runs
+DELTAS_ARCHIVE_MAX_PER_RUN = 500_000
+
 
 class DeleteExpiredInvitationsJob(CronJobBase):
     schedule = Schedule(run_every_mins=60)
@@ -64,7 +75,8 @@ class SetTerminatedWorkersToFinalStatusJob(CronJobBase):
                 f'Job "{job.id}" was with status "{job.status}", but worker container no longer exists. Job unexpectedly terminated.'
             )
             if job.type == Job.Type.DELTA_APPLY:
-                ApplyJob.objects.get(id=job.id).deltas_to_apply.update(
+                deltas_to_apply = ApplyJob.objects.get(id=job.id).deltas_to_apply
+                deltas_to_apply.update(
                     last_status=Delta.Status.ERROR,
                     last_feedback=None,
                     last_modified_pk=None,
@@ -80,6 +92,10 @@ class SetTerminatedWorkersToFinalStatusJob(CronJobBase):
                     modified_pk=None,
                 )
 
+                DeltaClientPk.objects.clear(
+                    deltas_to_apply.values_list("id", flat=True)
+                )
+
         jobs.update(
             status=Job.Status.FAILED,
             finished_at=timezone.now(),
@@ -117,10 +133,56 @@ class ClearJobOutputsAfterRetentionPeriodJob(CronJobBase):
     code = "qfieldcloud.clear_jobs_outputs_after_retention_period"
 
     def do(self):
-        jobs = Job.objects.filter(
-            created_at__lt=timezone.now()
-            - timedelta(days=config.JOB_OUTPUT_RETENTION_DAYS),
-            output__isnull=False,
+        created_before = timezone.now() - timedelta(
+            days=config.JOBS_LOGS_RETENTION_PERIOD_DAYS
         )
+        jobs_qs = (
+            Job.objects.filter(created_at__lt=created_before)
+            .filter(Q(output__isnull=False) | Q(output_file__isnull=False))
+            .select_related("project")
+            .only("id", "output_file", "project__file_storage")
+        )
+
+        cleared_count = 0
+        while jobs := list(jobs_qs[:JOBS_OUTPUT_CLEAR_BATCH_SIZE]):
+            for job in jobs:
+                if job.output_file:
+                    job.output_file.delete(save=False)
+
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                output=None,
+                output_file=None,
+            )
+
+            cleared_count += len(jobs)
+
+        message = f"Cleared the output of {cleared_count} job(s) created before {created_before.isoformat()}."
+        logger.info(message)
+
+        return message
+
+
+class ArchiveDeltasJob(CronJobBase):
+    schedule = Schedule(run_every_mins=60)
+    code = "qfieldcloud.archive_deltas"
+
+    def do(self):
+        if not config.DELTAS_ARCHIVE_AFTER_DAYS:
+            return "Deltas archiving is disabled."
+
+        updated_before = timezone.now() - timedelta(
+            days=config.DELTAS_ARCHIVE_AFTER_DAYS
+        )
+
+        archived_count = 0
+        while archived_count < DELTAS_ARCHIVE_MAX_PER_RUN:
+            batch_count = archive_deltas(updated_before, DELTAS_ARCHIVE_BATCH_SIZE)
+            archived_count += batch_count
+
+            if batch_count < DELTAS_ARCHIVE_BATCH_SIZE:
+                break
+
+        message = f"Archived {archived_count} delta(s) last updated before {updated_before.isoformat()}."
+        logger.info(message)
 
-        jobs.update(output=None)
+        return message
@@ -246,3 +246,47 @@ class UnexpectedProjectCollaboratorError(QFieldCloudException):
     code = "unexpected_project_collaborator"
     message = "Project creator is already a project collaborator."
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+class UploadSessionNotSupportedError(QFieldCloudException):
+    """Raised when a resumable upload is requested for a file on a storage that does not support multipart uploads."""
+
+    code = "upload_session_not_supported"
+    message = "Resumable uploads are not supported by the project's file storage."
+    status_code = status.HTTP_400_BAD_REQUEST
+
+
+class InvalidUploadChunkError(QFieldCloudException):
+    """Raised when an uploaded chunk of a resumable upload has invalid `Content-Range` or contents."""
+
+    code = "invalid_upload_chunk"
+    message = "The uploaded chunk is invalid."
+    status_code = status.HTTP_400_BAD_REQUEST
+    log_as_error = False
+
+
+class UploadChunkOffsetMismatchError(QFieldCloudException):
+    """Raised when an uploaded chunk of a resumable upload does not start at the offset expected by the server."""
+
+    code = "upload_chunk_offset_mismatch"
+    message = "The uploaded chunk does not start at the expected offset."
+    status_code = status.HTTP_409_CONFLICT
+    log_as_error = False
+
+
+class IncompleteUploadSessionError(QFieldCloudException):
+    """Raised when finalizing a resumable upload that has not received all the file contents yet."""
+
+    code = "incomplete_upload_session"
+    message = "The upload has not received all the file contents yet."
+    status_code = status.HTTP_400_BAD_REQUEST
+    log_as_error = False
+
+
+class UploadVerificationError(QFieldCloudException):
+    """Raised when a file uploaded directly to the object storage does not match the size or checksums declared by the client."""
+
+    code = "upload_verification_failed"
+    message = "The uploaded file does not match the declared size or checksums."
+    status_code = status.HTTP_400_BAD_REQUEST
+    log_as_error = False
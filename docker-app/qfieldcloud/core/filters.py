@@ -0,0 +1,154 @@
+import uuid
+from collections.abc import Callable
+
+import django_filters
+from django.contrib.gis.geos import Polygon
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.fields.json import KT
+from django.utils.dateparse import parse_datetime
+from django_filters import rest_framework as filters
+from django_filters import utils
+
+from qfieldcloud.core.models import Delta
+from qfieldcloud.core.pagination import decode_cursor
+
+
+class BboxFilter(django_filters.BaseCSVFilter, django_filters.NumberFilter):
+    """Comma separated `xmin,ymin,xmax,ymax` values."""
+
+
+class DeltaFilterSet(django_filters.FilterSet):
+    """Filters of the deltas list endpoints.
+
+    The filters use the field names shared by `Delta` and `ArchivedDelta`, so the filterset can filter the querysets of both.
+    """
+
+    status = django_filters.MultipleChoiceFilter(
+        field_name="last_status",
+        label="Delta status, can be provided multiple times",
+        choices=Delta.Status.choices,
+    )
+    method = django_filters.ChoiceFilter(
+        label="Delta method",
+        choices=[(method.value, method.value) for method in Delta.Method],
+        method="filter_method",
+    )
+    created_by = django_filters.CharFilter(
+        field_name="created_by__username",
+        label="Username of the user that pushed the delta",
+        lookup_expr="iexact",
+    )
+    created_after = django_filters.IsoDateTimeFilter(
+        field_name="created_at",
+        label="Deltas pushed at or after the given ISO 8601 datetime",
+        lookup_expr="gte",
+    )
+    created_before = django_filters.IsoDateTimeFilter(
+        field_name="created_at",
+        label="Deltas pushed before the given ISO 8601 datetime",
+        lookup_expr="lt",
+    )
+    layer_id = django_filters.CharFilter(
+        label="Id of the layer the delta modifies",
+        method="filter_layer_id",
+    )
+    bbox = BboxFilter(
+        label="Deltas with an old or new geometry in the `xmin,ymin,xmax,ymax` bounding box in EPSG:4326",
+        method="filter_bbox",
+    )
+    cursor = django_filters.CharFilter(
+        label="Cursor of the next page, as returned in the `X-Next-Page` header. If provided, even empty, the deltas are paginated by cursor.",
+        method="filter_cursor",
+    )
+
+    def filter_method(
+        self, queryset: models.QuerySet[Delta], name: str, value: str
+    ) -> models.QuerySet[Delta]:
+        return queryset.alias(content_method=KT("content__method")).filter(
+            content_method=value
+        )
+
+    def filter_layer_id(
+        self, queryset: models.QuerySet[Delta], name: str, value: str
+    ) -> models.QuerySet[Delta]:
+        # NOTE the same expression as in the `core_delta_project_layer_idx` index
+        return queryset.alias(content_layer_id=KT("content__sourceLayerId")).filter(
+            content_layer_id=value
+        )
+
+    def filter_bbox(
+        self, queryset: models.QuerySet[Delta], name: str, value: list
+    ) -> models.QuerySet[Delta]:
+        if len(value) != 4:
+            raise ValidationError(
+                "The bounding box must be provided as `xmin,ymin,xmax,ymax`."
+            )
+
+        bbox = Polygon.from_bbox([float(v) for v in value])
+        bbox.srid = 4326
+
+        return queryset.filter(
+            models.Q(old_geom__bboverlaps=bbox) | models.Q(new_geom__bboverlaps=bbox)
+        )
+
+    def filter_cursor(
+        self, queryset: models.QuerySet[Delta], name: str, value: str
+    ) -> models.QuerySet[Delta]:
+        values = decode_cursor(value)
+
+        if len(values) != 2:
+            raise ValidationError("Invalid cursor.")
+
+        try:
+            created_at = parse_datetime(values[0])
+            id = uuid.UUID(values[1])
+        except ValueError as err:
+            raise ValidationError("Invalid cursor.") from err
+
+        if created_at is None:
+            raise ValidationError("Invalid cursor.")
+
+        return queryset.filter(
+            models.Q(created_at__gt=created_at)
+            | models.Q(created_at=created_at, id__gt=id)
+        )
+
+    class Meta:
+        model = Delta
+        fields = [
+            "status",
+            "method",
+            "created_by",
+            "created_after",
+            "created_before",
+            "layer_id",
+            "bbox",
+            "cursor",
+        ]
+
+
+class DeltaFilterBackend(filters.DjangoFilterBackend):
+    """Validates and documents the `DeltaFilterSet` parameters.
+
+    The deltas are listed as a combined queryset of the deltas and the archived deltas, which cannot be filtered anymore,
+    so the filtering is done by the view with `get_filter_queryset` before the querysets are combined.
+    """
+
+    def get_filter_queryset(
+        self, request, view
+    ) -> Callable[[models.QuerySet], models.QuerySet]:
+        """Returns a function applying the request filters to a `Delta` or `ArchivedDelta` queryset.
+
+        Raises:
+            rest_framework.exceptions.ValidationError: the filters are not valid
+        """
+        filterset = self.get_filterset(request, Delta.objects.none(), view)
+
+        if not filterset.is_valid():
+            raise utils.translate_validation(filterset.errors)
+
+        return filterset.filter_queryset
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset
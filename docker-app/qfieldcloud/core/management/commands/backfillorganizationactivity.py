@@ -0,0 +1,83 @@
+import itertools
+from datetime import date, timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncDate
+from qfieldcloud.core.models import (
+    ArchivedDelta,
+    Delta,
+    Job,
+    OrganizationActivity,
+    User,
+    get_activity_day_start,
+)
+
+
+class Command(BaseCommand):
+    """
+    Backfill the `OrganizationActivity` rollup from the existing deltas, archived deltas and jobs.
+
+    New deltas and jobs are recorded as they are created, this command is needed only for the activity
+    that happened before the rollup existed. Already recorded days are skipped, so it is safe to rerun.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Backfill only the activity since this UTC day, in YYYY-MM-DD format.",
+        )
+        parser.add_argument(
+            "--organization",
+            help="Backfill only the activity of the organization with this username.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of rollup rows inserted at once.",
+        )
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        organization_username = options["organization"]
+        batch_size = options["batch_size"]
+
+        extra_filters = {}
+        if since:
+            extra_filters["created_at__gte"] = get_activity_day_start(since)
+
+        if organization_username:
+            extra_filters["project__owner__username"] = organization_username
+
+        for model in (Delta, ArchivedDelta, Job):
+            activity_qs = (
+                model.objects.filter(
+                    project__owner__type=User.Type.ORGANIZATION,
+                    **extra_filters,
+                )
+                .annotate(day=TruncDate("created_at", tzinfo=timezone.utc))
+                .values_list("project__owner_id", "created_by_id", "day")
+                .order_by()
+                .distinct()
+            )
+
+            rows = (
+                OrganizationActivity(
+                    organization_id=organization_id,
+                    user_id=user_id,
+                    day=day,
+                )
+                for organization_id, user_id, day in activity_qs.iterator(
+                    chunk_size=batch_size
+                )
+            )
+
+            total_count = 0
+            while batch := list(itertools.islice(rows, batch_size)):
+                OrganizationActivity.objects.bulk_create(batch, ignore_conflicts=True)
+                total_count += len(batch)
+
+            self.stdout.write(
+                f"Backfilled {total_count} organization activity days from {model._meta.verbose_name_plural}."
+            )
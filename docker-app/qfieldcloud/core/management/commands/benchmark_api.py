@@ -0,0 +1,469 @@
+import io
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponseBase
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from qfieldcloud.authentication.models import AuthToken
+from qfieldcloud.core.models import (
+    Delta,
+    Job,
+    Organization,
+    OrganizationMember,
+    PackageJob,
+    Person,
+    ProcessProjectfileJob,
+    ProjectCollaborator,
+    Team,
+    TeamMember,
+)
+from qfieldcloud.core.utils2.delta_utils import generate_deltafile
+from qfieldcloud.filestorage.models import File, FileVersion
+from qfieldcloud.project.models import Project
+from rest_framework.test import APIClient
+
+LAYER_ID = "points_897d5ed7_b810_4624_abe3_9f7c0a93d6a1"
+
+# the feedback of a finished package job with the minimum needed by the latest package endpoint
+PACKAGE_JOB_FEEDBACK = {
+    "feedback_version": "3.0",
+    "outputs": {"qgis_layers_data": {"layers_by_id": {}}},
+}
+
+
+def generate_delta(idx: int, client_id: str) -> dict:
+    return {
+        "uuid": str(uuid.uuid4()),
+        "clientId": client_id,
+        "exportId": client_id,
+        "localPk": str(idx),
+        "sourcePk": str(idx),
+        "localLayerId": LAYER_ID,
+        "sourceLayerId": LAYER_ID,
+        "method": "patch",
+        "new": {"attributes": {"int": idx}},
+        "old": {"attributes": {"int": 0}},
+    }
+
+
+def get_percentile(sorted_values: list[float], percentile: float) -> float:
+    """Returns the percentile of the sorted values, interpolating linearly between the closest ranks."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+
+    rank = (len(sorted_values) - 1) * percentile
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        rank - lower
+    )
+
+
+@dataclass
+class Seed:
+    """The synthetic data created for a benchmark run, all named with the same prefix."""
+
+    prefix: str
+    user: Person
+    token: AuthToken
+    projects: list[Project] = field(default_factory=list)
+    seconds: float = 0
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the hot API endpoints against synthetic data.
+
+    The data is seeded in the configured database and storage, then the endpoints are called in-process with the Django test client,
+    so no running web server or network access is needed.
+    The latency percentiles, the number of database queries and the peak Python memory of each endpoint are written as JSON,
+    to compare the results across commits.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Number of users.")
+        parser.add_argument(
+            "--organizations",
+            type=int,
+            default=2,
+            help="Number of organizations, the projects are spread among them.",
+        )
+        parser.add_argument(
+            "--teams",
+            type=int,
+            default=2,
+            help="Number of teams per organization, collaborating on all its projects.",
+        )
+        parser.add_argument(
+            "--projects", type=int, default=20, help="Number of projects."
+        )
+        parser.add_argument(
+            "--files", type=int, default=20, help="Number of files per project."
+        )
+        parser.add_argument(
+            "--versions", type=int, default=3, help="Number of versions per file."
+        )
+        parser.add_argument(
+            "--deltas", type=int, default=200, help="Number of deltas per project."
+        )
+        parser.add_argument(
+            "--jobs", type=int, default=20, help="Number of jobs per project."
+        )
+        parser.add_argument(
+            "--file-size", type=int, default=1024, help="Size of each file, in bytes."
+        )
+        parser.add_argument(
+            "--deltafile-deltas",
+            type=int,
+            default=10,
+            help="Number of deltas in each posted deltafile.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="Number of timed requests per endpoint.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Number of untimed requests per endpoint, to warm up the caches.",
+        )
+        parser.add_argument(
+            "--label",
+            default="",
+            help="Free text stored in the results, e.g. the commit hash.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Path of the JSON results file. When not set, the results are written to the standard output.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded data after the benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        if options["projects"] < 1 or options["files"] < 1 or options["versions"] < 1:
+            raise CommandError(
+                "At least one project with one file version is required."
+            )
+
+        if options["iterations"] < 1:
+            raise CommandError("At least one iteration is required.")
+
+        # makes the test client accept the "testserver" host and keeps the emails in memory
+        setup_test_environment()
+
+        prefix = f"bench_{uuid.uuid4().hex[:8]}"
+        try:
+            seed = self.seed(prefix, options)
+
+            results = {
+                "label": options["label"],
+                "created_at": timezone.now().isoformat(),
+                "scale": {
+                    name: options[name]
+                    for name in (
+                        "users",
+                        "organizations",
+                        "teams",
+                        "projects",
+                        "files",
+                        "versions",
+                        "deltas",
+                        "jobs",
+                        "file_size",
+                        "deltafile_deltas",
+                    )
+                },
+                "iterations": options["iterations"],
+                "seed_seconds": round(seed.seconds, 3),
+                "endpoints": self.benchmark(seed, options),
+            }
+        finally:
+            if not options["keep"]:
+                self.cleanup(prefix)
+
+            teardown_test_environment()
+
+        results_json = json.dumps(results, indent=2, sort_keys=True)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(results_json)
+
+            for name, result in results["endpoints"].items():
+                self.stderr.write(
+                    f"{name:>20}: p50 {result['latency_ms']['p50']:10.2f} ms, "
+                    f"p99 {result['latency_ms']['p99']:10.2f} ms, "
+                    f"{result['queries']['max']:4} queries"
+                )
+        else:
+            self.stdout.write(results_json)
+
+    def seed(self, prefix: str, options: dict) -> Seed:
+        started_at = time.perf_counter()
+
+        self.stderr.write(f'Seeding the benchmark data with prefix "{prefix}"...')
+
+        users = [
+            Person.objects.create_user(
+                username=f"{prefix}_user{idx}", password=uuid.uuid4().hex
+            )
+            for idx in range(max(options["users"], 1))
+        ]
+        user = users[0]
+        token = AuthToken.objects.create(
+            user=user, client_type=AuthToken.ClientType.QFIELD
+        )
+        seed = Seed(prefix=prefix, user=user, token=token)
+
+        organizations = []
+        teams_by_organization: dict[int, list[Team]] = {}
+        for org_idx in range(max(options["organizations"], 1)):
+            organization = Organization.objects.create(
+                username=f"{prefix}_org{org_idx}",
+                type=Organization.Type.ORGANIZATION,
+                organization_owner=user,
+            )
+            organizations.append(organization)
+
+            for member in users[1:]:
+                OrganizationMember.objects.create(
+                    organization=organization,
+                    member=member,
+                    role=OrganizationMember.Roles.MEMBER,
+                )
+
+            teams = []
+            for team_idx in range(options["teams"]):
+                team = Team.objects.create(
+                    username=Team.format_team_name(
+                        organization.username, f"team{team_idx}"
+                    ),
+                    team_organization=organization,
+                )
+                TeamMember.objects.bulk_create(
+                    TeamMember(team=team, member=member)
+                    for member in users[1 + team_idx :: max(options["teams"], 1)]
+                )
+                teams.append(team)
+
+            teams_by_organization[organization.pk] = teams
+
+        content = b"x" * options["file_size"]
+        for project_idx in range(options["projects"]):
+            organization = organizations[project_idx % len(organizations)]
+            project = Project.objects.create(
+                name=f"{prefix}_project{project_idx}",
+                owner=organization,
+                is_public=False,
+            )
+            seed.projects.append(project)
+
+            ProjectCollaborator.objects.bulk_create(
+                ProjectCollaborator(project=project, collaborator=team, created_by=user)
+                for team in teams_by_organization[organization.pk]
+            )
+
+            for file_idx in range(options["files"]):
+                filename = "project.qgs" if file_idx == 0 else f"data/{file_idx}.gpkg"
+
+                for _version_idx in range(options["versions"]):
+                    FileVersion.objects.add_version(
+                        project=project,
+                        filename=filename,
+                        content=ContentFile(content, filename),
+                        file_type=File.FileType.PROJECT_FILE,
+                        uploaded_by=user,
+                    )
+
+            Project.objects.filter(pk=project.pk).update(
+                the_qgis_file=File.objects.get(
+                    project=project,
+                    name="project.qgs",
+                    file_type=File.FileType.PROJECT_FILE,
+                )
+            )
+
+            client_id = str(uuid.uuid4())
+            Delta.objects.bulk_create(
+                Delta(
+                    deltafile_id=uuid.uuid4(),
+                    client_id=client_id,
+                    project=project,
+                    content=generate_delta(idx, client_id),
+                    last_status=Delta.Status.APPLIED,
+                    created_by=user,
+                )
+                for idx in range(options["deltas"])
+            )
+
+            now = timezone.now()
+            for job_idx in range(options["jobs"]):
+                ProcessProjectfileJob.objects.create(
+                    project=project,
+                    created_by=user,
+                    status=Job.Status.FINISHED,
+                    started_at=now - timedelta(minutes=job_idx + 1),
+                    finished_at=now - timedelta(minutes=job_idx),
+                )
+
+            package_job = PackageJob.objects.create(
+                project=project,
+                created_by=user,
+                triggered_by=user,
+                status=Job.Status.FINISHED,
+                feedback=PACKAGE_JOB_FEEDBACK,
+                started_at=now,
+                finished_at=now,
+            )
+            for file_idx in range(options["files"]):
+                filename = "project_qfield.qgs" if file_idx == 0 else "data.gpkg"
+                FileVersion.objects.add_version(
+                    project=project,
+                    filename=f"{file_idx}/{filename}" if file_idx else filename,
+                    content=ContentFile(content, filename),
+                    file_type=File.FileType.PACKAGE_FILE,
+                    uploaded_by=user,
+                    package_job_id=package_job.id,
+                )
+
+        seed.seconds = time.perf_counter() - started_at
+
+        self.stderr.write(f"Seeded in {seed.seconds:.2f} s.")
+
+        return seed
+
+    def get_endpoints(
+        self, seed: Seed, client: APIClient, options: dict
+    ) -> dict[str, Callable[[int], HttpResponseBase]]:
+        project = seed.projects[0]
+        content = b"x" * options["file_size"]
+
+        def upload_file(idx: int) -> HttpResponseBase:
+            return client.post(
+                f"/api/v1/files/{project.id}/bench.txt/",
+                {"file": io.BytesIO(content)},
+                format="multipart",
+            )
+
+        def post_deltafile(idx: int) -> HttpResponseBase:
+            client_id = str(uuid.uuid4())
+            deltafile = generate_deltafile(
+                [
+                    generate_delta(delta_idx, client_id)
+                    for delta_idx in range(options["deltafile_deltas"])
+                ],
+                project_id=str(project.id),
+                id=str(uuid.uuid4()),
+            )
+            deltafile_io = io.BytesIO(json.dumps(deltafile).encode())
+            deltafile_io.name = "deltafile.json"
+
+            return client.post(
+                f"/api/v1/deltas/{project.id}/",
+                {"file": deltafile_io},
+                format="multipart",
+            )
+
+        return {
+            "project_list": lambda idx: client.get("/api/v1/projects/"),
+            "file_list": lambda idx: client.get(f"/api/v1/files/{project.id}/"),
+            "file_upload": upload_file,
+            "file_download": lambda idx: client.get(
+                f"/api/v1/files/{project.id}/project.qgs/"
+            ),
+            "deltafile_post": post_deltafile,
+            "latest_package": lambda idx: client.get(
+                f"/api/v1/packages/{project.id}/latest/"
+            ),
+            "job_list": lambda idx: client.get(
+                "/api/v1/jobs/", {"project_id": str(project.id)}
+            ),
+        }
+
+    def benchmark(self, seed: Seed, options: dict) -> dict[str, dict]:
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {seed.token.key}")
+
+        results = {}
+        for name, request in self.get_endpoints(seed, client, options).items():
+            self.stderr.write(f"Benchmarking {name}...")
+
+            for idx in range(options["warmup"]):
+                request(idx)
+
+            latencies = []
+            queries = []
+            status_codes: Counter[int] = Counter()
+            for idx in range(options["iterations"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    started_at = time.perf_counter()
+                    response = request(idx)
+                    latencies.append((time.perf_counter() - started_at) * 1000)
+
+                queries.append(len(ctx.captured_queries))
+                status_codes[response.status_code] += 1
+
+            # the memory is traced on a separate request, as tracing slows down the timed ones
+            tracemalloc.start()
+            request(options["iterations"])
+            _current, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            latencies.sort()
+            results[name] = {
+                "status_codes": {
+                    str(code): count for code, count in sorted(status_codes.items())
+                },
+                "latency_ms": {
+                    "min": round(latencies[0], 3),
+                    "mean": round(statistics.fmean(latencies), 3),
+                    "p50": round(get_percentile(latencies, 0.5), 3),
+                    "p90": round(get_percentile(latencies, 0.9), 3),
+                    "p99": round(get_percentile(latencies, 0.99), 3),
+                    "max": round(latencies[-1], 3),
+                },
+                "queries": {
+                    "min": min(queries),
+                    "median": statistics.median(queries),
+                    "max": max(queries),
+                },
+                "peak_memory_bytes": peak_memory,
+            }
+
+        return results
+
+    def cleanup(self, prefix: str) -> None:
+        self.stderr.write("Deleting the benchmark data...")
+
+        # the file versions are deleted one by one, so their objects are removed from the storage
+        for project in Project.objects.filter(name__startswith=f"{prefix}_"):
+            for file_version in FileVersion.objects.filter(file__project=project):
+                file_version.delete()
+
+            project.delete()
+
+        Team.objects.filter(username__startswith=f"@{prefix}_").delete()
+        Organization.objects.filter(username__startswith=f"{prefix}_").delete()
+        Person.objects.filter(username__startswith=f"{prefix}_").delete()
@@ -0,0 +1,82 @@
+import timeit
+import uuid
+
+import jsonschema
+from django.core.management.base import BaseCommand
+from qfieldcloud.core import utils
+from qfieldcloud.core.utils2.delta_utils import generate_deltafile
+
+
+def generate_delta(idx: int, client_id: str) -> dict:
+    return {
+        "uuid": str(uuid.uuid4()),
+        "clientId": client_id,
+        "exportId": client_id,
+        "localPk": str(idx),
+        "sourcePk": str(idx),
+        "localLayerId": "points_897d5ed7_b810_4624_abe3_9f7c0a93d6a1",
+        "sourceLayerId": "points_897d5ed7_b810_4624_abe3_9f7c0a93d6a1",
+        "method": "patch",
+        "new": {
+            "geometry": f"POINT ({idx} {idx})",
+            "attributes": {"int": idx, "str": f"new value {idx}"},
+        },
+        "old": {
+            "geometry": "POINT (0 0)",
+            "attributes": {"int": 0, "str": "old value"},
+        },
+    }
+
+
+class Command(BaseCommand):
+    """
+    Compare the deltafile JSON schema validation speed of the available validator backends.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deltas", type=int, default=10000, help="Number of deltas."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of timed validations."
+        )
+
+    def handle(self, *args, **options):
+        deltas_count = options["deltas"]
+        repeat = options["repeat"]
+
+        client_id = str(uuid.uuid4())
+        deltafile = generate_deltafile(
+            [generate_delta(idx, client_id) for idx in range(deltas_count)],
+            project_id=str(uuid.uuid4()),
+            id=str(uuid.uuid4()),
+        )
+
+        schema = utils.get_deltafile_schema()
+        validators = {
+            "jsonschema": jsonschema.Draft7Validator(schema),
+            "compiled": utils.CompiledSchemaValidator(schema),
+        }
+
+        self.stdout.write(
+            f"Validating a deltafile with {deltas_count} deltas, best of {repeat} runs:"
+        )
+
+        timings = {}
+        for name, validator in validators.items():
+            # warm up the caches before timing
+            validator.validate(deltafile)
+
+            timings[name] = min(
+                timeit.repeat(
+                    lambda validator=validator: validator.validate(deltafile),
+                    repeat=repeat,
+                    number=1,
+                )
+            )
+
+            self.stdout.write(f"{name:>12}: {timings[name] * 1000:10.2f} ms")
+
+        self.stdout.write(
+            f"{'speedup':>12}: {timings['jsonschema'] / timings['compiled']:10.2f}x"
+        )
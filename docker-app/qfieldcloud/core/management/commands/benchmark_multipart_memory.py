@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from qfieldcloud.core.middleware.requests import (
+    BoundedTeeStream,
+    get_request_attributes,
+)
+
+
+class Command(BaseCommand):
+    """
+    Measure the peak memory of parsing a multipart upload, with and without the raw body copy of the `attach_keys` middleware.
+
+    The request body is built before the measurement starts, so only the memory allocated while parsing is reported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size-mb", type=int, default=50, help="Size of the uploaded file."
+        )
+        parser.add_argument(
+            "--max-size-to-send",
+            type=int,
+            default=10 * 1024 * 1024,
+            help="Maximum size of the raw body copy, as `SENTRY_REQUEST_MAX_SIZE_TO_SEND`.",
+        )
+
+    def handle(self, *args, **options):
+        size = options["size_mb"] * 1024 * 1024
+        max_size_to_send = options["max_size_to_send"]
+
+        scenarios = {
+            "no copy": None,
+            "bounded copy": max_size_to_send,
+        }
+
+        self.stdout.write(
+            f"Parsing a multipart upload of {options['size_mb']} MB, raw body copy limited to {max_size_to_send} bytes:"
+        )
+
+        for name, max_size in scenarios.items():
+            request = RequestFactory().post(
+                "/api/v1/files/",
+                {"file": SimpleUploadedFile("file.bin", b"\0" * size)},
+            )
+
+            tracemalloc.start()
+            started_at = time.perf_counter()
+
+            if max_size is not None:
+                request._stream = BoundedTeeStream(request._stream, max_size)
+
+            request.FILES["file"].close()
+            duration_s = time.perf_counter() - started_at
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{name:>14}: peak {peak / 1024 / 1024:10.2f} MB, {duration_s * 1000:10.2f} ms"
+            )
+
+        tracemalloc.start()
+        get_request_attributes(request)
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{'attributes':>14}: peak {peak / 1024 / 1024:10.2f} MB, only when an event is sent to Sentry"
+        )
@@ -0,0 +1,177 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from qfieldcloud.filestorage.backend import QfcWebDavStorage
+
+
+def strip_head_response_body(app):
+    """WsgiDAV sends a body with its `HEAD` error responses, which breaks keep-alive connections."""
+
+    def wrapper(environ, start_response):
+        response = app(environ, start_response)
+
+        if environ["REQUEST_METHOD"] != "HEAD":
+            return response
+
+        for _chunk in response:
+            pass
+
+        if hasattr(response, "close"):
+            response.close()
+
+        return []
+
+    return wrapper
+
+
+@contextmanager
+def run_wsgidav_server(root_path: str) -> Iterator[str]:
+    """Runs a local anonymous WsgiDAV server serving the given directory, yields its url."""
+    try:
+        from cheroot import wsgi
+        from wsgidav.wsgidav_app import WsgiDAVApp
+    except ImportError as err:
+        raise CommandError(
+            "The benchmark requires `wsgidav` and `cheroot`, install the test requirements."
+        ) from err
+
+    app = WsgiDAVApp(
+        {
+            "provider_mapping": {"/": root_path},
+            "simple_dc": {"user_mapping": {"*": True}},
+            "logging": {"enable": False},
+            "verbose": 0,
+        }
+    )
+    server = wsgi.Server(("127.0.0.1", 0), strip_head_response_body(app), numthreads=10)
+    server.prepare()
+
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+
+    try:
+        host, port = server.bind_addr
+        yield f"http://{host}:{port}"
+    finally:
+        server.stop()
+        thread.join()
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the webdav storage backend against a local WsgiDAV server.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file-size",
+            type=int,
+            default=64,
+            help="Size of the file read in the streaming benchmark, in MiB.",
+        )
+        parser.add_argument(
+            "--files",
+            type=int,
+            default=200,
+            help="Number of files saved in the collections benchmark.",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=4,
+            help="Number of nested collections of the saved files.",
+        )
+
+    def handle(self, *args, **options):
+        with (
+            tempfile.TemporaryDirectory() as root_path,
+            run_wsgidav_server(root_path) as webdav_url,
+        ):
+            storage = QfcWebDavStorage(
+                webdav_url=webdav_url,
+                public_url=webdav_url,
+                basic_auth="benchmark:",
+            )
+
+            self.benchmark_save(storage, options["files"], options["depth"])
+            self.benchmark_read(storage, options["file_size"] * 1024 * 1024)
+
+    def benchmark_save(self, storage: QfcWebDavStorage, files: int, depth: int):
+        methods = Counter()
+
+        def count_request(response, *args, **kwargs):
+            methods[response.request.method] += 1
+
+        storage.requests.hooks["response"].append(count_request)
+
+        self.stdout.write(
+            f"Saving {files} files in {depth} nested collections of 10 projects:"
+        )
+
+        for label, forget in (("uncached", True), ("cached", False)):
+            methods.clear()
+            prefix = uuid.uuid4().hex
+
+            started_at = time.perf_counter()
+            for idx in range(files):
+                parents = "/".join(f"dir{level}" for level in range(depth))
+                name = f"{prefix}/project{idx % 10}/{parents}/file{idx}.txt"
+
+                if forget:
+                    storage.forget_collections(name)
+
+                storage.save(name, ContentFile(b"x" * 1024))
+            elapsed = time.perf_counter() - started_at
+
+            requests_count = " ".join(f"{m}={c}" for m, c in sorted(methods.items()))
+            self.stdout.write(
+                f"{label:>12}: {elapsed * 1000:10.2f} ms, {sum(methods.values())} requests ({requests_count})"
+            )
+
+        storage.requests.hooks["response"].remove(count_request)
+
+    def benchmark_read(self, storage: QfcWebDavStorage, file_size: int):
+        name = f"{uuid.uuid4().hex}/large.bin"
+        storage.save(name, ContentFile(os.urandom(1024 * 1024) * (file_size // 2**20)))
+
+        self.stdout.write(f"Reading a file of {file_size / 2**20:.0f} MiB:")
+
+        def read_whole():
+            return len(storage.perform_webdav_request("GET", name).content)
+
+        def read_streamed():
+            with storage.open(name) as f:
+                return sum(len(chunk) for chunk in f.chunks())
+
+        for label, read in (("whole", read_whole), ("streamed", read_streamed)):
+            tracemalloc.start()
+            started_at = time.perf_counter()
+            read_size = read()
+            elapsed = time.perf_counter() - started_at
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            assert read_size == file_size
+
+            self.stdout.write(
+                f"{label:>12}: {elapsed * 1000:10.2f} ms, peak memory {peak / 2**20:8.2f} MiB"
+            )
+
+        with storage.open(name) as f:
+            f.seek(file_size - 1024)
+            started_at = time.perf_counter()
+            tail = f.read()
+            elapsed = time.perf_counter() - started_at
+
+        assert len(tail) == 1024
+
+        self.stdout.write(f"{'tail range':>12}: {elapsed * 1000:10.2f} ms")
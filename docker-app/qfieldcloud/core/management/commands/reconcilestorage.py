@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from qfieldcloud.filestorage.reconciliation import (
+    iter_reconciliation,
+    iter_storage_references,
+)
+
+# S3 limit of objects deleted with a single request
+MAX_DELETE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Reconcile the objects on a storage with their database references.
+
+    Reports (and optionally deletes) the orphan objects without any database row referencing them,
+    and reports the database rows referencing missing objects.
+    Both the storage listing and the database references are streamed sorted by name and merge-joined,
+    so the memory usage does not depend on the number of objects.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--storage",
+            default="default",
+            choices=list(settings.STORAGES.keys()),
+            help="Name of the storage to reconcile.",
+        )
+        parser.add_argument("--prefix", default="", help="Filter by prefix.")
+        parser.add_argument(
+            "--min-age-hours",
+            type=int,
+            default=24,
+            help="Ignore the orphan objects modified more recently, as their database rows might not be committed yet.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=MAX_DELETE_BATCH_SIZE,
+            help="Number of orphan objects deleted with a single request.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of database rows fetched at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the orphan objects without deleting them.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Skip the delete confirmation prompt.",
+        )
+
+    def handle(self, *args, **options):
+        storage_name = options["storage"]
+        prefix = options["prefix"]
+        dry_run = options["dry_run"]
+        batch_size = options["batch_size"]
+        storage = storages[storage_name]
+        modified_before = timezone.now() - timedelta(hours=options["min_age_hours"])
+
+        if not 0 < batch_size <= MAX_DELETE_BATCH_SIZE:
+            raise CommandError(
+                f"The batch size must be between 1 and {MAX_DELETE_BATCH_SIZE}."
+            )
+
+        if not dry_run and not options["force"]:
+            confirmation_input = input(
+                f'Delete the orphan objects from storage "{storage_name}"? (yes/no): '
+            ).lower()
+
+            if confirmation_input != "yes":
+                return
+
+        try:
+            objects = storage.iter_objects(prefix)
+        except NotImplementedError:
+            raise CommandError(
+                f'Listing the objects of storage "{storage_name}" is not supported.'
+            )
+
+        references = iter_storage_references(
+            storage_name, prefix, chunk_size=options["chunk_size"]
+        )
+
+        orphans_count = 0
+        orphans_bytes = 0
+        skipped_count = 0
+        missing_count = 0
+        failed_count = 0
+        batch: list[str] = []
+
+        def flush() -> int:
+            failed_names = storage.delete_many(batch)
+
+            for name in failed_names:
+                self.stderr.write(f"Failed to delete: {name}")
+
+            batch.clear()
+
+            return len(failed_names)
+
+        for result in iter_reconciliation(objects, references):
+            if result.is_missing:
+                missing_count += 1
+                references_str = ", ".join(
+                    f"{reference.model_name} {reference.pk}"
+                    for reference in result.references
+                )
+                self.stdout.write(f"Missing: {result.name} | {references_str}")
+                continue
+
+            assert result.obj
+
+            if result.obj.last_modified > modified_before:
+                skipped_count += 1
+                continue
+
+            orphans_count += 1
+            orphans_bytes += result.obj.size
+            self.stdout.write(
+                f"Orphan: {result.name} | Size: {filesizeformat(result.obj.size)} | "
+                f"Last Modified: {result.obj.last_modified}"
+            )
+
+            if dry_run:
+                continue
+
+            batch.append(result.name)
+
+            if len(batch) == batch_size:
+                failed_count += flush()
+
+        if batch:
+            failed_count += flush()
+
+        self.stdout.write(f"Total orphan objects found: {orphans_count}")
+        self.stdout.write(
+            f"Total size of orphan objects: {filesizeformat(orphans_bytes)}"
+        )
+        self.stdout.write(f"Total recent orphan objects skipped: {skipped_count}")
+        self.stdout.write(f"Total missing objects found: {missing_count}")
+
+        if not dry_run:
+            self.stdout.write(
+                f"Total orphan objects deleted: {orphans_count - failed_count}"
+            )
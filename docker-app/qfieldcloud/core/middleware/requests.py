@@ -1,46 +1,127 @@
-import io
 import logging
-import shutil
 
+import sentry_sdk
 from constance import config
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# maximum size of the request attributes attached to a Sentry event
+MAX_REQUEST_ATTRIBUTES_SIZE = 64 * 1024
+
+# the `META` keys of the request attached to a Sentry event, besides the HTTP headers
+REQUEST_META_KEYS = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "PATH_INFO",
+    "QUERY_STRING",
+    "REQUEST_METHOD",
+    "SERVER_PROTOCOL",
+)
+
+# the HTTP headers with credentials, their values are never attached to a Sentry event
+SENSITIVE_META_KEYS = (
+    "HTTP_AUTHORIZATION",
+    "HTTP_COOKIE",
+    "HTTP_PROXY_AUTHORIZATION",
+    "HTTP_X_CSRFTOKEN",
+)
+
+
+class BoundedTeeStream:
+    """Wraps a request stream and keeps a copy of the first `max_size` bytes read from it.
+
+    Nothing is read from the wrapped stream unless the request handling reads it,
+    so upload handlers still stream the request body as usual.
+    """
+
+    def __init__(self, stream, max_size: int) -> None:
+        self.stream = stream
+        self.max_size = max_size
+        self.captured = bytearray()
+
+    def _capture(self, data: bytes) -> bytes:
+        remaining_size = self.max_size - len(self.captured)
+
+        if remaining_size > 0:
+            self.captured += data[:remaining_size]
+
+        return data
+
+    def read(self, *args, **kwargs) -> bytes:
+        return self._capture(self.stream.read(*args, **kwargs))
+
+    def readline(self, *args, **kwargs) -> bytes:
+        return self._capture(self.stream.readline(*args, **kwargs))
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+def get_request_meta(request) -> dict[str, str]:
+    """Returns the HTTP headers and the request line keys of the request `META`, with the credentials filtered out.
+
+    The rest of the `META` is left out, as it might contain the environment variables of the server.
+    """
+    return {
+        key: "[Filtered]" if key in SENSITIVE_META_KEYS else value
+        for key, value in request.META.items()
+        if key.startswith("HTTP_") or key in REQUEST_META_KEYS
+    }
+
+
+def get_request_attributes(request) -> bytes:
+    """Returns the `FILES` keys and the filtered `META` of the request, truncated to `MAX_REQUEST_ATTRIBUTES_SIZE`."""
+    # NOTE read the already parsed files only, `request.FILES` would parse the request body if it was not read yet
+    files = getattr(request, "_files", None)
+    request_attributes = {
+        "file_key": str(files.keys()) if files is not None else None,
+        "meta": str(get_request_meta(request)),
+        "files": files.getlist("file") if files is not None else None,
+    }
+
+    return str(request_attributes).encode()[:MAX_REQUEST_ATTRIBUTES_SIZE]
+
 
 def attach_keys(get_response):
     """
     QF-2540
-    Annotate request with:
-    - a `str` representation of relevant fields, so as to obtain a diff by comparing with the post-serialized request later in the callstack;
-    - a byte-for-byte, non stealing copy of the raw body to inspect multipart boundaries.
+    Attach to the Sentry events of the request:
+    - a `str` representation of relevant fields of the request, without the credentials headers;
+    - a byte-for-byte copy of the raw body of multipart uploads to inspect multipart boundaries, if smaller than `SENTRY_REQUEST_MAX_SIZE_TO_SEND`.
+      Other bodies are never copied, as they might contain credentials, e.g. the login password.
+
+    The attachments are materialized only when an event is sent to Sentry.
+    The raw body is copied while the request handling reads it, it is never read in advance.
     """
 
     def middleware(request):
-        # add a copy of the request body to the request
+        if not settings.SENTRY_DSN:
+            return get_response(request)
+
+        scope = sentry_sdk.get_isolation_scope()
+        max_size_to_send = int(config.SENTRY_REQUEST_MAX_SIZE_TO_SEND)
+
         if (
-            settings.SENTRY_DSN
-            and request.method == "POST"
+            request.method == "POST"
+            and request.content_type == "multipart/form-data"
             and "Content-Length" in request.headers
-            and (
-                int(request.headers["Content-Length"])
-                < int(config.SENTRY_REQUEST_MAX_SIZE_TO_SEND)
-            )
+            and int(request.headers["Content-Length"]) < max_size_to_send
         ):
-            logger.info("Making a temporary copy for request body.")
-
-            input_stream = io.BytesIO(request.body)
-            output_stream = io.BytesIO()
-            shutil.copyfileobj(input_stream, output_stream)
-            request.body_stream = output_stream
-
-        request_attributes = {
-            "file_key": str(request.FILES.keys()),
-            "meta": str(request.META),
-            "files": request.FILES.getlist("file"),
-        }
-        request.attached_keys = str(request_attributes)
-        response = get_response(request)
-        return response
+            # NOTE `_stream` is what `HttpRequest.read()` and the multipart parser read from
+            body_stream = BoundedTeeStream(request._stream, max_size_to_send)
+            request._stream = body_stream
+
+            scope.add_attachment(
+                bytes=lambda: bytes(body_stream.captured),
+                filename="request_rawbody.txt",
+            )
+
+        scope.add_attachment(
+            bytes=lambda: get_request_attributes(request),
+            filename="request_attributes.txt",
+        )
+
+        return get_response(request)
 
     return middleware
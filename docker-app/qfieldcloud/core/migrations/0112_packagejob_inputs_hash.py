@@ -0,0 +1,19 @@
+# Generated by Django 5.2.17 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0111_auto_20260821_1536"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="packagejob",
+            name="inputs_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.17 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0112_packagejob_inputs_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="worker_wall_time_s",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="worker_cpu_time_s",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="worker_peak_rss_bytes",
+            field=models.PositiveBigIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="worker_bytes_received",
+            field=models.PositiveBigIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="worker_bytes_sent",
+            field=models.PositiveBigIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.17 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0113_job_worker_metrics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrganizationActivity",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activities",
+                        to="core.organization",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="organization_activities",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "organization activity",
+                "verbose_name_plural": "organization activities",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("organization", "day", "user"),
+                        name="organization_activity_organization_day_user_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
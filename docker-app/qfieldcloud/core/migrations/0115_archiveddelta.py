@@ -0,0 +1,95 @@
+# Generated by Django 5.2.17 on 2026-10-18 12:10
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0114_organizationactivity"),
+        ("project", "0011_project_thumbnail_cache_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedDelta",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("deltafile_id", models.UUIDField(db_index=True)),
+                ("client_id", models.UUIDField(db_index=True, editable=False)),
+                ("content", models.JSONField()),
+                (
+                    "last_status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("started", "Started"),
+                            ("applied", "Applied"),
+                            ("conflict", "Conflict"),
+                            ("not_applied", "Not_applied"),
+                            ("error", "Error"),
+                            ("ignored", "Ignored"),
+                            ("unpermitted", "Unpermitted"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("last_feedback", models.JSONField(null=True)),
+                ("last_modified_pk", models.TextField(null=True)),
+                ("last_apply_attempt_at", models.DateTimeField(null=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "old_geom",
+                    django.contrib.gis.db.models.fields.GeometryField(
+                        dim=4, null=True, spatial_index=False, srid=4326
+                    ),
+                ),
+                (
+                    "new_geom",
+                    django.contrib.gis.db.models.fields.GeometryField(
+                        dim=4, null=True, spatial_index=False, srid=4326
+                    ),
+                ),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_deltas",
+                        to="project.project",
+                    ),
+                ),
+                (
+                    "last_apply_attempt_by",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["project", "created_at"],
+                        name="core_archiveddelta_project_idx",
+                    )
+                ],
+            },
+        ),
+    ]
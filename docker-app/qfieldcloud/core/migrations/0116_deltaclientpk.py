@@ -0,0 +1,76 @@
+# Generated by Django 5.2.17 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0115_archiveddelta"),
+        ("project", "0011_project_thumbnail_cache_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeltaClientPk",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("client_id", models.UUIDField()),
+                ("local_layer_id", models.TextField()),
+                ("local_pk", models.TextField()),
+                ("modified_pk", models.TextField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="project.project",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("client_id", "local_layer_id", "local_pk"),
+                        name="delta_client_pk_client_layer_pk_uniq",
+                    )
+                ],
+            },
+        ),
+        # fill the modified pks of the already applied deltas, the most recently updated delta wins
+        migrations.RunSQL(
+            """
+                INSERT INTO core_deltaclientpk (project_id, client_id, local_layer_id, local_pk, modified_pk, updated_at)
+                SELECT DISTINCT ON (client_id, content->>'localLayerId', content->>'localPk')
+                    project_id,
+                    client_id,
+                    content->>'localLayerId',
+                    content->>'localPk',
+                    last_modified_pk,
+                    NOW()
+                FROM (
+                    SELECT project_id, client_id, content, last_modified_pk, updated_at
+                    FROM core_delta
+                    WHERE last_modified_pk IS NOT NULL
+                    UNION ALL
+                    SELECT project_id, client_id, content, last_modified_pk, updated_at
+                    FROM core_archiveddelta
+                    WHERE last_modified_pk IS NOT NULL
+                ) AS deltas
+                WHERE content->>'localLayerId' IS NOT NULL
+                    AND content->>'localPk' IS NOT NULL
+                ORDER BY client_id, content->>'localLayerId', content->>'localPk', updated_at DESC
+                ON CONFLICT DO NOTHING
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.17 on 2026-10-18 14:10
+
+import django.contrib.gis.db.models.fields
+import django.db.models.fields.json
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are created concurrently, so the writes to the deltas tables are not blocked while they are built
+    atomic = False
+
+    dependencies = [
+        ("core", "0116_deltaclientpk"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archiveddelta",
+            name="old_geom",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                dim=4, null=True, srid=4326
+            ),
+        ),
+        migrations.AlterField(
+            model_name="archiveddelta",
+            name="new_geom",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                dim=4, null=True, srid=4326
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="delta",
+            index=models.Index(
+                fields=["project", "created_at", "id"],
+                name="core_delta_project_created_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="delta",
+            index=models.Index(
+                fields=["project", "last_status", "created_at"],
+                name="core_delta_project_status_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="delta",
+            index=models.Index(
+                fields=["project", "created_by", "created_at"],
+                name="core_delta_project_user_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="delta",
+            index=models.Index(
+                models.F("project"),
+                django.db.models.fields.json.KeyTextTransform(
+                    "sourceLayerId", "content"
+                ),
+                name="core_delta_project_layer_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="archiveddelta",
+            index=models.Index(
+                models.F("project"),
+                django.db.models.fields.json.KeyTextTransform(
+                    "sourceLayerId", "content"
+                ),
+                name="core_archiveddelta_layer_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.17 on 2026-10-18 15:20
+
+from django.db import migrations
+
+import qfieldcloud.core.fields
+import qfieldcloud.core.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0117_delta_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="output_file",
+            field=qfieldcloud.core.fields.DynamicStorageFileField(
+                blank=True,
+                editable=False,
+                max_length=1024,
+                null=True,
+                upload_to=qfieldcloud.core.models.get_job_output_upload_to,
+            ),
+        ),
+    ]
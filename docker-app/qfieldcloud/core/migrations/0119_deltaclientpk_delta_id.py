@@ -0,0 +1,42 @@
+# Generated by Django 5.2.17 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0118_job_output_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deltaclientpk",
+            name="delta_id",
+            field=models.UUIDField(db_index=True, null=True),
+        ),
+        # fill the delta that recorded the modified pk, the most recently updated delta wins
+        migrations.RunSQL(
+            """
+                UPDATE core_deltaclientpk AS client_pk
+                SET delta_id = deltas.id
+                FROM (
+                    SELECT DISTINCT ON (client_id, content->>'localLayerId', content->>'localPk', last_modified_pk)
+                        id,
+                        client_id,
+                        content->>'localLayerId' AS local_layer_id,
+                        content->>'localPk' AS local_pk,
+                        last_modified_pk
+                    FROM core_delta
+                    WHERE last_modified_pk IS NOT NULL
+                        AND content->>'localLayerId' IS NOT NULL
+                        AND content->>'localPk' IS NOT NULL
+                    ORDER BY client_id, content->>'localLayerId', content->>'localPk', last_modified_pk, updated_at DESC
+                ) AS deltas
+                WHERE client_pk.client_id = deltas.client_id
+                    AND client_pk.local_layer_id = deltas.local_layer_id
+                    AND client_pk.local_pk = deltas.local_pk
+                    AND client_pk.modified_pk = deltas.last_modified_pk
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import gzip
 import logging
 import secrets
 import string
 import uuid
-from datetime import datetime, timedelta
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta, timezone
 from enum import Enum
 from functools import cached_property
 from pathlib import Path
@@ -16,6 +18,7 @@ from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.contrib.gis.db import models
 from django.core import signing
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.core.validators import (
     RegexValidator,
 )
@@ -23,7 +26,7 @@ from django.db import transaction
 from django.db.models import Case, Exists, F, OuterRef, Q, When
 from django.db.models import Value as V
 from django.db.models.aggregates import Count, Sum
-from django.db.models.fields.json import JSONField
+from django.db.models.fields.json import KT, JSONField
 from django.urls import reverse
 from django.utils.translation import gettext as _
 from encrypted_fields.fields import EncryptedTextField
@@ -46,6 +49,19 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+ONE_DAY = timedelta(days=1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def get_activity_day(created_at: datetime) -> date:
+    """Returns the UTC day of `created_at`, as stored in `OrganizationActivity.day`."""
+    return created_at.astimezone(timezone.utc).date()
+
+
+def get_activity_day_start(day: date) -> datetime:
+    """Returns the UTC midnight at which `day` starts."""
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
 
 class BasemapProvider(models.TextChoices):
     NONE = "none", _("No basemap")
@@ -691,31 +707,83 @@ class Organization(User):
         assert period_since
         assert period_until
 
+        # the whole days within the period are read from the `OrganizationActivity` rollup,
+        # only the partial days at the edges of the period are read from the deltas, the archived deltas and the jobs.
+        first_whole_day = get_activity_day(period_since - ONE_MICROSECOND) + ONE_DAY
+        last_whole_day = get_activity_day(period_until + ONE_MICROSECOND) - ONE_DAY
+
+        if first_whole_day > last_whole_day:
+            return Person.objects.filter(
+                is_staff=False,
+            ).filter(
+                self._get_active_users_filter(
+                    Q(created_at__gte=period_since, created_at__lte=period_until)
+                )
+                | Q(id=self.organization_owner_id)
+            )
+
+        users_with_activity = (
+            OrganizationActivity.objects.filter(
+                organization=self,
+                day__gte=first_whole_day,
+                day__lte=last_whole_day,
+            )
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        partial_days_filter = Q(
+            created_at__gte=period_since,
+            created_at__lt=get_activity_day_start(first_whole_day),
+        ) | Q(
+            created_at__gte=get_activity_day_start(last_whole_day + ONE_DAY),
+            created_at__lte=period_until,
+        )
+
+        return Person.objects.filter(
+            is_staff=False,
+        ).filter(
+            Q(id__in=users_with_activity)
+            | self._get_active_users_filter(partial_days_filter)
+            | Q(id=self.organization_owner_id)
+        )
+
+    def _get_active_users_filter(self, created_at_filter: Q) -> Q:
+        """Returns a filter for the users that pushed a delta or triggered a job on the organization's projects.
+
+        The deltas moved to `ArchivedDelta` are included, as they might be archived before the end of the period.
+
+        Args:
+            created_at_filter: filter on the `created_at` of the deltas, the archived deltas and the jobs
+        """
         users_with_delta = (
             Delta.objects.filter(
+                created_at_filter,
+                project__in=self.projects.all(),  # type: ignore
+            )
+            .values_list("created_by_id", flat=True)
+            .distinct()
+        )
+        users_with_archived_delta = (
+            ArchivedDelta.objects.filter(
+                created_at_filter,
                 project__in=self.projects.all(),  # type: ignore
-                created_at__gte=period_since,
-                created_at__lte=period_until,
             )
             .values_list("created_by_id", flat=True)
             .distinct()
         )
         users_with_jobs = (
             Job.objects.filter(
+                created_at_filter,
                 project__in=self.projects.all(),  # type: ignore
-                created_at__gte=period_since,
-                created_at__lte=period_until,
             )
             .values_list("created_by_id", flat=True)
             .distinct()
         )
 
-        return Person.objects.filter(
-            is_staff=False,
-        ).filter(
+        return (
             Q(id__in=users_with_delta)
+            | Q(id__in=users_with_archived_delta)
             | Q(id__in=users_with_jobs)
-            | Q(id=self.organization_owner_id)
         )
 
     def save(self, *args, **kwargs):
@@ -906,6 +974,72 @@ class OrganizationRolesView(models.Model):
         managed = False
 
 
+class OrganizationActivityQuerySet(models.QuerySet):
+    def record(
+        self, project: Project, user_ids: Iterable[int], created_at: datetime
+    ) -> None:
+        """Marks the users as active in the organization owning `project` on the day of `created_at`.
+
+        Nothing is recorded if the project is not owned by an organization.
+
+        Args:
+            project: the project the users were active on
+            user_ids: ids of the users that created a delta or a job
+            created_at: when the activity happened
+        """
+        if not project.owner.is_organization:
+            return
+
+        day = get_activity_day(created_at)
+
+        self.bulk_create(
+            [
+                OrganizationActivity(
+                    organization_id=project.owner_id,
+                    user_id=user_id,
+                    day=day,
+                )
+                for user_id in set(user_ids)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class OrganizationActivity(models.Model):
+    """Daily rollup of the users that pushed a delta or triggered a job on projects owned by an organization.
+
+    Used to count the active (billable) users without scanning the deltas and the jobs of the organization.
+    The days are UTC dates, see `get_activity_day`.
+    """
+
+    objects = OrganizationActivityQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "organization activity"
+        verbose_name_plural = "organization activities"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["organization", "day", "user"],
+                name="organization_activity_organization_day_user_uniq",
+            )
+        ]
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="activities",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="organization_activities",
+    )
+    day = models.DateField()
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.user_id}:{self.day}"
+
+
 class Team(User):
     team_organization = models.ForeignKey(
         Organization,
@@ -1223,6 +1357,28 @@ class Delta(models.Model):
         through="ApplyJobDelta",
     )
 
+    class Meta:
+        # NOTE the indexes support the filters and the cursor pagination of the deltas list endpoints
+        indexes = [
+            models.Index(
+                fields=["project", "created_at", "id"],
+                name="core_delta_project_created_idx",
+            ),
+            models.Index(
+                fields=["project", "last_status", "created_at"],
+                name="core_delta_project_status_idx",
+            ),
+            models.Index(
+                fields=["project", "created_by", "created_at"],
+                name="core_delta_project_user_idx",
+            ),
+            models.Index(
+                F("project"),
+                KT("content__sourceLayerId"),
+                name="core_delta_project_layer_idx",
+            ),
+        ]
+
     def __str__(self):
         return str(self.id) + ", project: " + str(self.project.id)
 
@@ -1256,8 +1412,44 @@ class Delta(models.Model):
     def method(self):
         return self.content.get("method")
 
+    def save(self, *args, **kwargs):
+        is_adding = self._state.adding
+
+        super().save(*args, **kwargs)
+
+        if is_adding:
+            OrganizationActivity.objects.record(
+                self.project, [self.created_by_id], self.created_at
+            )
+
+
+# maximum length of the output kept in the jobs table, the full output is stored compressed in the project's file storage
+JOB_OUTPUT_INLINE_MAX_LENGTH = 16 * 1024
+
+
+def get_job_output_upload_to(instance: models.Model, filename: str) -> str:
+    instance = cast(Job, instance)
+    return f"projects/{instance.project_id}/jobs/{instance.id}/{filename}"
+
 
 class JobQuerySet(InheritanceQuerySet):
+    def for_list(self) -> JobQuerySet:
+        """Fetches only the columns serialized in the jobs list, see `JobSerializer`.
+
+        The potentially large `output` and `feedback` are never fetched.
+        """
+        return self.only(
+            "id",
+            "created_at",
+            "created_by",
+            "finished_at",
+            "project",
+            "started_at",
+            "status",
+            "type",
+            "updated_at",
+        )
+
     def for_user(self, user: User) -> models.QuerySet[Job]:
         """Returns the jobs applicable to the user. If the user has assigned secrets, only jobs triggered by the user are returned.
 
@@ -1311,7 +1503,17 @@ class Job(models.Model):
     status = models.CharField(
         max_length=32, choices=Status.choices, default=Status.PENDING, db_index=True
     )
+    # the end of the output, the full output is in `output_file` if it is longer than `JOB_OUTPUT_INLINE_MAX_LENGTH`
     output = models.TextField(null=True)
+    # the full output, gzip compressed
+    output_file = DynamicStorageFileField(
+        upload_to=get_job_output_upload_to,
+        # the s3 storage has 1024 bytes (not chars!) limit: https://docs.aws.amazon.com/AmazonS3/latest/userguide/object-keys.html
+        max_length=1024,
+        null=True,
+        blank=True,
+        editable=False,
+    )
     feedback = JSONField(null=True)
 
     triggered_by = models.ForeignKey(
@@ -1332,6 +1534,22 @@ class Job(models.Model):
     container_id = models.CharField(
         max_length=64, default="", blank=True, db_index=True
     )
+    # resources used by the worker, aggregated from the metrics of the feedback steps
+    worker_wall_time_s = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True
+    )
+    worker_cpu_time_s = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True
+    )
+    worker_peak_rss_bytes = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, db_index=True
+    )
+    worker_bytes_received = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, db_index=True
+    )
+    worker_bytes_sent = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, db_index=True
+    )
 
     @property
     def short_id(self) -> str:
@@ -1411,7 +1629,48 @@ class Job(models.Model):
         if not self.triggered_by_id and self.created_by_id:
             self.triggered_by = self.created_by
 
-        return super().save(*args, **kwargs)
+        is_adding = self._state.adding
+
+        super().save(*args, **kwargs)
+
+        if is_adding:
+            OrganizationActivity.objects.record(
+                self.project, [self.created_by_id], self.created_at
+            )
+
+    def set_output(self, output: str) -> None:
+        """Sets the output of the job.
+
+        An output longer than `JOB_OUTPUT_INLINE_MAX_LENGTH` is stored gzip compressed in the project's file storage,
+        only its end is kept in `output`. The caller is responsible for saving both `output` and `output_file`.
+        """
+        if len(output) <= JOB_OUTPUT_INLINE_MAX_LENGTH:
+            self.output = output
+            return
+
+        self.output_file.save(
+            "output.log.gz",
+            ContentFile(gzip.compress(output.encode())),
+            save=False,
+        )
+
+        truncated_length = len(output) - JOB_OUTPUT_INLINE_MAX_LENGTH
+        self.output = (
+            f"[{truncated_length} characters truncated, the full output is available in the job details]\n"
+            + output[truncated_length:]
+        )
+
+    def get_full_output(self) -> str | None:
+        """Returns the full output of the job, read from the file storage if it was too long to be stored inline."""
+        if not self.output_file:
+            return self.output
+
+        with self.output_file.open("rb") as f:
+            return gzip.decompress(f.read()).decode()
+
+    def _get_file_storage_name(self) -> str:
+        # Use same storage as project
+        return self.project.file_storage
 
     def get_feedback_step_data(self, step_name: str) -> dict[str, Any] | None:
         """Extract a step data of a job's feedback.
@@ -1439,6 +1698,11 @@ class PackageJobQuerySet(JobQuerySet):
 class PackageJob(Job):
     objects = PackageJobQuerySet.as_manager()
 
+    # Hash of all the inputs that determine the package contents. Package jobs with the same hash produce the same package.
+    inputs_hash = models.CharField(
+        max_length=64, null=True, blank=True, editable=False, db_index=True
+    )
+
     def save(self, *args, **kwargs):
         self.type = self.Type.PACKAGE
         return super().save(*args, **kwargs)
@@ -1512,6 +1776,232 @@ class ApplyJobDelta(models.Model):
         return f"{self.apply_job_id}:{self.delta_id}"
 
 
+class ArchivedDelta(models.Model):
+    """A delta in a final status, moved out of `Delta` after `DELTAS_ARCHIVE_AFTER_DAYS` by `ArchiveDeltasJob`.
+
+    The fields are the same as `Delta` and in the same order, so both can be combined with `QuerySet.union()`.
+    The links to the apply jobs are not archived.
+    """
+
+    # the statuses that are never changed again by QFieldCloud
+    ARCHIVED_STATUSES = (
+        Delta.Status.APPLIED,
+        Delta.Status.IGNORED,
+        Delta.Status.UNPERMITTED,
+    )
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    deltafile_id = models.UUIDField(db_index=True)
+    client_id = models.UUIDField(null=False, db_index=True, editable=False)
+    project = models.ForeignKey(
+        "project.Project",
+        on_delete=models.CASCADE,
+        related_name="archived_deltas",
+    )
+    content = JSONField()
+    last_status = models.CharField(choices=Delta.Status.choices, max_length=32)
+    last_feedback = JSONField(null=True)
+    last_modified_pk = models.TextField(null=True)
+    last_apply_attempt_at = models.DateTimeField(null=True)
+    last_apply_attempt_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name="+",
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    old_geom = models.GeometryField(null=True, srid=4326, dim=4)
+    new_geom = models.GeometryField(null=True, srid=4326, dim=4)
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project", "created_at"],
+                name="core_archiveddelta_project_idx",
+            ),
+            models.Index(
+                F("project"),
+                KT("content__sourceLayerId"),
+                name="core_archiveddelta_layer_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.id) + ", project: " + str(self.project_id)
+
+
+def get_client_pk_key(client_id: str, local_layer_id: str, local_pk: str) -> str:
+    """Returns the key of the `clientPks` map of the deltafile, as read by the `apply_deltas` worker command."""
+    return f"{client_id}__{local_layer_id}__{local_pk}"
+
+
+class DeltaClientPkQuerySet(models.QuerySet):
+    def record(self, modified_pks: dict[str, str | None]) -> None:
+        """Stores the modified pks of the applied deltas, keyed by the client, layer and pk the deltas were created with.
+
+        A delta without a modified pk, e.g. a re-applied delta that failed, deletes the modified pk it has recorded before.
+        A pk that was modified again overrides the previous one.
+
+        Args:
+            modified_pks: the modified pks reported by the apply job, by delta id
+        """
+        self.clear(
+            [
+                delta_id
+                for delta_id, modified_pk in modified_pks.items()
+                if modified_pk is None
+            ]
+        )
+
+        modified_pks = {
+            delta_id: modified_pk
+            for delta_id, modified_pk in modified_pks.items()
+            if modified_pk is not None
+        }
+
+        if not modified_pks:
+            return
+
+        deltas = (
+            Delta.objects.filter(
+                id__in=modified_pks.keys(),
+                content__localLayerId__isnull=False,
+                content__localPk__isnull=False,
+            )
+            .order_by("created_at")
+            .values(
+                "id",
+                "project_id",
+                "client_id",
+                "content__localLayerId",
+                "content__localPk",
+            )
+        )
+
+        # NOTE a feature might be modified by several deltas of the same job, the last delta wins.
+        # A single upsert cannot update the same row twice, hence the deduplication.
+        client_pks = {}
+        for delta in deltas:
+            client_pk = DeltaClientPk(
+                project_id=delta["project_id"],
+                client_id=delta["client_id"],
+                local_layer_id=delta["content__localLayerId"],
+                local_pk=str(delta["content__localPk"]),
+                modified_pk=modified_pks[str(delta["id"])],
+                delta_id=delta["id"],
+            )
+            client_pks[
+                (client_pk.client_id, client_pk.local_layer_id, client_pk.local_pk)
+            ] = client_pk
+
+        self.bulk_create(
+            client_pks.values(),
+            update_conflicts=True,
+            unique_fields=["client_id", "local_layer_id", "local_pk"],
+            update_fields=["project", "modified_pk", "delta_id", "updated_at"],
+        )
+
+    def clear(self, delta_ids: Iterable[str | uuid.UUID]) -> None:
+        """Deletes the modified pks recorded by the deltas, e.g. when the deltas are re-applied and fail.
+
+        A modified pk recorded again by a later delta of the same feature is kept.
+
+        Args:
+            delta_ids: ids of the deltas whose modified pks are no longer valid
+        """
+        delta_ids = list(delta_ids)
+
+        if not delta_ids:
+            return
+
+        self.filter(delta_id__in=delta_ids).delete()
+
+    def get_client_pks_map(self, delta_contents: Iterable[dict]) -> dict[str, str]:
+        """Returns the `clientPks` map of the deltafile, limited to the features patched or deleted by `delta_contents`.
+
+        Args:
+            delta_contents: the contents of the deltas to be applied
+        """
+        keys = {
+            (
+                str(uuid.UUID(content["clientId"])),
+                content["localLayerId"],
+                str(content["localPk"]),
+            )
+            for content in delta_contents
+            if content.get("method")
+            in (Delta.Method.Patch.value, Delta.Method.Delete.value)
+            and "clientId" in content
+            and "localLayerId" in content
+            and "localPk" in content
+        }
+
+        if not keys:
+            return {}
+
+        client_ids, local_layer_ids, local_pks = zip(*keys)
+
+        # NOTE the query is narrowed by each column separately, the exact keys are filtered below
+        client_pks = self.filter(
+            client_id__in=set(client_ids),
+            local_layer_id__in=set(local_layer_ids),
+            local_pk__in=set(local_pks),
+        ).values_list("client_id", "local_layer_id", "local_pk", "modified_pk")
+
+        client_pks_map = {}
+        for client_id, local_layer_id, local_pk, modified_pk in client_pks:
+            if (str(client_id), local_layer_id, local_pk) in keys:
+                key = get_client_pk_key(str(client_id), local_layer_id, local_pk)
+                client_pks_map[key] = modified_pk
+
+        return client_pks_map
+
+
+class DeltaClientPk(models.Model):
+    """The pk a feature got on the server, for the pk it has on the QField client that created it.
+
+    A feature created on a client has a local pk which might differ from the pk it gets once the delta is applied.
+    The later deltas patching or deleting that feature are looked up by the apply job with the pks stored here,
+    instead of scanning all the deltas of the client. The rows are kept when the deltas are archived.
+    """
+
+    objects = DeltaClientPkQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["client_id", "local_layer_id", "local_pk"],
+                name="delta_client_pk_client_layer_pk_uniq",
+            )
+        ]
+
+    project = models.ForeignKey(
+        "project.Project",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    client_id = models.UUIDField()
+    local_layer_id = models.TextField()
+    local_pk = models.TextField()
+    modified_pk = models.TextField()
+    # the delta that recorded the modified pk, not a foreign key as the rows outlive the archived deltas
+    delta_id = models.UUIDField(null=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return get_client_pk_key(
+            str(self.client_id), self.local_layer_id, self.local_pk
+        )
+
+
 class SecretQueryset(models.QuerySet):
     def for_user_and_project(self, user: User, project: Project) -> SecretQueryset:
         """Returns a queryset with secrets for a specific user and project.
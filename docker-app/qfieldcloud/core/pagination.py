@@ -1,9 +1,16 @@
+import base64
+import binascii
+import json
 from collections.abc import Callable
 from itertools import islice
 from typing import Any
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
 from rest_framework import pagination, response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 def parameterize_pagination(_class: type) -> Callable:
@@ -65,3 +72,105 @@ class QfcLimitOffsetPagination(pagination.LimitOffsetPagination):
     def get_paginated_response_schema(self, schema) -> dict[str, Any]:
         """Overrides schema with just the results"""
         return schema
+
+
+def encode_cursor(values: list[str]) -> str:
+    """Returns an opaque cursor for the ordering values of the last item of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    """Returns the ordering values encoded with `encode_cursor`.
+
+    Raises:
+        ValidationError: the cursor is not valid
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError) as err:
+        raise ValidationError("Invalid cursor.") from err
+
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValidationError("Invalid cursor.")
+
+    return values
+
+
+@parameterize_pagination
+class QfcKeysetPagination(pagination.BasePagination):
+    """
+    Paginates by the `ordering` values of the last item of the previous page, instead of an offset.
+    The page is fetched with an index range scan however deep it is, but there is no total count.
+    Filtering the queryset by the cursor is left to the view, as it might be a combined queryset that cannot be filtered anymore.
+    A client `ordering` other than the paginator `ordering` is rejected, as the cursor only works in that order.
+    The next page link is injected into the `X-Next-Page` response header, the last page has no such header.
+    Can be customized when assigning `pagination_class`.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    ordering: tuple[str, ...] = ("created_at", "id")
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            limit = 0
+
+        if limit <= 0:
+            return settings.QFIELDCLOUD_API_DEFAULT_PAGE_LIMIT
+
+        return limit
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        """Returns the items of the page.
+
+        Raises:
+            ValidationError: the requested ordering is not supported
+        """
+        self.request = request
+
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if ordering:
+            fields = [field.strip() for field in ordering.split(",")]
+
+            if fields != list(self.ordering[: len(fields)]):
+                raise ValidationError(
+                    f"Paginating by cursor supports only the `{','.join(self.ordering)}` ordering."
+                )
+
+        limit = self.get_limit(request)
+
+        # fetch one more item to know if there is a next page
+        items = list(queryset.order_by(*self.ordering)[: limit + 1])
+
+        self.next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            self.next_cursor = encode_cursor(
+                [
+                    value.isoformat() if hasattr(value, "isoformat") else str(value)
+                    for value in (getattr(items[-1], field) for field in self.ordering)
+                ]
+            )
+
+        return items
+
+    def get_headers(self) -> dict[str, Any]:
+        headers = {}
+
+        if self.next_cursor:
+            headers["X-Next-Page"] = replace_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.next_cursor,
+            )
+
+        return headers
+
+    def get_paginated_response(self, data) -> response.Response:
+        return response.Response(data, headers=self.get_headers())
+
+    def get_paginated_response_schema(self, schema) -> dict[str, Any]:
+        """Overrides schema with just the results"""
+        return schema
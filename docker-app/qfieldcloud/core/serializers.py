@@ -389,6 +389,15 @@ class JobMixin:
 
         return internal_data
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+
+        # the job details show the full output, not only its end stored in the jobs table
+        if "output" in data:
+            data["output"] = instance.get_full_output()
+
+        return data
+
     def get_lastest_not_finished_job(self) -> Job | None:
         ModelClass: Job = self.Meta.model
         last_active_job = (
@@ -470,19 +479,13 @@ class CreateProjectJobSerializer(JobMixin, serializers.ModelSerializer):
 
 
 class JobSerializer(serializers.ModelSerializer):
-    def get_lastest_not_finished_job(self):
-        return None
+    """Serializes the jobs list, the job details are serialized by the job type specific serializers, e.g. `PackageJobSerializer`.
 
-    def get_fields(self, *args, **kwargs):
-        fields = super().get_fields(*args, **kwargs)
-        request = self.context.get("request")
-
-        if request and "job_id" not in request.parser_context.get("kwargs", {}):
-            fields.pop("output", None)
-            fields.pop("feedback", None)
-            fields.pop("layers", None)
+    The serialized fields must be fetched by `JobQuerySet.for_list()`.
+    """
 
-        return fields
+    def get_lastest_not_finished_job(self):
+        return None
 
     class Meta:
         model = Job
@@ -496,8 +499,6 @@ class JobSerializer(serializers.ModelSerializer):
             "status",
             "type",
             "updated_at",
-            "feedback",
-            "output",
         )
         read_only_fields = (
             "id",
@@ -507,8 +508,6 @@ class JobSerializer(serializers.ModelSerializer):
             "started_at",
             "status",
             "updated_at",
-            "feedback",
-            "output",
         )
         order_by = "-created_at"
         allow_parallel_jobs = True
@@ -1,9 +1,18 @@
 from axes.signals import user_locked_out
+from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
 from qfieldcloud.core.exceptions import TooManyLoginAttemptsError
+from qfieldcloud.core.models import Job
 
 
 @receiver(user_locked_out)
 def raise_permission_denied(*args, **kwargs):
     raise TooManyLoginAttemptsError()
+
+
+@receiver(pre_delete, sender=Job)
+def pre_delete_job(sender, instance, **kwargs):
+    """Responsible for deleting the full output of the job from the storage, also when the whole project is deleted."""
+    if instance.output_file:
+        instance.output_file.delete(save=False)
@@ -3,7 +3,7 @@ import json
 import logging
 import tempfile
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import NoReturn
 from unittest import mock, skip
 from uuid import UUID
@@ -11,12 +11,16 @@ from uuid import UUID
 import geopandas as gpd
 import rest_framework
 from django.http.response import FileResponse
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework import response, status
 from rest_framework.test import APITransactionTestCase
 
 from qfieldcloud.authentication.models import AuthToken
 from qfieldcloud.core.models import (
+    ArchivedDelta,
     Delta,
+    DeltaClientPk,
     FaultyDeltaFile,
     Job,
     Organization,
@@ -24,11 +28,13 @@ from qfieldcloud.core.models import (
     Person,
     ProjectCollaborator,
 )
+from qfieldcloud.core.pagination import encode_cursor
 from qfieldcloud.core.tests.utils import (
     get_filename,
     setup_subscription_plans,
     testdata_path,
 )
+from qfieldcloud.core.utils2.delta_archive import archive_deltas
 from qfieldcloud.project.enums import ProjectCollaboratorRole
 from qfieldcloud.project.models import Project
 from qfieldcloud.subscription.models import Subscription
@@ -354,6 +360,33 @@ class QfcTestCase(APITransactionTestCase):
         f = self.get_delta_file_with_project_id(self.project1, delta_file)
         self.assertEqual(faulty_deltafile.deltafile.read().decode(), f.read())
 
+    def test_push_apply_delta_file_invalid_delta_json_schema(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+        project = self.upload_project_files(self.project1)
+
+        with open(testdata_path("delta/deltas/singlelayer_singledelta.json")) as f:
+            deltafile = json.load(f)
+
+        # the deltafile id comes after the invalid delta in the stream
+        deltafile["project"] = str(project.id)
+        del deltafile["deltas"][0]["method"]
+        deltafile = {"deltas": deltafile.pop("deltas"), **deltafile}
+
+        response = self.client.post(
+            f"/api/v1/deltas/{project.id}/",
+            {"file": io.StringIO(json.dumps(deltafile))},
+            format="multipart",
+        )
+
+        self.assertFalse(rest_framework.status.is_success(response.status_code))
+        self.assertEqual(Delta.objects.filter(project=project).count(), 0)
+
+        faulty_deltafile = FaultyDeltaFile.objects.get(project=project)
+
+        self.assertEqual(faulty_deltafile.deltafile_id, UUID(deltafile["id"]))
+        self.assertIn("'method' is a required property", faulty_deltafile.traceback)
+        self.assertIn("On instance['deltas'][0]", faulty_deltafile.traceback)
+
     def test_push_apply_delta_file_not_json(self):
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
         project = self.upload_project_files(self.project1)
@@ -479,6 +512,34 @@ class QfcTestCase(APITransactionTestCase):
             ],
         )
 
+    @override_settings(QFIELDCLOUD_DELTAS_INGEST_BATCH_SIZE=2)
+    def test_push_list_multidelta_in_batches(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+        project = self.upload_project_files(self.project1)
+
+        self.upload_and_check_deltas(
+            project=project,
+            delta_filename="singlelayer_multidelta.json",
+            token=self.token1.key,
+            final_values=[
+                [
+                    "736bf2c2-646a-41a2-8c55-28c26aecd68d",
+                    "STATUS_APPLIED",
+                    self.user1.username,
+                ],
+                [
+                    "8adac0df-e1d3-473e-b150-f8c4a91b4781",
+                    "STATUS_APPLIED",
+                    self.user1.username,
+                ],
+                [
+                    "c6c88e78-172c-4f77-b2fd-2ff41f5aa854",
+                    "STATUS_APPLIED",
+                    self.user1.username,
+                ],
+            ],
+        )
+
     def test_list_all_deltas_and_list_deltas_by_deltafile(self):
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
         project = self.upload_project_files(self.project1)
@@ -524,6 +585,246 @@ class QfcTestCase(APITransactionTestCase):
             deltafile_id="3aab7e58-ea27-4b7c-9bca-c772b6d94820",
         )
 
+    def test_list_archived_deltas(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+        deltafile_id = UUID("3aab7e58-ea27-4b7c-9bca-c772b6d94820")
+        client_id = UUID("cd517e24-a520-4021-8850-e7af70e3a1c9")
+
+        applied_delta = Delta.objects.create(
+            deltafile_id=deltafile_id,
+            project=self.project1,
+            content={"method": "patch"},
+            client_id=client_id,
+            created_by=self.user1,
+            last_status=Delta.Status.APPLIED,
+        )
+        pending_delta = Delta.objects.create(
+            deltafile_id=deltafile_id,
+            project=self.project1,
+            content={"method": "patch"},
+            client_id=client_id,
+            created_by=self.user1,
+        )
+        Delta.objects.update(updated_at=timezone.now() - timedelta(days=400))
+
+        # only the deltas in a final status are archived
+        self.assertEqual(archive_deltas(timezone.now() - timedelta(days=365), 100), 1)
+        self.assertEqual(archive_deltas(timezone.now() - timedelta(days=365), 100), 0)
+        self.assertEqual(
+            list(Delta.objects.values_list("id", flat=True)), [pending_delta.id]
+        )
+        self.assertEqual(
+            list(ArchivedDelta.objects.values_list("id", flat=True)),
+            [applied_delta.id],
+        )
+
+        for uri in (
+            f"/api/v1/deltas/{self.project1.id}/?ordering=created_at",
+            f"/api/v1/deltas/{self.project1.id}/{deltafile_id}/",
+        ):
+            response = self.client.get(uri)
+
+            self.assertTrue(rest_framework.status.is_success(response.status_code))
+            self.assertEqual(response.headers["X-Total-Count"], "2")
+            self.assertEqual(
+                sorted(
+                    (d["id"], d["status"], d["created_by"]) for d in response.json()
+                ),
+                sorted(
+                    [
+                        (str(applied_delta.id), "STATUS_APPLIED", self.user1.username),
+                        (str(pending_delta.id), "STATUS_PENDING", self.user1.username),
+                    ]
+                ),
+            )
+
+    def test_list_deltas_filters(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+        deltafile_id = UUID("3aab7e58-ea27-4b7c-9bca-c772b6d94820")
+
+        def create_delta(
+            method: str, layer_id: str, wkt: str, status: Delta.Status
+        ) -> Delta:
+            return Delta.objects.create(
+                deltafile_id=deltafile_id,
+                project=self.project1,
+                content={
+                    "method": method,
+                    "clientId": "cd517e24-a520-4021-8850-e7af70e3a1c9",
+                    "sourceLayerId": layer_id,
+                    "localLayerCrs": "EPSG:4326",
+                    "new": {"geometry": wkt},
+                },
+                client_id="cd517e24-a520-4021-8850-e7af70e3a1c9",
+                created_by=self.user1,
+                last_status=status,
+            )
+
+        delta1 = create_delta("create", "points", "POINT(1 1)", Delta.Status.APPLIED)
+        delta2 = create_delta("patch", "points", "POINT(5 5)", Delta.Status.CONFLICT)
+        delta3 = create_delta("patch", "lines", "POINT(9 9)", Delta.Status.CONFLICT)
+
+        uri = f"/api/v1/deltas/{self.project1.id}/"
+
+        for params, expected_deltas in (
+            ({"status": "conflict"}, [delta2, delta3]),
+            ({"status": ["conflict", "applied"]}, [delta1, delta2, delta3]),
+            ({"method": "create"}, [delta1]),
+            ({"layer_id": "points"}, [delta1, delta2]),
+            ({"created_by": "user1"}, [delta1, delta2, delta3]),
+            ({"created_by": "user2"}, []),
+            ({"created_after": delta2.created_at.isoformat()}, [delta2, delta3]),
+            ({"bbox": "0,0,6,6"}, [delta1, delta2]),
+            ({"bbox": "0,0,6,6", "status": "conflict"}, [delta2]),
+        ):
+            response = self.client.get(uri, {**params, "ordering": "created_at"})
+
+            self.assertHttpOk(response)
+            self.assertEqual(
+                [d["id"] for d in response.json()],
+                [str(d.id) for d in expected_deltas],
+                params,
+            )
+
+        response = self.client.get(uri, {"bbox": "0,0,6"})
+        self.assertEqual(response.status_code, 400)
+
+        # cursor pagination
+        response = self.client.get(uri, {"cursor": "", "limit": 2})
+
+        self.assertHttpOk(response)
+        self.assertEqual(
+            [d["id"] for d in response.json()], [str(delta1.id), str(delta2.id)]
+        )
+        self.assertNotIn("X-Total-Count", response.headers)
+
+        response = self.client.get(response.headers["X-Next-Page"])
+
+        self.assertHttpOk(response)
+        self.assertEqual([d["id"] for d in response.json()], [str(delta3.id)])
+        self.assertNotIn("X-Next-Page", response.headers)
+
+        for cursor in (
+            "not a cursor",
+            encode_cursor([delta1.created_at.isoformat()]),
+            encode_cursor(["not a timestamp", str(delta1.id)]),
+            encode_cursor([delta1.created_at.isoformat(), "not an id"]),
+        ):
+            response = self.client.get(uri, {"cursor": cursor})
+
+            self.assertEqual(response.status_code, 400, cursor)
+
+        # the deltas are paginated by cursor only in the cursor order
+        response = self.client.get(uri, {"cursor": "", "ordering": "created_at"})
+
+        self.assertHttpOk(response)
+
+        response = self.client.get(uri, {"cursor": "", "ordering": "-created_at"})
+
+        self.assertEqual(response.status_code, 400)
+
+        # GeoJSON output
+        response = self.client.get(
+            uri, {"output_format": "geojson", "status": "conflict"}
+        )
+
+        self.assertHttpOk(response)
+        self.assertEqual(response.headers["Content-Type"], "application/geo+json")
+
+        feature_collection = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(feature_collection["type"], "FeatureCollection")
+        self.assertEqual(
+            [
+                (f["id"], f["geometry"]["coordinates"], f["properties"]["layer_id"])
+                for f in feature_collection["features"]
+            ],
+            [
+                (str(delta2.id), [5, 5], "points"),
+                (str(delta3.id), [9, 9], "lines"),
+            ],
+        )
+
+    def test_client_pks_map(self):
+        deltafile_id = UUID("3aab7e58-ea27-4b7c-9bca-c772b6d94820")
+        client_id = "cd517e24-a520-4021-8850-e7af70e3a1c9"
+
+        def create_delta(method: str, local_pk: int) -> Delta:
+            return Delta.objects.create(
+                deltafile_id=deltafile_id,
+                project=self.project1,
+                content={
+                    "method": method,
+                    "clientId": client_id,
+                    "localLayerId": "points",
+                    "localPk": local_pk,
+                },
+                client_id=client_id,
+                created_by=self.user1,
+            )
+
+        created_delta_1 = create_delta("create", 1)
+        created_delta_2 = create_delta("create", 2)
+        patched_delta = create_delta("patch", 1)
+
+        DeltaClientPk.objects.record(
+            {
+                str(created_delta_1.id): "10",
+                str(created_delta_2.id): "20",
+                str(patched_delta.id): None,
+            }
+        )
+        # the pk modified again overrides the previous one
+        DeltaClientPk.objects.record({str(created_delta_1.id): "11"})
+
+        self.assertEqual(DeltaClientPk.objects.count(), 2)
+
+        # only the features patched or deleted by the batch are mapped
+        self.assertEqual(
+            DeltaClientPk.objects.get_client_pks_map(
+                [
+                    patched_delta.content,
+                    {**created_delta_2.content, "method": "create"},
+                    {**patched_delta.content, "localPk": 3},
+                ]
+            ),
+            {f"{client_id}__points__1": "11"},
+        )
+
+        # a re-applied delta without a modified pk deletes the modified pk it has recorded
+        DeltaClientPk.objects.record(
+            {str(created_delta_1.id): None, str(patched_delta.id): None}
+        )
+
+        self.assertEqual(
+            DeltaClientPk.objects.get_client_pks_map([patched_delta.content]), {}
+        )
+
+        # but not the modified pk recorded by a later delta of the same feature
+        DeltaClientPk.objects.record(
+            {str(created_delta_1.id): "11", str(patched_delta.id): "12"}
+        )
+        DeltaClientPk.objects.record({str(created_delta_1.id): None})
+
+        self.assertEqual(
+            DeltaClientPk.objects.get_client_pks_map([patched_delta.content]),
+            {f"{client_id}__points__1": "12"},
+        )
+
+        # the modified pks outlive the archived deltas
+        Delta.objects.update(
+            last_status=Delta.Status.APPLIED,
+            updated_at=timezone.now() - timedelta(days=400),
+        )
+        archive_deltas(timezone.now() - timedelta(days=365), 100)
+
+        self.assertEqual(
+            DeltaClientPk.objects.get_client_pks_map(
+                [{**created_delta_2.content, "method": "delete"}]
+            ),
+            {f"{client_id}__points__2": "20"},
+        )
+
     def test_push_apply_delta_file_conflicts_overwrite_false(self):
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
         project = self.upload_project_files(self.project1)
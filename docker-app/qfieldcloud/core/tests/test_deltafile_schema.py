@@ -0,0 +1,166 @@
+import copy
+import json
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import fastjsonschema
+import jsonschema
+from django.test import SimpleTestCase, override_settings
+
+from qfieldcloud.core import utils
+from qfieldcloud.core.tests.utils import testdata_path
+
+logging.disable(logging.CRITICAL)
+
+
+def iter_invalid_deltafiles(deltafile: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """Yields variants of the given valid deltafile, each breaking a different rule of the schema."""
+    schema = utils.get_deltafile_schema()
+
+    for key in schema["required"]:
+        invalid = copy.deepcopy(deltafile)
+        del invalid[key]
+        yield invalid
+
+    for key in schema["properties"]:
+        invalid = copy.deepcopy(deltafile)
+        invalid[key] = 42
+        yield invalid
+
+    invalid = copy.deepcopy(deltafile)
+    invalid["version"] = "2.0"
+    yield invalid
+
+    invalid = copy.deepcopy(deltafile)
+    invalid["files"] = ["DCIM/1.jpg", "DCIM/1.jpg"]
+    yield invalid
+
+    delta_schema = schema["properties"]["deltas"]["items"]
+    for key in delta_schema["required"]:
+        invalid = copy.deepcopy(deltafile)
+        del invalid["deltas"][0][key]
+        yield invalid
+
+    for key in delta_schema["properties"]:
+        invalid = copy.deepcopy(deltafile)
+        invalid["deltas"][0][key] = 42
+        yield invalid
+
+    invalid = copy.deepcopy(deltafile)
+    invalid["deltas"][0]["method"] = "upsert"
+    yield invalid
+
+    invalid = copy.deepcopy(deltafile)
+    invalid["deltas"].append("not a delta")
+    yield invalid
+
+    method_descr_schema = schema["definitions"]["delta_method_descr"]
+    for key in method_descr_schema["properties"]:
+        invalid = copy.deepcopy(deltafile)
+        invalid["deltas"][0]["new"] = {key: 42}
+        yield invalid
+
+    invalid = copy.deepcopy(deltafile)
+    invalid["deltas"][0]["new"] = {"unknown": 42}
+    yield invalid
+
+
+class QfcTestCase(SimpleTestCase):
+    def setUp(self):
+        self.deltafiles = {}
+        for path in sorted(Path(testdata_path("delta/deltas")).glob("*.json")):
+            with open(path) as f:
+                self.deltafiles[path.name] = json.load(f)
+
+        self.valid_deltafile = self.deltafiles["singlelayer_multidelta.json"]
+
+    def assertBackendsParity(self, deltafile: dict[str, Any]) -> None:
+        schema = utils.get_deltafile_schema()
+        compiled_validate = fastjsonschema.compile(
+            copy.deepcopy(schema),
+            use_default=False,
+            use_formats=False,
+        )
+        interpretive_validator = jsonschema.Draft7Validator(schema)
+
+        try:
+            compiled_validate(copy.deepcopy(deltafile))
+            is_valid_compiled = True
+        except fastjsonschema.JsonSchemaValueException:
+            is_valid_compiled = False
+
+        self.assertEqual(is_valid_compiled, interpretive_validator.is_valid(deltafile))
+
+    def test_backends_parity_on_testdata(self):
+        for name, deltafile in self.deltafiles.items():
+            with self.subTest(name=name):
+                self.assertBackendsParity(deltafile)
+
+    def test_backends_parity_on_invalid_deltafiles(self):
+        for idx, deltafile in enumerate(iter_invalid_deltafiles(self.valid_deltafile)):
+            with self.subTest(idx=idx):
+                self.assertFalse(
+                    jsonschema.Draft7Validator(utils.get_deltafile_schema()).is_valid(
+                        deltafile
+                    )
+                )
+                self.assertBackendsParity(deltafile)
+
+    def test_compiled_validator_raises_jsonschema_errors(self):
+        schema = utils.get_deltafile_schema()
+        compiled_validator = utils.CompiledSchemaValidator(schema)
+        interpretive_validator = jsonschema.Draft7Validator(schema)
+
+        compiled_validator.validate(self.valid_deltafile)
+
+        for idx, deltafile in enumerate(iter_invalid_deltafiles(self.valid_deltafile)):
+            with self.subTest(idx=idx):
+                with self.assertRaises(jsonschema.ValidationError) as compiled_cm:
+                    compiled_validator.validate(deltafile)
+
+                with self.assertRaises(jsonschema.ValidationError) as interpretive_cm:
+                    interpretive_validator.validate(deltafile)
+
+                self.assertEqual(
+                    str(compiled_cm.exception), str(interpretive_cm.exception)
+                )
+
+    def test_compiled_validator_does_not_modify_instance(self):
+        compiled_validator = utils.CompiledSchemaValidator(utils.get_deltafile_schema())
+        deltafile = copy.deepcopy(self.valid_deltafile)
+
+        compiled_validator.validate(deltafile)
+
+        self.assertEqual(deltafile, self.valid_deltafile)
+
+    def test_validator_backend_setting(self):
+        schema = utils.get_deltafile_schema()
+
+        with override_settings(QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND="compiled"):
+            self.assertIsInstance(
+                utils.get_schema_validator(schema), utils.CompiledSchemaValidator
+            )
+
+        with override_settings(QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND="jsonschema"):
+            self.assertIsInstance(
+                utils.get_schema_validator(schema), jsonschema.Draft7Validator
+            )
+
+        with override_settings(QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND="unknown"):
+            with self.assertRaises(NotImplementedError):
+                utils.get_schema_validator(schema)
+
+    def test_validate_delta_error_path(self):
+        deltafile = copy.deepcopy(self.valid_deltafile)
+        del deltafile["deltas"][1]["method"]
+
+        for idx, delta in enumerate(deltafile["deltas"][:1]):
+            utils.validate_delta(delta, idx)
+
+        with self.assertRaises(jsonschema.ValidationError) as cm:
+            utils.validate_delta(deltafile["deltas"][1], 1)
+
+        self.assertEqual(list(cm.exception.path), ["deltas", 1])
+        self.assertEqual(cm.exception.message, "'method' is a required property")
@@ -1,12 +1,18 @@
 import io
 import logging
+from datetime import timedelta
 
 from django.contrib.gis.geos import Polygon
 from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITransactionTestCase
 
 from qfieldcloud.authentication.models import AuthToken
+from qfieldcloud.core.cron import ClearJobOutputsAfterRetentionPeriodJob
 from qfieldcloud.core.models import (
     Job,
     Organization,
@@ -22,7 +28,11 @@ from qfieldcloud.core.tests.utils import (
     testdata_path,
     wait_for_project_ok_status,
 )
-from qfieldcloud.core.utils2.jobs import queue_job
+from qfieldcloud.core.utils2.jobs import (
+    get_feedback_worker_metrics,
+    get_step_metrics_percentiles,
+    queue_job,
+)
 from qfieldcloud.project.enums import ProjectCollaboratorRole, QgsGeometryType
 from qfieldcloud.project.models import Project, ProjectSeed
 from qfieldcloud.project.utils import projectseed_utils
@@ -345,6 +355,39 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
             self.assertTrue(status.is_success(resp_get.status_code))
             self.assertEqual(resp_get.data["id"], job_id)
 
+    def test_jobs_list_does_not_fetch_output_and_feedback(self):
+        ProcessProjectfileJob.objects.create(
+            project=self.p1,
+            created_by=self.u1,
+            output="x" * 1000,
+            feedback={"feedback_version": "2.0", "outputs": {}},
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/v1/jobs/", {"project_id": self.p1.id})
+
+        self.assertTrue(status.is_success(resp.status_code))
+        self.assertEqual(len(resp.data), 1)
+        self.assertNotIn("output", resp.data[0])
+        self.assertNotIn("feedback", resp.data[0])
+
+        job_queries = [q["sql"] for q in ctx.captured_queries if "core_job" in q["sql"]]
+
+        self.assertTrue(job_queries)
+
+        for sql in job_queries:
+            self.assertNotIn('"core_job"."output"', sql)
+            self.assertNotIn('"core_job"."feedback"', sql)
+
+        # the details of a single job still contain the output and the feedback
+        resp = self.client.get(f"/api/v1/jobs/{resp.data[0]['id']}/")
+
+        self.assertTrue(status.is_success(resp.status_code))
+        self.assertEqual(resp.data["output"], "x" * 1000)
+        self.assertEqual(resp.data["feedback"]["feedback_version"], "2.0")
+
     def test_create_project_from_xlsform(self):
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
 
@@ -477,6 +520,54 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
         self.assertEqual(self.p1.the_qgis_file_name, "project.qgs")
         self.assertEqual(self.p1.thumbnail.name, "")
 
+    def test_thumbnail_is_reused_when_inputs_did_not_change(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
+
+        for filename, testdata_filename in (
+            ("bumblebees.gpkg", "bumblebees.gpkg"),
+            ("project.qgs", "simple_bumblebees.qgs"),
+        ):
+            response = self._upload_file(
+                self.u1, self.p1, filename, io.FileIO(testdata_path(testdata_filename))
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        wait_for_project_ok_status(self.p1)
+        self.refresh_project(self.p1)
+
+        thumbnail_name = self.p1.thumbnail.name
+        thumbnail_cache_key = self.p1.thumbnail_cache_key
+
+        self.assertTrue(thumbnail_name)
+        self.assertTrue(thumbnail_cache_key)
+
+        # 1. a file which is not a layer source does not change the thumbnail
+        response = self._upload_file(
+            self.u1, self.p1, "file.txt", io.FileIO(testdata_path("file.txt"))
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        wait_for_project_ok_status(self.p1)
+        self.refresh_project(self.p1)
+
+        self.assertEqual(self.p1.thumbnail.name, thumbnail_name)
+        self.assertEqual(self.p1.thumbnail_cache_key, thumbnail_cache_key)
+
+        # 2. a new version of a layer source renders a new thumbnail
+        response = self._upload_file(
+            self.u1,
+            self.p1,
+            "bumblebees.gpkg",
+            io.FileIO(testdata_path("bumblebees.gpkg")),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        wait_for_project_ok_status(self.p1)
+        self.refresh_project(self.p1)
+
+        self.assertNotEqual(self.p1.thumbnail.name, thumbnail_name)
+        self.assertNotEqual(self.p1.thumbnail_cache_key, thumbnail_cache_key)
+
     def test_clone_project(self):
         self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
 
@@ -737,3 +828,131 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
             job.refresh_from_db()
 
             self.assertEqual(job.status, Job.Status.FINISHED)
+
+    def test_worker_step_metrics(self):
+        def step(step_id: str, wall_time_s: float, peak_rss_bytes: int) -> dict:
+            return {
+                "id": step_id,
+                "stage": 2,
+                "returns": {},
+                "metrics": {
+                    "wall_time_s": wall_time_s,
+                    "cpu_time_s": wall_time_s / 2,
+                    "peak_rss_bytes": peak_rss_bytes,
+                    "bytes_received": 100,
+                    "bytes_sent": None,
+                    "files_count": 1,
+                },
+            }
+
+        for idx in range(1, 11):
+            feedback = {
+                "feedback_version": "2.0",
+                "steps": [
+                    step("download_project_directory", idx, 1000 * idx),
+                    step("package_project", 10 * idx, 2000 * idx),
+                ],
+            }
+            worker_metrics = get_feedback_worker_metrics(feedback)
+
+            PackageJob.objects.create(
+                project=self.p1,
+                created_by=self.u1,
+                status=Job.Status.FINISHED,
+                finished_at=timezone.now(),
+                feedback=feedback,
+                **worker_metrics,
+            )
+
+        self.assertEqual(
+            worker_metrics,
+            {
+                "worker_wall_time_s": 110,
+                "worker_cpu_time_s": 55,
+                "worker_peak_rss_bytes": 20000,
+                "worker_bytes_received": 200,
+                "worker_bytes_sent": None,
+            },
+        )
+
+        # jobs without step metrics, e.g. from older workers, are ignored
+        PackageJob.objects.create(
+            project=self.p1,
+            created_by=self.u1,
+            status=Job.Status.FINISHED,
+            finished_at=timezone.now(),
+            feedback={"feedback_version": "2.0", "steps": [{"id": "package_project"}]},
+        )
+        self.assertIsNone(get_feedback_worker_metrics(None)["worker_wall_time_s"])
+
+        rows = get_step_metrics_percentiles(
+            Job.Type.PACKAGE,
+            timezone.now() - timedelta(days=1),
+            (0.5, 1),
+        )
+
+        self.assertEqual(
+            [row["step_id"] for row in rows],
+            ["download_project_directory", "package_project"],
+        )
+        self.assertEqual(rows[0]["count"], 10)
+        self.assertEqual(rows[0]["wall_time_s"], [5.5, 10])
+        self.assertEqual(rows[1]["peak_rss_bytes"], [11000, 20000])
+        # no step reported the metric
+        self.assertIsNone(rows[1]["bytes_sent"])
+
+        self.assertEqual(
+            get_step_metrics_percentiles(Job.Type.DELTA_APPLY, timezone.now()), []
+        )
+
+    def test_long_output_is_stored_in_file_storage(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
+
+        output = "".join(f"line {idx}\n" for idx in range(10000))
+        job = PackageJob.objects.create(
+            project=self.p1,
+            created_by=self.u1,
+            status=Job.Status.FINISHED,
+        )
+        job.set_output(output)
+        job.save(update_fields=["output", "output_file"])
+        job.refresh_from_db()
+
+        # only the end of the output is kept in the jobs table
+        self.assertTrue(job.output_file)
+        self.assertLess(len(job.output), len(output))
+        self.assertTrue(job.output.endswith("line 9999\n"))
+        self.assertEqual(job.get_full_output(), output)
+
+        response = self.client.get(f"/api/v1/jobs/{job.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["output"], output)
+
+        # the outputs are cleared after the retention period
+        Job.objects.filter(id=job.id).update(
+            created_at=timezone.now() - timedelta(days=1000)
+        )
+        output_file_name = job.output_file.name
+
+        ClearJobOutputsAfterRetentionPeriodJob().do()
+        job.refresh_from_db()
+
+        self.assertIsNone(job.output)
+        self.assertFalse(job.output_file)
+        self.assertFalse(
+            storages[self.p1.file_storage].exists(output_file_name),
+        )
+
+        # the output is deleted with the job
+        job.set_output(output)
+        job.save(update_fields=["output", "output_file"])
+        output_file_name = job.output_file.name
+
+        self.assertTrue(storages[self.p1.file_storage].exists(output_file_name))
+
+        job.delete()
+
+        self.assertFalse(
+            storages[self.p1.file_storage].exists(output_file_name),
+        )
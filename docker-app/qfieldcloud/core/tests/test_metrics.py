@@ -0,0 +1,113 @@
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from qfieldcloud.core.models import Job, Person, ProcessProjectfileJob
+from qfieldcloud.core.tests.utils import setup_subscription_plans
+from qfieldcloud.core.utils2 import metrics
+from qfieldcloud.project.models import Project
+
+logging.disable(logging.CRITICAL)
+
+
+class MetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram(
+            "test_histogram", "Test histogram.", (1, 10), {"method": ("a", "b")}
+        )
+
+        histogram.observe(0.5, method="a")
+        histogram.observe(5, method="a")
+        histogram.observe(50, method="a")
+
+        lines = histogram.render()
+
+        self.assertIn("# TYPE test_histogram histogram", lines)
+        self.assertIn('test_histogram_bucket{method="a",le="1"} 1', lines)
+        self.assertIn('test_histogram_bucket{method="a",le="10"} 2', lines)
+        self.assertIn('test_histogram_bucket{method="a",le="+Inf"} 3', lines)
+        self.assertIn('test_histogram_sum{method="a"} 55.5', lines)
+        self.assertIn('test_histogram_count{method="a"} 3', lines)
+        self.assertIn('test_histogram_count{method="b"} 0', lines)
+
+    def test_counter_rejects_unknown_labels(self):
+        counter = metrics.Counter(
+            "test_counter", "Test counter.", {"error_type": ("A",)}
+        )
+
+        counter.inc(error_type="A")
+        counter.inc(2, error_type="A")
+
+        self.assertIn('test_counter_total{error_type="A"} 3', counter.render())
+
+        with self.assertRaises(ValueError):
+            counter.inc(error_type="B")
+
+
+class QfcTestCase(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        setup_subscription_plans()
+
+        self.u1 = Person.objects.create_user(username="u1", password="abc123")
+        self.p1 = Project.objects.create(owner=self.u1, name="p1")
+
+    @override_settings(QFIELDCLOUD_METRICS_TOKEN=None)
+    def test_metrics_disabled_without_token(self):
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(QFIELDCLOUD_METRICS_TOKEN="s3cret")
+    def test_metrics(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        job = ProcessProjectfileJob.objects.create(project=self.p1, created_by=self.u1)
+        Job.objects.filter(pk=job.pk).update(
+            created_at=timezone.now() - timedelta(minutes=10)
+        )
+        job.feedback = {"error_type": "INVALID_PROJECT_FILE"}
+        metrics.record_job_failure(job)
+        job.feedback = {"error_type": "SOMETHING_NEW"}
+        metrics.record_job_failure(job)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+        lines = response.content.decode().splitlines()
+
+        self.assertIn(
+            'qfieldcloud_jobs{type="process_projectfile",status="pending"} 1', lines
+        )
+        self.assertIn('qfieldcloud_jobs{type="package",status="pending"} 0', lines)
+        self.assertIn(
+            'qfieldcloud_job_failures_total{type="process_projectfile",error_type="INVALID_PROJECT_FILE"} 1',
+            lines,
+        )
+        self.assertIn(
+            'qfieldcloud_job_failures_total{type="process_projectfile",error_type="UNKNOWN"} 1',
+            lines,
+        )
+        self.assertIn('qfieldcloud_deltas{status="pending"} 0', lines)
+        self.assertIn("qfieldcloud_active_worker_containers 0", lines)
+
+        oldest_age_line = next(
+            line
+            for line in lines
+            if line.startswith(
+                'qfieldcloud_oldest_pending_job_age_seconds{type="process_projectfile"}'
+            )
+        )
+        self.assertGreaterEqual(float(oldest_age_line.split()[-1]), 600)
@@ -2,16 +2,21 @@ import calendar
 import logging
 import uuid
 from datetime import timedelta
+from io import StringIO
 
+from django.core.management import call_command
+from django.db.models import Q
 from django.utils.timezone import now
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from qfieldcloud.authentication.models import AuthToken
 from qfieldcloud.core.models import (
+    ArchivedDelta,
     Delta,
     Job,
     Organization,
+    OrganizationActivity,
     OrganizationMember,
     Person,
     ProjectCollaborator,
@@ -312,6 +317,130 @@ class QfcTestCase(APITestCase):
         # There are still 3 billable users (organization owner, user2, user4)
         self.assertEqual(_active_users_count(), 3)
 
+    def test_active_users_rollup_parity(self):
+        """Tests the active users from the activity rollup match the ones from the deltas and jobs"""
+
+        def _active_user_ids(since, until):
+            return set(
+                self.organization1.active_users(since, until).values_list(
+                    "id", flat=True
+                )
+            )
+
+        def _expected_active_user_ids(since, until):
+            return set(
+                Person.objects.filter(is_staff=False)
+                .filter(
+                    self.organization1._get_active_users_filter(
+                        Q(created_at__gte=since, created_at__lte=until)
+                    )
+                    | Q(id=self.organization1.organization_owner_id)
+                )
+                .values_list("id", flat=True)
+            )
+
+        project1 = Project.objects.create(name="p1", owner=self.organization1)
+        base_date = now()
+
+        job1 = Job.objects.create(project=project1, created_by=self.user2)
+        delta1 = Delta.objects.create(
+            deltafile_id=uuid.uuid4(),
+            project=project1,
+            content="delta",
+            client_id=uuid.uuid4(),
+            created_by=self.user3,
+        )
+        job2 = Job.objects.create(project=project1, created_by=self.user4)
+        delta2 = Delta.objects.create(
+            deltafile_id=uuid.uuid4(),
+            project=project1,
+            content="delta",
+            client_id=uuid.uuid4(),
+            created_by=self.user2,
+        )
+
+        # the activity is recorded when the deltas and the jobs are created
+        self.assertEqual(
+            _active_user_ids(
+                base_date - timedelta(days=1), base_date + timedelta(days=1)
+            ),
+            {self.user1.id, self.user2.id, self.user3.id},
+        )
+
+        # move the activity back in time and rebuild the rollup from scratch
+        Delta.objects.filter(id=delta1.id).update(
+            created_at=base_date - timedelta(days=3)
+        )
+        Job.objects.filter(id=job2.id).update(created_at=base_date - timedelta(days=10))
+        Delta.objects.filter(id=delta2.id).update(
+            created_at=base_date - timedelta(days=40)
+        )
+        OrganizationActivity.objects.all().delete()
+
+        call_command("backfillorganizationactivity", stdout=StringIO())
+
+        self.assertEqual(
+            OrganizationActivity.objects.filter(
+                organization=self.organization1
+            ).count(),
+            4,
+        )
+
+        job1.refresh_from_db()
+        today_start = job1.created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        periods = [
+            (base_date - timedelta(days=50), base_date + timedelta(days=1)),
+            (base_date - timedelta(days=3, hours=1), base_date - timedelta(days=2)),
+            (base_date - timedelta(days=3, seconds=-1), base_date),
+            (base_date - timedelta(days=45), base_date - timedelta(days=35)),
+            (base_date - timedelta(days=2), base_date - timedelta(days=1)),
+            (today_start - timedelta(days=10), today_start - timedelta(microseconds=1)),
+            (today_start, today_start + timedelta(days=1, microseconds=-1)),
+            (job1.created_at, job1.created_at),
+        ]
+
+        for since, until in periods:
+            with self.subTest(since=since, until=until):
+                self.assertEqual(
+                    _active_user_ids(since, until),
+                    _expected_active_user_ids(since, until),
+                )
+
+    def test_active_users_include_archived_deltas(self):
+        project1 = Project.objects.create(name="p1", owner=self.organization1)
+        base_date = now()
+
+        ArchivedDelta.objects.create(
+            id=uuid.uuid4(),
+            deltafile_id=uuid.uuid4(),
+            client_id=uuid.uuid4(),
+            project=project1,
+            content="delta",
+            last_status=Delta.Status.APPLIED,
+            created_at=base_date - timedelta(days=40),
+            updated_at=base_date - timedelta(days=40),
+            created_by=self.user2,
+        )
+
+        # the partial days at the edges of the period are read from the archived deltas
+        self.assertIn(
+            self.user2,
+            self.organization1.active_users(
+                base_date - timedelta(days=40, hours=1),
+                base_date - timedelta(days=40, hours=-1),
+            ),
+        )
+
+        # the whole days are read from the rollup, filled by the backfill
+        call_command("backfillorganizationactivity", stdout=StringIO())
+
+        self.assertIn(
+            self.user2,
+            self.organization1.active_users(
+                base_date - timedelta(days=45), base_date - timedelta(days=35)
+            ),
+        )
+
     def test_memberships_when_owner_changes(self):
         # Set user2 as admin of organization1
         OrganizationMember.objects.create(
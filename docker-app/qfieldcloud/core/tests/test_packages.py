@@ -2,8 +2,10 @@ import io
 import json
 import logging
 import os
+import tarfile
 import tempfile
 import time
+from pathlib import Path
 
 from django.http import FileResponse
 from django.test import tag
@@ -30,8 +32,10 @@ from qfieldcloud.core.tests.utils import (
     testdata_path,
     wait_for_project_ok_status,
 )
+from qfieldcloud.core.utils2 import packages
 from qfieldcloud.core.utils2.jobs import repackage
-from qfieldcloud.filestorage.models import File
+from qfieldcloud.filestorage.cron import CalculateFileVersionChecksumsJob
+from qfieldcloud.filestorage.models import File, FileVersion
 from qfieldcloud.filestorage.utils import open_qgis_file
 from qfieldcloud.project.enums import ProjectCollaboratorRole
 from qfieldcloud.project.models import Project
@@ -264,6 +268,87 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
                 "<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>",
             )
 
+    def test_download_package_archive(self):
+        self.upload_files_and_check_package(
+            token=self.token1.key,
+            project=self.project1,
+            files=[
+                ("DCIM/1.jpg", "DCIM/1.jpg"),
+                ("bumblebees.gpkg", "bumblebees.gpkg"),
+                ("simple_bumblebees.qgs", "simple_bumblebees.qgs"),
+            ],
+            expected_files=[
+                "data.gpkg",
+                "simple_bumblebees_qfield.qgz",
+                "DCIM/1.jpg",
+            ],
+        )
+
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/archive/"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-tar")
+
+        archive_content = b"".join(response.streaming_content)
+
+        self.assertEqual(int(response["Content-Length"]), len(archive_content))
+
+        with tarfile.open(fileobj=io.BytesIO(archive_content)) as tar:
+            self.assertListEqual(
+                tar.getnames(),
+                ["DCIM/1.jpg", "data.gpkg", "simple_bumblebees_qfield.qgz"],
+            )
+
+            for member in tar.getmembers():
+                file_response = self.client.get(
+                    f"/api/v1/packages/{self.project1.id}/latest/files/{member.name}/"
+                )
+                member_file = tar.extractfile(member)
+
+                assert member_file
+
+                self.assertEqual(
+                    member_file.read(), b"".join(file_response.streaming_content)
+                )
+
+        # resume the download from the middle of the archive
+        offset = len(archive_content) // 2
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/archive/",
+            headers={"Range": f"bytes={offset}-", "If-Range": response["ETag"]},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), archive_content[offset:])
+
+        # the archive has changed, so the whole new archive is sent
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/archive/",
+            headers={"Range": f"bytes={offset}-", "If-Range": '"outdated"'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # download only a subset of the package files
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/archive/?files=data.gpkg"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with tarfile.open(
+            fileobj=io.BytesIO(b"".join(response.streaming_content))
+        ) as tar:
+            self.assertListEqual(tar.getnames(), ["data.gpkg"])
+
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/archive/?files=missing.gpkg"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_list_files_for_qfield_broken_file(self):
         self.upload_files(
             token=self.token1.key,
@@ -697,6 +782,76 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
             ],
         )
 
+    def test_latest_package_etag(self):
+        self.upload_files_and_check_package(
+            token=self.token1.key,
+            project=self.project1,
+            files=[
+                ("DCIM/1.jpg", "DCIM/1.jpg"),
+                ("bumblebees.gpkg", "bumblebees.gpkg"),
+                ("simple_bumblebees.qgs", "simple_bumblebees.qgs"),
+            ],
+            expected_files=[
+                "data.gpkg",
+                "simple_bumblebees_qfield.qgz",
+                "DCIM/1.jpg",
+            ],
+        )
+
+        response = self.client.get(f"/api/v1/packages/{self.project1.id}/latest/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response["ETag"]
+
+        # 1) the client already has the latest package data
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/",
+            headers={"If-None-Match": etag},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        # 2) a new attachment changes the package data, even without repackaging
+        self.upload_files(
+            self.token1.key, self.project1, [("DCIM/2.jpg", "DCIM/2.jpg")]
+        )
+
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/",
+            headers={"If-None-Match": etag},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("DCIM/2.jpg", [f["name"] for f in response.json()["files"]])
+
+        # 3) the pending checksums are not kept once calculated, e.g. of a presigned upload
+        FileVersion.objects.filter(
+            file__project=self.project1, file__name="DCIM/2.jpg"
+        ).update(md5sum=None, sha256sum=None)
+
+        response = self.client.get(f"/api/v1/packages/{self.project1.id}/latest/")
+        etag = response["ETag"]
+        files = {f["name"]: f for f in response.json()["files"]}
+
+        self.assertIsNone(files["DCIM/2.jpg"]["sha256"])
+
+        CalculateFileVersionChecksumsJob().do()
+
+        response = self.client.get(
+            f"/api/v1/packages/{self.project1.id}/latest/",
+            headers={"If-None-Match": etag},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        files = {f["name"]: f for f in response.json()["files"]}
+
+        self.assertIsNotNone(files["DCIM/2.jpg"]["sha256"])
+
     def test_purge_obsolete_package_files_works_fine(self):
         # create another user to check that its package files are not deleted.
         other_user = Person.objects.create_user(
@@ -775,6 +930,212 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
 
         self.assertEqual(other_user_package_files_qs.count(), 2)
 
+    def test_package_is_reused_for_same_inputs(self):
+        other_user = Person.objects.create_user(
+            username="other_user", password="abc123"
+        )
+        ProjectCollaborator.objects.create(
+            project=self.project1,
+            collaborator=other_user,
+            role=ProjectCollaboratorRole.ADMIN,
+        )
+
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "bumblebees.gpkg",
+            io.FileIO(testdata_path("bumblebees.gpkg"), "rb"),
+        )
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "simple_bumblebees.qgs",
+            io.FileIO(testdata_path("simple_bumblebees.qgs"), "rb"),
+        )
+
+        wait_for_project_ok_status(self.project1)
+        self.project1.refresh_from_db()
+
+        package_job_1 = repackage(self.project1, self.user1)
+        wait_for_project_ok_status(self.project1)
+        package_job_1.refresh_from_db()
+
+        self.assertEqual(package_job_1.status, Job.Status.FINISHED)
+        self.assertTrue(package_job_1.inputs_hash)
+        self.assertNotIn("reused_package_job_id", package_job_1.feedback)
+
+        # 1. the other user gets the same package without running the worker
+        package_job_2 = repackage(self.project1, other_user)
+        wait_for_project_ok_status(self.project1)
+        package_job_2.refresh_from_db()
+
+        self.assertEqual(package_job_2.status, Job.Status.FINISHED)
+        self.assertEqual(package_job_2.inputs_hash, package_job_1.inputs_hash)
+        self.assertEqual(
+            package_job_2.feedback["reused_package_job_id"], str(package_job_1.id)
+        )
+
+        package_contents_1 = sorted(
+            File.objects.filter(package_job=package_job_1).values_list(
+                "name", "latest_version__content"
+            )
+        )
+        package_contents_2 = sorted(
+            File.objects.filter(package_job=package_job_2).values_list(
+                "name", "latest_version__content"
+            )
+        )
+
+        self.assertEqual(len(package_contents_2), 2)
+        self.assertEqual(package_contents_1, package_contents_2)
+
+        # 2. a secret assigned to the other user changes the package inputs
+        Secret.objects.create(
+            name="SOME_ENVVAR",
+            type=Secret.Type.ENVVAR,
+            project=self.project1,
+            assigned_to=other_user,
+            created_by=self.user1,
+            value="some value",
+        )
+
+        package_job_3 = repackage(self.project1, other_user)
+        wait_for_project_ok_status(self.project1)
+        package_job_3.refresh_from_db()
+
+        self.assertEqual(package_job_3.status, Job.Status.FINISHED)
+        self.assertNotEqual(package_job_3.inputs_hash, package_job_1.inputs_hash)
+        self.assertNotIn("reused_package_job_id", package_job_3.feedback)
+
+    def test_package_reuses_unchanged_files(self):
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "bumblebees.gpkg",
+            io.FileIO(testdata_path("bumblebees.gpkg"), "rb"),
+        )
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "simple_bumblebees.qgs",
+            io.FileIO(testdata_path("simple_bumblebees.qgs"), "rb"),
+        )
+
+        wait_for_project_ok_status(self.project1)
+        self.project1.refresh_from_db()
+
+        package_job_1 = repackage(self.project1, self.user1)
+        wait_for_project_ok_status(self.project1)
+        package_job_1.refresh_from_db()
+
+        manifest_1 = package_job_1.feedback["outputs"]["package_manifest"][
+            "package_manifest"
+        ]
+
+        self.assertIsNone(manifest_1["previous_package_job_id"])
+        self.assertFalse(any(f["reused"] for f in manifest_1["files"].values()))
+        self.assertTrue(manifest_1["layers"])
+
+        for layer_data in manifest_1["layers"].values():
+            self.assertIn(layer_data["artifact_upload"], ("uploaded", "no_artifact"))
+
+        # change the inputs, so the whole package cannot be reused
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "file.txt",
+            io.FileIO(testdata_path("file.txt"), "rb"),
+        )
+
+        wait_for_project_ok_status(self.project1)
+        self.project1.refresh_from_db()
+
+        package_job_2 = repackage(self.project1, self.user1)
+        wait_for_project_ok_status(self.project1)
+        package_job_2.refresh_from_db()
+
+        self.assertEqual(package_job_2.status, Job.Status.FINISHED)
+        self.assertNotIn("reused_package_job_id", package_job_2.feedback)
+
+        manifest_2 = package_job_2.feedback["outputs"]["package_manifest"][
+            "package_manifest"
+        ]
+
+        self.assertEqual(manifest_2["previous_package_job_id"], str(package_job_1.id))
+        self.assertEqual(manifest_2["layers"].keys(), manifest_1["layers"].keys())
+
+        # all the package files are assigned to the new package, the reused ones referencing the previous objects
+        files_2 = {
+            f.name: f.latest_version.content.name
+            for f in File.objects.filter(package_job=package_job_2)
+        }
+
+        self.assertEqual(files_2.keys(), manifest_2["files"].keys())
+
+        for filename, file_data in manifest_2["files"].items():
+            if file_data["reused"]:
+                self.assertIn(str(package_job_1.id), files_2[filename])
+            else:
+                self.assertIn(str(package_job_2.id), files_2[filename])
+
+    def test_reused_package_files_are_stored_when_the_previous_package_is_deleted(
+        self,
+    ):
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "bumblebees.gpkg",
+            io.FileIO(testdata_path("bumblebees.gpkg"), "rb"),
+        )
+        self._upload_file(
+            self.user1,
+            self.project1,
+            "simple_bumblebees.qgs",
+            io.FileIO(testdata_path("simple_bumblebees.qgs"), "rb"),
+        )
+
+        wait_for_project_ok_status(self.project1)
+        self.project1.refresh_from_db()
+
+        package_job_1 = repackage(self.project1, self.user1)
+        wait_for_project_ok_status(self.project1)
+
+        package_file = File.objects.filter(package_job=package_job_1).first()
+
+        assert package_file
+
+        with package_file.latest_version.content.open() as f:
+            package_file_contents = f.read()
+
+        package_job_2 = PackageJob.objects.create(
+            project=self.project1,
+            created_by=self.user1,
+            triggered_by=self.user1,
+        )
+
+        # the worker keeps the reused files it has built, but the previous package is deleted as obsolete in the meantime
+        with tempfile.TemporaryDirectory() as reused_files_dir:
+            reused_file = Path(reused_files_dir).joinpath(package_file.name)
+            reused_file.parent.mkdir(parents=True, exist_ok=True)
+            reused_file.write_bytes(package_file_contents)
+
+            File.objects.filter(package_job=package_job_1).delete()
+
+            packages.assign_reused_package_files(
+                str(package_job_1.id),
+                package_job_2,
+                [package_file.name],
+                Path(reused_files_dir),
+            )
+
+        stored_file = File.objects.get(package_job=package_job_2)
+
+        self.assertEqual(stored_file.name, package_file.name)
+        self.assertIn(str(package_job_2.id), stored_file.latest_version.content.name)
+
+        with stored_file.latest_version.content.open() as f:
+            self.assertEqual(f.read(), package_file_contents)
+
     def test_needs_repackaging(self):
         # 0. Create two users, where one owns the project and the other is a project collaborator.
         u1 = Person.objects.create(username="u1")
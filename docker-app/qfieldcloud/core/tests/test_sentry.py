@@ -1,9 +1,17 @@
 from io import BytesIO, StringIO
 from unittest import skipIf
 
+from constance.test import override_config
 from django.conf import settings
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
 
+from qfieldcloud.core.middleware.requests import (
+    BoundedTeeStream,
+    attach_keys,
+    get_request_attributes,
+)
 from qfieldcloud.core.utils2.sentry import report_serialization_diff_to_sentry
 
 
@@ -59,3 +67,59 @@ class QfcTestCase(TestCase):
         }
         will_be_sent = report_serialization_diff_to_sentry(**mock_payload)
         self.assertTrue(will_be_sent)
+
+    @override_settings(SENTRY_DSN="https://public@sentry.example.com/1")
+    @override_config(SENTRY_REQUEST_MAX_SIZE_TO_SEND=1024 * 1024)
+    def test_attach_keys_copies_the_body_while_it_is_read(self):
+        request = RequestFactory().post(
+            "/api/v1/files/",
+            {"file": SimpleUploadedFile("file.txt", b"Hello World")},
+        )
+        body_streams = []
+
+        def get_response(request):
+            body_streams.append(request._stream)
+
+            # nothing is read before the request handling reads the body
+            self.assertIsInstance(request._stream, BoundedTeeStream)
+            self.assertEqual(request._stream.captured, b"")
+
+            self.assertEqual(request.FILES["file"].read(), b"Hello World")
+
+            return HttpResponse()
+
+        attach_keys(get_response)(request)
+
+        self.assertIn(b"Hello World", body_streams[0].captured)
+        self.assertIn(b"file_key", get_request_attributes(request))
+
+    @override_settings(SENTRY_DSN="https://public@sentry.example.com/1")
+    @override_config(SENTRY_REQUEST_MAX_SIZE_TO_SEND=1024 * 1024)
+    def test_attach_keys_does_not_copy_credentials(self):
+        request = RequestFactory().post(
+            "/api/v1/auth/login/",
+            {"username": "user1", "password": "secret_password"},
+            content_type="application/json",
+            headers={"Authorization": "Token secret_token", "Cookie": "secret_cookie"},
+        )
+
+        def get_response(request):
+            self.assertNotIsInstance(request._stream, BoundedTeeStream)
+            self.assertIn(b"secret_password", request.body)
+
+            return HttpResponse()
+
+        attach_keys(get_response)(request)
+
+        request_attributes = get_request_attributes(request)
+
+        self.assertIn(b"HTTP_AUTHORIZATION", request_attributes)
+        self.assertNotIn(b"secret_token", request_attributes)
+        self.assertNotIn(b"secret_cookie", request_attributes)
+
+    def test_bounded_tee_stream(self):
+        stream = BoundedTeeStream(BytesIO(b"0123456789"), max_size=4)
+
+        self.assertEqual(stream.read(3), b"012")
+        self.assertEqual(stream.read(), b"3456789")
+        self.assertEqual(stream.captured, b"0123")
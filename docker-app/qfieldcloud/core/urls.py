@@ -52,6 +52,10 @@ urlpatterns = [
         "packages/<uuid:project_id>/latest/",
         package_views.LatestPackageView.as_view(),
     ),
+    path(
+        "packages/<uuid:project_id>/latest/archive/",
+        package_views.LatestPackageArchiveView.as_view(),
+    ),
     path(
         "packages/<uuid:project_id>/latest/files/<path:filename>/",
         package_views.LatestPackageDownloadFilesView.as_view(),
@@ -1,10 +1,12 @@
-import io
+import copy
+import functools
 import json
 import logging
 import os
 from datetime import datetime
-from typing import IO, NamedTuple
+from typing import Any, NamedTuple
 
+import fastjsonschema
 import jsonschema
 import mypy_boto3_s3
 from django.conf import settings
@@ -75,33 +77,144 @@ class S3ObjectWithVersions(NamedTuple):
         return sum(v.size for v in self.versions if v.size is not None)
 
 
-def strip_json_null_bytes(file: IO) -> IO:
-    """Return JSON string stream without NULL chars."""
-    result = io.BytesIO()
-    result.write(file.read().decode().replace(r"\u0000", "").encode())
-    file.seek(0)
-    result.seek(0)
+@functools.cache
+def get_deltafile_schema() -> dict[str, Any]:
+    """Returns the deltafile JSON schema. The schema is loaded and checked only once per process."""
+    schema_file = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "deltafile_01.json"
+    )
 
-    return result
+    with open(schema_file) as f:
+        schema_dict = json.load(f)
+
+    jsonschema.Draft7Validator.check_schema(schema_dict)
+
+    return schema_dict
+
+
+class CompiledSchemaValidator:
+    """JSON schema validator running the Python code generated by `fastjsonschema` from the schema.
+
+    The generated code is several times faster than the interpretive `jsonschema.Draft7Validator`, but reports less detailed errors.
+    Therefore the invalid instances are validated again with `jsonschema.Draft7Validator` to raise the usual `jsonschema.ValidationError`.
+
+    NOTE the QGIS worker image does not ship this module, so there is a copy in `qfc_worker.commands.apply_deltas`, don't forget to update it too.
+    """
+
+    def __init__(self, schema: dict[str, Any]) -> None:
+        self.schema = schema
+        # `jsonschema.Draft7Validator` does not check formats without a format checker, neither should the compiled validator.
+        # NOTE `fastjsonschema` caches the resolved references by the schema objects, so compile a copy not shared with other schemas
+        self._validate = fastjsonschema.compile(
+            copy.deepcopy(schema),
+            use_default=False,
+            use_formats=False,
+            detailed_exceptions=False,
+        )
+        self._fallback_validator = jsonschema.Draft7Validator(schema)
+
+    def validate(self, instance: Any) -> None:
+        """Validates the instance against the schema.
+
+        Raises:
+            jsonschema.ValidationError: the instance is not valid
+        """
+        try:
+            self._validate(instance)
+            return
+        except fastjsonschema.JsonSchemaValueException:
+            pass
+
+        # raise the detailed error outside of the `except` block, so it is not chained to the compiled validator error
+        self._fallback_validator.validate(instance)
+
+        logger.warning(
+            "The compiled JSON schema validator rejected an instance accepted by jsonschema."
+        )
+
+
+SchemaValidator = jsonschema.Draft7Validator | CompiledSchemaValidator
+
+
+def get_schema_validator(schema: dict[str, Any]) -> SchemaValidator:
+    """Creates a JSON schema validator using the backend configured in `QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND`.
+
+    Returns:
+        SchemaValidator -- JSON Schema validator
+    """
+    if settings.QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND == "compiled":
+        return CompiledSchemaValidator(schema)
+    elif settings.QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND == "jsonschema":
+        return jsonschema.Draft7Validator(schema)
+    else:
+        raise NotImplementedError(
+            f"Unknown deltafile validator backend: {settings.QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND}"
+        )
 
 
-def get_deltafile_schema_validator() -> jsonschema.Draft7Validator:
+def get_deltafile_header_schema() -> dict[str, Any]:
+    """Returns the deltafile JSON schema without the schema of the individual deltas."""
+    schema_dict = copy.deepcopy(get_deltafile_schema())
+    schema_dict["properties"]["deltas"] = {"type": "array"}
+
+    return schema_dict
+
+
+def get_delta_schema() -> dict[str, Any]:
+    """Returns the JSON schema of a single delta of a deltafile."""
+    schema_dict = get_deltafile_schema()
+
+    return {
+        **schema_dict["properties"]["deltas"]["items"],
+        "definitions": schema_dict["definitions"],
+    }
+
+
+@functools.cache
+def get_deltafile_schema_validator() -> SchemaValidator:
     """Creates a JSON schema validator to check whether the provided delta
     file is valid.
 
     Returns:
-        jsonschema.Draft7Validator -- JSON Schema validator
+        SchemaValidator -- JSON Schema validator
     """
-    schema_file = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "deltafile_01.json"
-    )
+    return get_schema_validator(get_deltafile_schema())
 
-    with open(schema_file) as f:
-        schema_dict = json.load(f)
 
-    jsonschema.Draft7Validator.check_schema(schema_dict)
+@functools.cache
+def get_deltafile_header_schema_validator() -> SchemaValidator:
+    """Creates a JSON schema validator for the deltafile without validating the individual deltas.
 
-    return jsonschema.Draft7Validator(schema_dict)
+    Used together with `get_delta_schema_validator` when the deltafile is parsed incrementally.
+
+    Returns:
+        SchemaValidator -- JSON Schema validator
+    """
+    return get_schema_validator(get_deltafile_header_schema())
+
+
+@functools.cache
+def get_delta_schema_validator() -> SchemaValidator:
+    """Creates a JSON schema validator to check whether a single delta of a delta file is valid.
+
+    Returns:
+        SchemaValidator -- JSON Schema validator
+    """
+    return get_schema_validator(get_delta_schema())
+
+
+def validate_delta(delta: Any, index: int) -> None:
+    """Validates a single delta, the `index` is its position in the deltafile `deltas` list.
+
+    Raises:
+        jsonschema.ValidationError: with the error path relative to the deltafile root
+    """
+    try:
+        get_delta_schema_validator().validate(delta)
+    except jsonschema.ValidationError as err:
+        err.path.extendleft([index, "deltas"])
+        err.schema_path.extendleft(["items", "deltas", "properties"])
+        raise
 
 
 def get_file_storage_choices() -> list[tuple[str, str]]:
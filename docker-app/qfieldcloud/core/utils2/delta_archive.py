@@ -0,0 +1,142 @@
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db import connection, transaction
+from django.db.models import F, QuerySet
+from django.db.models.fields.json import KT
+from django.db.models.functions import Coalesce
+
+from qfieldcloud.core.models import ApplyJobDelta, ArchivedDelta, Delta
+
+logger = logging.getLogger(__name__)
+
+# the fields of the deltas returned by the deltas API
+LISTED_DELTA_FIELDS = (
+    "id",
+    "deltafile_id",
+    "project",
+    "content",
+    "last_status",
+    "last_feedback",
+    "created_at",
+    "updated_at",
+    "created_by",
+)
+
+
+def get_deltas_with_archived(
+    filter_queryset: Callable[[QuerySet], QuerySet] | None = None,
+    **filters: Any,
+) -> QuerySet[Delta]:
+    """Returns the deltas matching `filters`, including the archived ones, as `Delta` instances.
+
+    Only the `LISTED_DELTA_FIELDS` are fetched. The result is a combined query,
+    so it can only be ordered, sliced and counted, see `QuerySet.union()`.
+
+    Args:
+        filter_queryset: applied to both the deltas and the archived deltas querysets before they are combined,
+            e.g. `DeltaFilterSet.filter_queryset`
+        filters: lookups applied to both the deltas and the archived deltas
+    """
+    # NOTE `ArchivedDelta` has the same fields in the same order as `Delta`, so the selected columns match
+    deltas_qs = (
+        Delta.objects.filter(**filters)
+        .only(*LISTED_DELTA_FIELDS)
+        .prefetch_related("created_by")
+    )
+    archived_deltas_qs = ArchivedDelta.objects.filter(**filters).only(
+        *LISTED_DELTA_FIELDS
+    )
+
+    if filter_queryset:
+        deltas_qs = filter_queryset(deltas_qs)
+        archived_deltas_qs = filter_queryset(archived_deltas_qs)
+
+    return deltas_qs.union(archived_deltas_qs, all=True)
+
+
+def get_delta_features_with_archived(
+    filter_queryset: Callable[[QuerySet], QuerySet] | None = None,
+    **filters: Any,
+) -> QuerySet:
+    """Returns the deltas matching `filters`, including the archived ones, as dicts ready to be written as GeoJSON features.
+
+    The geometry is the new geometry of the delta, or the old one for deleted features, as a GeoJSON string.
+
+    Args:
+        filter_queryset: applied to both the deltas and the archived deltas querysets before they are combined
+        filters: lookups applied to both the deltas and the archived deltas
+    """
+    querysets = []
+    for model in (Delta, ArchivedDelta):
+        queryset = model.objects.filter(**filters)
+
+        if filter_queryset:
+            queryset = filter_queryset(queryset)
+
+        querysets.append(
+            queryset.values(
+                "id",
+                "deltafile_id",
+                "last_status",
+                "created_at",
+                "updated_at",
+                method=KT("content__method"),
+                layer_id=KT("content__sourceLayerId"),
+                created_by_username=F("created_by__username"),
+                geometry=AsGeoJSON(Coalesce("new_geom", "old_geom")),
+            )
+        )
+
+    return querysets[0].union(querysets[1], all=True)
+
+
+def archive_deltas(updated_before: datetime, batch_size: int) -> int:
+    """Moves a batch of deltas in a final status and last updated before `updated_before` to `ArchivedDelta`.
+
+    The deltas locked by another transaction are skipped.
+
+    Args:
+        updated_before: only deltas last updated before that time are archived
+        batch_size: maximum number of deltas to archive
+
+    Returns:
+        the number of archived deltas, less than `batch_size` when there are no more deltas to archive.
+    """
+    columns = ", ".join(
+        connection.ops.quote_name(field.column) for field in Delta._meta.concrete_fields
+    )
+    sql = f"""
+        INSERT INTO {ArchivedDelta._meta.db_table} ({columns}, archived_at)
+        SELECT {columns}, NOW()
+        FROM {Delta._meta.db_table}
+        WHERE id = ANY(%(delta_ids)s)
+        ON CONFLICT (id) DO NOTHING
+    """
+
+    with transaction.atomic():
+        delta_ids = list(
+            Delta.objects.select_for_update(skip_locked=True)
+            .filter(
+                last_status__in=ArchivedDelta.ARCHIVED_STATUSES,
+                updated_at__lt=updated_before,
+            )
+            .order_by("updated_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+
+        if not delta_ids:
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {"delta_ids": delta_ids})
+
+        ApplyJobDelta.objects.filter(delta_id__in=delta_ids).delete()
+        Delta.objects.filter(id__in=delta_ids).delete()
+
+    logger.info(f"Archived {len(delta_ids)} delta(s).")
+
+    return len(delta_ids)
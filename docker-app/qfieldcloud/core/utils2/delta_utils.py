@@ -1,7 +1,20 @@
-from collections.abc import Iterable
-from typing import Any
+import codecs
+import itertools
+import json
+from collections.abc import Iterable, Iterator
+from typing import IO, Any
 from uuid import UUID
 
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Bytes read from the deltafile stream at once. Deltas bigger than that are read in doubling chunks.
+DELTAFILE_READ_CHUNK_SIZE = 64 * 1024
+
+# Number of GeoJSON features written in a single chunk of a streamed response.
+GEOJSON_FEATURES_CHUNK_SIZE = 1000
+
+JSON_WHITESPACE = " \t\n\r"
+
 
 def generate_deltafile(
     deltas: Iterable[dict[str, Any]],
@@ -26,3 +39,206 @@ def generate_deltafile(
     }
 
     return deltafile
+
+
+def strip_json_null_chars(value: Any) -> Any:
+    """Returns a copy of the decoded JSON value with all NULL chars removed from the strings."""
+    if isinstance(value, str):
+        return value.replace("\x00", "")
+    elif isinstance(value, list):
+        return [strip_json_null_chars(v) for v in value]
+    elif isinstance(value, dict):
+        return {
+            strip_json_null_chars(k): strip_json_null_chars(v) for k, v in value.items()
+        }
+
+    return value
+
+
+def iter_geojson_feature_collection(
+    features: Iterable[dict[str, Any]],
+    chunk_size: int = GEOJSON_FEATURES_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Yields a GeoJSON feature collection in chunks of `chunk_size` features, without keeping all the features in memory.
+
+    Args:
+        features: the feature properties, with an `id` and a `geometry` already encoded as a GeoJSON string or `None`
+        chunk_size: number of features per yielded chunk
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+
+    separator = ""
+    for chunk in itertools.batched(features, chunk_size):
+        encoded_features = []
+        for properties in chunk:
+            properties = dict(properties)
+            geometry = properties.pop("geometry") or "null"
+            encoded_id = json.dumps(str(properties["id"]))
+            encoded_properties = json.dumps(properties, cls=DjangoJSONEncoder)
+
+            encoded_features.append(
+                f'{{"type": "Feature", "id": {encoded_id}, "geometry": {geometry}, "properties": {encoded_properties}}}'
+            )
+
+        yield separator + ",".join(encoded_features)
+        separator = ","
+
+    yield "]}"
+
+
+class DeltafileReader(Iterator[dict[str, Any]]):
+    """Incrementally parses a deltafile stream and iterates over its deltas one by one.
+
+    Only a single delta is kept in memory at a time, no matter how big the deltafile is.
+    All the other top level keys of the deltafile (e.g. `id`, `project`, `files`) are collected in `header` as they are met in the stream.
+    Since the keys of a JSON object are not ordered, the `header` is guaranteed to be complete only after all the deltas have been iterated.
+    The `deltas` key in the `header` is always an empty list placeholder, so the `header` can still be validated against the deltafile schema.
+
+    NULL chars (`\\u0000`) are stripped from all the strings, as PostgreSQL cannot store them in `jsonb` columns.
+
+    Raises `json.JSONDecodeError` if the stream is not a valid JSON object.
+    """
+
+    def __init__(self, file: IO, chunk_size: int = DELTAFILE_READ_CHUNK_SIZE) -> None:
+        self.header: dict[str, Any] = {}
+        self.deltas_count = 0
+
+        self._file = file
+        self._chunk_size = chunk_size
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._is_eof = False
+        self._deltas = self._iter_deltas()
+
+    def __next__(self) -> dict[str, Any]:
+        return next(self._deltas)
+
+    def consume(self) -> dict[str, Any]:
+        """Reads the rest of the stream skipping the deltas and returns the complete `header`."""
+        for _delta in self:
+            pass
+
+        return self.header
+
+    def _read(self, size: int) -> bool:
+        """Appends the next `size` bytes of the stream to the buffer, dropping the already parsed part.
+
+        Returns whether there was anything left to read.
+        """
+        if self._is_eof:
+            return False
+
+        data = self._file.read(size)
+
+        if isinstance(data, bytes):
+            text = self._text_decoder.decode(data, final=not data)
+        else:
+            text = data
+
+        if not data:
+            self._is_eof = True
+
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+
+        return bool(data)
+
+    def _peek(self) -> str:
+        """Skips the whitespace and returns the next char without consuming it, or an empty string at the end of the stream."""
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in JSON_WHITESPACE
+            ):
+                self._pos += 1
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._read(self._chunk_size):
+                return ""
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self._buffer, self._pos)
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise self._error(f"Expecting '{char}'")
+
+        self._pos += 1
+
+    def _decode_value(self) -> Any:
+        """Decodes the next complete JSON value, reading more from the stream until it is complete."""
+        read_size = self._chunk_size
+
+        while True:
+            self._peek()
+
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # the value might be simply truncated by the end of the buffer
+                if self._read(read_size):
+                    read_size *= 2
+                    continue
+
+                raise
+
+            # a number at the very end of the buffer might continue in the next chunk
+            if end == len(self._buffer) and self._read(read_size):
+                continue
+
+            if "\\u0000" in self._buffer[self._pos : end]:
+                value = strip_json_null_chars(value)
+
+            self._pos = end
+
+            return value
+
+    def _iter_deltas(self) -> Iterator[dict[str, Any]]:
+        self._expect("{")
+
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._decode_value()
+
+                if not isinstance(key, str):
+                    raise self._error(
+                        "Expecting property name enclosed in double quotes"
+                    )
+
+                self._expect(":")
+
+                if key == "deltas" and self._peek() == "[":
+                    self._pos += 1
+                    self.header[key] = []
+
+                    if self._peek() == "]":
+                        self._pos += 1
+                    else:
+                        while True:
+                            delta = self._decode_value()
+                            self.deltas_count += 1
+
+                            yield delta
+
+                            if self._peek() == ",":
+                                self._pos += 1
+                            else:
+                                self._expect("]")
+                                break
+                else:
+                    self.header[key] = self._decode_value()
+
+                if self._peek() == ",":
+                    self._pos += 1
+                else:
+                    self._expect("}")
+                    break
+
+        if self._peek() != "":
+            raise self._error("Extra data")
@@ -1,8 +1,10 @@
 import logging
 from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import Q
 
 import qfieldcloud.core.models as models
@@ -14,6 +16,16 @@ logger = logging.getLogger(__name__)
 # the job types that can be triggered by the `queue_job` function.
 TRIGGERABLE_JOBS = [models.ProcessProjectfileJob]
 
+# the step metrics reported by the worker in the job feedback, see `qfc_worker.workflow.measure_step`
+STEP_METRIC_NAMES = (
+    "wall_time_s",
+    "cpu_time_s",
+    "peak_rss_bytes",
+    "bytes_received",
+    "bytes_sent",
+    "files_count",
+)
+
 
 @transaction.atomic
 def apply_deltas(
@@ -205,3 +217,103 @@ def queue_job(
         job.save()
 
     return jobs
+
+
+def get_feedback_worker_metrics(feedback: Any) -> dict[str, float | int | None]:
+    """Aggregates the metrics of the feedback steps into the values of the `Job.worker_*` fields.
+
+    The times and the transferred bytes are summed, the peak RSS is the maximum over all steps.
+
+    Args:
+        feedback: the job feedback as written by the worker.
+
+    Returns:
+        the `Job.worker_*` field names and their values, `None` if no step reported the metric.
+    """
+    steps = feedback.get("steps") if isinstance(feedback, dict) else None
+    steps_metrics = [
+        step["metrics"]
+        for step in steps or []
+        if isinstance(step, dict) and step.get("metrics")
+    ]
+
+    def get_values(metric_name: str) -> list[float | int]:
+        return [
+            step_metrics[metric_name]
+            for step_metrics in steps_metrics
+            if step_metrics.get(metric_name) is not None
+        ]
+
+    def total(metric_name: str) -> float | int | None:
+        values = get_values(metric_name)
+        return sum(values) if values else None
+
+    peak_rss_bytes = get_values("peak_rss_bytes")
+
+    return {
+        "worker_wall_time_s": total("wall_time_s"),
+        "worker_cpu_time_s": total("cpu_time_s"),
+        "worker_peak_rss_bytes": max(peak_rss_bytes) if peak_rss_bytes else None,
+        "worker_bytes_received": total("bytes_received"),
+        "worker_bytes_sent": total("bytes_sent"),
+    }
+
+
+def get_step_metrics_percentiles(
+    job_type: models.Job.Type,
+    finished_after: datetime,
+    percentiles: tuple[float, ...] = (0.5, 0.9, 0.99),
+) -> list[dict[str, Any]]:
+    """Returns the percentiles of the metrics of each step of the finished jobs of the given type.
+
+    Args:
+        job_type: the type of the jobs.
+        finished_after: only consider jobs finished after this timestamp.
+        percentiles: the percentiles to calculate, as fractions between 0 and 1.
+
+    Returns:
+        one row per step id in the order of the steps, with the number of measured step runs
+        and a list of values per metric, one for each of the `percentiles`, or `None` if no step run reported the metric.
+    """
+    metric_columns = ",\n".join(
+        f"percentile_cont(%(percentiles)s::float[]) WITHIN GROUP (ORDER BY (S.step -> 'metrics' ->> '{metric_name}')::float) AS {metric_name}"
+        for metric_name in STEP_METRIC_NAMES
+    )
+
+    sql = f"""
+        SELECT
+            S.step ->> 'id' AS step_id,
+            COUNT(*) AS count,
+            {metric_columns}
+        FROM
+            core_job J
+            CROSS JOIN LATERAL jsonb_array_elements(
+                CASE
+                    WHEN jsonb_typeof(J.feedback -> 'steps') = 'array' THEN J.feedback -> 'steps'
+                    ELSE '[]'::jsonb
+                END
+            ) WITH ORDINALITY AS S(step, idx)
+        WHERE
+            J.type = %(job_type)s
+            AND J.status = %(status)s
+            AND J.finished_at >= %(finished_after)s
+            AND jsonb_typeof(S.step -> 'metrics') = 'object'
+        GROUP BY
+            S.step ->> 'id'
+        ORDER BY
+            MIN(S.idx)
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "job_type": job_type,
+                "status": models.Job.Status.FINISHED,
+                "finished_after": finished_after,
+                "percentiles": list(percentiles),
+            },
+        )
+        columns = [column.name for column in cursor.description]
+
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,436 @@
+"""Prometheus metrics of QFieldCloud.
+
+The counters and histograms are incremented in the shared cache, so all the app and worker wrapper processes report to the same values.
+The gauges are calculated on every scrape, using only indexed queries on the few active rows and planner estimates for the large tables.
+
+NOTE the cache might evict or lose the values, which Prometheus treats as a counter reset.
+"""
+
+import itertools
+import logging
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from qfieldcloud.core.models import Delta, Job
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "qfc_metrics"
+
+# the error types reported in the job feedback, any other value is reported as "UNKNOWN"
+JOB_ERROR_TYPES = (
+    "API_TOKEN_EXPIRED",
+    "API_PAYMENT_REQUIRED",
+    "API_FORBIDDEN",
+    "API_NOT_FOUND",
+    "API_INTERNAL_SERVER_ERROR",
+    "API_OTHER",
+    "FILE_NOT_FOUND",
+    "INVALID_PROJECT_FILE",
+    "UNABLE_TO_CONTINUE",
+    "DOCKER_ENGINE_SIGKILL",
+    "TIMEOUT",
+    "WORKER_WRAPPER",
+    "UNKNOWN",
+)
+
+UPLOAD_METHODS = ("direct", "chunked", "presigned")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    labels_str = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in labels.items()
+    )
+
+    return f"{{{labels_str}}}"
+
+
+def _format_value(value: float | int) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def _increment(key: str, delta: int) -> None:
+    try:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # the key does not exist yet, but another process might create it in the meantime
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+    # metrics must never break the instrumented code
+    except Exception as err:  # noqa: BLE001
+        logger.warning(f'Failed to increment metric "{key}".', exc_info=err)
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_values: dict[str, Iterable[str]] | None = None,
+    ) -> None:
+        """
+        Arguments:
+            name: the metric name.
+            documentation: the help text of the metric.
+            label_values: all the possible values of each label, as the cache cannot list its keys.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_values = {
+            label_name: tuple(values)
+            for label_name, values in (label_values or {}).items()
+        }
+
+    def _check_labels(self, labels: dict[str, str]) -> None:
+        if labels.keys() != self.label_values.keys():
+            raise ValueError(
+                f'Metric "{self.name}" expects labels {list(self.label_values)}, got {list(labels)}.'
+            )
+
+        for label_name, value in labels.items():
+            if value not in self.label_values[label_name]:
+                raise ValueError(
+                    f'Metric "{self.name}" got unknown value "{value}" for label "{label_name}".'
+                )
+
+    def _iter_labels(self) -> Iterator[dict[str, str]]:
+        label_names = list(self.label_values)
+
+        for values in itertools.product(*self.label_values.values()):
+            yield dict(zip(label_names, values))
+
+    def _get_key(self, suffix: str, labels: dict[str, str]) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.name}{suffix}{_format_labels(labels)}"
+
+    def get_samples(self) -> list[tuple[str, dict[str, str], float | int]]:
+        """Returns the samples of the metric, as the name suffix, the labels and the value."""
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+        for suffix, labels, value in self.get_samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+            )
+
+        return lines
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: int = 1, **labels: str) -> None:
+        self._check_labels(labels)
+        _increment(self._get_key("_total", labels), amount)
+
+    def get_samples(self) -> list[tuple[str, dict[str, str], float | int]]:
+        all_labels = list(self._iter_labels())
+        values = cache.get_many(
+            [self._get_key("_total", labels) for labels in all_labels]
+        )
+
+        return [
+            ("_total", labels, values.get(self._get_key("_total", labels), 0))
+            for labels in all_labels
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    # the sum is stored as an integer in the cache, scaled by this factor
+    SUM_SCALE = 1000
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Iterable[float],
+        label_values: dict[str, Iterable[str]] | None = None,
+    ) -> None:
+        super().__init__(name, documentation, label_values)
+
+        self.buckets = sorted(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        self._check_labels(labels)
+
+        # the buckets are stored non-cumulative and accumulated when rendering, so a single bucket is incremented
+        for bucket in self.buckets:
+            if value <= bucket:
+                _increment(self._get_key("_bucket", {**labels, "le": str(bucket)}), 1)
+                break
+        else:
+            _increment(self._get_key("_bucket", {**labels, "le": "+Inf"}), 1)
+
+        _increment(self._get_key("_sum", labels), round(value * self.SUM_SCALE))
+
+    def get_samples(self) -> list[tuple[str, dict[str, str], float | int]]:
+        bucket_names = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+        all_labels = list(self._iter_labels())
+
+        keys = []
+        for labels in all_labels:
+            keys.append(self._get_key("_sum", labels))
+            keys += [
+                self._get_key("_bucket", {**labels, "le": bucket_name})
+                for bucket_name in bucket_names
+            ]
+
+        values = cache.get_many(keys)
+
+        samples: list[tuple[str, dict[str, str], float | int]] = []
+        for labels in all_labels:
+            count = 0
+            for bucket_name in bucket_names:
+                count += values.get(
+                    self._get_key("_bucket", {**labels, "le": bucket_name}), 0
+                )
+                samples.append(("_bucket", {**labels, "le": bucket_name}, count))
+
+            samples.append(
+                (
+                    "_sum",
+                    labels,
+                    values.get(self._get_key("_sum", labels), 0) / self.SUM_SCALE,
+                )
+            )
+            samples.append(("_count", labels, count))
+
+        return samples
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+
+        self.samples: list[tuple[str, dict[str, str], float | int]] = []
+
+    def set(self, value: float | int, **labels: str) -> None:
+        self.samples.append(("", labels, value))
+
+    def get_samples(self) -> list[tuple[str, dict[str, str], float | int]]:
+        return self.samples
+
+
+JOB_TYPES = Job.Type.values
+
+job_failures = Counter(
+    "qfieldcloud_job_failures",
+    "Failed jobs by job type and error type.",
+    {"type": JOB_TYPES, "error_type": JOB_ERROR_TYPES},
+)
+
+job_queue_wait_seconds = Histogram(
+    "qfieldcloud_job_queue_wait_seconds",
+    "Time between the job creation and the job start.",
+    (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+    {"type": JOB_TYPES},
+)
+
+job_docker_run_seconds = Histogram(
+    "qfieldcloud_job_docker_run_seconds",
+    "Time the job worker container was running.",
+    (1, 5, 10, 30, 60, 120, 300, 600, 1200),
+    {"type": JOB_TYPES},
+)
+
+upload_size_bytes = Histogram(
+    "qfieldcloud_upload_size_bytes",
+    "Size of the uploaded project files.",
+    (10**3, 10**4, 10**5, 10**6, 10**7, 10**8, 10**9, 10**10),
+    {"method": UPLOAD_METHODS},
+)
+
+upload_duration_seconds = Histogram(
+    "qfieldcloud_upload_duration_seconds",
+    "Time to upload a project file, from the upload request or upload session start until the file version is stored.",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+    {"method": UPLOAD_METHODS},
+)
+
+
+notification_emails = Counter(
+    "qfieldcloud_notification_emails",
+    "Notification emails by delivery status.",
+    {"status": ("sent", "failed")},
+)
+
+notification_emails_run_seconds = Histogram(
+    "qfieldcloud_notification_emails_run_seconds",
+    "Time a notification emails cron run took.",
+    (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300),
+)
+
+
+def record_job_failure(job: Job) -> None:
+    """Increments the failures counter with the error type from the job feedback."""
+    error_type = "UNKNOWN"
+
+    if isinstance(job.feedback, dict):
+        if job.feedback.get("error_origin") == "worker_wrapper":
+            error_type = "WORKER_WRAPPER"
+        else:
+            error_type = job.feedback.get("error_type") or "UNKNOWN"
+
+    if error_type not in JOB_ERROR_TYPES:
+        error_type = "UNKNOWN"
+
+    job_failures.inc(type=job.type, error_type=error_type)
+
+
+def record_upload(method: str, size: int, started_at: datetime) -> None:
+    """Observes the size and the duration of a project file upload."""
+    upload_size_bytes.observe(size, method=method)
+    upload_duration_seconds.observe(
+        (timezone.now() - started_at).total_seconds(), method=method
+    )
+
+
+def get_estimated_delta_counts() -> dict[str, int]:
+    """Returns the estimated number of deltas per status, from the planner statistics instead of counting the whole table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                S.most_common_vals::text::text[],
+                S.most_common_freqs,
+                C.reltuples
+            FROM
+                pg_stats S
+                INNER JOIN pg_class C ON C.relname = S.tablename
+            WHERE
+                S.tablename = %s
+                AND S.attname = %s
+            """,
+            [Delta._meta.db_table, "last_status"],
+        )
+        row = cursor.fetchone()
+
+    counts = dict.fromkeys(Delta.Status.values, 0)
+
+    if not row or not row[0]:
+        return counts
+
+    statuses, frequencies, total = row
+    for status, frequency in zip(statuses, frequencies):
+        if status in counts:
+            counts[status] = round(frequency * max(total, 0))
+
+    return counts
+
+
+def get_gauges() -> list[Gauge]:
+    now = timezone.now()
+    active_statuses = (Job.Status.PENDING, Job.Status.QUEUED, Job.Status.STARTED)
+
+    jobs = Gauge(
+        "qfieldcloud_jobs", "Number of active jobs by job type and job status."
+    )
+    jobs_counts = {
+        (row["type"], row["status"]): row["count"]
+        for row in Job.objects.filter(status__in=active_statuses)
+        .values("type", "status")
+        .annotate(count=Count("id"))
+        .order_by()
+    }
+    for job_type in JOB_TYPES:
+        for status in active_statuses:
+            jobs.set(
+                jobs_counts.get((job_type, status), 0), type=job_type, status=status
+            )
+
+    oldest_pending_job_age = Gauge(
+        "qfieldcloud_oldest_pending_job_age_seconds",
+        "Age of the oldest pending job by job type.",
+    )
+    oldest_pending_jobs = dict(
+        Job.objects.filter(status=Job.Status.PENDING)
+        .values("type")
+        .annotate(created_at=Min("created_at"))
+        .order_by()
+        .values_list("type", "created_at")
+    )
+    for job_type in JOB_TYPES:
+        created_at = oldest_pending_jobs.get(job_type)
+        oldest_pending_job_age.set(
+            (now - created_at).total_seconds() if created_at else 0, type=job_type
+        )
+
+    active_worker_containers = Gauge(
+        "qfieldcloud_active_worker_containers",
+        "Number of running worker containers.",
+    )
+    active_worker_containers.set(
+        Job.objects.filter(
+            status=Job.Status.STARTED,
+            docker_started_at__isnull=False,
+            docker_finished_at__isnull=True,
+        ).count()
+    )
+
+    deltas = Gauge(
+        "qfieldcloud_deltas",
+        "Number of deltas by status. Exact for the pending and started deltas, estimated for the rest.",
+    )
+    delta_counts = get_estimated_delta_counts()
+    # the active deltas are few and the status is indexed, so they are counted exactly
+    delta_counts.update(
+        Delta.objects.filter(
+            last_status__in=(Delta.Status.PENDING, Delta.Status.STARTED)
+        )
+        .values("last_status")
+        .annotate(count=Count("id"))
+        .order_by()
+        .values_list("last_status", "count")
+    )
+    for status in (Delta.Status.PENDING, Delta.Status.STARTED):
+        delta_counts.setdefault(status, 0)
+
+    for status, count in delta_counts.items():
+        deltas.set(count, status=status)
+
+    return [jobs, oldest_pending_job_age, active_worker_containers, deltas]
+
+
+def render_metrics() -> str:
+    """Returns all the metrics in the Prometheus text exposition format."""
+    metrics: list[Metric] = [
+        *get_gauges(),
+        job_failures,
+        job_queue_wait_seconds,
+        job_docker_run_seconds,
+        upload_size_bytes,
+        upload_duration_seconds,
+        notification_emails,
+        notification_emails_run_seconds,
+    ]
+
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+
+    return "\n".join(lines) + "\n"
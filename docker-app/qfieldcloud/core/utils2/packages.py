@@ -1,12 +1,33 @@
+import hashlib
+import hmac
+import json
 import logging
-from collections.abc import Iterable
+import tarfile
+import uuid
+from collections.abc import Iterable, Iterator
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
 
-from qfieldcloud.core import models
-from qfieldcloud.filestorage.models import File
+from constance import config
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File as DjangoFile
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from qfieldcloud.core import exceptions, models
+from qfieldcloud.core.utils2 import storage
+from qfieldcloud.filestorage.models import File, FileVersion
+from qfieldcloud.filestorage.serializers import FileSerializer
 from qfieldcloud.project.models import Project
 
 logger = logging.getLogger(__name__)
 
+# the latest package data are keyed by their ETag, so they never get outdated and only need to expire to free the cache
+LATEST_PACKAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 def delete_obsolete_packages(projects: Iterable[Project]) -> None:
     """Delete obsolete packages for the given projects.
@@ -56,3 +77,505 @@ def delete_obsolete_packages(projects: Iterable[Project]) -> None:
         delete_count = files_to_delete_qs.delete()
 
         logger.info(f"Deleted {delete_count} package files.")
+
+
+def get_package_inputs_hash(
+    project: Project, user: models.User, qgis_image: str
+) -> str:
+    """Returns a hash of all the inputs that determine the contents of a package built for the user.
+
+    The attachments are not part of the package, so they are not part of the inputs either.
+    The secrets are part of the inputs, hence the hash is keyed with the `SECRET_KEY`.
+
+    Arguments:
+        project: the project to be packaged.
+        user: the user the package is built for.
+        qgis_image: the QGIS worker image building the package.
+
+    Returns:
+        the hex digest of the inputs.
+    """
+    file_version_ids = sorted(
+        str(latest_version_id)
+        for name, latest_version_id in File.objects.filter(
+            project=project,
+            file_type=File.FileType.PROJECT_FILE,
+        ).values_list("name", "latest_version_id")
+        if storage.get_attachment_dir_prefix(project, name) == ""
+    )
+
+    secrets = sorted(
+        (secret.type, secret.name, secret.value)
+        for secret in models.Secret.objects.for_user_and_project(user, project)  # type: ignore[attr-defined]
+    )
+
+    qgis_project = getattr(project, "qgis_project", None)
+    area_of_interest = None
+
+    if qgis_project and qgis_project.area_of_interest:
+        area_of_interest = qgis_project.area_of_interest.wkt
+
+    inputs = {
+        "file_version_ids": file_version_ids,
+        "packaging_offliner": project.packaging_offliner,
+        "secrets": secrets,
+        "area_of_interest": area_of_interest,
+        "qgis_image": qgis_image,
+    }
+
+    return hmac.new(
+        settings.SECRET_KEY.encode(),
+        json.dumps(inputs, sort_keys=True).encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def get_reusable_package_job(
+    package_job: models.PackageJob,
+) -> models.PackageJob | None:
+    """Returns the latest finished package job with the same inputs as the given one, if its package files are still present.
+
+    The packages of projects with online layers are snapshots of the online data,
+    so they are reused only if they are more recent than `PACKAGE_REUSE_ONLINE_DATA_MAX_AGE_MINUTES`.
+
+    Arguments:
+        package_job: the package job with `inputs_hash` already set.
+
+    Returns:
+        the package job whose package can be reused or `None`.
+    """
+    if not package_job.inputs_hash:
+        return None
+
+    jobs_qs = (
+        models.PackageJob.objects.filter(
+            project_id=package_job.project_id,
+            inputs_hash=package_job.inputs_hash,
+            status=models.Job.Status.FINISHED,
+        )
+        .exclude(pk=package_job.pk)
+        .filter(
+            Exists(
+                File.objects.filter(
+                    package_job_id=OuterRef("pk"),
+                    file_type=File.FileType.PACKAGE_FILE,
+                )
+            )
+        )
+    )
+
+    # NOTE `has_online_vector_data` is `None` when the project details are missing, then we assume there might be online layers
+    if package_job.project.has_online_vector_data is not False:
+        max_age_minutes = config.PACKAGE_REUSE_ONLINE_DATA_MAX_AGE_MINUTES
+
+        if max_age_minutes <= 0:
+            return None
+
+        jobs_qs = jobs_qs.filter(
+            finished_at__gte=timezone.now() - timedelta(minutes=max_age_minutes)
+        )
+
+    return jobs_qs.order_by("-finished_at").first()
+
+
+@transaction.atomic()
+def copy_package_files(
+    source_package_job: models.PackageJob,
+    package_job: models.PackageJob,
+    filenames: Iterable[str] | None = None,
+) -> None:
+    """Copies the package files of a finished package job to another package job.
+
+    The new `File` and `FileVersion` rows reference the already stored package objects, nothing is copied on the storage.
+    Deleting the obsolete packages deletes only the rows, so the shared objects stay available for the remaining packages.
+
+    Arguments:
+        source_package_job: the finished package job whose package files are copied.
+        package_job: the package job to copy the package files to.
+        filenames: the names of the package files to copy. Copies all package files if `None`.
+
+    Raises:
+        File.DoesNotExist: if any of the requested package files does not exist in the source package.
+    """
+    source_files_qs = File.objects.filter(
+        package_job=source_package_job,
+        file_type=File.FileType.PACKAGE_FILE,
+    ).select_related("latest_version")
+
+    if filenames is not None:
+        filenames = set(filenames)
+        source_files_qs = source_files_qs.filter(name__in=filenames)
+
+        missing_filenames = filenames - set(
+            source_files_qs.values_list("name", flat=True)
+        )
+
+        if missing_filenames:
+            raise File.DoesNotExist(
+                f"Package files {sorted(missing_filenames)} do not exist in package {source_package_job.id}."
+            )
+
+    for source_file in source_files_qs:
+        source_version = source_file.latest_version
+
+        assert source_version
+
+        version_id = uuid.uuid4()
+        file = File.objects.create(
+            project_id=package_job.project_id,
+            name=source_file.name,
+            file_type=File.FileType.PACKAGE_FILE,
+            uploaded_by=package_job.created_by,
+            package_job_id=package_job.id,
+            latest_version_id=version_id,
+            latest_version_count=1,
+        )
+        FileVersion.objects.create(
+            id=version_id,
+            file=file,
+            # keep the storage of the source package, as the storage of the project might have changed since
+            file_storage=source_version.file_storage,
+            content=source_version.content.name,
+            etag=source_version.etag,
+            md5sum=source_version.md5sum,
+            sha256sum=source_version.sha256sum,
+            size=source_version.size,
+            uploaded_by=package_job.created_by,
+        )
+
+
+def assign_reused_package_files(
+    source_package_job_id: str,
+    package_job: models.PackageJob,
+    filenames: list[str],
+    reused_files_dir: Path,
+) -> None:
+    """Assigns the package files the worker has reused from the previous package to the new package job.
+
+    The previous package might have been deleted as obsolete while the new package was built.
+    Then the package files built by the worker are stored instead, they are kept by the worker in `reused_files_dir`.
+
+    Arguments:
+        source_package_job_id: the id of the previous package job the files are reused from.
+        package_job: the package job to assign the package files to.
+        filenames: the names of the reused package files.
+        reused_files_dir: the directory with the reused package files as built by the worker.
+    """
+    try:
+        copy_package_files(
+            models.PackageJob.objects.get(id=source_package_job_id),
+            package_job,
+            filenames,
+        )
+
+        return
+    except (models.PackageJob.DoesNotExist, File.DoesNotExist) as err:
+        logger.warning(
+            f"Failed to reuse the files of package {source_package_job_id}, storing the files built by job {package_job.id} instead: {err}"
+        )
+
+    for filename in filenames:
+        with open(reused_files_dir.joinpath(filename), "rb") as f:
+            FileVersion.objects.add_version(
+                project=package_job.project,
+                filename=filename,
+                content=DjangoFile(f, name=filename),
+                file_type=File.FileType.PACKAGE_FILE,
+                uploaded_by=package_job.created_by,
+                package_job_id=package_job.id,
+            )
+
+
+@transaction.atomic()
+def reuse_package(
+    source_package_job: models.PackageJob, package_job: models.PackageJob
+) -> None:
+    """Assigns the package of a finished package job to another package job with the same inputs.
+
+    Arguments:
+        source_package_job: the finished package job whose package is reused.
+        package_job: the package job to assign the package to.
+    """
+    copy_package_files(source_package_job, package_job)
+
+    package_job.output = (
+        f"Reused the package of job {source_package_job.id} with the same inputs."
+    )
+    package_job.feedback = {
+        **(source_package_job.feedback or {}),
+        "reused_package_job_id": str(source_package_job.id),
+    }
+    package_job.save(update_fields=["output", "feedback"])
+
+
+def get_package_manifest(package_job: models.PackageJob | None) -> dict[str, Any]:
+    """Returns the manifest of a finished package, used by the next package job to reuse the identical package files.
+
+    Arguments:
+        package_job: the package job of the previous package or `None`.
+
+    Returns:
+        the package job id and the checksums of the package files.
+    """
+    manifest: dict[str, Any] = {
+        "package_job_id": None,
+        "files": {},
+    }
+
+    if not package_job or package_job.status != models.Job.Status.FINISHED:
+        return manifest
+
+    manifest["package_job_id"] = str(package_job.id)
+
+    files_qs = File.objects.filter(
+        package_job=package_job,
+        file_type=File.FileType.PACKAGE_FILE,
+    ).values_list("name", "latest_version__sha256sum", "latest_version__size")
+
+    for name, sha256sum, size in files_qs:
+        # the checksum of the file is not calculated yet, it cannot be compared and the file is not reused
+        if sha256sum is None:
+            continue
+
+        manifest["files"][name] = {
+            "sha256": bytes(sha256sum).hex(),
+            "size": size,
+        }
+
+    return manifest
+
+
+def get_feedback_package_manifest(
+    feedback: dict[str, Any] | None,
+) -> dict[str, Any] | None:
+    """Returns the package manifest from the feedback of a package job, if the worker has built one."""
+    if not isinstance(feedback, dict):
+        return None
+
+    return (
+        feedback.get("outputs", {}).get("package_manifest", {}).get("package_manifest")
+    )
+
+
+def get_package_files(
+    project: Project, package_job: models.PackageJob
+) -> QuerySet[File]:
+    """Returns the files of a project package.
+
+    The attachment files are directly the original project files, as the package job does not upload them in the package.
+
+    Arguments:
+        project: the packaged project, with `qgis_project` selected.
+        package_job: the package job that created the package.
+
+    Returns:
+        the package files queryset.
+    """
+    files_qs = File.objects.filter(
+        project_id=project.id,
+        package_job=package_job,
+        file_type=File.FileType.PACKAGE_FILE,
+    )
+
+    # get attachment files directly from the original project files, not from the package
+    qgis_project = getattr(project, "qgis_project", None)
+
+    if qgis_project:
+        for attachment_dir in qgis_project.attachment_dirs:
+            files_qs |= File.objects.filter(
+                project_id=project.id,
+                file_type=File.FileType.PROJECT_FILE,
+                name__startswith=attachment_dir,
+            )
+
+    return files_qs.distinct()
+
+
+def has_pending_checksums(project: Project, package_job: models.PackageJob) -> bool:
+    """Returns whether any of the package files has no checksum yet, e.g. an attachment uploaded with a presigned upload.
+
+    Arguments:
+        project: the packaged project, with `qgis_project` selected.
+        package_job: the package job that created the package.
+    """
+    return (
+        get_package_files(project, package_job)
+        .filter(latest_version__sha256sum__isnull=True)
+        .exists()
+    )
+
+
+def get_latest_package_etag(project: Project, package_job: models.PackageJob) -> str:
+    """Returns the ETag of the latest package data, see `get_latest_package_data`.
+
+    The ETag is calculated without fetching the package files. It changes when:
+    - a new package job finishes, or the package job itself is updated;
+    - a project file is uploaded or deleted, as it updates `Project.data_last_updated_at`;
+    - the attachment dirs of the project change;
+    - the pending checksums of the package files are calculated, see `CalculateFileVersionChecksumsJob`.
+
+    Arguments:
+        project: the packaged project, with `qgis_project` selected.
+        package_job: the latest finished package job for the user.
+
+    Returns:
+        the quoted ETag.
+    """
+    qgis_project = getattr(project, "qgis_project", None)
+
+    inputs = {
+        "package_job_id": str(package_job.id),
+        "package_job_updated_at": package_job.updated_at.isoformat(),
+        "data_last_packaged_at": project.data_last_packaged_at,
+        "data_last_updated_at": project.data_last_updated_at,
+        "attachment_dirs": qgis_project.attachment_dirs if qgis_project else [],
+        "has_pending_checksums": has_pending_checksums(project, package_job),
+    }
+
+    etag = hashlib.md5(
+        json.dumps(inputs, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    return f'"{etag}"'
+
+
+def get_latest_package_data(
+    project: Project, package_job: models.PackageJob
+) -> dict[str, Any]:
+    """Returns the files and the layers of the latest package, as returned to QField.
+
+    The data are cached by their ETag, see `get_latest_package_etag`.
+    The data with pending checksums are not cached, as the checksums are calculated later.
+
+    Arguments:
+        project: the packaged project, with `qgis_project` selected.
+        package_job: the latest finished package job for the user.
+
+    Returns:
+        the latest package data.
+
+    Raises:
+        exceptions.InvalidJobError: raised when the package has no files
+    """
+    etag = get_latest_package_etag(project, package_job)
+    cache_key = f"latest_package:{project.id}:{etag}"
+
+    data = cache.get(cache_key)
+
+    if data is not None:
+        return data
+
+    files_qs = get_package_files(project, package_job)
+    files = FileSerializer(files_qs, many=True).data
+
+    if not files:
+        raise exceptions.InvalidJobError("Empty project package.")
+
+    assert package_job.feedback
+
+    feedback_version = package_job.feedback.get("feedback_version")
+    # version 2 and 3 have the same format
+    if feedback_version in ["2.0", "3.0"]:
+        layers = package_job.feedback["outputs"]["qgis_layers_data"]["layers_by_id"]
+    # support some ancient QFieldCloud job data
+    elif feedback_version is None:
+        steps = package_job.feedback.get("steps", [])
+
+        layers = None
+        if len(steps) > 2 and steps[1].get("stage", 1) == 2:
+            layers = steps[1]["outputs"]["layer_checks"]
+
+    # be paranoid and raise for newer versions
+    else:
+        raise NotImplementedError()
+
+    data = {
+        "files": files,
+        "layers": layers,
+        "status": package_job.status,
+        "package_id": package_job.pk,
+        "packaged_at": project.data_last_packaged_at,
+        "data_last_updated_at": project.data_last_updated_at,
+    }
+
+    if any(file["sha256"] is None for file in files):
+        return data
+
+    # NOTE failures to cache, e.g. exceeding the maximum item size, are ignored by the memcached client, see `CACHES`
+    cache.set(cache_key, data, LATEST_PACKAGE_CACHE_TIMEOUT)
+
+    return data
+
+
+class PackageTarArchive:
+    """An uncompressed tar archive of package files, assembled on the fly from the storage.
+
+    The layout of a tar archive depends only on the member names and sizes,
+    so the archive size and the offset of each member are known without reading any file contents.
+    This allows streaming any byte range of the archive, e.g. to resume an interrupted download.
+    """
+
+    def __init__(self, file_versions: Iterable[tuple[str, FileVersion]]) -> None:
+        """
+        Arguments:
+            file_versions: the archive member names and the file versions with their contents.
+        """
+        # each segment is either raw bytes (headers and paddings) or file version contents, with its size
+        self.segments: list[tuple[bytes | FileVersion, int]] = []
+
+        etag_hasher = hashlib.md5()
+
+        for name, file_version in file_versions:
+            info = tarfile.TarInfo(name)
+            info.size = file_version.size
+            info.mtime = int(file_version.uploaded_at.timestamp())
+            info.mode = 0o644
+
+            header = info.tobuf(tarfile.PAX_FORMAT)
+
+            self.segments.append((header, len(header)))
+            self.segments.append((file_version, file_version.size))
+
+            if padding_size := -file_version.size % tarfile.BLOCKSIZE:
+                self.segments.append((tarfile.NUL * padding_size, padding_size))
+
+            etag_hasher.update(f"{name}:{file_version.id}\n".encode())
+
+        # the end of the archive is marked by two empty blocks
+        self.segments.append(
+            (tarfile.NUL * 2 * tarfile.BLOCKSIZE, 2 * tarfile.BLOCKSIZE)
+        )
+
+        self.size = sum(size for _segment, size in self.segments)
+        self.etag = f'"{etag_hasher.hexdigest()}"'
+
+    def iter_range(self, start: int, end: int) -> Iterator[bytes]:
+        """Streams a byte range of the archive, reading only the needed file contents from the storage.
+
+        Arguments:
+            start: the first byte of the range.
+            end: the last byte of the range, inclusive.
+
+        Returns:
+            iterator of the range contents.
+        """
+        segment_start = 0
+
+        for segment, size in self.segments:
+            segment_end = segment_start + size - 1
+
+            if size and segment_end >= start and segment_start <= end:
+                range_start = max(start, segment_start) - segment_start
+                range_end = min(end, segment_end) - segment_start
+
+                if isinstance(segment, bytes):
+                    yield segment[range_start : range_end + 1]
+                else:
+                    yield from segment.content.storage.iter_range(  # type: ignore
+                        segment.content.name, range_start, range_end
+                    )
+
+            if segment_end >= end:
+                break
+
+            segment_start += size
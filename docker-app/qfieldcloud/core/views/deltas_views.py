@@ -1,12 +1,14 @@
-import json
+import itertools
 import logging
+from collections.abc import Iterable
 from traceback import format_exception
-from typing import IO
+from typing import IO, Any
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.db import transaction
-from django.http import HttpRequest
+from django.http import HttpRequest, StreamingHttpResponse
 from django.utils.translation import gettext as _
 from drf_spectacular.utils import (
     OpenApiParameter,
@@ -16,9 +18,23 @@ from drf_spectacular.utils import (
 )
 from qfieldcloud.core import exceptions, pagination, permissions_utils, utils
 from qfieldcloud.core.drf_utils import QfcOrderingFilter
-from qfieldcloud.core.models import Delta, FaultyDeltaFile
+from qfieldcloud.core.filters import DeltaFilterBackend, DeltaFilterSet
+from qfieldcloud.core.models import (
+    ArchivedDelta,
+    Delta,
+    FaultyDeltaFile,
+    OrganizationActivity,
+)
 from qfieldcloud.core.serializers import DeltaSerializer
 from qfieldcloud.core.utils2 import jobs
+from qfieldcloud.core.utils2.delta_archive import (
+    get_delta_features_with_archived,
+    get_deltas_with_archived,
+)
+from qfieldcloud.core.utils2.delta_utils import (
+    DeltafileReader,
+    iter_geojson_feature_collection,
+)
 from qfieldcloud.project.models import Project, get_slim_project_or_raise
 from rest_framework import generics, permissions, views
 from rest_framework.response import Response
@@ -42,8 +58,72 @@ class DeltaFilePermissions(permissions.BasePermission):
         return False
 
 
+# NOTE the filters are documented by `DeltaFilterBackend`
+DELTAS_LIST_PARAMETERS = [
+    OpenApiParameter(
+        name="output_format",
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        required=False,
+        enum=["geojson"],
+        description="Stream all the matching deltas as a GeoJSON feature collection instead of a page of deltas.",
+    ),
+]
+
+
+class DeltaListMixin:
+    """Lists the deltas, including the archived ones, with the `DeltaFilterSet` filters.
+
+    The deltas are paginated by offset by default, or by cursor if the `cursor` parameter is provided.
+    With `output_format=geojson`, all the matching deltas are streamed as a GeoJSON feature collection.
+    """
+
+    filterset_class = DeltaFilterSet
+    keyset_pagination_class = pagination.QfcKeysetPagination()
+
+    def get_delta_filters(self) -> dict[str, Any]:
+        """Returns the lookups of the deltas to list, before the request filters are applied."""
+        raise NotImplementedError
+
+    @property
+    def paginator(self):
+        if "cursor" in self.request.query_params:
+            if not hasattr(self, "_paginator"):
+                self._paginator = self.keyset_pagination_class()
+
+            return self._paginator
+
+        return super().paginator
+
+    def get_queryset(self):
+        filter_queryset = DeltaFilterBackend().get_filter_queryset(self.request, self)
+
+        return get_deltas_with_archived(filter_queryset, **self.get_delta_filters())
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("output_format") != "geojson":
+            return super().list(request, *args, **kwargs)
+
+        filter_queryset = DeltaFilterBackend().get_filter_queryset(request, self)
+        features = (
+            get_delta_features_with_archived(
+                filter_queryset, **self.get_delta_filters()
+            )
+            .order_by("created_at", "id")
+            .iterator()
+        )
+
+        return StreamingHttpResponse(
+            iter_geojson_feature_collection(features),
+            content_type="application/geo+json",
+        )
+
+
 @extend_schema_view(
-    get=extend_schema(description="Get all deltas of the given project."),
+    get=extend_schema(
+        description="Get all deltas of the given project.",
+        parameters=DELTAS_LIST_PARAMETERS,
+    ),
     post=extend_schema(
         description="Add a deltafile to the given project",
         parameters=[
@@ -61,11 +141,11 @@ class DeltaFilePermissions(permissions.BasePermission):
         },
     ),
 )
-class ListCreateDeltasView(generics.ListCreateAPIView):
+class ListCreateDeltasView(DeltaListMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated, DeltaFilePermissions]
     serializer_class = DeltaSerializer
     pagination_class = pagination.QfcLimitOffsetPagination()
-    filter_backends = [QfcOrderingFilter]
+    filter_backends = [QfcOrderingFilter, DeltaFilterBackend]
     ordering_fields = ["created_at"]
 
     def post(self, request, projectid):
@@ -74,24 +154,21 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
         if "file" not in request.data:
             raise exceptions.EmptyContentError()
 
-        request_file = utils.strip_json_null_bytes(request.data["file"])
-        created_deltas = []
+        request_file = request.data["file"]
+        reader = None
+        has_created_deltas = False
 
         try:
-            deltafile_json = json.load(request_file)
-            utils.get_deltafile_schema_validator().validate(deltafile_json)
+            # First pass: validate the whole deltafile without keeping the deltas in memory.
+            reader = DeltafileReader(request_file)
 
-            deltafile_id = deltafile_json["id"]
-            deltafile_projectid = deltafile_json["project"]
+            for idx, delta in enumerate(reader):
+                utils.validate_delta(delta, idx)
 
-            deltas = deltafile_json.get("deltas", [])
-            delta_ids = sorted([str(delta["uuid"]) for delta in deltas])
-            existing_delta_ids = [
-                str(v)
-                for v in Delta.objects.filter(id__in=delta_ids)
-                .order_by("id")
-                .values_list("id", flat=True)
-            ]
+            utils.get_deltafile_header_schema_validator().validate(reader.header)
+
+            deltafile_id = reader.header["id"]
+            deltafile_projectid = reader.header["project"]
 
             if not project_obj.has_the_qgis_file:
                 raise exceptions.NoQGISProjectError()
@@ -101,47 +178,32 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
                 exc.message = f"Deltafile's project id ({deltafile_projectid}) doesn't match URL parameter project id ({project_obj.id})."
                 raise exc
 
+            # Second pass: store the already validated deltas in bounded batches.
+            request_file.seek(0)
+
+            # The permissions and the owner account do not change within a request.
+            # Delta permissions depend only on the delta method, so check them once per method.
+            permitted_by_method: dict[str, bool] = {}
+            owner_can_create_job = project_obj.owner_can_create_job
+
             with transaction.atomic():
-                for delta in deltas:
-                    if delta["uuid"] in existing_delta_ids:
-                        logger.warning(f"Duplicate delta id: ${delta['uuid']}")
-                        continue
-
-                    delta_obj = Delta(
-                        id=delta["uuid"],
-                        deltafile_id=deltafile_id,
-                        project=project_obj,
-                        content=delta,
-                        client_id=delta["clientId"],
-                        created_by=self.request.user,
+                for deltas in itertools.batched(
+                    DeltafileReader(request_file),
+                    settings.QFIELDCLOUD_DELTAS_INGEST_BATCH_SIZE,
+                ):
+                    created_deltas = self.create_deltas(
+                        deltas,
+                        deltafile_id,
+                        project_obj,
+                        permitted_by_method,
+                        owner_can_create_job,
                     )
-
-                    if not permissions_utils.can_create_delta(
-                        self.request.user, delta_obj
-                    ):
-                        delta_obj.last_status = Delta.Status.UNPERMITTED
-                        delta_obj.last_feedback = {
-                            "msg": _(
-                                "User has no rights to create delta on this project. Try inviting him as a collaborator with proper permissions and try again."
-                            )
-                        }
-                    else:
-                        delta_obj.last_status = Delta.Status.PENDING
-
-                        if not delta_obj.project.owner_can_create_job:
-                            delta_obj.last_feedback = {
-                                "msg": _(
-                                    "Some features of this project are not supported by the owner's account. Deltas are created but kept pending. Either upgrade the account or ensure you're not using features such as remote layers, then try again."
-                                )
-                            }
-
-                    delta_obj.save(force_insert=True)
-                    created_deltas.append(delta_obj)
+                    has_created_deltas = has_created_deltas or bool(created_deltas)
 
         except Exception as err:
             if request_file:
                 self.preserve_faulty_deltafile(
-                    request_file, project_obj, self.request, err
+                    request_file, project_obj, self.request, err, reader
                 )
 
             logger.exception(err)
@@ -153,7 +215,7 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
             else:
                 raise exceptions.QFieldCloudException() from err
 
-        if created_deltas and not jobs.apply_deltas(
+        if has_created_deltas and not jobs.apply_deltas(
             project_obj,
             self.request.user,
             project_obj.the_qgis_file_name,
@@ -163,21 +225,96 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
 
         return Response()
 
+    def create_deltas(
+        self,
+        deltas: Iterable[dict[str, Any]],
+        deltafile_id: str,
+        project: Project,
+        permitted_by_method: dict[str, bool],
+        owner_can_create_job: bool,
+    ) -> list[Delta]:
+        """Stores a batch of already validated deltas with a single query, skipping the already existing ones."""
+        delta_ids = [delta["uuid"] for delta in deltas]
+        existing_delta_ids = {
+            str(v)
+            for v in Delta.objects.filter(id__in=delta_ids)
+            .values_list("id", flat=True)
+            .union(
+                ArchivedDelta.objects.filter(id__in=delta_ids).values_list(
+                    "id", flat=True
+                )
+            )
+        }
+
+        delta_objs = []
+        for delta in deltas:
+            if delta["uuid"] in existing_delta_ids:
+                logger.warning(f"Duplicate delta id: ${delta['uuid']}")
+                continue
+
+            delta_obj = Delta(
+                id=delta["uuid"],
+                deltafile_id=deltafile_id,
+                project=project,
+                content=delta,
+                client_id=delta["clientId"],
+                created_by=self.request.user,
+            )
+
+            if delta_obj.method not in permitted_by_method:
+                permitted_by_method[delta_obj.method] = (
+                    permissions_utils.can_create_delta(self.request.user, delta_obj)
+                )
+
+            if not permitted_by_method[delta_obj.method]:
+                delta_obj.last_status = Delta.Status.UNPERMITTED
+                delta_obj.last_feedback = {
+                    "msg": _(
+                        "User has no rights to create delta on this project. Try inviting him as a collaborator with proper permissions and try again."
+                    )
+                }
+            else:
+                delta_obj.last_status = Delta.Status.PENDING
+
+                if not owner_can_create_job:
+                    delta_obj.last_feedback = {
+                        "msg": _(
+                            "Some features of this project are not supported by the owner's account. Deltas are created but kept pending. Either upgrade the account or ensure you're not using features such as remote layers, then try again."
+                        )
+                    }
+
+            delta_objs.append(delta_obj)
+
+        created_deltas = Delta.objects.bulk_create(delta_objs)
+
+        # NOTE `bulk_create` skips `Delta.save()`, so the activity is recorded here
+        if created_deltas:
+            OrganizationActivity.objects.record(
+                project, [self.request.user.pk], created_deltas[0].created_at
+            )
+
+        return created_deltas
+
     def preserve_faulty_deltafile(
-        self, request_file: IO, project: Project, request: HttpRequest, err: Exception
+        self,
+        request_file: IO,
+        project: Project,
+        request: HttpRequest,
+        err: Exception,
+        reader: DeltafileReader | None = None,
     ) -> FaultyDeltaFile:
         """Preserve a faulty deltafile for later inspection."""
-        # File contents might already have been partially read by JSON parser.
-        # Rewind to avoid uploading an empty file.
-        request_file.seek(0)
-        deltafile_data = request_file.read()
-
         # Be defensive about figuring out the deltafile id - we might not
-        # even have a valid JSON file.
-        try:
-            deltafile_json = json.loads(deltafile_data)
-            deltafile_id = deltafile_json.get("id")
-        except json.JSONDecodeError:
+        # even have a valid JSON file. The id might come after the deltas
+        # that failed the validation, so try to read the rest of the header.
+        deltafile_id = None
+        if reader is not None:
+            try:
+                deltafile_id = reader.consume().get("id")
+            except ValueError:
+                deltafile_id = reader.header.get("id")
+
+        if not isinstance(deltafile_id, str):
             deltafile_id = None
 
         if deltafile_id:
@@ -187,8 +324,13 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
 
         user_agent = request.headers.get("user-agent")
 
+        # File contents might already have been partially read by JSON parser.
+        # Rewind to avoid uploading an empty file.
+        request_file.seek(0)
+
         faulty_deltafile = FaultyDeltaFile.objects.create(
-            deltafile=ContentFile(deltafile_data, filename),
+            # stream the original upload to the storage instead of reading it in memory
+            deltafile=File(request_file, filename),
             project=project,
             user_agent=user_agent,
             traceback="".join(format_exception(err)),
@@ -202,30 +344,34 @@ class ListCreateDeltasView(generics.ListCreateAPIView):
     def get_view_name(self):
         return _("Delta List")
 
-    def get_queryset(self):
+    def get_delta_filters(self) -> dict[str, Any]:
         project_id = self.request.parser_context["kwargs"]["projectid"]
         project_obj = Project.objects.get(id=project_id)
 
-        return Delta.objects.prefetch_related("created_by").filter(project=project_obj)
+        return {"project": project_obj}
 
 
 @extend_schema_view(
-    get=extend_schema(description="List deltas of the given deltafile.")
+    get=extend_schema(
+        description="List deltas of the given deltafile.",
+        parameters=DELTAS_LIST_PARAMETERS,
+    )
 )
-class ListDeltasByDeltafileView(generics.ListAPIView):
+class ListDeltasByDeltafileView(DeltaListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated, DeltaFilePermissions]
     serializer_class = DeltaSerializer
     pagination_class = pagination.QfcLimitOffsetPagination()
+    filter_backends = [DeltaFilterBackend]
 
-    def get_queryset(self):
+    def get_delta_filters(self) -> dict[str, Any]:
         project_id = self.request.parser_context["kwargs"]["projectid"]
         project_obj = Project.objects.get(id=project_id)
         deltafile_id = self.request.parser_context["kwargs"]["deltafileid"]
 
-        return Delta.objects.prefetch_related("created_by").filter(
-            project=project_obj,
-            deltafile_id=deltafile_id,
-        )
+        return {
+            "project": project_obj,
+            "deltafile_id": deltafile_id,
+        }
 
 
 @extend_schema(
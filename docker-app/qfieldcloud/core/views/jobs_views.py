@@ -153,11 +153,11 @@ class JobViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data, status=HTTP_201_CREATED)
 
     def get_queryset(self):
-        qs = Job.objects.select_subclasses()
-
         if self.action == "list":
             project_id = self.request.GET.get("project_id")
             project = generics.get_object_or_404(Project, pk=project_id)
-            qs = qs.filter(project=project)
 
-        return qs
+            # the list is serialized by `JobSerializer`, which needs neither the subclasses nor the heavy columns
+            return Job.objects.for_list().filter(project=project)
+
+        return Job.objects.select_subclasses()
@@ -0,0 +1,26 @@
+import hmac
+
+from django.conf import settings
+from django.http.request import HttpRequest
+from django.http.response import Http404, HttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from qfieldcloud.core.utils2 import metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@never_cache
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus metrics, only available with the `QFIELDCLOUD_METRICS_TOKEN` bearer token."""
+    if not settings.QFIELDCLOUD_METRICS_TOKEN:
+        raise Http404()
+
+    expected_authorization = f"Bearer {settings.QFIELDCLOUD_METRICS_TOKEN}"
+    authorization = request.headers.get("Authorization", "")
+
+    if not hmac.compare_digest(authorization.encode(), expected_authorization.encode()):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+
+    return HttpResponse(metrics.render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
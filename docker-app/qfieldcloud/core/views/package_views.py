@@ -1,8 +1,10 @@
 import logging
 from uuid import UUID
 
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
@@ -14,11 +16,11 @@ from qfieldcloud.core import exceptions
 from qfieldcloud.core import permissions_utils as perms
 from qfieldcloud.core.models import PackageJob
 from qfieldcloud.core.serializers import LatestPackageSerializer
-from qfieldcloud.core.utils2 import storage
+from qfieldcloud.core.utils2 import packages, storage
 from qfieldcloud.filestorage.models import (
     File,
 )
-from qfieldcloud.filestorage.serializers import FileSerializer
+from qfieldcloud.filestorage.utils import get_range
 from qfieldcloud.filestorage.view_helpers import (
     download_project_file_version,
     upload_project_file_version,
@@ -64,8 +66,8 @@ class PackageUploadViewPermissions(permissions.BasePermission):
 
 @extend_schema_view(
     get=extend_schema(
-        description="Get all the files in a project package with files.",
-        responses={200: LatestPackageSerializer()},
+        description="Get all the files in a project package with files. Supports conditional requests with the `If-None-Match` header.",
+        responses={200: LatestPackageSerializer(), 304: None},
     ),
 )
 class LatestPackageView(views.APIView):
@@ -86,60 +88,16 @@ class LatestPackageView(views.APIView):
                 "Packaging has never been triggered or successful for this project."
             )
 
-        files_qs = File.objects.filter(
-            project_id=project_id,
-            package_job=latest_finished_package_job,
-            file_type=File.FileType.PACKAGE_FILE,
-        )
-
-        # get attachment files directly from the original project files, not from the package
-        qgis_project = getattr(project, "qgis_project", None)
+        etag = packages.get_latest_package_etag(project, latest_finished_package_job)
 
-        if qgis_project:
-            for attachment_dir in qgis_project.attachment_dirs:
-                files_qs |= File.objects.filter(
-                    project_id=project_id,
-                    file_type=File.FileType.PROJECT_FILE,
-                    name__startswith=attachment_dir,
-                )
+        # the client already has the latest package data
+        if not_modified_response := get_conditional_response(request, etag=etag):
+            not_modified_response["ETag"] = etag
+            return not_modified_response
 
-        files_qs = files_qs.distinct()
+        data = packages.get_latest_package_data(project, latest_finished_package_job)
 
-        file_serializer = FileSerializer(files_qs, many=True)
-
-        if not file_serializer.data:
-            raise exceptions.InvalidJobError("Empty project package.")
-
-        assert latest_finished_package_job.feedback
-
-        feedback_version = latest_finished_package_job.feedback.get("feedback_version")
-        # version 2 and 3 have the same format
-        if feedback_version in ["2.0", "3.0"]:
-            layers = latest_finished_package_job.feedback["outputs"][
-                "qgis_layers_data"
-            ]["layers_by_id"]
-        # support some ancient QFieldCloud job data
-        elif feedback_version is None:
-            steps = latest_finished_package_job.feedback.get("steps", [])
-
-            layers = None
-            if len(steps) > 2 and steps[1].get("stage", 1) == 2:
-                layers = steps[1]["outputs"]["layer_checks"]
-
-        # be paranoid and raise for newer versions
-        else:
-            raise NotImplementedError()
-
-        return Response(
-            {
-                "files": file_serializer.data,
-                "layers": layers,
-                "status": latest_finished_package_job.status,
-                "package_id": latest_finished_package_job.pk,
-                "packaged_at": latest_finished_package_job.project.data_last_packaged_at,
-                "data_last_updated_at": latest_finished_package_job.project.data_last_updated_at,
-            }
-        )
+        return Response(data, headers={"ETag": etag})
 
 
 @extend_schema_view(
@@ -189,6 +147,106 @@ class LatestPackageDownloadFilesView(views.APIView):
         )
 
 
+@extend_schema_view(
+    get=extend_schema(
+        description="Download the whole project package, or only the requested files, as a single uncompressed tar archive. Interrupted downloads can be resumed with the `Range` and `If-Range` headers.",
+        parameters=[
+            OpenApiParameter(
+                name="files",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                many=True,
+                description="Filenames of the package files to be archived. Defaults to all package files.",
+            )
+        ],
+        responses={
+            (200, "application/x-tar"): OpenApiTypes.BINARY,
+            (206, "application/x-tar"): OpenApiTypes.BINARY,
+        },
+    ),
+)
+class LatestPackageArchiveView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, PackageViewPermissions]
+
+    def get(self, request: Request, project_id: UUID) -> StreamingHttpResponse:
+        """Stream the package files as a tar archive.
+
+        Raises:
+            exceptions.InvalidJobError: raised when packaging has never been triggered or successful for this project
+            exceptions.ObjectNotFoundError: raised when some of the requested files are not in the package
+        """
+        project = get_object_or_404(
+            Project.objects.select_related("qgis_project"), id=project_id
+        )
+        latest_finished_package_job = project.latest_finished_package_job_for_user(
+            request.user
+        )
+
+        # Check if the project was packaged at least once
+        if not latest_finished_package_job:
+            raise exceptions.InvalidJobError(
+                "Packaging has never been triggered or successful for this project."
+            )
+
+        files_qs = (
+            packages.get_package_files(project, latest_finished_package_job)
+            .select_related("latest_version")
+            .order_by("name")
+        )
+
+        filenames = request.GET.getlist("files")
+
+        if filenames:
+            files_qs = files_qs.filter(name__in=filenames)
+
+        files = list(files_qs)
+
+        if filenames and len(files) != len(set(filenames)):
+            missing_filenames = set(filenames) - {file.name for file in files}
+
+            raise exceptions.ObjectNotFoundError(
+                f"Files not found in the package: {sorted(missing_filenames)}"
+            )
+
+        if not files:
+            raise exceptions.InvalidJobError("Empty project package.")
+
+        archive = packages.PackageTarArchive(
+            (file.name, file.latest_version) for file in files
+        )
+
+        # resume the download only if the archive is still the same, otherwise send the whole new archive
+        byte_range = None
+        if request.headers.get("If-Range", archive.etag) == archive.etag:
+            byte_range = get_range(request, archive.size)
+
+        if byte_range:
+            response = StreamingHttpResponse(
+                archive.iter_range(byte_range.start, byte_range.end),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type="application/x-tar",
+            )
+            response["Content-Range"] = (
+                f"bytes {byte_range.start}-{byte_range.end}/{byte_range.total_size}"
+            )
+            response["Content-Length"] = str(byte_range.length)
+        else:
+            response = StreamingHttpResponse(
+                archive.iter_range(0, archive.size - 1),
+                content_type="application/x-tar",
+            )
+            response["Content-Length"] = str(archive.size)
+
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = archive.etag
+        response["Content-Disposition"] = (
+            f'attachment;filename="{latest_finished_package_job.id}.tar"'
+        )
+
+        return response
+
+
 @extend_schema_view(
     post=extend_schema(
         description="Upload a file to the package",
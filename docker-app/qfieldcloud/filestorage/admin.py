@@ -90,7 +90,10 @@ class FileVersionAdmin(QFieldCloudModelAdmin):
 
     @admin.display(description="MD5 HEX Checksum")
     def md5sum_hex(self, obj: FileVersion) -> str | None:
-        return obj.md5sum.hex()
+        if obj.md5sum is None:
+            return None
+
+        return bytes(obj.md5sum).hex()
 
 
 qfc_admin_site.register(File, FileAdmin)
@@ -1,17 +1,35 @@
 import base64
+import io
 import mimetypes
-import os
+import threading
 from abc import ABC
-from typing import Any
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any, NamedTuple
 
 import requests
 from django.core.exceptions import ImproperlyConfigured
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import Storage
 from django.http import HttpResponse
 from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
 
-from qfieldcloud.filestorage.constants import VERSION_SUFFIX_REGEX
+from qfieldcloud.filestorage.constants import (
+    VERSION_SUFFIX_REGEX,
+    WEBDAV_DEFAULT_POOL_CONNECTIONS,
+    WEBDAV_DEFAULT_POOL_MAXSIZE,
+    WEBDAV_READ_BUFFER_SIZE,
+)
+from qfieldcloud.filestorage.utils import parse_content_range_header
+
+
+class StorageObject(NamedTuple):
+    """An object as listed from the storage."""
+
+    name: str
+    size: int
+    last_modified: datetime
 
 
 class QfcBackendStorageMixin(ABC):
@@ -34,6 +52,50 @@ class QfcBackendStorageMixin(ABC):
         """
         pass
 
+    def iter_range(
+        self, name: str, start: int, end: int, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """Streams a byte range of a file, without reading the rest of the file.
+
+        Arguments:
+            name: relative path of the file on the storage.
+            start: the first byte of the range.
+            end: the last byte of the range, inclusive.
+            chunk_size: the maximum size of the yielded chunks.
+
+        Returns:
+            iterator of the range contents.
+        """
+        raise NotImplementedError(
+            "Subclassing QFC specific storages must implement this method."
+        )
+
+    def iter_objects(self, prefix: str = "") -> Iterator[StorageObject]:
+        """Lists the objects on the storage, sorted by name in UTF-8 binary order.
+
+        Arguments:
+            prefix: only list the objects with names starting with this prefix.
+
+        Returns:
+            iterator of the listed objects.
+        """
+        raise NotImplementedError(
+            "Subclassing QFC specific storages must implement this method."
+        )
+
+    def delete_many(self, names: list[str]) -> list[str]:
+        """Deletes multiple files at once.
+
+        Arguments:
+            names: relative paths of the files on the storage.
+
+        Returns:
+            the names of the files that failed to be deleted.
+        """
+        raise NotImplementedError(
+            "Subclassing QFC specific storages must implement this method."
+        )
+
 
 class QfcS3Boto3Storage(QfcBackendStorageMixin, S3Storage):
     def check_status(self) -> bool:
@@ -90,6 +152,339 @@ class QfcS3Boto3Storage(QfcBackendStorageMixin, S3Storage):
 
         return params
 
+    def iter_range(
+        self, name: str, start: int, end: int, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """Streams a byte range of an object using a ranged GET request.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            start: the first byte of the range.
+            end: the last byte of the range, inclusive.
+            chunk_size: the maximum size of the yielded chunks.
+
+        Returns:
+            iterator of the range contents.
+        """
+        response = self.bucket.meta.client.get_object(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+            Range=f"bytes={start}-{end}",
+        )
+
+        with response["Body"] as body:
+            yield from body.iter_chunks(chunk_size)
+
+    def create_multipart_upload(self, name: str) -> str:
+        """Starts a multipart upload of a new object.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+
+        Returns:
+            the multipart upload id, required to upload the parts and complete the upload.
+        """
+        key = self._normalize_name(clean_name(name))
+        params = self._get_write_parameters(key)
+
+        response = self.bucket.meta.client.create_multipart_upload(
+            Bucket=self.bucket.name,
+            Key=key,
+            **params,
+        )
+
+        return response["UploadId"]
+
+    def upload_part(
+        self, name: str, upload_id: str, part_number: int, data: bytes
+    ) -> str:
+        """Uploads a single part of a multipart upload.
+
+        Uploading a part with an already uploaded `part_number` overwrites the previous part.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            upload_id: the multipart upload id.
+            part_number: the part number, starting from 1.
+            data: the part contents.
+
+        Returns:
+            the ETag of the uploaded part, as returned from the Object Storage.
+        """
+        response = self.bucket.meta.client.upload_part(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+
+        return response["ETag"]
+
+    def complete_multipart_upload(
+        self, name: str, upload_id: str, part_etags: list[str]
+    ) -> None:
+        """Completes a multipart upload, the object becomes available in the bucket.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            upload_id: the multipart upload id.
+            part_etags: the ETags of the uploaded parts, in the part order.
+        """
+        self.bucket.meta.client.complete_multipart_upload(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": etag, "PartNumber": part_number}
+                    for part_number, etag in enumerate(part_etags, start=1)
+                ]
+            },
+        )
+
+    def get_upload_part_url(
+        self, name: str, upload_id: str, part_number: int, expire: int
+    ) -> str:
+        """Returns a presigned URL to upload a single part of a multipart upload directly to the Object Storage.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            upload_id: the multipart upload id.
+            part_number: the part number, starting from 1.
+            expire: number of seconds the URL is valid for.
+
+        Returns:
+            the presigned URL, to be used with HTTP PUT.
+        """
+        return self.bucket.meta.client.generate_presigned_url(
+            "upload_part",
+            Params={
+                "Bucket": self.bucket.name,
+                "Key": self._normalize_name(clean_name(name)),
+                "UploadId": upload_id,
+                "PartNumber": part_number,
+            },
+            ExpiresIn=expire,
+            HttpMethod="PUT",
+        )
+
+    def list_uploaded_parts(self, name: str, upload_id: str) -> list[dict[str, Any]]:
+        """Lists the already uploaded parts of a multipart upload.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            upload_id: the multipart upload id.
+
+        Returns:
+            the uploaded parts ordered by part number, each with `PartNumber`, `ETag` and `Size` keys.
+        """
+        paginator = self.bucket.meta.client.get_paginator("list_parts")
+        parts = []
+
+        for page in paginator.paginate(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+            UploadId=upload_id,
+        ):
+            parts.extend(page.get("Parts", []))
+
+        return sorted(parts, key=lambda part: part["PartNumber"])
+
+    def get_etag(self, name: str) -> str:
+        """Returns the ETag of an object, as calculated by the Object Storage.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+
+        Returns:
+            the ETag without the surrounding quotes.
+        """
+        response = self.bucket.meta.client.head_object(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+        )
+
+        return response["ETag"].strip('"')
+
+    def abort_multipart_upload(self, name: str, upload_id: str) -> None:
+        """Aborts a multipart upload and frees the storage used by the already uploaded parts.
+
+        Arguments:
+            name: relative path of the object in the bucket.
+            upload_id: the multipart upload id.
+        """
+        self.bucket.meta.client.abort_multipart_upload(
+            Bucket=self.bucket.name,
+            Key=self._normalize_name(clean_name(name)),
+            UploadId=upload_id,
+        )
+
+    def iter_objects(self, prefix: str = "") -> Iterator[StorageObject]:
+        """Lists the objects in the bucket, sorted by key in UTF-8 binary order, as S3 lists them.
+
+        Arguments:
+            prefix: only list the objects with names starting with this prefix.
+
+        Returns:
+            iterator of the listed objects, with names relative to the storage location.
+        """
+        location = f"{self.location}/" if self.location else ""
+        paginator = self.bucket.meta.client.get_paginator("list_objects_v2")
+
+        for page in paginator.paginate(
+            Bucket=self.bucket.name,
+            Prefix=location + clean_name(prefix) if prefix else location,
+        ):
+            for obj in page.get("Contents", []):
+                yield StorageObject(
+                    name=obj["Key"][len(location) :],
+                    size=obj["Size"],
+                    last_modified=obj["LastModified"],
+                )
+
+    def delete_many(self, names: list[str]) -> list[str]:
+        """Deletes up to 1000 objects with a single request.
+
+        Arguments:
+            names: relative paths of the objects in the bucket.
+
+        Returns:
+            the names of the objects that failed to be deleted.
+        """
+        if not names:
+            return []
+
+        keys = {self._normalize_name(clean_name(name)): name for name in names}
+        response = self.bucket.meta.client.delete_objects(
+            Bucket=self.bucket.name,
+            Delete={
+                "Objects": [{"Key": key} for key in keys],
+                "Quiet": True,
+            },
+        )
+
+        return [keys[error["Key"]] for error in response.get("Errors", [])]
+
+
+class WebDavRawIO(io.RawIOBase):
+    """Read-only file-like object over a file on a webdav server.
+
+    The file contents are fetched lazily with a streamed GET request, starting from the current position.
+    Seeking closes the current response and the next read issues a new ranged GET request from the new position.
+    Wrap it in `io.BufferedReader` to get efficient small reads.
+    """
+
+    def __init__(self, storage: "QfcWebDavStorage", name: str) -> None:
+        super().__init__()
+
+        self.storage = storage
+        self.name = name
+        self._position = 0
+        self._size: int | None = None
+        self._response: requests.Response | None = None
+        self._stream: Any = None
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = self.storage.size(self.name)
+
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence value: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position: {position}")
+
+        if position != self._position:
+            self._close_response()
+            self._position = position
+
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        if self._size is not None and self._position >= self._size:
+            return 0
+
+        if self._stream is None:
+            self._open_response()
+
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self._position += len(data)
+
+        return len(data)
+
+    def close(self) -> None:
+        self._close_response()
+        super().close()
+
+    def _open_response(self) -> None:
+        headers = {}
+        if self._position:
+            headers["Range"] = f"bytes={self._position}-"
+
+        try:
+            response = self.storage.perform_webdav_request(
+                "GET", self.name, headers=headers, stream=True
+            )
+        except requests.HTTPError as err:
+            # reading past the end of the file
+            if err.response is not None and err.response.status_code == 416:
+                self._size = self._position
+                self._stream = io.BytesIO()
+                return
+
+            raise
+
+        self._response = response
+        self._stream = response.raw
+        self._stream.decode_content = True
+
+        if response.status_code == 206:
+            content_range = parse_content_range_header(
+                response.headers.get("content-range", "")
+            )
+            if content_range:
+                self._size = content_range[2]
+        else:
+            # the webdav server might ignore the `Range` header and return the whole file
+            if "content-length" in response.headers:
+                self._size = int(response.headers["content-length"])
+
+            skip = self._position
+            while skip > 0:
+                skipped = len(self._stream.read(min(skip, 64 * 1024)))
+                if not skipped:
+                    break
+
+                skip -= skipped
+
+    def _close_response(self) -> None:
+        if self._response is not None:
+            self._response.close()
+
+        self._response = None
+        self._stream = None
+
 
 class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
     """
@@ -101,6 +496,10 @@ class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
     def __init__(self, **options):
         self.requests = self.get_requests_session(**options)
 
+        # collections known to exist on the webdav server, shared by all threads of the process
+        self._known_collections: set[str] = set()
+        self._known_collections_lock = threading.Lock()
+
         self.webdav_url = options.get("webdav_url")
         if not self.webdav_url:
             raise ImproperlyConfigured("Please define the `webdav_url` storage option")
@@ -129,8 +528,21 @@ class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
     def get_requests_session(self, **kwargs) -> requests.Session:
         """
         Creates a HTTP session for requesting webdav later.
+
+        The connection pool of the session can be tuned with the optional `pool_connections`, `pool_maxsize` and `max_retries` storage options.
         """
-        return requests.Session()
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=int(
+                kwargs.get("pool_connections", WEBDAV_DEFAULT_POOL_CONNECTIONS)
+            ),
+            pool_maxsize=int(kwargs.get("pool_maxsize", WEBDAV_DEFAULT_POOL_MAXSIZE)),
+            max_retries=int(kwargs.get("max_retries", 0)),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
 
     def perform_webdav_request(
         self, method: str, name: str, *args, **kwargs
@@ -174,18 +586,68 @@ class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
         """
         return self.public_url.rstrip("/") + "/" + name.lstrip("/")
 
-    def _open(self, name: str, mode: str = "rb") -> ContentFile:
-        """Reads the content of a file from the configured webdav storage.
+    def _open(self, name: str, mode: str = "rb") -> File:
+        """Opens a file from the configured webdav storage for reading.
+
+        The contents are streamed on demand, so the file is never loaded in memory as a whole.
 
         Arguments:
             name: relative path of the file on the webdav server.
             mode: opening mode (default: "rb").
 
         Returns:
-            Content of the requested file.
+            Seekable file-like object of the requested file.
+        """
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError(f"Unsupported mode for webdav files: {mode}")
+
+        raw = WebDavRawIO(self, name)
+        # fail early if the file does not exist, just like opening a local file
+        raw.seek(0, io.SEEK_END)
+        raw.seek(0)
+
+        return File(io.BufferedReader(raw, WEBDAV_READ_BUFFER_SIZE), name)
+
+    def iter_range(
+        self, name: str, start: int, end: int, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """Streams a byte range of a file from the configured webdav storage using a ranged GET request.
+
+        Arguments:
+            name: relative path of the file on the webdav server.
+            start: the first byte of the range.
+            end: the last byte of the range, inclusive.
+            chunk_size: the maximum size of the yielded chunks.
+
+        Returns:
+            iterator of the range contents.
         """
-        content = self.perform_webdav_request("GET", name).content
-        return ContentFile(content, name)
+        response = self.perform_webdav_request(
+            "GET",
+            name,
+            headers={"Range": f"bytes={start}-{end}"},
+            stream=True,
+        )
+
+        with response:
+            # the webdav server might ignore the `Range` header and return the whole file
+            skip = start if response.status_code == 200 else 0
+            remaining = end - start + 1
+
+            for chunk in response.iter_content(chunk_size):
+                if skip:
+                    skipped = min(skip, len(chunk))
+                    chunk = chunk[skipped:]
+                    skip -= skipped
+
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+
+                if chunk:
+                    yield chunk
+
+                if remaining == 0:
+                    break
 
     def _save(self, name: str, content: ContentFile) -> str:
         """Saves a file on the configured webdav storage.
@@ -199,6 +661,20 @@ class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
         """
         self.make_collection(name)
 
+        try:
+            self._put(name, content)
+        except requests.HTTPError as err:
+            # the parent collection was removed behind our back, forget it and try again
+            if err.response is None or err.response.status_code != 409:
+                raise
+
+            self.forget_collections(name)
+            self.make_collection(name)
+            self._put(name, content)
+
+        return name
+
+    def _put(self, name: str, content: ContentFile) -> None:
         if hasattr(content, "temporary_file_path"):
             with open(content.temporary_file_path(), "rb") as f:
                 self.perform_webdav_request(method="PUT", name=name, data=f)
@@ -206,26 +682,68 @@ class QfcWebDavStorage(QfcBackendStorageMixin, Storage):
             content.file.seek(0)
             self.perform_webdav_request(method="PUT", name=name, data=content.file)
 
-        return name
-
     def make_collection(self, name: str) -> None:
         """Creates a so-called collection on the configured webdav storage for a file.
         Typically creates parent folders if not existing.
 
+        Collections known to exist are remembered for the lifetime of the process, so saving many files in the same folder costs no extra requests.
+        Otherwise the deepest parent collection is checked first, and only the missing collections are created.
+
         Arguments:
             name: relative path of the file on the webdav server.
         """
-        coll_path = self.webdav_url
+        directories = [d for d in name.strip("/").split("/")[:-1] if d]
+        collections = [
+            "/".join(directories[: idx + 1]) for idx in range(len(directories))
+        ]
 
-        for directory in name.split("/")[:-1]:
-            col = os.path.join(coll_path, directory, "")
-            resp = self.requests.head(col)
+        if not collections or collections[-1] in self._known_collections:
+            return
 
-            if not resp.ok:
-                resp = self.requests.request("MKCOL", col)
+        resp = self.requests.head(self.get_collection_url(collections[-1]))
+        if resp.ok:
+            self._remember_collections(collections)
+            return
+
+        for collection in collections:
+            if collection in self._known_collections:
+                continue
+
+            resp = self.requests.request("MKCOL", self.get_collection_url(collection))
+
+            # 405 Method Not Allowed means the collection already exists
+            if resp.status_code != 405:
                 resp.raise_for_status()
 
-            coll_path = os.path.join(coll_path, directory)
+            self._remember_collections([collection])
+
+    def get_collection_url(self, collection: str) -> str:
+        """Returns the HTTP url for a webdav collection, always ending with a slash.
+
+        Arguments:
+            collection: relative path of the collection on the webdav server.
+
+        Returns:
+            HTTP url for the collection.
+        """
+        return self.get_webdav_url(collection).rstrip("/") + "/"
+
+    def forget_collections(self, name: str) -> None:
+        """Removes the parent collections of a file from the known collections cache.
+
+        Arguments:
+            name: relative path of the file on the webdav server.
+        """
+        with self._known_collections_lock:
+            self._known_collections.difference_update(
+                c
+                for c in list(self._known_collections)
+                if name.strip("/").startswith(c + "/")
+            )
+
+    def _remember_collections(self, collections: list[str]) -> None:
+        with self._known_collections_lock:
+            self._known_collections.update(collections)
 
     def delete(self, name: str) -> None:
         """Deletes a file from a configured webdav storage.
@@ -2,3 +2,18 @@ import re
 
 VERSION_SUFFIX_REGEX = re.compile(r"v20[0-9]{12}-[a-f0-9]{8}$")
 """A regex to ensure the format of the version suffix is correct."""
+
+OBJECT_STORAGE_PART_SIZE = 8 * 1024 * 1024
+"""The part size of multipart uploads to the Object Storage (S3). Most Object Storages use 8MB."""
+
+OBJECT_STORAGE_MAX_PARTS = 10000
+"""The maximum number of parts of a multipart upload to the Object Storage (S3)."""
+
+WEBDAV_DEFAULT_POOL_CONNECTIONS = 10
+"""Default number of connection pools (one per host) kept by the webdav requests session."""
+
+WEBDAV_DEFAULT_POOL_MAXSIZE = 10
+"""Default maximum number of connections kept alive per host by the webdav requests session."""
+
+WEBDAV_READ_BUFFER_SIZE = 256 * 1024
+"""Size of the read buffer of the files opened from the webdav storage."""
@@ -0,0 +1,85 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_cron import CronJobBase, Schedule
+
+from qfieldcloud.core.utils2.storage import calculate_checksums
+from qfieldcloud.filestorage.models import FileUploadSession, FileVersion
+from qfieldcloud.filestorage.view_helpers import abort_file_upload_session
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of file versions to calculate the checksums of in a single CRON run
+FILE_VERSION_CHECKSUMS_BATCH_SIZE = 100
+
+
+class AbortExpiredFileUploadSessionsJob(CronJobBase):
+    schedule = Schedule(run_every_mins=60)
+    code = "qfieldcloud.abort_expired_file_upload_sessions"
+
+    def do(self):
+        upload_sessions = FileUploadSession.objects.filter(
+            updated_at__lt=timezone.now()
+            - timedelta(
+                hours=settings.QFIELDCLOUD_FILE_UPLOAD_SESSION_EXPIRATION_HOURS
+            ),
+        )
+
+        aborted_count = 0
+        for upload_session in upload_sessions:
+            try:
+                abort_file_upload_session(upload_session)
+                aborted_count += 1
+            # Catch any exception the storage can raise, as we don't want the CRON to fail because of a single failed abort.
+            except Exception as err:  # noqa: BLE001
+                logger.error(
+                    f"Failed to abort the expired upload session {upload_session}: {err}"
+                )
+
+        logger.info(f"Aborted {aborted_count} expired file upload session(s).")
+
+
+class CalculateFileVersionChecksumsJob(CronJobBase):
+    """Calculates the MD5 and SHA256 sums of the file versions uploaded with a presigned upload session, see `finalize_file_upload_session`.
+
+    The file versions which checksums fail to be calculated are marked with `checksums_failed_at` and are not retried,
+    so they do not block the next file versions.
+    """
+
+    schedule = Schedule(run_every_mins=1)
+    code = "qfieldcloud.calculate_file_version_checksums"
+
+    def do(self):
+        file_versions = FileVersion.objects.filter(
+            sha256sum__isnull=True,
+            checksums_failed_at__isnull=True,
+        ).order_by("created_at")[:FILE_VERSION_CHECKSUMS_BATCH_SIZE]
+
+        calculated_count = 0
+        failed_count = 0
+        for file_version in file_versions:
+            try:
+                with file_version.content.open() as content:
+                    md5sum, sha256sum = calculate_checksums(content, ("md5", "sha256"))
+            # Catch any exception the storage can raise, as we don't want the CRON to fail because of a single missing object.
+            except Exception as err:  # noqa: BLE001
+                logger.error(
+                    f"Failed to calculate the checksums of file version {file_version}: {err}"
+                )
+                FileVersion.objects.filter(id=file_version.id).update(
+                    checksums_failed_at=timezone.now(),
+                )
+                failed_count += 1
+                continue
+
+            FileVersion.objects.filter(id=file_version.id).update(
+                md5sum=md5sum,
+                sha256sum=sha256sum,
+            )
+            calculated_count += 1
+
+        logger.info(
+            f"Calculated the checksums of {calculated_count} file version(s) and failed for {failed_count}."
+        )
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.17 on 2026-10-18 09:12
+
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+import qfieldcloud.core.validators
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("filestorage", "0009_alter_file_project"),
+        ("project", "0010_qgisproject_area_of_interest"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileUploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(editable=False, max_length=255)),
+                ("size", models.PositiveBigIntegerField(editable=False)),
+                (
+                    "file_storage",
+                    models.CharField(
+                        editable=False,
+                        max_length=100,
+                        validators=[
+                            qfieldcloud.core.validators.file_storage_name_validator
+                        ],
+                    ),
+                ),
+                ("content_name", models.CharField(editable=False, max_length=1024)),
+                ("multipart_upload_id", models.TextField(editable=False)),
+                (
+                    "version_id",
+                    models.UUIDField(default=uuid.uuid4, editable=False),
+                ),
+                ("parts", models.JSONField(default=list, editable=False)),
+                (
+                    "bytes_received",
+                    models.PositiveBigIntegerField(default=0, editable=False),
+                ),
+                (
+                    "uploaded_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="file_upload_sessions",
+                        to="project.project",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.17 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("filestorage", "0010_fileuploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="upload_method",
+            field=models.PositiveSmallIntegerField(
+                choices=[(1, "Chunked"), (2, "Presigned")],
+                default=1,
+                editable=False,
+            ),
+        ),
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="etag",
+            field=models.TextField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="md5sum",
+            field=models.BinaryField(editable=False, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="sha256sum",
+            field=models.BinaryField(editable=False, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.17 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("filestorage", "0011_fileuploadsession_upload_method_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fileversion",
+            name="md5sum",
+            field=models.BinaryField(editable=False, max_length=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name="fileversion",
+            name="sha256sum",
+            field=models.BinaryField(editable=False, max_length=32, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="fileversion",
+            index=models.Index(
+                condition=models.Q(("sha256sum__isnull", True)),
+                fields=["created_at"],
+                name="filestorage_fv_no_checksum_idx",
+            ),
+        ),
+    ]
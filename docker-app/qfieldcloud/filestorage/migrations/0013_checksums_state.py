@@ -0,0 +1,41 @@
+# Generated by Django 5.2.17 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("filestorage", "0012_alter_fileversion_checksums_null"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="md5_state",
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="fileuploadsession",
+            name="sha256_state",
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="fileversion",
+            name="checksums_failed_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RemoveIndex(
+            model_name="fileversion",
+            name="filestorage_fv_no_checksum_idx",
+        ),
+        migrations.AddIndex(
+            model_name="fileversion",
+            index=models.Index(
+                condition=models.Q(
+                    ("checksums_failed_at__isnull", True), ("sha256sum__isnull", True)
+                ),
+                fields=["created_at"],
+                name="filestorage_fv_no_checksum_idx",
+            ),
+        ),
+    ]
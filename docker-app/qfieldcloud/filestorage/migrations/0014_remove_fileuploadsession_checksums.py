@@ -0,0 +1,20 @@
+# Generated by Django 5.2.17 on 2026-10-19 11:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("filestorage", "0013_checksums_state"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="fileuploadsession",
+            name="md5sum",
+        ),
+        migrations.RemoveField(
+            model_name="fileuploadsession",
+            name="sha256sum",
+        ),
+    ]
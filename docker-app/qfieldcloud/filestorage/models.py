@@ -12,7 +12,7 @@ from django.core.validators import (
     ProhibitNullCharactersValidator,
 )
 from django.db import models, transaction
-from django.db.models import F, QuerySet, Sum
+from django.db.models import F, Q, QuerySet, Sum
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
@@ -173,13 +173,17 @@ class FileVersionQueryset(models.QuerySet):
         self,
         project: Project,
         filename: str,
-        content: ContentFile,
+        content: ContentFile | str,
         file_type: File.FileType,
         uploaded_by: User,
         uploaded_at: datetime | None = None,
         created_at: datetime | None = None,
         version_id: UUID | None = None,
         package_job_id: UUID | None = None,
+        etag: str | None = None,
+        md5sum: bytes | None = None,
+        sha256sum: bytes | None = None,
+        size: int | None = None,
     ) -> FileVersion:
         """Adds a new file version with specific filename.
 
@@ -187,6 +191,10 @@ class FileVersionQueryset(models.QuerySet):
 
         This method runs in a transaction. It creates/updates a `File` object and creates a new `FileVersion` object.
 
+        The `content` might be the name of an object that is already stored on the file storage, e.g. after a multipart upload.
+        Then the content is not read again, and the `etag` and `size` must be passed.
+        The `md5sum` and `sha256sum` might be left `None`, then they are calculated later by `CalculateFileVersionChecksumsJob`.
+
         Args:
             project: the project the file belongs to
             filename: the filename
@@ -197,6 +205,10 @@ class FileVersionQueryset(models.QuerySet):
             created_at: the timestamp when the file has been created. When `None`, the value is set to the current timestamp. Defaults to None.
             version_id: The uuid to be used assigned to that version. When `None`, the value is a new random UUID4. Defaults to None.
             package_job_id: The package job the file belongs to. Defaults to None.
+            etag: the precalculated ETag of an already stored `content`. Defaults to None.
+            md5sum: the precalculated MD5 sum of an already stored `content`. Defaults to None.
+            sha256sum: the precalculated SHA256 sum of an already stored `content`. Defaults to None.
+            size: the size in bytes of an already stored `content`. Defaults to None.
 
         Returns:
             the file version that has been created
@@ -212,12 +224,7 @@ class FileVersionQueryset(models.QuerySet):
         if not version_id:
             version_id = uuid4()
 
-        # if the new file is an attachment (i.e. in an attachment dir),
-        # it should be stored on the project's configured attachments storage.
-        if storage.get_attachment_dir_prefix(project, filename) != "":
-            file_storage = project.attachments_file_storage
-        else:
-            file_storage = project.file_storage
+        file_storage = get_project_file_storage_name(project, filename)
 
         try:
             file = File.objects.get(
@@ -238,8 +245,15 @@ class FileVersionQueryset(models.QuerySet):
                 latest_version_id=version_id,
             )
 
-        md5sum, sha256sum = storage.calculate_checksums(content, ("md5", "sha256"))
-        etag = calc_etag(content)
+        if isinstance(content, str):
+            if etag is None or size is None:
+                raise ValueError(
+                    f"Adding the already stored {content=} requires `etag` and `size` to be passed!"
+                )
+        else:
+            md5sum, sha256sum = storage.calculate_checksums(content, ("md5", "sha256"))
+            etag = calc_etag(content)
+            size = content.size
 
         file_version = self.create(
             id=version_id,
@@ -249,7 +263,7 @@ class FileVersionQueryset(models.QuerySet):
             etag=etag,
             md5sum=md5sum,
             sha256sum=sha256sum,
-            size=content.size,
+            size=size,
             uploaded_by=uploaded_by,
             uploaded_at=uploaded_at,
             created_at=created_at,
@@ -263,6 +277,17 @@ class FileVersionQueryset(models.QuerySet):
         return file_version
 
 
+def get_project_file_storage_name(project: Project, filename: str) -> str:
+    """Returns the name of the file storage where a project file with the given filename is stored.
+
+    If the file is an attachment (i.e. in an attachment dir), it is stored on the project's configured attachments storage.
+    """
+    if storage.get_attachment_dir_prefix(project, filename) != "":
+        return project.attachments_file_storage
+    else:
+        return project.file_storage
+
+
 def get_file_version_upload_to(instance: "FileVersion", _filename: str) -> str:
     if instance.file.file_type == File.FileType.PROJECT_FILE:
         # if the project is configured to not version attachments, store them without version id.
@@ -294,6 +319,14 @@ def get_file_version_upload_to(instance: "FileVersion", _filename: str) -> str:
 class FileVersion(models.Model):
     class Meta:
         ordering = ("file", "-uploaded_at")
+        indexes = [
+            # the file versions which checksums are still to be calculated by `CalculateFileVersionChecksumsJob`
+            models.Index(
+                fields=["created_at"],
+                condition=Q(sha256sum__isnull=True, checksums_failed_at__isnull=True),
+                name="filestorage_fv_no_checksum_idx",
+            ),
+        ]
 
     objects = FileVersionQueryset.as_manager()
 
@@ -331,11 +364,14 @@ class FileVersion(models.Model):
     # MD5-like sum but calculated the same way as S3 calculates it on multistage upload.
     etag = models.TextField(max_length=255, editable=False)
 
-    # MD5 sum of the file.
-    md5sum = models.BinaryField(max_length=16, editable=False)
+    # MD5 sum of the file. NULL until calculated by `CalculateFileVersionChecksumsJob` for files uploaded with a presigned upload session.
+    md5sum = models.BinaryField(max_length=16, editable=False, null=True)
+
+    # SHA256 sum of the file. NULL until calculated by `CalculateFileVersionChecksumsJob` for files uploaded with a presigned upload session.
+    sha256sum = models.BinaryField(max_length=32, editable=False, null=True)
 
-    # SHA256 sum of the file.
-    sha256sum = models.BinaryField(max_length=32, editable=False)
+    # Timestamp when `CalculateFileVersionChecksumsJob` failed to calculate the checksums, e.g. the object is missing. The job does not retry such versions.
+    checksums_failed_at = models.DateTimeField(editable=False, null=True)
 
     # Size of the file in bytes.
     size = models.PositiveBigIntegerField(editable=False)
@@ -399,3 +435,104 @@ class FileVersion(models.Model):
 
     def __str__(self) -> str:
         return self.__repr__()
+
+
+class FileUploadSession(models.Model):
+    """A resumable upload of a project file, streamed in chunks to an Object Storage multipart upload.
+
+    The client creates a session, uploads the file contents in chunks and then finalizes the session,
+    which creates the new `FileVersion` from the already stored object.
+
+    With presigned uploads, the client uploads the parts directly to the Object Storage using presigned URLs,
+    so the file contents never pass through the application server.
+    """
+
+    class UploadMethod(models.IntegerChoices):
+        # the chunks are uploaded to the application server, which streams them to the Object Storage
+        CHUNKED = (1, _("Chunked"))
+
+        # the parts are uploaded directly to the Object Storage using presigned URLs
+        PRESIGNED = (2, _("Presigned"))
+
+    # The upload session primary key
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="file_upload_sessions",
+        editable=False,
+    )
+
+    # The filename of the project file being uploaded.
+    filename = models.CharField(
+        max_length=settings.STORAGE_FILENAME_MAX_CHAR_LENGTH,
+        editable=False,
+    )
+
+    # The total size of the file in bytes, as declared by the client when the session was created.
+    size = models.PositiveBigIntegerField(editable=False)
+
+    # The file storage provider where the multipart upload is stored, must be available in `settings.STORAGES`.
+    file_storage = models.CharField(
+        max_length=100,
+        validators=[validators.file_storage_name_validator],
+        editable=False,
+    )
+
+    # The name of the object on the file storage, which becomes the `FileVersion.content` once finalized.
+    content_name = models.CharField(max_length=1024, editable=False)
+
+    # The multipart upload id on the file storage.
+    multipart_upload_id = models.TextField(editable=False)
+
+    # The id of the `FileVersion` to be created once finalized.
+    version_id = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    # How the file contents are uploaded.
+    upload_method = models.PositiveSmallIntegerField(
+        choices=UploadMethod.choices,
+        default=UploadMethod.CHUNKED,
+        editable=False,
+    )
+
+    # The ETag of the file, as declared by the client of a presigned upload and verified against the Object Storage once finalized.
+    etag = models.TextField(max_length=255, editable=False, null=True)
+
+    # The parts uploaded so far, in order. Each part has the `etag` returned by the storage and the `md5sum` hex digest.
+    parts = models.JSONField(default=list, editable=False)
+
+    # The intermediate MD5 state of the chunks received so far, see `update_hash_state`.
+    md5_state = models.BinaryField(editable=False, null=True)
+
+    # The intermediate SHA256 state of the chunks received so far, see `update_hash_state`.
+    sha256_state = models.BinaryField(editable=False, null=True)
+
+    # Number of bytes received so far, always a multiple of the part size until the last part is received.
+    bytes_received = models.PositiveBigIntegerField(default=0, editable=False)
+
+    # Timestamp when the upload has been started, used as `FileVersion.uploaded_at` once finalized.
+    uploaded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    # User who uploads the file.
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        editable=False,
+    )
+
+    # Timestamp when the upload session has been created.
+    created_at = models.DateTimeField(editable=False, auto_now_add=True)
+
+    # Timestamp when the upload session has received the last chunk.
+    updated_at = models.DateTimeField(editable=False, auto_now=True)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.bytes_received == self.size
+
+    def __repr__(self) -> str:
+        return f"{self.project_id}/{self.filename} [upload_session={self.id}]"  # type: ignore
+
+    def __str__(self) -> str:
+        return self.__repr__()
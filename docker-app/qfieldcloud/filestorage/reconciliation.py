@@ -0,0 +1,201 @@
+import heapq
+import itertools
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from django.db.models import Model, QuerySet
+from django.db.models.functions import Collate
+
+from qfieldcloud.core.models import FaultyDeltaFile, Job, UserAccount
+from qfieldcloud.filestorage.backend import StorageObject
+from qfieldcloud.filestorage.models import FileUploadSession, FileVersion
+from qfieldcloud.project.models import Project, ProjectSeed
+
+
+class StorageReference(NamedTuple):
+    """A database row referencing an object on the storage."""
+
+    name: str
+    model_name: str
+    pk: str
+    # whether the object must exist, e.g. the objects of ongoing uploads do not exist yet
+    required: bool = True
+
+
+class ReconciliationResult(NamedTuple):
+    """An object on the storage without database references, or database references without object on the storage."""
+
+    name: str
+    obj: StorageObject | None
+    references: list[StorageReference]
+
+    @property
+    def is_orphan(self) -> bool:
+        return not self.references
+
+    @property
+    def is_missing(self) -> bool:
+        return self.obj is None and any(
+            reference.required for reference in self.references
+        )
+
+
+class UnsortedStreamError(Exception):
+    """Raised when the storage listing or the database references are not sorted as expected."""
+
+
+def get_reference_querysets(
+    storage_name: str, prefix: str = ""
+) -> list[tuple[QuerySet, str, bool]]:
+    """Returns the querysets of all rows referencing objects on the given storage.
+
+    Arguments:
+        storage_name: the name of the storage in `settings.STORAGES`.
+        prefix: only return the rows referencing objects with names starting with this prefix.
+
+    Returns:
+        list of querysets, the name of the field holding the object name and whether the object must exist.
+    """
+    querysets: list[tuple[QuerySet, str, bool]] = [
+        (FileVersion.objects.filter(file_storage=storage_name), "content", True),
+        (Project.objects.filter(file_storage=storage_name), "thumbnail", True),
+        (
+            FaultyDeltaFile.objects.filter(project__file_storage=storage_name),
+            "deltafile",
+            True,
+        ),
+        (
+            FileUploadSession.objects.filter(file_storage=storage_name),
+            "content_name",
+            False,
+        ),
+        (Job.objects.filter(project__file_storage=storage_name), "output_file", False),
+    ]
+
+    # these fields use the default Django storage
+    if storage_name == "default":
+        querysets += [
+            (UserAccount.objects.all(), "avatar", True),
+            (ProjectSeed.objects.all(), "xlsform_file", True),
+        ]
+
+    return [
+        (
+            queryset.filter(
+                **{f"{field_name}__isnull": False, f"{field_name}__startswith": prefix}
+            ).exclude(**{field_name: ""}),
+            field_name,
+            required,
+        )
+        for queryset, field_name, required in querysets
+    ]
+
+
+def iter_queryset_references(
+    queryset: QuerySet, field_name: str, required: bool, chunk_size: int = 2000
+) -> Iterator[StorageReference]:
+    """Streams the object names referenced by a queryset, sorted in UTF-8 binary order like the storage listing.
+
+    Arguments:
+        queryset: the queryset of the rows referencing objects.
+        field_name: the name of the field holding the object name.
+        required: whether the referenced objects must exist.
+        chunk_size: the number of rows fetched at once from the database cursor.
+
+    Returns:
+        iterator of the references, sorted by name.
+    """
+    model: type[Model] = queryset.model
+    model_name = model._meta.label
+
+    # the "C" collation compares the UTF-8 bytes, which is the order used by the object storage listing
+    rows = (
+        queryset.order_by(Collate(field_name, "C"), "pk")
+        .values_list(field_name, "pk")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for name, pk in rows:
+        yield StorageReference(
+            name=name, model_name=model_name, pk=str(pk), required=required
+        )
+
+
+def iter_storage_references(
+    storage_name: str, prefix: str = "", chunk_size: int = 2000
+) -> Iterator[StorageReference]:
+    """Streams all the database references to objects on the given storage, sorted by name.
+
+    Arguments:
+        storage_name: the name of the storage in `settings.STORAGES`.
+        prefix: only return the references to objects with names starting with this prefix.
+        chunk_size: the number of rows fetched at once from each database cursor.
+
+    Returns:
+        iterator of the references, sorted by name.
+    """
+    return heapq.merge(
+        *[
+            iter_queryset_references(queryset, field_name, required, chunk_size)
+            for queryset, field_name, required in get_reference_querysets(
+                storage_name, prefix
+            )
+        ],
+        key=lambda reference: reference.name,
+    )
+
+
+def _iter_sorted(
+    items: Iterable[StorageObject | StorageReference], stream_name: str
+) -> Iterator[StorageObject | StorageReference]:
+    previous_name = ""
+
+    for item in items:
+        if item.name < previous_name:
+            raise UnsortedStreamError(
+                f"The {stream_name} is not sorted: {item.name!r} after {previous_name!r}."
+            )
+
+        previous_name = item.name
+
+        yield item
+
+
+def iter_reconciliation(
+    objects: Iterable[StorageObject],
+    references: Iterable[StorageReference],
+) -> Iterator[ReconciliationResult]:
+    """Merge-joins the sorted storage listing with the sorted database references, keeping only one name in memory.
+
+    Arguments:
+        objects: the storage objects, sorted by name.
+        references: the database references, sorted by name.
+
+    Returns:
+        iterator of the orphan objects and the references to missing objects, sorted by name.
+        Names both on the storage and in the database are skipped.
+    """
+    objects_iter = _iter_sorted(objects, "storage listing")
+    references_iter = itertools.groupby(
+        _iter_sorted(references, "database references"),
+        key=lambda reference: reference.name,
+    )
+
+    obj = next(objects_iter, None)
+    reference_name, reference_group = next(references_iter, (None, None))
+
+    while obj is not None or reference_name is not None:
+        if reference_name is None or (obj is not None and obj.name < reference_name):
+            yield ReconciliationResult(obj.name, obj, [])  # type: ignore[union-attr]
+            obj = next(objects_iter, None)
+        elif obj is None or reference_name < obj.name:
+            result = ReconciliationResult(reference_name, None, list(reference_group))  # type: ignore[arg-type]
+
+            if result.is_missing:
+                yield result
+
+            reference_name, reference_group = next(references_iter, (None, None))
+        else:
+            # both sides have the name, nothing to reconcile
+            obj = next(objects_iter, None)
+            reference_name, reference_group = next(references_iter, (None, None))
@@ -3,12 +3,16 @@ from typing import cast
 
 import drf_spectacular
 from django.conf import settings
+from django.core.validators import RegexValidator
 from rest_framework import serializers
 
+from qfieldcloud.filestorage.constants import OBJECT_STORAGE_PART_SIZE
 from qfieldcloud.filestorage.models import (
     File,
+    FileUploadSession,
     FileVersion,
 )
+from qfieldcloud.filestorage.utils import get_presigned_upload_part_urls
 
 
 @drf_spectacular.utils.extend_schema_serializer(
@@ -31,8 +35,11 @@ class FileVersionSerializer(serializers.ModelSerializer):
     def get_md5sum(self, obj: FileVersion) -> str:
         return obj.etag
 
-    def get_sha256(self, obj: FileVersion) -> str:
-        return obj.sha256sum.hex()
+    def get_sha256(self, obj: FileVersion) -> str | None:
+        if obj.sha256sum is None:
+            return None
+
+        return bytes(obj.sha256sum).hex()
 
     def get_is_latest(self, obj: FileVersion) -> bool:
         return bool(obj.file.latest_version == obj)
@@ -83,8 +90,13 @@ class FileSerializer(serializers.ModelSerializer):
     def get_md5sum(self, obj: File) -> str:
         return cast(FileVersion, obj.latest_version).etag
 
-    def get_sha256(self, obj: File) -> str:
-        return cast(FileVersion, obj.latest_version).sha256sum.hex()
+    def get_sha256(self, obj: File) -> str | None:
+        sha256sum = cast(FileVersion, obj.latest_version).sha256sum
+
+        if sha256sum is None:
+            return None
+
+        return bytes(sha256sum).hex()
 
     def get_size(self, obj: File) -> int:
         return cast(FileVersion, obj.latest_version).size
@@ -118,3 +130,57 @@ class FileWithVersionsSerializer(FileSerializer):
     class Meta(FileSerializer.Meta):
         fields = [*FileSerializer.Meta.fields, "versions"]
         read_only_fields = [*FileSerializer.Meta.read_only_fields, "versions"]
+
+
+class FileUploadSessionSerializer(serializers.ModelSerializer):
+    # NOTE the model fields are not editable, but the filename and size are passed when creating the upload session
+    filename = serializers.CharField(
+        max_length=settings.STORAGE_FILENAME_MAX_CHAR_LENGTH
+    )
+    size = serializers.IntegerField(min_value=1)
+    part_size = serializers.SerializerMethodField()
+
+    def get_part_size(self, obj: FileUploadSession) -> int:
+        return OBJECT_STORAGE_PART_SIZE
+
+    class Meta:
+        model = FileUploadSession
+        fields = (
+            "id",
+            "filename",
+            "size",
+            "bytes_received",
+            "part_size",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = (
+            "id",
+            "bytes_received",
+            "part_size",
+            "created_at",
+            "updated_at",
+        )
+
+
+class PresignedFileUploadSessionSerializer(FileUploadSessionSerializer):
+    # NOTE the ETag is calculated the same way as `calc_etag`, the MD5 sum of the file, or for files larger than the part size, the MD5 sum of the part MD5 sums with `-<parts count>` suffix.
+    etag = serializers.CharField(
+        write_only=True,
+        validators=[RegexValidator(r"^[0-9a-f]{32}(-[0-9]+)?$")],
+    )
+    part_urls = serializers.SerializerMethodField()
+
+    def get_part_urls(self, obj: FileUploadSession) -> list[str]:
+        return get_presigned_upload_part_urls(obj)
+
+    class Meta(FileUploadSessionSerializer.Meta):
+        fields = (
+            *FileUploadSessionSerializer.Meta.fields,
+            "etag",
+            "part_urls",
+        )
+        read_only_fields = (
+            *FileUploadSessionSerializer.Meta.read_only_fields,
+            "part_urls",
+        )
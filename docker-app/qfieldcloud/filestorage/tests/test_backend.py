@@ -1,9 +1,17 @@
+import io
 import logging
+import os
+import tempfile
+from collections import Counter
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
 
-from qfieldcloud.filestorage.backend import QfcS3Boto3Storage
+from qfieldcloud.core.management.commands.benchmark_webdav_storage import (
+    run_wsgidav_server,
+)
+from qfieldcloud.filestorage.backend import QfcS3Boto3Storage, QfcWebDavStorage
 
 logging.disable(logging.CRITICAL)
 
@@ -92,3 +100,80 @@ class QfcS3Boto3StorageTestCase(TestCase):
         to guess_type on the last path component (no extension)."""
         params = self._call("projects/abc123/files/photo.jpg/v19991231235959-abcdef01")
         self.assertNotIn("ContentType", params)
+
+
+class QfcWebDavStorageTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.server = run_wsgidav_server(self.tempdir.name)
+        webdav_url = self.server.__enter__()
+
+        self.storage = QfcWebDavStorage(
+            webdav_url=webdav_url,
+            public_url=webdav_url,
+            basic_auth="user:",
+            pool_maxsize=2,
+        )
+
+        self.methods = Counter()
+        self.storage.requests.hooks["response"].append(
+            lambda response, *args, **kwargs: self.methods.update(
+                [response.request.method]
+            )
+        )
+
+    def tearDown(self):
+        self.storage.requests.close()
+        self.server.__exit__(None, None, None)
+        self.tempdir.cleanup()
+
+    def test_open_streams_with_ranges(self):
+        content = os.urandom(1024 * 1024 + 123)
+        self.storage.save("project/file.bin", ContentFile(content))
+
+        with self.storage.open("project/file.bin") as f:
+            self.assertEqual(f.size, len(content))
+            self.assertEqual(f.read(10), content[:10])
+
+            f.seek(1024 * 1024)
+            self.assertEqual(f.read(), content[1024 * 1024 :])
+
+            f.seek(-100, io.SEEK_END)
+            self.assertEqual(f.read(50), content[-100:-50])
+
+            f.seek(0)
+            self.assertEqual(b"".join(f.chunks()), content)
+
+    def test_open_missing_file(self):
+        with self.assertRaises(IOError):
+            self.storage.open("project/missing.bin")
+
+    def test_make_collection_is_memoized(self):
+        self.storage.save("project/a/b/1.txt", ContentFile(b"1"))
+        self.assertEqual(self.methods["MKCOL"], 3)
+
+        self.methods.clear()
+        self.storage.make_collection("project/a/b/2.txt")
+        self.storage.make_collection("project/a/3.txt")
+        self.assertEqual(self.methods["MKCOL"], 0)
+        self.assertEqual(self.methods["HEAD"], 0)
+
+        # a sibling collection only creates the missing collection
+        self.storage.make_collection("project/a/c/4.txt")
+        self.assertEqual(self.methods["MKCOL"], 1)
+
+        # collections created by another process are only checked once
+        os.makedirs(os.path.join(self.tempdir.name, "other", "d"))
+        self.methods.clear()
+        self.storage.make_collection("other/d/5.txt")
+        self.storage.make_collection("other/d/6.txt")
+        self.assertEqual(self.methods["HEAD"], 1)
+        self.assertEqual(self.methods["MKCOL"], 0)
+
+    def test_save_recreates_removed_collection(self):
+        self.storage.save("project/a/1.txt", ContentFile(b"1"))
+
+        self.storage.perform_webdav_request("DELETE", "project/a/")
+        self.storage.save("project/a/2.txt", ContentFile(b"2"))
+
+        self.assertEqual(self.storage.open("project/a/2.txt").read(), b"2")
@@ -1106,6 +1106,46 @@ class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
         self.assertNotEqual(thumbnail_key2, "thumbnail2.svg")
         self.assertNotEqual(thumbnail_key1, thumbnail_key2)
 
+    def test_thumbnail_caching_headers(self):
+        self.p1.thumbnail = ContentFile("<svg />", "thumbnail.svg")
+        self.p1.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
+
+        # 1. the versioned url is cached forever
+        response = self.client.get(self.p1.thumbnail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{self.p1.thumbnail_etag}"')
+        self.assertEqual(
+            response["Cache-Control"], "private, max-age=31536000, immutable"
+        )
+
+        # 2. the unversioned url is revalidated
+        response = self.client.get(f"/api/v1/files/thumbnails/{self.p1.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        response = self.client.get(
+            f"/api/v1/files/thumbnails/{self.p1.id}/",
+            HTTP_IF_NONE_MATCH=f'"{self.p1.thumbnail_etag}"',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 3. a new thumbnail has a new ETag
+        self.p1.thumbnail = ContentFile("<svg />", "thumbnail.svg")
+        self.p1.save()
+
+        response = self.client.get(
+            f"/api/v1/files/thumbnails/{self.p1.id}/",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{self.p1.thumbnail_etag}"')
+
     def test_get_file_metadata(self):
         self.assertFileUploaded(self.u1, self.p1, "file.name", StringIO("Hello!"))
 
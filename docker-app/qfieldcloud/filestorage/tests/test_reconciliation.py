@@ -0,0 +1,147 @@
+import io
+import logging
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from qfieldcloud.core.models import Person
+from qfieldcloud.core.tests.mixins import QfcFilesTestCaseMixin
+from qfieldcloud.core.tests.utils import setup_subscription_plans
+from qfieldcloud.filestorage.backend import StorageObject
+from qfieldcloud.filestorage.models import FileVersion
+from qfieldcloud.filestorage.reconciliation import (
+    StorageReference,
+    UnsortedStreamError,
+    iter_reconciliation,
+    iter_storage_references,
+)
+from qfieldcloud.project.models import Project
+
+logging.disable(logging.CRITICAL)
+
+
+def storage_object(name: str) -> StorageObject:
+    return StorageObject(name, 1, datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+
+class ReconciliationTestCase(SimpleTestCase):
+    def test_merge_join(self):
+        objects = [storage_object(name) for name in ("a", "b", "c/1", "c/2", "é")]
+        references = [
+            StorageReference("b", "filestorage.FileVersion", "1"),
+            StorageReference("b", "filestorage.FileVersion", "2"),
+            StorageReference("c", "project.Project", "3"),
+            StorageReference("c/2", "core.FaultyDeltaFile", "4"),
+            StorageReference("d", "filestorage.FileUploadSession", "5", False),
+            StorageReference("z", "filestorage.FileVersion", "6"),
+        ]
+
+        results = list(iter_reconciliation(objects, references))
+
+        self.assertEqual(
+            [(r.name, r.is_orphan, r.is_missing) for r in results],
+            [
+                ("a", True, False),
+                ("c", False, True),
+                ("c/1", True, False),
+                ("z", False, True),
+                ("é", True, False),
+            ],
+        )
+
+    def test_unsorted_stream(self):
+        with self.assertRaises(UnsortedStreamError):
+            list(iter_reconciliation([storage_object("b"), storage_object("a")], []))
+
+
+class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
+    def setUp(self):
+        setup_subscription_plans()
+
+        self.u1 = Person.objects.create_user(username="u1", password="abc123")
+        self.p1 = Project.objects.create(
+            owner=self.u1,
+            name="p1",
+            file_storage="default",
+        )
+        self.prefix = f"projects/{self.p1.id}/"
+        self.storage = storages["default"]
+
+    def _reconcile(self, *args: str) -> str:
+        out = StringIO()
+        call_command(
+            "reconcilestorage",
+            "--prefix",
+            self.prefix,
+            "--min-age-hours",
+            "0",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_reconcile_storage(self):
+        for filename in ("file.txt", "DCIM/1.jpg", "DCIM/2.jpg"):
+            response = self._upload_file(
+                self.u1, self.p1, filename, io.BytesIO(b"Hello world!")
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # an object left behind by a failed upload
+        orphan_name = self.storage.save(
+            f"{self.prefix}files/orphan.txt/v20260101000000-abcdef01",
+            ContentFile(b"orphan"),
+        )
+        # an object deleted behind the back of the database
+        missing_version = FileVersion.objects.get(
+            file__project=self.p1, file__name="DCIM/2.jpg"
+        )
+        self.storage.delete(missing_version.content.name)
+
+        references = list(iter_storage_references("default", self.prefix))
+        self.assertEqual(
+            [r.name for r in references], sorted(r.name for r in references)
+        )
+        self.assertEqual(len(references), 3)
+
+        # 1. dry run only reports
+        output = self._reconcile("--dry-run")
+
+        self.assertIn(f"Orphan: {orphan_name}", output)
+        self.assertIn(
+            f"Missing: {missing_version.content.name} | filestorage.FileVersion {missing_version.id}",
+            output,
+        )
+        self.assertIn("Total orphan objects found: 1", output)
+        self.assertIn("Total missing objects found: 1", output)
+        self.assertTrue(self.storage.exists(orphan_name))
+
+        # 2. recent orphans are skipped
+        output = self._reconcile("--dry-run", "--min-age-hours", "1")
+
+        self.assertIn("Total orphan objects found: 0", output)
+        self.assertIn("Total recent orphan objects skipped: 1", output)
+
+        # 3. delete the orphans
+        output = self._reconcile("--force", "--batch-size", "1")
+
+        self.assertIn("Total orphan objects deleted: 1", output)
+        self.assertFalse(self.storage.exists(orphan_name))
+
+        for filename in ("file.txt", "DCIM/1.jpg"):
+            file_version = FileVersion.objects.get(
+                file__project=self.p1, file__name=filename
+            )
+            self.assertTrue(self.storage.exists(file_version.content.name))
+
+        # 4. nothing left to delete
+        output = self._reconcile("--dry-run")
+
+        self.assertIn("Total orphan objects found: 0", output)
+        self.assertIn("Total missing objects found: 1", output)
@@ -0,0 +1,455 @@
+import hashlib
+import logging
+import os
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APITransactionTestCase
+
+from qfieldcloud.core.models import Person
+from qfieldcloud.core.tests.mixins import QfcFilesTestCaseMixin
+from qfieldcloud.core.tests.utils import setup_subscription_plans
+from qfieldcloud.filestorage.constants import OBJECT_STORAGE_PART_SIZE
+from qfieldcloud.filestorage.cron import (
+    AbortExpiredFileUploadSessionsJob,
+    CalculateFileVersionChecksumsJob,
+)
+from qfieldcloud.filestorage.models import FileUploadSession
+from qfieldcloud.filestorage.utils import calc_etag
+from qfieldcloud.project.models import Project
+
+logging.disable(logging.CRITICAL)
+
+
+class QfcTestCase(QfcFilesTestCaseMixin, APITransactionTestCase):
+    def setUp(self):
+        setup_subscription_plans()
+
+        self.u1 = Person.objects.create_user(username="u1", password="abc123")
+        self.t1 = self._get_token_for_user(self.u1)
+        self.p1 = Project.objects.create(
+            owner=self.u1,
+            name="p1",
+            file_storage="default",
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.t1.key)
+
+    def _create_upload_session(self, filename: str, size: int) -> Response:
+        return self.client.post(
+            reverse(
+                "filestorage_create_upload_session",
+                kwargs={"project_id": self.p1.id},
+            ),
+            {"filename": filename, "size": size},
+        )
+
+    def _get_upload_session_url(self, upload_session_id: str) -> str:
+        return reverse(
+            "filestorage_upload_session",
+            kwargs={
+                "project_id": self.p1.id,
+                "upload_session_id": upload_session_id,
+            },
+        )
+
+    def _upload_chunk(
+        self, upload_session_id: str, content: bytes, start: int, total_size: int
+    ) -> Response:
+        return self.client.put(
+            self._get_upload_session_url(upload_session_id),
+            content,
+            content_type="application/octet-stream",
+            headers={
+                "Content-Range": f"bytes {start}-{start + len(content) - 1}/{total_size}"
+            },
+        )
+
+    def _create_presigned_upload_session(
+        self,
+        filename: str,
+        content: bytes,
+        etag: str | None = None,
+    ) -> Response:
+        return self.client.post(
+            reverse(
+                "filestorage_create_presigned_upload_session",
+                kwargs={"project_id": self.p1.id},
+            ),
+            {
+                "filename": filename,
+                "size": len(content),
+                "etag": etag or calc_etag(ContentFile(content)),
+            },
+        )
+
+    def _upload_presigned_parts(self, part_urls: list[str], content: bytes) -> None:
+        for idx, part_url in enumerate(part_urls):
+            part = content[
+                idx * OBJECT_STORAGE_PART_SIZE : (idx + 1) * OBJECT_STORAGE_PART_SIZE
+            ]
+            requests.put(part_url, data=part).raise_for_status()
+
+    def test_upload_in_single_chunk_succeeds(self):
+        content = b"Hello resumable world!"
+
+        response = self._create_upload_session("file.txt", len(content))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["bytes_received"], 0)
+        self.assertEqual(response.json()["part_size"], OBJECT_STORAGE_PART_SIZE)
+
+        upload_session_id = response.json()["id"]
+
+        response = self._upload_chunk(upload_session_id, content, 0, len(content))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["bytes_received"], len(content))
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(FileUploadSession.objects.exists())
+
+        file_version = self.p1.get_file("file.txt").latest_version
+
+        self.assertEqual(file_version.size, len(content))
+        self.assertEqual(file_version.etag, hashlib.md5(content).hexdigest())
+
+        # the checksums of the whole file are calculated while uploading the chunks
+        self.assertEqual(bytes(file_version.md5sum), hashlib.md5(content).digest())
+        self.assertEqual(
+            bytes(file_version.sha256sum), hashlib.sha256(content).digest()
+        )
+
+        with file_version.content.open() as f:
+            self.assertEqual(f.read(), content)
+
+    def test_upload_in_multiple_chunks_succeeds(self):
+        content = os.urandom(OBJECT_STORAGE_PART_SIZE * 2 + 1024)
+
+        response = self._create_upload_session("DCIM/photo.jpg", len(content))
+        upload_session_id = response.json()["id"]
+
+        # upload the first two parts in a single chunk, then the remaining bytes
+        response = self._upload_chunk(
+            upload_session_id, content[: OBJECT_STORAGE_PART_SIZE * 2], 0, len(content)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["bytes_received"], OBJECT_STORAGE_PART_SIZE * 2
+        )
+
+        response = self._upload_chunk(
+            upload_session_id,
+            content[OBJECT_STORAGE_PART_SIZE * 2 :],
+            OBJECT_STORAGE_PART_SIZE * 2,
+            len(content),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        file_version = self.p1.get_file("DCIM/photo.jpg").latest_version
+
+        self.assertEqual(file_version.size, len(content))
+        self.assertEqual(file_version.etag, calc_etag(ContentFile(content)))
+        self.assertTrue(file_version.etag.endswith("-3"))
+        self.assertEqual(bytes(file_version.md5sum), hashlib.md5(content).digest())
+        self.assertEqual(
+            bytes(file_version.sha256sum), hashlib.sha256(content).digest()
+        )
+
+    def test_upload_resumes_from_received_bytes(self):
+        content = os.urandom(OBJECT_STORAGE_PART_SIZE + 1024)
+
+        response = self._create_upload_session("file.bin", len(content))
+        upload_session_id = response.json()["id"]
+
+        response = self._upload_chunk(
+            upload_session_id, content[:OBJECT_STORAGE_PART_SIZE], 0, len(content)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # the client lost the response and asks where to resume from
+        response = self.client.get(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["bytes_received"], OBJECT_STORAGE_PART_SIZE)
+
+        # uploading the same chunk again is rejected
+        response = self._upload_chunk(
+            upload_session_id, content[:OBJECT_STORAGE_PART_SIZE], 0, len(content)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self._upload_chunk(
+            upload_session_id,
+            content[OBJECT_STORAGE_PART_SIZE:],
+            OBJECT_STORAGE_PART_SIZE,
+            len(content),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        file_version = self.p1.get_file("file.bin").latest_version
+
+        # the rejected chunk has not been hashed again
+        self.assertEqual(
+            bytes(file_version.sha256sum), hashlib.sha256(content).digest()
+        )
+
+        with file_version.content.open() as f:
+            self.assertEqual(f.read(), content)
+
+    def test_upload_chunk_not_aligned_to_part_size_fails(self):
+        content = os.urandom(OBJECT_STORAGE_PART_SIZE + 1024)
+
+        response = self._create_upload_session("file.bin", len(content))
+        upload_session_id = response.json()["id"]
+
+        response = self._upload_chunk(
+            upload_session_id, content[:1024], 0, len(content)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_upload_chunk")
+
+        response = self.client.put(
+            self._get_upload_session_url(upload_session_id),
+            content,
+            content_type="application/octet-stream",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_upload_chunk")
+
+    def test_finalize_incomplete_upload_fails(self):
+        content = b"Hello!"
+
+        response = self._create_upload_session("file.txt", len(content))
+        upload_session_id = response.json()["id"]
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "incomplete_upload_session")
+        self.assertEqual(self.p1.project_files.count(), 0)
+
+    def test_abort_upload_succeeds(self):
+        content = b"Hello!"
+
+        response = self._create_upload_session("file.txt", len(content))
+        upload_session_id = response.json()["id"]
+
+        response = self._upload_chunk(upload_session_id, content, 0, len(content))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.delete(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(FileUploadSession.objects.exists())
+        self.assertEqual(self.p1.project_files.count(), 0)
+
+    def test_upload_session_of_other_user_is_forbidden(self):
+        response = self._create_upload_session("file.txt", 6)
+        upload_session_id = response.json()["id"]
+
+        u2 = Person.objects.create_user(username="u2", password="abc123")
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + self._get_token_for_user(u2).key
+        )
+
+        response = self.client.get(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_upload_invalid_qgis_project_file_fails(self):
+        content = b"not a QGIS project"
+
+        response = self._create_upload_session("project.qgs", len(content))
+        upload_session_id = response.json()["id"]
+
+        self._upload_chunk(upload_session_id, content, 0, len(content))
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_qgis_project_file")
+        self.assertFalse(FileUploadSession.objects.exists())
+        self.assertEqual(self.p1.project_files.count(), 0)
+
+    def test_upload_qgis_project_file_sets_qgis_version(self):
+        content = b'<qgis projectname="" version="3.44.7-Solothurn"></qgis>'
+
+        response = self._create_upload_session("project.qgs", len(content))
+        upload_session_id = response.json()["id"]
+
+        self._upload_chunk(upload_session_id, content, 0, len(content))
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.p1.refresh_from_db()
+
+        self.assertEqual(self.p1.the_qgis_file_name, "project.qgs")
+        self.assertEqual(self.p1.qgis_version, "3.44.7")
+
+    def test_abort_expired_upload_sessions(self):
+        response = self._create_upload_session("file.txt", 6)
+        upload_session = FileUploadSession.objects.get(id=response.json()["id"])
+
+        AbortExpiredFileUploadSessionsJob().do()
+
+        self.assertTrue(FileUploadSession.objects.exists())
+
+        with mock.patch(
+            "django.utils.timezone.now",
+            return_value=timezone.now() + timedelta(days=2),
+        ):
+            AbortExpiredFileUploadSessionsJob().do()
+
+        self.assertFalse(FileUploadSession.objects.exists())
+        self.assertFalse(
+            storages[upload_session.file_storage].exists(upload_session.content_name)
+        )
+
+    def test_presigned_upload_succeeds(self):
+        for content in (
+            b"Hello presigned world!",
+            os.urandom(OBJECT_STORAGE_PART_SIZE + 1024),
+        ):
+            with self.subTest(size=len(content)):
+                response = self._create_presigned_upload_session("file.bin", content)
+
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+                part_urls = response.json()["part_urls"]
+
+                self.assertEqual(
+                    len(part_urls), 1 if len(content) < OBJECT_STORAGE_PART_SIZE else 2
+                )
+
+                self._upload_presigned_parts(part_urls, content)
+
+                response = self.client.post(
+                    self._get_upload_session_url(response.json()["id"])
+                )
+
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+                file_version = self.p1.get_file("file.bin").latest_version
+
+                self.assertEqual(file_version.size, len(content))
+                self.assertEqual(file_version.etag, calc_etag(ContentFile(content)))
+                self.assertIsNone(file_version.sha256sum)
+
+                CalculateFileVersionChecksumsJob().do()
+
+                file_version.refresh_from_db()
+
+                self.assertEqual(
+                    bytes(file_version.sha256sum), hashlib.sha256(content).digest()
+                )
+
+                with file_version.content.open() as f:
+                    self.assertEqual(f.read(), content)
+
+    def test_checksums_job_skips_the_failed_file_versions(self):
+        content = b"Hello presigned world!"
+
+        response = self._create_presigned_upload_session("file.bin", content)
+        self._upload_presigned_parts(response.json()["part_urls"], content)
+        response = self.client.post(self._get_upload_session_url(response.json()["id"]))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        file_version = self.p1.get_file("file.bin").latest_version
+
+        # the object is deleted behind the back of the database
+        file_version.content.storage.delete(file_version.content.name)
+
+        CalculateFileVersionChecksumsJob().do()
+
+        file_version.refresh_from_db()
+
+        self.assertIsNone(file_version.sha256sum)
+        self.assertIsNotNone(file_version.checksums_failed_at)
+
+        with mock.patch(
+            "qfieldcloud.filestorage.cron.calculate_checksums"
+        ) as calculate_checksums_mock:
+            CalculateFileVersionChecksumsJob().do()
+
+        calculate_checksums_mock.assert_not_called()
+
+    def test_presigned_upload_with_wrong_etag_fails(self):
+        content = b"Hello presigned world!"
+
+        response = self._create_presigned_upload_session(
+            "file.bin", content, etag=hashlib.md5(b"other").hexdigest()
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        content = os.urandom(OBJECT_STORAGE_PART_SIZE + 1024)
+
+        response = self._create_presigned_upload_session(
+            "file.bin", content, etag=f"{hashlib.md5(b'other').hexdigest()}-2"
+        )
+        upload_session = FileUploadSession.objects.get(id=response.json()["id"])
+
+        self._upload_presigned_parts(response.json()["part_urls"], content)
+
+        response = self.client.post(self._get_upload_session_url(upload_session.id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "upload_verification_failed")
+        self.assertFalse(FileUploadSession.objects.exists())
+        self.assertFalse(
+            storages[upload_session.file_storage].exists(upload_session.content_name)
+        )
+        self.assertEqual(self.p1.project_files.count(), 0)
+
+    def test_finalize_presigned_upload_with_missing_parts_fails(self):
+        content = os.urandom(OBJECT_STORAGE_PART_SIZE + 1024)
+
+        response = self._create_presigned_upload_session("file.bin", content)
+        upload_session_id = response.json()["id"]
+
+        self._upload_presigned_parts(response.json()["part_urls"][:1], content)
+
+        response = self.client.post(self._get_upload_session_url(upload_session_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "incomplete_upload_session")
+
+        # chunks of presigned uploads cannot be uploaded through the API
+        response = self._upload_chunk(
+            upload_session_id,
+            content[OBJECT_STORAGE_PART_SIZE:],
+            OBJECT_STORAGE_PART_SIZE,
+            len(content),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "invalid_upload_chunk")
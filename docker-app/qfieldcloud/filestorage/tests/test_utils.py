@@ -1,5 +1,7 @@
 # from unittest import TestCase
+import hashlib
 import logging
+import os
 from pathlib import Path
 
 from django.conf import settings
@@ -7,10 +9,12 @@ from django.test import TestCase
 
 from qfieldcloud.core.tests.utils import qgz_from_qgs, testdata_path
 from qfieldcloud.filestorage.utils import (
+    finalize_hash_state,
     is_admin_restricted_file,
     is_qgis_project_file,
     is_valid_filename,
     open_qgis_file,
+    update_hash_state,
 )
 
 logging.disable(logging.CRITICAL)
@@ -157,3 +161,24 @@ class QfcTestCase(TestCase):
                     self.assertIsNotNone(text_fh)
                     first_line = text_fh.readline()
                     self.assertIn("<qgis", first_line)
+
+    def test_hash_state_is_resumed(self):
+        data = os.urandom(1024 * 1024 + 3)
+
+        for algorithm in ("md5", "sha256"):
+            with self.subTest(algorithm=algorithm):
+                # the state is stored and read back as `memoryview` by the `BinaryField`
+                state = None
+                for idx in range(0, len(data), 100_000):
+                    state = memoryview(
+                        update_hash_state(algorithm, state, data[idx : idx + 100_000])
+                    )
+
+                self.assertEqual(
+                    finalize_hash_state(algorithm, state),
+                    hashlib.new(algorithm, data).digest(),
+                )
+                self.assertEqual(
+                    finalize_hash_state(algorithm, None),
+                    hashlib.new(algorithm, b"").digest(),
+                )
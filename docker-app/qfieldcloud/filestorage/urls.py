@@ -5,6 +5,9 @@ from qfieldcloud.filestorage.views import (
     FileCrudView,
     FileListView,
     FileMetadataView,
+    FileUploadSessionCreateView,
+    FileUploadSessionView,
+    PresignedFileUploadSessionCreateView,
     ProjectMetaFileReadView,
 )
 
@@ -14,6 +17,21 @@ urlpatterns = [
         FileListView.as_view(),
         name="filestorage_list_files",
     ),
+    path(
+        "files/uploads/<uuid:project_id>/",
+        FileUploadSessionCreateView.as_view(),
+        name="filestorage_create_upload_session",
+    ),
+    path(
+        "files/presigned-uploads/<uuid:project_id>/",
+        PresignedFileUploadSessionCreateView.as_view(),
+        name="filestorage_create_presigned_upload_session",
+    ),
+    path(
+        "files/uploads/<uuid:project_id>/<uuid:upload_session_id>/",
+        FileUploadSessionView.as_view(),
+        name="filestorage_upload_session",
+    ),
     path(
         "files/<uuid:project_id>/<path:filename>/",
         FileCrudView.as_view(),
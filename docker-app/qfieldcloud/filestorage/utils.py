@@ -1,24 +1,32 @@
+import ctypes
+import ctypes.util
 import hashlib
 import io
 import logging
+import math
 import re
 import uuid
 import xml.etree.ElementTree as ET
 import zipfile
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 from contextlib import contextmanager
 from pathlib import Path, PurePath
-from typing import Any, BinaryIO, TextIO
+from typing import TYPE_CHECKING, Any, BinaryIO, NamedTuple, TextIO
 
 from attr import dataclass
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from django.core.validators import RegexValidator
 from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
 from qfieldcloud.core.exceptions import InvalidRangeError
+from qfieldcloud.filestorage.constants import OBJECT_STORAGE_PART_SIZE
+
+if TYPE_CHECKING:
+    from qfieldcloud.filestorage.models import FileUploadSession
 
 logger = logging.getLogger(__name__)
 
@@ -120,7 +128,7 @@ def is_admin_restricted_file(filename: str, projectfile_filename: str | None) ->
     return False
 
 
-def calc_etag(file: ContentFile, part_size: int = 8 * 1024 * 1024) -> str:
+def calc_etag(file: ContentFile, part_size: int = OBJECT_STORAGE_PART_SIZE) -> str:
     """Calculate ETag as in Object Storage (S3) of a local file.
 
     ETag is a MD5. But for the multipart uploaded files, the MD5 is computed from the concatenation of the MD5s of each uploaded part.
@@ -159,6 +167,120 @@ def calc_etag(file: ContentFile, part_size: int = 8 * 1024 * 1024) -> str:
         return "{}-{}".format(final_md5sum.hexdigest(), len(md5sums))
 
 
+def calc_multipart_etag(part_md5sums: list[bytes]) -> str:
+    """Calculate ETag as in Object Storage (S3) from the MD5 sums of the already uploaded parts.
+
+    See `calc_etag` for the details of the ETag calculation.
+
+    Args:
+        part_md5sums: the binary MD5 sums of each uploaded part, in the part order
+
+    Returns:
+        the calculated ETag value
+    """
+    if len(part_md5sums) == 1:
+        return part_md5sums[0].hex()
+
+    final_md5sum = hashlib.md5(b"".join(part_md5sums))
+
+    return "{}-{}".format(final_md5sum.hexdigest(), len(part_md5sums))
+
+
+class _OpenSSLHash(NamedTuple):
+    """The OpenSSL low level functions of a hash algorithm and the sizes of its context and digest."""
+
+    init: Callable
+    update: Callable
+    final: Callable
+    ctx_size: int
+    digest_size: int
+
+
+_libcrypto = ctypes.CDLL(ctypes.util.find_library("crypto") or "libcrypto.so.3")
+
+# NOTE the context structs are public and have the same layout for all OpenSSL versions,
+# see `MD5_CTX` in `openssl/md5.h` and `SHA256_CTX` in `openssl/sha.h`.
+_OPENSSL_HASHES = {
+    "md5": _OpenSSLHash(
+        _libcrypto.MD5_Init, _libcrypto.MD5_Update, _libcrypto.MD5_Final, 92, 16
+    ),
+    "sha256": _OpenSSLHash(
+        _libcrypto.SHA256_Init,
+        _libcrypto.SHA256_Update,
+        _libcrypto.SHA256_Final,
+        112,
+        32,
+    ),
+}
+
+
+def update_hash_state(algorithm: str, state: bytes | None, data: bytes) -> bytes:
+    """Updates the intermediate state of a hash with the next data, so the hash can be continued by another request.
+
+    The `hashlib` hashes cannot be serialized, so the OpenSSL low level functions are called directly.
+
+    Args:
+        algorithm: the hash algorithm, either "md5" or "sha256"
+        state: the state returned by the previous call, or `None` to start a new hash
+        data: the next data to hash
+
+    Returns:
+        the new state of the hash
+    """
+    openssl_hash = _OPENSSL_HASHES[algorithm]
+
+    if state is None:
+        ctx = ctypes.create_string_buffer(openssl_hash.ctx_size)
+        openssl_hash.init(ctx)
+    else:
+        ctx = ctypes.create_string_buffer(bytes(state), openssl_hash.ctx_size)
+
+    openssl_hash.update(ctx, data, ctypes.c_size_t(len(data)))
+
+    return ctx.raw
+
+
+def finalize_hash_state(algorithm: str, state: bytes | None) -> bytes:
+    """Returns the digest of a hash from its intermediate state, see `update_hash_state`.
+
+    Args:
+        algorithm: the hash algorithm, either "md5" or "sha256"
+        state: the state returned by the last `update_hash_state` call, or `None` if no data has been hashed
+
+    Returns:
+        the binary digest
+    """
+    openssl_hash = _OPENSSL_HASHES[algorithm]
+
+    if state is None:
+        state = update_hash_state(algorithm, None, b"")
+
+    ctx = ctypes.create_string_buffer(bytes(state), openssl_hash.ctx_size)
+    digest = ctypes.create_string_buffer(openssl_hash.digest_size)
+    openssl_hash.final(digest, ctx)
+
+    return digest.raw
+
+
+def get_presigned_upload_part_urls(upload_session: "FileUploadSession") -> list[str]:
+    """Returns the presigned URLs to upload each part of a presigned upload session directly to the Object Storage.
+
+    All parts except the last one must be exactly `OBJECT_STORAGE_PART_SIZE` bytes long.
+    """
+    storage = storages[upload_session.file_storage]
+    parts_count = max(1, math.ceil(upload_session.size / OBJECT_STORAGE_PART_SIZE))
+
+    return [
+        storage.get_upload_part_url(
+            upload_session.content_name,
+            upload_session.multipart_upload_id,
+            part_number,
+            expire=settings.QFIELDCLOUD_PRESIGNED_UPLOAD_URL_EXPIRE_S,
+        )
+        for part_number in range(1, parts_count + 1)
+    ]
+
+
 def to_uuid(value: Any) -> uuid.UUID | None:
     """Converts a given value to a UUID object, or if not possible, returns None."""
     if not value:
@@ -206,6 +328,49 @@ def parse_range_header(
     return (range_start, range_end)
 
 
+def parse_content_range_header(content_range: str) -> tuple[int, int, int] | None:
+    """Parses a content range HTTP Header string of an uploaded chunk.
+
+    Arguments:
+        content_range: string value of a HTTP content range header to parse, e.g. `bytes 0-1023/4096`.
+
+    Returns:
+        If compliant, a tuple with start, end (inclusive) and total size in bytes.
+        If not, returns `None`.
+    """
+    match = re.match(r"^bytes (\d+)-(\d+)/(\d+)$", content_range)
+
+    if not match:
+        return None
+
+    range_start, range_end, total_size = (int(value) for value in match.groups())
+
+    if range_end < range_start or range_end >= total_size:
+        return None
+
+    return (range_start, range_end, total_size)
+
+
+def read_exactly(stream: BinaryIO, size: int) -> bytes:
+    """Reads exactly `size` bytes from a stream, unless the stream ends earlier.
+
+    Reading from a network stream might return less bytes than requested, even if the stream has not ended yet.
+    """
+    chunks = []
+    remaining = size
+
+    while remaining > 0:
+        chunk = stream.read(remaining)
+
+        if not chunk:
+            break
+
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
 @dataclass
 class RangeForFile:
     """A range for a file, as parsed from a HTTP Range header."""
@@ -1,11 +1,16 @@
+import hashlib
 import logging
+import math
 from datetime import datetime
 from datetime import timezone as tz
 from pathlib import PurePath
+from typing import Any, BinaryIO
 from uuid import UUID
 
 from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from django.db import transaction
 from django.db.models import Q
 from django.db.models.fields.files import FieldFile
@@ -26,19 +31,33 @@ from qfieldcloud.core.models import (
     Job,
     ProcessProjectfileJob,
 )
+from qfieldcloud.core.utils2 import metrics
 from qfieldcloud.core.utils2.storage import (
     get_attachment_dir_prefix,
 )
+from qfieldcloud.filestorage.backend import QfcS3Boto3Storage
+from qfieldcloud.filestorage.constants import (
+    OBJECT_STORAGE_MAX_PARTS,
+    OBJECT_STORAGE_PART_SIZE,
+)
 from qfieldcloud.filestorage.helpers import purge_old_file_versions
 from qfieldcloud.filestorage.models import (
     File,
+    FileUploadSession,
     FileVersion,
+    get_file_version_upload_to,
+    get_project_file_storage_name,
 )
 from qfieldcloud.filestorage.utils import (
+    calc_multipart_etag,
+    finalize_hash_state,
     get_qgis_version_from_project_file,
     get_range,
     is_admin_restricted_file,
     is_qgis_project_file,
+    parse_content_range_header,
+    read_exactly,
+    update_hash_state,
     validate_filename,
 )
 from qfieldcloud.project.models import Project
@@ -46,28 +65,37 @@ from qfieldcloud.project.models import Project
 logger = logging.getLogger(__name__)
 
 
-def upload_project_file_version(
+def get_request_client_type(request: Request) -> str | None:
+    if hasattr(request, "auth") and hasattr(request.auth, "client_type"):
+        return request.auth.client_type
+    else:
+        return request.session.get("client_type")
+
+
+def check_can_upload_project_file_version(
     request: Request,
-    project_id: UUID,
+    project: Project,
     filename: str,
     file_type: File.FileType,
-    package_job_id: UUID | None = None,
-) -> FileVersion:
-    # Only one file allowed to be uploaded at once
-    if len(request.FILES.getlist("file")) > 1:
-        raise exceptions.MultipleContentsError()
-
-    uploaded_file = request.FILES.get("file")
+    size: int,
+) -> None:
+    """Checks if a file with the given filename and size can be uploaded to the project by the requesting user.
 
-    if not uploaded_file:
-        raise exceptions.EmptyContentError(
-            f'Missing file contents for "{filename}" from the request!'
-        )
+    The checks do not require the file contents, so they are done before any content is stored.
 
-    project = get_object_or_404(
-        Project.objects.select_related("the_qgis_file"), id=project_id
-    )
+    Args:
+        request: the DRF request
+        project: the project the file is uploaded to
+        filename: the filename
+        file_type: the file type
+        size: the size of the file contents in bytes
 
+    Raises:
+        RestrictedProjectModificationError: the user is not allowed to modify the restricted project files.
+        ValidationError: QGIS project file uploaded to a shared datasets project.
+        MultipleProjectsError: a second QGIS project file uploaded to the project.
+        QuotaError: the project owner has not enough storage left.
+    """
     try:
         validate_filename(filename)
     except DjangoValidationError as err:
@@ -109,39 +137,75 @@ def upload_project_file_version(
 
         raise MultipleProjectsError("Only one QGIS project per project allowed")
 
-    qgis_version: str | None = None
-    if file_type == File.FileType.PROJECT_FILE and is_qgis_file:
-        try:
-            qgis_version = get_qgis_version_from_project_file(filename, uploaded_file)
-        except ValueError as err:
-            logger.exception(
-                f"Failed to get QGIS version from project file {filename}: {err}"
-            )
-
-            raise exceptions.InvalidQgisProjectFileError(
-                f"Invalid QGIS project file: {err}"
-            )
-
     # check if the user has enough storage to upload the file
-    if hasattr(request, "auth") and hasattr(request.auth, "client_type"):
-        client_type = request.auth.client_type
-    else:
-        client_type = request.session.get("client_type")
-
     permissions_utils.check_can_upload_file(
         project,
-        client_type,
-        uploaded_file.size,
+        get_request_client_type(request),
+        size,
     )
 
+
+def get_uploaded_qgis_version(
+    filename: str,
+    file_type: File.FileType,
+    content: BinaryIO,
+) -> str | None:
+    """Returns the QGIS version of an uploaded QGIS project file, or `None` if the uploaded file is not a QGIS project file.
+
+    Raises:
+        InvalidQgisProjectFileError: the uploaded QGIS project file is invalid.
+    """
+    if file_type != File.FileType.PROJECT_FILE or not is_qgis_project_file(filename):
+        return None
+
+    try:
+        return get_qgis_version_from_project_file(filename, content)
+    except ValueError as err:
+        logger.exception(
+            f"Failed to get QGIS version from project file {filename}: {err}"
+        )
+
+        raise exceptions.InvalidQgisProjectFileError(
+            f"Invalid QGIS project file: {err}"
+        )
+
+
+def add_project_file_version(
+    request: Request,
+    project: Project,
+    filename: str,
+    file_type: File.FileType,
+    content: ContentFile | str,
+    qgis_version: str | None = None,
+    package_job_id: UUID | None = None,
+    **add_version_kwargs: Any,
+) -> FileVersion:
+    """Adds the new file version and updates the project state accordingly, e.g. the QGIS project file and the project data timestamps.
+
+    Args:
+        request: the DRF request
+        project: the project the file is uploaded to
+        filename: the filename
+        file_type: the file type
+        content: the file contents, or the name of the already stored object
+        qgis_version: the QGIS version of the uploaded QGIS project file. Defaults to None.
+        package_job_id: the package job the file belongs to. Defaults to None.
+        add_version_kwargs: passed to `FileVersion.objects.add_version`
+
+    Returns:
+        the file version that has been created
+    """
+    is_qgis_file = is_qgis_project_file(filename)
+
     with transaction.atomic():
         file_version = FileVersion.objects.add_version(
             project=project,
             filename=filename,
-            content=uploaded_file,
+            content=content,
             file_type=file_type,
             uploaded_by=request.user,
             package_job_id=package_job_id,
+            **add_version_kwargs,
         )
 
         if file_type == File.FileType.PROJECT_FILE:
@@ -204,6 +268,423 @@ def upload_project_file_version(
     return file_version
 
 
+def upload_project_file_version(
+    request: Request,
+    project_id: UUID,
+    filename: str,
+    file_type: File.FileType,
+    package_job_id: UUID | None = None,
+) -> FileVersion:
+    started_at = timezone.now()
+
+    # Only one file allowed to be uploaded at once
+    if len(request.FILES.getlist("file")) > 1:
+        raise exceptions.MultipleContentsError()
+
+    uploaded_file = request.FILES.get("file")
+
+    if not uploaded_file:
+        raise exceptions.EmptyContentError(
+            f'Missing file contents for "{filename}" from the request!'
+        )
+
+    project = get_object_or_404(
+        Project.objects.select_related("the_qgis_file"), id=project_id
+    )
+
+    check_can_upload_project_file_version(
+        request,
+        project,
+        filename,
+        file_type,
+        uploaded_file.size,
+    )
+
+    qgis_version = get_uploaded_qgis_version(filename, file_type, uploaded_file)
+
+    file_version = add_project_file_version(
+        request,
+        project,
+        filename,
+        file_type,
+        uploaded_file,
+        qgis_version=qgis_version,
+        package_job_id=package_job_id,
+    )
+
+    metrics.record_upload("direct", uploaded_file.size, started_at)
+
+    return file_version
+
+
+def create_file_upload_session(
+    request: Request,
+    project_id: UUID,
+    filename: str,
+    size: int,
+    upload_method: FileUploadSession.UploadMethod = FileUploadSession.UploadMethod.CHUNKED,
+    etag: str | None = None,
+) -> FileUploadSession:
+    """Starts a resumable upload of a project file.
+
+    The object name of the future `FileVersion` is determined upfront, so the uploaded parts are stored directly in a multipart upload of that object.
+
+    Args:
+        request: the DRF request
+        project_id: the project the file is uploaded to
+        filename: the filename
+        size: the total size of the file contents in bytes
+        upload_method: how the file contents are uploaded. Defaults to `CHUNKED`.
+        etag: the ETag of the file as calculated by the client, required for presigned uploads. Defaults to None.
+
+    Raises:
+        UploadSessionNotSupportedError: the project file storage does not support multipart uploads.
+
+    Returns:
+        the created upload session
+    """
+    project = get_object_or_404(
+        Project.objects.select_related("the_qgis_file"), id=project_id
+    )
+
+    if size > OBJECT_STORAGE_MAX_PARTS * OBJECT_STORAGE_PART_SIZE:
+        raise exceptions.ValidationError(
+            f"Resumable uploads are limited to {OBJECT_STORAGE_MAX_PARTS * OBJECT_STORAGE_PART_SIZE} bytes, but got {size=}!"
+        )
+
+    check_can_upload_project_file_version(
+        request,
+        project,
+        filename,
+        File.FileType.PROJECT_FILE,
+        size,
+    )
+
+    file_storage = get_project_file_storage_name(project, filename)
+    storage = storages[file_storage]
+
+    if not isinstance(storage, QfcS3Boto3Storage):
+        raise exceptions.UploadSessionNotSupportedError(
+            f"The storage {file_storage=} of {filename=} does not support multipart uploads!"
+        )
+
+    upload_session = FileUploadSession(
+        project=project,
+        filename=filename,
+        size=size,
+        file_storage=file_storage,
+        upload_method=upload_method,
+        etag=etag,
+        created_by=request.user,
+    )
+
+    # the unsaved file version is used only to get the object name the same way as a regular upload
+    file_version = FileVersion(
+        id=upload_session.version_id,
+        file=File(
+            project=project,
+            name=filename,
+            file_type=File.FileType.PROJECT_FILE,
+        ),
+        uploaded_at=upload_session.uploaded_at,
+    )
+    upload_session.content_name = storage.generate_filename(
+        get_file_version_upload_to(file_version, filename)
+    )
+    upload_session.multipart_upload_id = storage.create_multipart_upload(
+        upload_session.content_name
+    )
+    upload_session.save()
+
+    return upload_session
+
+
+def upload_file_upload_session_chunk(
+    request: Request,
+    upload_session: FileUploadSession,
+) -> FileUploadSession:
+    """Streams a chunk of the request body to the multipart upload of the upload session.
+
+    The chunk position is passed with the `Content-Range: bytes <start>-<end>/<size>` header.
+    The chunk must start where the previously received contents end and its size must be a multiple of the part size, except for the last chunk.
+    Each part is stored as soon as it is read, so an interrupted upload can be resumed from the last stored part.
+    The MD5 and SHA256 sums of the file are calculated part by part, their intermediate states are stored with the parts.
+
+    Args:
+        request: the DRF request
+        upload_session: the upload session
+
+    Raises:
+        InvalidUploadChunkError: the `Content-Range` header or the request body is invalid.
+        UploadChunkOffsetMismatchError: the chunk does not start where the previously received contents end.
+
+    Returns:
+        the updated upload session
+    """
+    if upload_session.upload_method != FileUploadSession.UploadMethod.CHUNKED:
+        raise exceptions.InvalidUploadChunkError(
+            "The chunks of presigned uploads must be uploaded directly to the object storage!"
+        )
+
+    content_range = parse_content_range_header(request.headers.get("Content-Range", ""))
+
+    if not content_range:
+        raise exceptions.InvalidUploadChunkError(
+            "Missing or invalid `Content-Range` header!"
+        )
+
+    start, end, total_size = content_range
+
+    if total_size != upload_session.size:
+        raise exceptions.InvalidUploadChunkError(
+            f"Invalid chunk range {start}-{end}/{total_size} for upload session of {upload_session.size} bytes!"
+        )
+
+    if start != upload_session.bytes_received:
+        raise exceptions.UploadChunkOffsetMismatchError(
+            f"Expected chunk starting at {upload_session.bytes_received}, but got {start}!"
+        )
+
+    if end + 1 != total_size and (end + 1 - start) % OBJECT_STORAGE_PART_SIZE != 0:
+        raise exceptions.InvalidUploadChunkError(
+            f"The chunk size must be a multiple of {OBJECT_STORAGE_PART_SIZE} bytes, except for the last chunk!"
+        )
+
+    stream = request.stream
+
+    if stream is None:
+        raise exceptions.EmptyContentError("Missing chunk contents from the request!")
+
+    storage = storages[upload_session.file_storage]
+    offset = start
+
+    while offset <= end:
+        part_size = min(OBJECT_STORAGE_PART_SIZE, end + 1 - offset)
+        data = read_exactly(stream, part_size)
+
+        if len(data) != part_size:
+            raise exceptions.InvalidUploadChunkError(
+                f"Expected {end + 1 - start} bytes of chunk contents, but the request body ended after {offset - start + len(data)} bytes!"
+            )
+
+        part_etag = storage.upload_part(
+            upload_session.content_name,
+            upload_session.multipart_upload_id,
+            offset // OBJECT_STORAGE_PART_SIZE + 1,
+            data,
+        )
+        parts = [
+            *upload_session.parts,
+            {
+                "etag": part_etag,
+                "md5sum": hashlib.md5(data).hexdigest(),
+            },
+        ]
+        md5_state = update_hash_state("md5", upload_session.md5_state, data)
+        sha256_state = update_hash_state("sha256", upload_session.sha256_state, data)
+
+        # Record the stored part only if no other request has stored it in the meantime.
+        updated_count = FileUploadSession.objects.filter(
+            id=upload_session.id,
+            bytes_received=offset,
+        ).update(
+            parts=parts,
+            md5_state=md5_state,
+            sha256_state=sha256_state,
+            bytes_received=offset + part_size,
+            updated_at=timezone.now(),
+        )
+
+        if updated_count != 1:
+            raise exceptions.UploadChunkOffsetMismatchError(
+                f"The chunk starting at {offset} has been concurrently uploaded by another request!"
+            )
+
+        upload_session.parts = parts
+        upload_session.md5_state = md5_state
+        upload_session.sha256_state = sha256_state
+        upload_session.bytes_received = offset + part_size
+        offset += part_size
+
+    return upload_session
+
+
+def get_presigned_upload_part_etags(upload_session: FileUploadSession) -> list[str]:
+    """Returns the ETags of the parts uploaded directly to the Object Storage, after checking all the parts are uploaded.
+
+    Raises:
+        IncompleteUploadSessionError: some of the parts are missing or have unexpected size.
+    """
+    storage = storages[upload_session.file_storage]
+    parts = storage.list_uploaded_parts(
+        upload_session.content_name, upload_session.multipart_upload_id
+    )
+    parts_count = max(1, math.ceil(upload_session.size / OBJECT_STORAGE_PART_SIZE))
+    expected_part_sizes = [OBJECT_STORAGE_PART_SIZE] * (parts_count - 1) + [
+        upload_session.size - OBJECT_STORAGE_PART_SIZE * (parts_count - 1)
+    ]
+
+    if [part["PartNumber"] for part in parts] != list(range(1, parts_count + 1)) or [
+        part["Size"] for part in parts
+    ] != expected_part_sizes:
+        raise exceptions.IncompleteUploadSessionError(
+            f"Expected {parts_count} uploaded parts with sizes {expected_part_sizes}, but got {[(part['PartNumber'], part['Size']) for part in parts]}!"
+        )
+
+    return [part["ETag"] for part in parts]
+
+
+def verify_presigned_upload_etag(upload_session: FileUploadSession) -> None:
+    """Verifies the ETag of the completed object matches the ETag declared by the client, without reading the object contents.
+
+    The Object Storage calculates the ETag of a multipart upload from the MD5 sums of the parts,
+    which is the same as `calc_etag` for files with multiple parts.
+    For single part files, `calc_etag` is the MD5 sum of the file, while the Object Storage ETag is the MD5 sum of that MD5 sum with `-1` suffix.
+
+    Raises:
+        UploadVerificationError: the ETag of the object does not match the declared one.
+    """
+    assert upload_session.etag
+
+    storage = storages[upload_session.file_storage]
+    storage_etag = storage.get_etag(upload_session.content_name)
+
+    if upload_session.size <= OBJECT_STORAGE_PART_SIZE:
+        expected_etag = "{}-1".format(
+            hashlib.md5(bytes.fromhex(upload_session.etag)).hexdigest()
+        )
+    else:
+        expected_etag = upload_session.etag
+
+    if storage_etag != expected_etag:
+        raise exceptions.UploadVerificationError(
+            f"Expected the uploaded object to have ETag {expected_etag}, but got {storage_etag}!"
+        )
+
+
+def finalize_file_upload_session(
+    request: Request,
+    upload_session: FileUploadSession,
+) -> FileVersion:
+    """Completes the multipart upload of the upload session and adds the uploaded object as a new file version.
+
+    For chunked uploads, the ETag, MD5 and SHA256 sums are calculated from the hash states recorded while uploading the chunks.
+    For presigned uploads, the size and the ETag of the uploaded object are verified against the values declared by the client.
+    The file contents never pass through the server, so the MD5 and SHA256 sums are left empty
+    and calculated from the stored object in the background by `CalculateFileVersionChecksumsJob`.
+    The object contents are not read, except for QGIS project files to get their QGIS version.
+
+    Args:
+        request: the DRF request
+        upload_session: the upload session
+
+    Raises:
+        IncompleteUploadSessionError: not all the file contents have been received yet.
+        UploadVerificationError: the uploaded object does not match the values declared by the client.
+
+    Returns:
+        the file version that has been created
+    """
+    is_presigned = (
+        upload_session.upload_method == FileUploadSession.UploadMethod.PRESIGNED
+    )
+
+    if is_presigned:
+        part_etags = get_presigned_upload_part_etags(upload_session)
+    elif upload_session.is_complete:
+        part_etags = [part["etag"] for part in upload_session.parts]
+    else:
+        raise exceptions.IncompleteUploadSessionError(
+            f"Received {upload_session.bytes_received} of {upload_session.size} bytes!"
+        )
+
+    project = get_object_or_404(
+        Project.objects.select_related("the_qgis_file"), id=upload_session.project_id
+    )
+
+    # the project might have changed since the upload session has been created, e.g. a QGIS project file has been uploaded
+    check_can_upload_project_file_version(
+        request,
+        project,
+        upload_session.filename,
+        File.FileType.PROJECT_FILE,
+        upload_session.size,
+    )
+
+    storage = storages[upload_session.file_storage]
+    storage.complete_multipart_upload(
+        upload_session.content_name,
+        upload_session.multipart_upload_id,
+        part_etags,
+    )
+
+    try:
+        if is_presigned:
+            verify_presigned_upload_etag(upload_session)
+
+            etag = upload_session.etag
+            md5sum = None
+            sha256sum = None
+        else:
+            etag = calc_multipart_etag(
+                [bytes.fromhex(part["md5sum"]) for part in upload_session.parts]
+            )
+            md5sum = finalize_hash_state("md5", upload_session.md5_state)
+            sha256sum = finalize_hash_state("sha256", upload_session.sha256_state)
+
+        qgis_version = None
+
+        if is_qgis_project_file(upload_session.filename):
+            with storage.open(upload_session.content_name) as content:
+                qgis_version = get_uploaded_qgis_version(
+                    upload_session.filename, File.FileType.PROJECT_FILE, content
+                )
+    except (
+        exceptions.InvalidQgisProjectFileError,
+        exceptions.UploadVerificationError,
+    ):
+        storage.delete(upload_session.content_name)
+        upload_session.delete()
+
+        raise
+
+    file_version = add_project_file_version(
+        request,
+        project,
+        upload_session.filename,
+        File.FileType.PROJECT_FILE,
+        upload_session.content_name,
+        qgis_version=qgis_version,
+        version_id=upload_session.version_id,
+        uploaded_at=upload_session.uploaded_at,
+        etag=etag,
+        md5sum=md5sum,
+        sha256sum=sha256sum,
+        size=upload_session.size,
+    )
+
+    upload_session.delete()
+
+    metrics.record_upload(
+        "presigned" if is_presigned else "chunked",
+        upload_session.size,
+        upload_session.created_at,
+    )
+
+    return file_version
+
+
+def abort_file_upload_session(upload_session: FileUploadSession) -> None:
+    """Aborts the multipart upload of the upload session and deletes the session."""
+    storage = storages[upload_session.file_storage]
+    storage.abort_multipart_upload(
+        upload_session.content_name,
+        upload_session.multipart_upload_id,
+    )
+
+    upload_session.delete()
+
+
 def download_project_file_version(
     request: Request,
     project_id: UUID,
@@ -266,6 +747,7 @@ def download_field_file(
     field_file: FieldFile,
     filename: str | None = None,
     as_attachment: bool = False,
+    cache_control: str | None = None,
 ) -> HttpResponseBase:
     if not filename:
         filename = field_file.name
@@ -319,6 +801,10 @@ def download_field_file(
                 }
             )
 
+        # the response headers come from the storage, so ask the storage to set the `Cache-Control` header
+        if cache_control:
+            parameters["ResponseCacheControl"] = cache_control
+
         url = field_file.storage.url(
             storage_filename,
             parameters=parameters,  # type: ignore
@@ -355,14 +841,22 @@ def download_field_file(
             response["Content-Length"] = str(range.length)
             response["Accept-Ranges"] = "bytes"
 
+            if cache_control:
+                response["Cache-Control"] = cache_control
+
             return response
 
-        return FileResponse(
+        file_response = FileResponse(
             field_file.open(),
             as_attachment=as_attachment,
             filename=filename,
         )
 
+        if cache_control:
+            file_response["Cache-Control"] = cache_control
+
+        return file_response
+
     raise Exception(
         "Expected to either run behind nginx proxy, debug mode or within a test suite."
     )
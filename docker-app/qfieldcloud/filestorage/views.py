@@ -5,9 +5,10 @@ from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core import signing
 from django.db.models import Q, QuerySet
 from django.http import Http404
-from django.http.response import HttpResponseBase
+from django.http.response import HttpResponseBase, HttpResponseNotModified
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 from drf_spectacular.utils import (
     OpenApiTypes,
     extend_schema,
@@ -26,12 +27,21 @@ from qfieldcloud.core.models import (
 )
 from qfieldcloud.filestorage.models import (
     File,
+    FileUploadSession,
+)
+from qfieldcloud.filestorage.serializers import (
+    FileUploadSessionSerializer,
+    FileWithVersionsSerializer,
+    PresignedFileUploadSessionSerializer,
 )
-from qfieldcloud.filestorage.serializers import FileWithVersionsSerializer
 from qfieldcloud.filestorage.view_helpers import (
+    abort_file_upload_session,
+    create_file_upload_session,
     delete_project_file_version,
     download_field_file,
     download_project_file_version,
+    finalize_file_upload_session,
+    upload_file_upload_session_chunk,
     upload_project_file_version,
 )
 from qfieldcloud.project.models import Project, get_slim_project_or_raise
@@ -178,6 +188,184 @@ class FileCrudView(views.APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class FileUploadSessionViewPermissions(permissions.BasePermission):
+    def has_permission(self, request, view):
+        if "project_id" not in request.parser_context["kwargs"]:
+            return False
+
+        project_id = request.parser_context["kwargs"]["project_id"]
+        project = get_slim_project_or_raise(project_id)
+
+        return permissions_utils.can_create_files(request.user, project)
+
+
+@extend_schema_view(
+    post=extend_schema(
+        description="Start a resumable upload of a project file",
+        request=FileUploadSessionSerializer,
+        responses={201: FileUploadSessionSerializer()},
+    ),
+)
+class FileUploadSessionCreateView(views.APIView):
+    permission_classes = [
+        permissions.IsAuthenticated,
+        FileUploadSessionViewPermissions,
+    ]
+
+    def post(self, request: Request, project_id: UUID) -> Response:
+        serializer = FileUploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload_session = create_file_upload_session(
+            request,
+            project_id,
+            serializer.validated_data["filename"],
+            serializer.validated_data["size"],
+        )
+
+        headers = {
+            "Location": reverse(
+                "filestorage_upload_session",
+                kwargs={
+                    "project_id": project_id,
+                    "upload_session_id": upload_session.id,
+                },
+            ),
+        }
+
+        return Response(
+            FileUploadSessionSerializer(upload_session).data,
+            status=status.HTTP_201_CREATED,
+            headers=headers,
+        )
+
+
+@extend_schema_view(
+    post=extend_schema(
+        description="Start an upload of a project file directly to the object storage using presigned part URLs. Once all parts are uploaded, finalize the upload to create the new file version.",
+        request=PresignedFileUploadSessionSerializer,
+        responses={201: PresignedFileUploadSessionSerializer()},
+    ),
+)
+class PresignedFileUploadSessionCreateView(views.APIView):
+    permission_classes = [
+        permissions.IsAuthenticated,
+        FileUploadSessionViewPermissions,
+    ]
+
+    def post(self, request: Request, project_id: UUID) -> Response:
+        serializer = PresignedFileUploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload_session = create_file_upload_session(
+            request,
+            project_id,
+            serializer.validated_data["filename"],
+            serializer.validated_data["size"],
+            upload_method=FileUploadSession.UploadMethod.PRESIGNED,
+            etag=serializer.validated_data["etag"],
+        )
+
+        headers = {
+            "Location": reverse(
+                "filestorage_upload_session",
+                kwargs={
+                    "project_id": project_id,
+                    "upload_session_id": upload_session.id,
+                },
+            ),
+        }
+
+        return Response(
+            PresignedFileUploadSessionSerializer(upload_session).data,
+            status=status.HTTP_201_CREATED,
+            headers=headers,
+        )
+
+
+@extend_schema_view(
+    get=extend_schema(
+        description="Get the status of a resumable upload, including the number of bytes received so far. Presigned uploads also get renewed presigned part URLs.",
+        responses={200: FileUploadSessionSerializer()},
+    ),
+    put=extend_schema(
+        description="Upload a chunk of a resumable upload, the chunk position is passed with the `Content-Range` header",
+        request={"application/octet-stream": OpenApiTypes.BINARY},
+        responses={200: FileUploadSessionSerializer()},
+    ),
+    post=extend_schema(
+        description="Finalize a resumable upload and create the new file version",
+        request=None,
+        responses={201: None},
+    ),
+    delete=extend_schema(
+        description="Abort a resumable upload",
+    ),
+)
+class FileUploadSessionView(views.APIView):
+    permission_classes = [
+        permissions.IsAuthenticated,
+        FileUploadSessionViewPermissions,
+    ]
+
+    def get_upload_session(
+        self, project_id: UUID, upload_session_id: UUID
+    ) -> FileUploadSession:
+        return get_object_or_404(
+            FileUploadSession,
+            id=upload_session_id,
+            project_id=project_id,
+            created_by=self.request.user,
+        )
+
+    def get(
+        self, request: Request, project_id: UUID, upload_session_id: UUID
+    ) -> Response:
+        upload_session = self.get_upload_session(project_id, upload_session_id)
+
+        if upload_session.upload_method == FileUploadSession.UploadMethod.PRESIGNED:
+            serializer_class = PresignedFileUploadSessionSerializer
+        else:
+            serializer_class = FileUploadSessionSerializer
+
+        return Response(serializer_class(upload_session).data)
+
+    def put(
+        self, request: Request, project_id: UUID, upload_session_id: UUID
+    ) -> Response:
+        upload_session = self.get_upload_session(project_id, upload_session_id)
+        upload_session = upload_file_upload_session_chunk(request, upload_session)
+
+        return Response(FileUploadSessionSerializer(upload_session).data)
+
+    def post(
+        self, request: Request, project_id: UUID, upload_session_id: UUID
+    ) -> Response:
+        upload_session = self.get_upload_session(project_id, upload_session_id)
+        file_version = finalize_file_upload_session(request, upload_session)
+
+        headers = {
+            "Location": reverse(
+                "filestorage_crud_file",
+                kwargs={
+                    "project_id": project_id,
+                    "filename": file_version.file.name,
+                },
+            ),
+        }
+
+        return Response({}, status=status.HTTP_201_CREATED, headers=headers)
+
+    def delete(
+        self, request: Request, project_id: UUID, upload_session_id: UUID
+    ) -> Response:
+        upload_session = self.get_upload_session(project_id, upload_session_id)
+
+        abort_file_upload_session(upload_session)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 @extend_schema_view(
     get=extend_schema(
         description="Download the metadata of a project's file",
@@ -194,15 +382,32 @@ class ProjectMetaFileReadView(views.APIView):
 
     def get(self, request: Request, project_id: UUID) -> HttpResponseBase:
         project = get_object_or_404(
-            Project.objects.only("thumbnail"),
+            Project.objects.only("thumbnail", "file_storage"),
             Q(id=project_id) & Q(thumbnail__isnull=False) & ~Q(thumbnail=""),
         )
 
-        return download_field_file(
-            request,
-            project.thumbnail,
-            "thumbnail.png",
-        )
+        etag = quote_etag(project.thumbnail_etag)
+
+        # the versioned url from `Project.thumbnail_url` always points to the same thumbnail
+        if request.query_params.get("v") == project.thumbnail_etag:
+            cache_control = "private, max-age=31536000, immutable"
+        else:
+            cache_control = "private, no-cache"
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response: HttpResponseBase = HttpResponseNotModified()
+        else:
+            response = download_field_file(
+                request,
+                project.thumbnail,
+                "thumbnail.png",
+                cache_control=cache_control,
+            )
+
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+
+        return response
 
 
 class AvatarFileReadView(views.APIView):
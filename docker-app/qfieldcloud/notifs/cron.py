@@ -1,7 +1,11 @@
+import itertools
 import logging
+import time
+from collections.abc import Iterator
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
 from django.db.models import Exists
 from django.db.models.expressions import OuterRef
 from django.db.models.functions import Now
@@ -10,70 +14,197 @@ from django_cron import CronJobBase, Schedule
 from notifications.models import Notification
 
 from qfieldcloud.core.models import User
+from qfieldcloud.core.utils2 import metrics
+from qfieldcloud.notifs.models import NotificationEvent
+
+logger = logging.getLogger(__name__)
+
+# maximum number of users emailed in a single run, the remaining users are emailed on the next runs
+MAX_RECIPIENTS_PER_RUN = 1000
+
+# maximum number of notification events fanned out in a single run, the remaining events are fanned out on the next runs
+MAX_EVENTS_PER_RUN = 500
+
+# number of notifications inserted with a single query
+NOTIFICATIONS_BATCH_SIZE = 1000
+
+
+def get_due_notifications(
+    max_recipients: int,
+) -> Iterator[tuple[User, list[Notification]]]:
+    """Yields the users due to receive a notification email, with all their unread and not emailed notifications.
+
+    A user is due once the oldest of these notifications is older than the user's notifications frequency.
+    All the notifications are fetched with a single query, ordered by recipient.
+
+    Args:
+        max_recipients: maximum number of users to return
+    """
+    due_user_ids = (
+        User.objects.filter(type=User.Type.PERSON)
+        .exclude(email="")
+        .filter(
+            Exists(
+                Notification.objects.filter(
+                    recipient=OuterRef("pk"),
+                    unread=True,
+                    emailed=False,
+                    timestamp__lte=Now() - OuterRef("useraccount__notifs_frequency"),
+                )
+            )
+        )
+        .order_by("pk")
+        .values("pk")[:max_recipients]
+    )
+
+    notifs = (
+        Notification.objects.filter(
+            recipient__in=due_user_ids,
+            unread=True,
+            emailed=False,
+        )
+        .select_related("recipient")
+        .prefetch_related("actor", "target", "action_object")
+        .order_by("recipient_id", "timestamp")
+    )
+
+    for _recipient_id, recipient_notifs in itertools.groupby(
+        notifs, key=lambda n: n.recipient_id
+    ):
+        recipient_notifs = list(recipient_notifs)
+
+        yield recipient_notifs[0].recipient, recipient_notifs
+
+
+def render_notifications_email(
+    user: User, notifs: list[Notification]
+) -> EmailMultiAlternatives:
+    context = {
+        "notifs": notifs,
+        "username": user.username,
+        "hostname": settings.QFIELDCLOUD_HOST,
+    }
+
+    subject = render_to_string("notifs/notification_email_subject.txt", context)
+    body_html = render_to_string("notifs/notification_email_body.html", context)
+    body_plain = render_to_string("notifs/notification_email_body.txt", context)
+
+    email = EmailMultiAlternatives(
+        subject.strip(),
+        body_plain,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+    )
+    email.attach_alternative(body_html, "text/html")
+
+    return email
+
+
+def fan_out_notification_event(event: NotificationEvent) -> int:
+    """Creates a notification for each recipient of the event and deletes the event.
+
+    Returns:
+        the number of created notifications.
+    """
+    notifs = [
+        Notification(
+            recipient_id=recipient_id,
+            actor_content_type_id=event.actor_content_type_id,
+            actor_object_id=event.actor_object_id,
+            verb=event.verb,
+            action_object_content_type_id=event.action_object_content_type_id,
+            action_object_object_id=event.action_object_object_id,
+            target_content_type_id=event.target_content_type_id,
+            target_object_id=event.target_object_id,
+            timestamp=event.created_at,
+        )
+        for recipient_id in event.recipient_ids
+    ]
+
+    with transaction.atomic():
+        # NOTE recipients deleted since the event was created are skipped
+        existing_recipient_ids = set(
+            User.objects.filter(pk__in=event.recipient_ids).values_list("pk", flat=True)
+        )
+        notifs = [n for n in notifs if n.recipient_id in existing_recipient_ids]
+
+        Notification.objects.bulk_create(notifs, batch_size=NOTIFICATIONS_BATCH_SIZE)
+        event.delete()
+
+    return len(notifs)
+
+
+class FanOutNotificationEventsJob(CronJobBase):
+    schedule = Schedule(run_every_mins=1)
+    code = "qfieldcloud.fan_out_notification_events"
+
+    def do(self):
+        events = NotificationEvent.objects.order_by("created_at", "pk")[
+            :MAX_EVENTS_PER_RUN
+        ]
+
+        events_count = 0
+        notifs_count = 0
+        for event in events:
+            notifs_count += fan_out_notification_event(event)
+            events_count += 1
+
+        message = f"Created {notifs_count} notification(s) from {events_count} notification event(s)."
+        logger.info(message)
+
+        return message
 
 
 class SendNotificationsJob(CronJobBase):
     schedule = Schedule(run_every_mins=1)
     code = "qfieldcloud.send_notifications"
 
-    # TODO : not sure if/how this is logged somewhere
+    # NOTE a run might take longer than a minute, the next run must not send the same notifications again.
+    # This is already the `django_cron` default, it is explicit as the job relies on it.
+    ALLOW_PARALLEL_RUNS = False
+
     def do(self):
-        try:
-            users = User.objects.filter(type=User.Type.PERSON).filter(
-                Exists(
-                    Notification.objects.filter(
-                        unread=True,
-                        emailed=False,
-                        timestamp__lte=Now()
-                        - OuterRef("useraccount__notifs_frequency"),
-                    )
-                )
-            )
-            for user in users:
-                logging.debug(f"Retrieving notifications for {user}")
+        started_at = time.monotonic()
+        sent_count = 0
+        failed_count = 0
+        notifs_count = 0
 
-                notifs = Notification.objects.filter(
-                    recipient=user, unread=True, emailed=False
-                )
-                if not notifs:
-                    logging.debug(f"{user} has no notifications.")
-                    continue
+        # a single SMTP connection is used for all the emails, unless sending fails and it has to be reopened
+        with get_connection() as connection:
+            for user, notifs in get_due_notifications(MAX_RECIPIENTS_PER_RUN):
+                logger.debug(f"Sending an email to {user} !")
 
-                if not user.email:
-                    logging.warning(f"{user} has notifications, but no email set !")
+                # NOTE each email is sent on its own, so a failing email does not prevent sending the others
+                try:
+                    connection.send_messages([render_notifications_email(user, notifs)])
+                # Catch any exception the email backend can raise, the failed notifications will be retried on the next run.
+                except Exception as err:  # noqa: BLE001
+                    logger.exception(
+                        f"Failed to send the notification email to {user}: {err}"
+                    )
+                    failed_count += 1
+                    connection.close()
                     continue
 
-                QFIELDCLOUD_HOST = settings.QFIELDCLOUD_HOST
-
-                logging.debug(f"Sending an email to {user} !")
+                # NOTE mark only the notifications that were sent, newer ones will be sent on the next run
+                Notification.objects.filter(id__in=[n.id for n in notifs]).update(
+                    emailed=True
+                )
 
-                context = {
-                    "notifs": notifs,
-                    "username": user.username,
-                    "hostname": QFIELDCLOUD_HOST,
-                }
+                sent_count += 1
+                notifs_count += len(notifs)
 
-                subject = render_to_string(
-                    "notifs/notification_email_subject.txt", context
-                )
-                body_html = render_to_string(
-                    "notifs/notification_email_body.html", context
-                )
-                body_plain = render_to_string(
-                    "notifs/notification_email_body.txt", context
-                )
+        duration_s = time.monotonic() - started_at
 
-                # TODO : use mass_send_mail
-                send_mail(
-                    subject.strip(),
-                    body_plain,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                    html_message=body_html,
-                )
+        metrics.notification_emails.inc(sent_count, status="sent")
+        metrics.notification_emails.inc(failed_count, status="failed")
+        metrics.notification_emails_run_seconds.observe(duration_s)
 
-                notifs.update(emailed=True)
+        message = (
+            f"Sent {sent_count} notification email(s) with {notifs_count} notification(s)"
+            f" and failed {failed_count} in {duration_s:.2f}s"
+            f" ({sent_count / max(duration_s, 0.001):.1f} emails/s)."
+        )
+        logger.info(message)
 
-        except Exception as e:
-            logging.exception(e)
-            raise e
+        return message
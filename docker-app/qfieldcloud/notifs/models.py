@@ -0,0 +1,45 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class NotificationEvent(models.Model):
+    """An activity to be notified to its recipients.
+
+    Creating a `Notification` for each recipient is slow for large organizations, teams or projects,
+    therefore the signal handlers only store an event and `FanOutNotificationEventsJob` creates the notifications in batches.
+    The actor, the action object and the target are stored as content type and object id pairs,
+    as the objects might be deleted by the time the event is fanned out.
+    """
+
+    actor_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    actor_object_id = models.CharField(max_length=255)
+
+    verb = models.CharField(max_length=255)
+
+    action_object_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    action_object_object_id = models.CharField(max_length=255)
+
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    target_object_id = models.CharField(max_length=255, null=True, blank=True)
+
+    # ids of the users to notify, resolved when the event is created
+    recipient_ids = models.JSONField(default=list)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.verb}:{self.action_object_content_type_id}:{self.action_object_object_id}"
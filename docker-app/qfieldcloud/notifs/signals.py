@@ -2,10 +2,10 @@
 This module logs activity streams using the `django-activity-stream` package.
 """
 
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 from django_currentuser.middleware import get_current_authenticated_user
-from notifications.signals import notify
 
 from qfieldcloud.core.models import (
     Organization,
@@ -16,14 +16,17 @@ from qfieldcloud.core.models import (
     TeamMember,
     User,
 )
+from qfieldcloud.notifs.models import NotificationEvent
 from qfieldcloud.project.enums import ProjectRoleOrigins
 from qfieldcloud.project.models import Project
 
 
 def _send_notif(verb, action_object, recipient, target=None):
     """
-    Sends a notification through django-notifications, but sets it as already read
-    if the actor is the same as the recipient
+    Stores a notification event to be fanned out by `FanOutNotificationEventsJob`.
+
+    Only the recipient ids are resolved here with a single query, the notifications are created later in batches.
+    The actor is never notified about its own actions.
     """
     authenticated_user = get_current_authenticated_user()
 
@@ -31,31 +34,27 @@ def _send_notif(verb, action_object, recipient, target=None):
     if authenticated_user is None:
         return
 
-    # deduplicate
-    recipient = list(set(recipient))
-
-    if authenticated_user in recipient:
-        # If the actor is already the recipient, we consider the notification as seen
-
-        # TODO : marking notifications as read is currently not supported, so we disable
-        # self-notifications for now
-        # see https://github.com/django-notifications/django-notifications/issues/317
-        # notify.send(
-        #     authenticated_user,
-        #     verb=verb,
-        #     action_object=action_object,
-        #     target=target,
-        #     recipient=[authenticated_user],
-        #     unread=False, # not supported !
-        # )
-        recipient.remove(authenticated_user)
-
-    notify.send(
-        authenticated_user,
+    # TODO : marking notifications as read is currently not supported, so we disable
+    # self-notifications for now
+    # see https://github.com/django-notifications/django-notifications/issues/317
+    recipient_ids = sorted(
+        set(recipient.values_list("pk", flat=True)) - {authenticated_user.pk}
+    )
+
+    if not recipient_ids:
+        return
+
+    NotificationEvent.objects.create(
+        actor_content_type=ContentType.objects.get_for_model(authenticated_user),
+        actor_object_id=str(authenticated_user.pk),
         verb=verb,
-        action_object=action_object,
-        target=target,
-        recipient=list(recipient),
+        action_object_content_type=ContentType.objects.get_for_model(action_object),
+        action_object_object_id=str(action_object.pk),
+        target_content_type=(
+            ContentType.objects.get_for_model(target) if target is not None else None
+        ),
+        target_object_id=str(target.pk) if target is not None else None,
+        recipient_ids=recipient_ids,
     )
 
 
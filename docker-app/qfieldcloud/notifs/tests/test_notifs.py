@@ -1,5 +1,9 @@
 from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
+from django.core import mail
+from django.core.mail.backends import locmem
 from django.core.management import call_command
 from django.db import close_old_connections
 from django.test import TestCase
@@ -17,6 +21,8 @@ from qfieldcloud.core.models import (
     UserAccount,
 )
 from qfieldcloud.core.tests.utils import set_subscription, setup_subscription_plans
+from qfieldcloud.notifs.cron import FanOutNotificationEventsJob, SendNotificationsJob
+from qfieldcloud.notifs.models import NotificationEvent
 from qfieldcloud.project.models import Project
 
 
@@ -44,6 +50,9 @@ class QfcTestCase(TestCase):
         if filter is None:
             filter = {}
 
+        # the notifications are created from the pending events by the cron job
+        FanOutNotificationEventsJob().do()
+
         notifications = Notification.objects.filter(**filter)
         actual_count = notifications.count()
         if actual_count != expected_count:
@@ -177,6 +186,29 @@ class QfcTestCase(TestCase):
         self.assertNotifs(3, {"recipient": self.user2})
         self.assertNotifs(2, {"recipient": self.user3})
 
+    def test_fan_out_is_deferred(self):
+        org1 = Organization.objects.create(
+            username="org1", organization_owner=self.user1
+        )
+        memb2 = org1.members.create(member=self.user2)
+
+        _set_current_user(self.otheruser)
+
+        # a single event is stored, no notification is created yet
+        org1.members.create(member=self.user3)
+
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        # the recipients are resolved when the event happens, so user2 is notified for both events
+        memb2.delete()
+
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+        self.assertNotifs(2, {"recipient": self.user1})
+        self.assertNotifs(2, {"recipient": self.user2})
+        self.assertNotifs(2, {"recipient": self.user3})
+        self.assertEqual(NotificationEvent.objects.count(), 0)
+
     def test_cron(self):
         # Ensuring cron works
 
@@ -228,3 +260,111 @@ class QfcTestCase(TestCase):
         call_command("runcrons", "--force")
         self.assertNotifs(0, {"emailed": False})
         self.assertNotifs(2, {"emailed": True})
+
+    def test_cron_sends_one_email_per_due_user(self):
+        old = timezone.now() - timedelta(minutes=65)
+
+        for user in (self.user1, self.user2, self.user3):
+            user.email = f"{user.username}@example.com"
+            user.save()
+            user.useraccount.notifs_frequency = UserAccount.NOTIFS_HOURLY
+            user.useraccount.save()
+
+        # user1 and user2 have old enough notifications
+        for user in (self.user1, self.user2):
+            for verb in ("tests_old_1", "tests_old_2"):
+                notify.send(
+                    self.otheruser,
+                    verb=verb,
+                    action_object=user,
+                    recipient=[user],
+                    timestamp=old,
+                )
+
+        # user3 has only a recent notification
+        notify.send(
+            self.otheruser,
+            verb="tests_now",
+            action_object=self.user3,
+            recipient=[self.user3],
+            timestamp=timezone.now(),
+        )
+
+        mail.outbox = []
+        message = SendNotificationsJob().do()
+
+        self.assertIn("Sent 2 notification email(s) with 4 notification(s)", message)
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            ["user1@example.com", "user2@example.com"],
+        )
+        for email in mail.outbox:
+            self.assertIn("tests_old_1", email.body)
+            self.assertIn("tests_old_2", email.body)
+            self.assertEqual(len(email.alternatives), 1)
+
+        self.assertNotifs(4, {"emailed": True})
+        self.assertNotifs(1, {"emailed": False, "recipient": self.user3})
+
+        # the already emailed notifications are not sent again
+        mail.outbox = []
+        SendNotificationsJob().do()
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_cron_sends_the_other_emails_when_one_fails(self):
+        old = timezone.now() - timedelta(minutes=65)
+
+        for user in (self.user1, self.user2, self.user3):
+            user.email = f"{user.username}@example.com"
+            user.save()
+            user.useraccount.notifs_frequency = UserAccount.NOTIFS_HOURLY
+            user.useraccount.save()
+
+            notify.send(
+                self.otheruser,
+                verb="tests_old",
+                action_object=user,
+                recipient=[user],
+                timestamp=old,
+            )
+
+        send_messages = locmem.EmailBackend.send_messages
+
+        def send_messages_failing_for_user2(backend, messages):
+            if any(email.to == [self.user2.email] for email in messages):
+                raise SMTPException("Recipient refused")
+
+            return send_messages(backend, messages)
+
+        mail.outbox = []
+        with mock.patch.object(
+            locmem.EmailBackend, "send_messages", send_messages_failing_for_user2
+        ):
+            message = SendNotificationsJob().do()
+
+        self.assertIn("Sent 2 notification email(s) with 2 notification(s)", message)
+        self.assertIn("failed 1", message)
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            ["user1@example.com", "user3@example.com"],
+        )
+
+        self.assertNotifs(
+            1, {"emailed": True, "recipient": self.user1, "verb": "tests_old"}
+        )
+        self.assertNotifs(
+            1, {"emailed": False, "recipient": self.user2, "verb": "tests_old"}
+        )
+        self.assertNotifs(
+            1, {"emailed": True, "recipient": self.user3, "verb": "tests_old"}
+        )
+
+        # the failed email is sent again on the next run
+        mail.outbox = []
+        SendNotificationsJob().do()
+
+        self.assertEqual([email.to[0] for email in mail.outbox], ["user2@example.com"])
+        self.assertNotifs(
+            1, {"emailed": True, "recipient": self.user2, "verb": "tests_old"}
+        )
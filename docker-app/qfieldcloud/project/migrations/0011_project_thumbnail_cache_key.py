@@ -0,0 +1,19 @@
+# Generated by Django 5.2.17 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("project", "0010_qgisproject_area_of_interest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="thumbnail_cache_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+    ]
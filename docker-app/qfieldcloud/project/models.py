@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import uuid
 from datetime import datetime, timedelta
@@ -12,6 +13,7 @@ from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import GEOSException, GEOSGeometry
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import (
     FileExtensionValidator,
     MaxValueValidator,
@@ -129,6 +131,21 @@ class ProjectQueryset(models.QuerySet):
         """
         return self.only("id", "name", "is_public", "project_type", "owner_id")
 
+    def for_list(self) -> "ProjectQueryset":
+        """Defers the potentially large `project_details`, which is not needed when listing projects.
+
+        Whether the project details are set is still needed for the project status, so it is annotated instead,
+        see `Project.has_project_details`.
+        """
+        return self.defer("project_details").annotate(
+            project_details_is_set=Case(
+                When(
+                    Q(project_details__isnull=False) & ~Q(project_details={}), then=True
+                ),
+                default=False,
+            )
+        )
+
 
 def get_slim_project_or_raise(project_id: uuid.UUID | str | None) -> "Project":
     """Fetch a project for a permission check, or raise `Http404` if it doesn't exist.
@@ -386,6 +403,14 @@ class Project(models.Model):
         ],
     )
 
+    # key of the inputs the thumbnail has been rendered from, set by the `process_projectfile` job to skip rendering an unchanged thumbnail again
+    thumbnail_cache_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
     # Duplicating logic from the plan's storage_keep_versions
     # so that users use less file versions (therefore storage)
     # than as per their plan's default on specific projects.
@@ -667,6 +692,16 @@ class Project(models.Model):
     def has_the_qgis_file(self) -> bool:
         return self.the_qgis_file is not None
 
+    @property
+    def has_project_details(self) -> bool:
+        # NOTE avoid fetching the deferred `project_details` when annotated by `ProjectQueryset.for_list()`
+        if "project_details" in self.get_deferred_fields() and hasattr(
+            self, "project_details_is_set"
+        ):
+            return self.project_details_is_set
+
+        return bool(self.project_details)
+
     @property
     def the_qgis_file_name(self) -> str | None:
         if self.the_qgis_file is None:
@@ -694,19 +729,55 @@ class Project(models.Model):
 
         return keep_count
 
+    @property
+    def thumbnail_etag(self) -> str:
+        """Returns the ETag of the project's thumbnail or empty string if there is no thumbnail.
+
+        Each uploaded thumbnail is stored with a new unique name, so the name identifies the thumbnail contents.
+        """
+        if not self.thumbnail:
+            return ""
+
+        return hashlib.sha256(self.thumbnail.name.encode()).hexdigest()[:32]
+
+    def is_same_thumbnail(self, thumbnail: UploadedFile) -> bool:
+        """Returns whether the given thumbnail file has the same contents as the project's stored thumbnail.
+
+        The position of the given file is rewound, so it can be saved afterwards.
+        """
+        if not self.thumbnail or not self.thumbnail.storage.exists(self.thumbnail.name):
+            return False
+
+        if self.thumbnail.size != thumbnail.size:
+            return False
+
+        with self.thumbnail.open("rb") as f:
+            stored_sha256 = hashlib.sha256(f.read()).digest()
+
+        thumbnail.seek(0)
+        sha256 = hashlib.sha256(thumbnail.read()).digest()
+        thumbnail.seek(0)
+
+        return stored_sha256 == sha256
+
     @property
     def thumbnail_url(self) -> StrOrPromise:
-        """Returns the url to the project's thumbnail or empty string if no URL provided."""
+        """Returns the url to the project's thumbnail or empty string if no URL provided.
+
+        The url contains the thumbnail ETag, so it changes with each new thumbnail and can be cached by the clients.
+        """
         if not self.thumbnail:
             return ""
 
-        return reverse_lazy(
+        url = reverse_lazy(
             "filestorage_project_thumbnails",
             kwargs={
                 "project_id": self.id,
             },
         )
 
+        return f"{url}?v={self.thumbnail_etag}"
+
     def __str__(self):
         return f"{self.owner.username}/{self.name} [id={self.id}]"
 
@@ -956,7 +1027,7 @@ class Project(models.Model):
 
             # TODO use self.problems to get if there are project problems
             if (
-                not self.has_the_qgis_file or not self.project_details
+                not self.has_the_qgis_file or not self.has_project_details
             ) and not self.is_shared_datasets_project:
                 status = Project.Status.FAILED
                 status_code = Project.StatusCode.FAILED_PROCESS_PROJECTFILE
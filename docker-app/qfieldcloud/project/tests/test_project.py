@@ -311,6 +311,39 @@ class QfcTestCase(APITransactionTestCase):
         self.assertTrue(status.is_success(response.status_code))
         self.assertEqual(len(response.data), 0)
 
+    def test_list_projects_does_not_fetch_project_details(self):
+        project1 = Project.objects.create(
+            name="project1",
+            is_public=False,
+            owner=self.user1,
+            project_details={"crs": "EPSG:4326"},
+        )
+        project2 = Project.objects.create(
+            name="project2", is_public=False, owner=self.user1
+        )
+
+        projects = {p.pk: p for p in Project.objects.for_list()}
+
+        # the annotation is used, the deferred `project_details` are not fetched
+        with self.assertNumQueries(0):
+            self.assertTrue(projects[project1.pk].has_project_details)
+            self.assertFalse(projects[project2.pk].has_project_details)
+
+        self.assertIn("project_details", projects[project1.pk].get_deferred_fields())
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+
+        response = self.client.get("/api/v1/projects/")
+
+        self.assertTrue(status.is_success(response.status_code))
+        self.assertEqual(
+            {p["name"]: p["status"] for p in response.data},
+            {
+                "project1": Project.Status.FAILED,
+                "project2": Project.Status.FAILED,
+            },
+        )
+
     def test_list_collaborators_of_project(self):
         # Create a project of user1
         self.project1 = Project.objects.create(
@@ -1266,6 +1299,38 @@ class QfcTestCase(APITransactionTestCase):
         project.refresh_from_db()
         self.assertIsNotNone(project.thumbnail)
 
+    def test_upload_project_thumbnail_resets_the_cache_key_when_changed(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token1.key)
+
+        project = Project.objects.create(name="test_upload_thumbnail", owner=self.user1)
+
+        def upload_thumbnail(filename: str) -> None:
+            response = self.client.post(
+                f"/api/v1/projects/{project.id}/thumbnail/",
+                {"thumbnail": io.FileIO(testdata_path(filename), "rb")},
+                format="multipart",
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+            project.refresh_from_db()
+
+        upload_thumbnail("DCIM/1.jpg")
+        thumbnail_name = project.thumbnail.name
+        Project.objects.filter(id=project.id).update(thumbnail_cache_key="cache_key")
+
+        # the same thumbnail is uploaded again
+        upload_thumbnail("DCIM/1.jpg")
+
+        self.assertEqual(project.thumbnail.name, thumbnail_name)
+        self.assertEqual(project.thumbnail_cache_key, "cache_key")
+
+        # another thumbnail is uploaded
+        upload_thumbnail("DCIM/2.jpg")
+
+        self.assertNotEqual(project.thumbnail.name, thumbnail_name)
+        self.assertIsNone(project.thumbnail_cache_key)
+
     def test_upload_project_thumbnail_invalid_file(self):
         """Test that uploading a thumbnail with an invalid file type is not allowed."""
         from PIL import Image
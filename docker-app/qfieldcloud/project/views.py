@@ -148,7 +148,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
         project = self.get_object()
         serializer = self.get_serializer(project, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+
+        # the thumbnail and its cache key are kept if the contents are the same, e.g. the same thumbnail is rendered again
+        if project.is_same_thumbnail(serializer.validated_data["thumbnail"]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # the `process_projectfile` job sets the cache key again after uploading its rendered thumbnail
+        serializer.save(thumbnail_cache_key=None)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
@@ -170,6 +176,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
             if force_exclude_public:
                 projects = projects.exclude(user_role_origin=ProjectRoleOrigins.PUBLIC)
 
+            projects = projects.for_list()
+
         if self.action in ("seed", "seed_xlsform"):
             projects = projects.select_related("seed")
 
@@ -311,6 +319,7 @@ class PublicProjectsListView(generics.ListAPIView):
     def get_queryset(self):
         return (
             Project.objects.for_user(self.request.user)
+            .for_list()
             .filter(is_public=True)
             .order_by("-is_featured", "owner__username", "name")
         )
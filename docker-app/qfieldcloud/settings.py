@@ -172,11 +172,16 @@ MIDDLEWARE = [
 ]
 
 CRON_CLASSES = [
+    "qfieldcloud.notifs.cron.FanOutNotificationEventsJob",
     "qfieldcloud.notifs.cron.SendNotificationsJob",
     # "qfieldcloud.core.cron.DeleteExpiredInvitationsJob",
     "qfieldcloud.core.cron.ResendFailedInvitationsJob",
     "qfieldcloud.core.cron.SetTerminatedWorkersToFinalStatusJob",
     "qfieldcloud.core.cron.DeleteObsoleteProjectPackagesJob",
+    "qfieldcloud.core.cron.ClearJobOutputsAfterRetentionPeriodJob",
+    "qfieldcloud.filestorage.cron.AbortExpiredFileUploadSessionsJob",
+    "qfieldcloud.filestorage.cron.CalculateFileVersionChecksumsJob",
+    "qfieldcloud.core.cron.ArchiveDeltasJob",
 ]
 
 ROOT_URLCONF = "qfieldcloud.urls"
@@ -356,6 +361,12 @@ QFIELDCLOUD_PROJECT_THUMBNAIL_MAX_DIMENSION = 10000
 # 5MB
 QFIELDCLOUD_PROJECT_THUMBNAIL_MAX_BYTES = 5 * 1024 * 1024
 
+# Hours after the last received chunk when an unfinished resumable file upload is aborted and its uploaded parts are deleted.
+QFIELDCLOUD_FILE_UPLOAD_SESSION_EXPIRATION_HOURS = 24
+
+# Seconds the presigned URLs for uploading file parts directly to the object storage are valid for.
+QFIELDCLOUD_PRESIGNED_UPLOAD_URL_EXPIRE_S = 60 * 60
+
 AUTH_USER_MODEL = "core.User"
 
 # QFieldCloud variables
@@ -699,6 +710,15 @@ QFIELDCLOUD_API_DEFAULT_PAGE_LIMIT = 50
 
 APPLY_DELTAS_LIMIT = 1000
 
+# Backend used to validate the uploaded deltafiles against the JSON schema.
+# Either "jsonschema" for the interpretive `jsonschema.Draft7Validator` or the opt-in "compiled" for the faster Python code generated by `fastjsonschema`.
+QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND = (
+    os.environ.get("QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND") or "jsonschema"
+)
+
+# Number of deltas stored at once when ingesting an uploaded deltafile
+QFIELDCLOUD_DELTAS_INGEST_BATCH_SIZE = 500
+
 # The value of the "source" key in each logger entry.
 # Filters what logs are printed based on in which image we are running ("app" or "worker_wrapper").
 LOGGER_SOURCE = os.environ["LOGGER_SOURCE"]
@@ -751,6 +771,18 @@ CONSTANCE_CONFIG = {
         "Number of days to retain job logs before they are automatically deleted.",
         int,
     ),
+    "DELTAS_ARCHIVE_AFTER_DAYS": (
+        365,
+        """Number of days after which the deltas in a final status (applied, ignored or unpermitted) are moved to the archive table.
+        Archived deltas are still listed by the API, but no longer show in the admin. Set to 0 to disable the archiving.""",
+        int,
+    ),
+    "PACKAGE_REUSE_ONLINE_DATA_MAX_AGE_MINUTES": (
+        0,
+        """Maximum age of a finished package that can be reused by another package job with the same inputs, if the project has online layers (PostGIS/WFS/etc).
+        Packages of projects without online layers are always reused. Set to 0 to never reuse packages of projects with online layers.""",
+        int,
+    ),
     "WORKER_QGIS_MEMORY_LIMIT": (
         "1000m",
         "Maximum memory for each QGIS worker container.",
@@ -802,7 +834,11 @@ CONSTANCE_CONFIG_FIELDSETS = {
         "MAINTENANCE_END_TIMESTAMP_UTC",
         "MAINTENANCE_MESSAGE",
     ),
-    "Jobs": ("JOBS_LOGS_RETENTION_PERIOD_DAYS",),
+    "Jobs": (
+        "JOBS_LOGS_RETENTION_PERIOD_DAYS",
+        "PACKAGE_REUSE_ONLINE_DATA_MAX_AGE_MINUTES",
+    ),
+    "Deltas": ("DELTAS_ARCHIVE_AFTER_DAYS",),
     "Worker": (
         "WORKER_QGIS_MEMORY_LIMIT",
         "WORKER_QGIS_CPU_SHARES",
@@ -818,6 +854,9 @@ CONSTANCE_CONFIG_FIELDSETS = {
 # Minimum number of bytes to ask a range when requesting a file part, otherwise a HTTP 416 is returned. Set to 0 to allow any number of bytes in the range.
 QFIELDCLOUD_MINIMUM_RANGE_HEADER_LENGTH = 0
 
+# Bearer token required to scrape the Prometheus metrics at `/metrics`. The endpoint is disabled when not set.
+QFIELDCLOUD_METRICS_TOKEN = os.environ.get("QFIELDCLOUD_METRICS_TOKEN")
+
 # Timeout of the workers before being terminated by the wrapper, in seconds.
 QFIELDCLOUD_WORKER_TIMEOUT_S = int(os.environ.get("QFIELDCLOUD_WORKER_TIMEOUT_S", 600))
 
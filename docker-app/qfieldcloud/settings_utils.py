@@ -1,6 +1,6 @@
 import json
 import os
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 
 class ConfigValidationError(Exception): ...
@@ -18,6 +18,9 @@ class WebDavStorageOptions(TypedDict):
     webdav_url: str
     public_url: str
     basic_auth: str
+    pool_connections: NotRequired[int]
+    pool_maxsize: NotRequired[int]
+    max_retries: NotRequired[int]
 
 
 class DjangoStorages(TypedDict):
@@ -32,6 +32,7 @@ from rest_framework import permissions
 from qfieldcloud.authentication import views as auth_views
 from qfieldcloud.core.admin import qfc_admin_site
 from qfieldcloud.core.utils2.view_utils import blocked_view
+from qfieldcloud.core.views.metrics_views import metrics_view
 from qfieldcloud.core.views.redirect_views import redirect_to_admin_project_view
 from qfieldcloud.filestorage.views import (
     FileCrudView,
@@ -96,6 +97,7 @@ urlpatterns = [
             permanent=False,
         ),
     ),
+    path("metrics", metrics_view, name="metrics"),
     path("auth/", include("rest_framework.urls")),
     # Block the unstyled pages - must be before the allauth URLs
     path("accounts/3rdparty/", blocked_view),
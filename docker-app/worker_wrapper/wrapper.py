@@ -25,12 +25,15 @@ from qfieldcloud.core.models import (
     ApplyJob,
     ApplyJobDelta,
     Delta,
+    DeltaClientPk,
     Job,
     PackageJob,
     ProcessProjectfileJob,
     Secret,
 )
-from qfieldcloud.core.utils2 import packages
+from qfieldcloud.core.utils2 import jobs, metrics, packages
+from qfieldcloud.core.utils2.storage import get_attachment_dir_prefix
+from qfieldcloud.filestorage.models import File
 from qfieldcloud.project.models import QgisProject
 from qfieldcloud.project.utils.project_utils import get_qgis_major_version
 from tenacity import (
@@ -197,6 +200,7 @@ class JobRun:
             "JOB_ID": self.job_id,
             "PROJ_DOWNLOAD_DIR": TRANSFORMATION_GRIDS_PATH,
             "QT_QPA_PLATFORM": "offscreen",
+            "QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND": settings.QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND,
         }
 
         return environment
@@ -220,6 +224,14 @@ class JobRun:
     def before_docker_run(self) -> None:
         pass
 
+    def reuse_finished_job(self) -> bool:
+        """Reuses the results of an already finished job with the same inputs instead of running the docker container.
+
+        Returns:
+            whether the results of a finished job have been reused.
+        """
+        return False
+
     def after_docker_run(self) -> None:
         pass
 
@@ -262,12 +274,29 @@ class JobRun:
                 return
             # # # /CONCURRENCY CHECK # # #
 
+            metrics.job_queue_wait_seconds.observe(
+                (self.job.started_at - self.job.created_at).total_seconds(),
+                type=self.job.type,
+            )
+
             self.before_docker_run()
 
+            if self.reuse_finished_job():
+                self._finish()
+                return
+
             command = self.get_command()
 
             exit_code, output = self._run_docker(command)
 
+            if self.job.docker_started_at and self.job.docker_finished_at:
+                metrics.job_docker_run_seconds.observe(
+                    (
+                        self.job.docker_finished_at - self.job.docker_started_at
+                    ).total_seconds(),
+                    type=self.job.type,
+                )
+
             if exit_code == DOCKER_SIGKILL_EXIT_CODE:
                 feedback["error"] = "Docker engine sigkill."
                 feedback["error_type"] = "DOCKER_ENGINE_SIGKILL"
@@ -313,14 +342,23 @@ class JobRun:
 
             feedback["container_exit_code"] = exit_code
 
-            self.job.output = output.decode("utf-8")
+            self.job.set_output(output.decode("utf-8"))
             self.job.feedback = feedback
-            self.job.save(update_fields=["output", "feedback"])
+
+            worker_metrics = jobs.get_feedback_worker_metrics(feedback)
+            for field_name, value in worker_metrics.items():
+                setattr(self.job, field_name, value)
+
+            self.job.save(
+                update_fields=["output", "output_file", "feedback", *worker_metrics]
+            )
 
             if exit_code != 0 or feedback.get("error") is not None:
                 self.job.status = Job.Status.FAILED
                 self.job.save(update_fields=["status"])
 
+                metrics.record_job_failure(self.job)
+
                 try:
                     self.after_docker_exception()
                 # `after_docker_exception` can raise anything, as it is developed externally
@@ -332,16 +370,7 @@ class JobRun:
 
                 return
 
-            # make sure we have reloaded the project, since someone might have changed it already
-            self.job.project.refresh_from_db()
-
-            self.after_docker_run()
-
-            shutil.rmtree(str(self.shared_tempdir), ignore_errors=True)
-
-            self.job.finished_at = timezone.now()
-            self.job.status = Job.Status.FINISHED
-            self.job.save(update_fields=["status", "finished_at"])
+            self._finish()
 
         # Global error handler when handling a job
         except Exception as err:  # noqa: BLE001
@@ -373,11 +402,25 @@ class JobRun:
                     )
 
                 self.job.save(update_fields=["status", "feedback", "finished_at"])
+
+                metrics.record_job_failure(self.job)
             except IntegrityError as err:
                 logger.error(
                     "Failed to handle exception and update the job status", exc_info=err
                 )
 
+    def _finish(self) -> None:
+        # make sure we have reloaded the project, since someone might have changed it already
+        self.job.project.refresh_from_db()
+
+        self.after_docker_run()
+
+        shutil.rmtree(str(self.shared_tempdir), ignore_errors=True)
+
+        self.job.finished_at = timezone.now()
+        self.job.status = Job.Status.FINISHED
+        self.job.save(update_fields=["status", "finished_at"])
+
     def _run_docker(self, command: list[str]) -> tuple[int, bytes]:
         assert settings.QFIELDCLOUD_WORKER_QFIELDCLOUD_URL
         assert settings.QFIELDCLOUD_TRANSFORMATION_GRIDS_VOLUME_NAME
@@ -519,12 +562,74 @@ class PackageJobRun(JobRun):
         "%(project__packaging_offliner)s",
     ]
     data_last_packaged_at = None
+    reused_package_job: PackageJob | None = None
 
     def before_docker_run(self) -> None:
         # at the start of docker we assume we make the snapshot of the data
         self.data_last_packaged_at = timezone.now()
 
+        self.job.inputs_hash = packages.get_package_inputs_hash(
+            self.job.project, self.job.triggered_by, self.get_qgis_image()
+        )
+        self.job.save(update_fields=["inputs_hash"])
+
+        # the worker reuses the identical files of the previous package instead of uploading them again
+        previous_package_job = (
+            self.job.project.package_jobs_for_user(self.job.triggered_by)
+            .filter(status=Job.Status.FINISHED)
+            .exclude(pk=self.job.pk)
+            .order_by("-created_at")
+            .first()
+        )
+
+        with open(
+            self.shared_tempdir.joinpath("previous_package_manifest.json"), "w"
+        ) as f:
+            json.dump(packages.get_package_manifest(previous_package_job), f)
+
+    def reuse_finished_job(self) -> bool:
+        source_package_job = packages.get_reusable_package_job(self.job)
+
+        if not source_package_job:
+            return False
+
+        logger.info(
+            f"Reusing the package of job {source_package_job.id} for job {self.job.id}."
+        )
+
+        packages.reuse_package(source_package_job, self.job)
+
+        self.reused_package_job = source_package_job
+
+        # the package of a project with online layers is a snapshot of the data when the source job started
+        if self.job.project.has_online_vector_data is not False:
+            self.data_last_packaged_at = source_package_job.started_at
+
+        return True
+
     def after_docker_run(self) -> None:
+        package_manifest = packages.get_feedback_package_manifest(self.job.feedback)
+
+        # the files of a reused package are all already assigned to the job
+        if (
+            not self.reused_package_job
+            and package_manifest
+            and package_manifest["previous_package_job_id"]
+        ):
+            reused_filenames = [
+                filename
+                for filename, file_data in package_manifest["files"].items()
+                if file_data["reused"]
+            ]
+
+            if reused_filenames:
+                packages.assign_reused_package_files(
+                    package_manifest["previous_package_job_id"],
+                    self.job,
+                    reused_filenames,
+                    self.shared_tempdir.joinpath("reused_package_files"),
+                )
+
         # only successfully finished packaging jobs should update the Project.data_last_packaged_at
         self.job.project.data_last_packaged_at = self.data_last_packaged_at
         self.job.project.save(update_fields=("data_last_packaged_at",))
@@ -543,27 +648,10 @@ class ApplyDeltaJobRun(JobRun):
             self.command = [*self.command, "--overwrite-conflicts"]
 
     def _prepare_deltas(self, deltas: Iterable[Delta]) -> dict[str, Any]:
-        delta_contents = []
-        delta_client_ids = []
-
-        for delta in deltas:
-            delta_contents.append(delta.content)
+        delta_contents = [delta.content for delta in deltas]
 
-            if "clientId" in delta.content:
-                delta_client_ids.append(delta.content["clientId"])
-
-        local_to_remote_pk_deltas = Delta.objects.filter(
-            client_id__in=delta_client_ids,
-            last_modified_pk__isnull=False,
-        ).values(
-            "client_id", "content__localLayerId", "content__localPk", "last_modified_pk"
-        )
-
-        client_pks_map = {}
-
-        for delta_with_modified_pk in local_to_remote_pk_deltas:
-            key = f"{delta_with_modified_pk['client_id']}__{delta_with_modified_pk['content__localLayerId']}__{delta_with_modified_pk['content__localPk']}"
-            client_pks_map[key] = delta_with_modified_pk["last_modified_pk"]
+        # NOTE only the pks of the features patched or deleted by this batch are needed
+        client_pks_map = DeltaClientPk.objects.get_client_pks_map(delta_contents)
 
         deltafile_contents = {
             "deltas": delta_contents,
@@ -596,11 +684,13 @@ class ApplyDeltaJobRun(JobRun):
     def after_docker_run(self) -> None:
         delta_feedback = self.job.feedback["outputs"]["apply_deltas"]["delta_feedback"]
         is_data_modified = False
+        modified_pks = {}
 
         for feedback in delta_feedback:
             delta_id = feedback["delta_id"]
             status = feedback["status"]
             modified_pk = feedback["modified_pk"]
+            modified_pks[delta_id] = modified_pk
 
             if status == "status_applied":
                 status = Delta.Status.APPLIED
@@ -631,6 +721,8 @@ class ApplyDeltaJobRun(JobRun):
                 modified_pk=modified_pk,
             )
 
+        DeltaClientPk.objects.record(modified_pks)
+
         if is_data_modified:
             self.job.project.data_last_updated_at = timezone.now()
             self.job.project.save(update_fields=("data_last_updated_at",))
@@ -655,6 +747,8 @@ class ApplyDeltaJobRun(JobRun):
             modified_pk=None,
         )
 
+        DeltaClientPk.objects.clear(self.delta_ids)
+
 
 class ProcessProjectfileJobRun(JobRun):
     job_class = ProcessProjectfileJob
@@ -671,12 +765,47 @@ class ProcessProjectfileJobRun(JobRun):
 
         return context
 
+    def before_docker_run(self) -> None:
+        project = self.job.project
+        file_versions = {
+            name: str(latest_version_id)
+            for name, latest_version_id in File.objects.filter(
+                project=project,
+                file_type=File.FileType.PROJECT_FILE,
+            ).values_list("name", "latest_version_id")
+            if get_attachment_dir_prefix(project, name) == ""
+        }
+
+        with open(self.shared_tempdir.joinpath("thumbnail_cache.json"), "w") as f:
+            json.dump(
+                {
+                    "cache_key": project.thumbnail_cache_key
+                    if project.thumbnail
+                    else None,
+                    "file_versions": file_versions,
+                },
+                f,
+            )
+
     def after_docker_run(self) -> None:
-        update_fields = ["project_details"]
+        update_fields = ["project_details", "thumbnail_cache_key"]
         project = self.job.project
         project.project_details = self.job.feedback["outputs"]["project_details"][
             "project_details"
         ]
+        outputs = self.job.feedback["outputs"]
+        thumbnail_cache_key_outputs = outputs.get("thumbnail_cache_key", {})
+
+        # the thumbnail is fresh only if it has been reused or completely rendered and uploaded,
+        # otherwise it must be rendered again by the next job, e.g. after the rendering timeout
+        if thumbnail_cache_key_outputs.get("is_thumbnail_cached") or outputs.get(
+            "generate_thumbnail_image", {}
+        ).get("is_thumbnail_complete"):
+            project.thumbnail_cache_key = thumbnail_cache_key_outputs[
+                "thumbnail_cache_key"
+            ]
+        else:
+            project.thumbnail_cache_key = None
 
         # Since the `Project.qgis_version` field is newly added, we want to backfill it for old projects that didn't have it set,
         # but the `process_projectfile` job can detect the QGIS version from the project file and return it in the feedback, we can set it here.
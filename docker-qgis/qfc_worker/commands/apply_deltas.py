@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import copy
 import json
 import logging
 import os
@@ -12,6 +13,7 @@ from pathlib import Path
 from typing import Any, TypedDict, cast
 from uuid import UUID
 
+import fastjsonschema
 import jsonschema
 
 # pylint: disable=no-name-in-module
@@ -52,6 +54,9 @@ FeaturePk = str
 LayerId = str
 
 QFC_PG_EFFECTIVE_USER = os.getenv("QFC_PG_EFFECTIVE_USER")
+QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND = (
+    os.getenv("QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND") or "jsonschema"
+)
 
 
 class BaseOptions(TypedDict):
@@ -288,20 +293,66 @@ def apply_deltas(
     return delta_log_copy
 
 
+class CompiledSchemaValidator:
+    """JSON schema validator running the Python code generated by `fastjsonschema` from the schema.
+
+    Invalid instances are validated again with `jsonschema.Draft7Validator` to raise the detailed `jsonschema.ValidationError`.
+
+    NOTE the QGIS worker image does not ship the `qfieldcloud` Django app, so this is a copy of
+    `qfieldcloud.core.utils.CompiledSchemaValidator`, don't forget to update it too.
+    """
+
+    def __init__(self, schema: dict[str, Any]) -> None:
+        self.schema = schema
+        # `jsonschema.Draft7Validator` does not check formats without a format checker, neither should the compiled validator.
+        # NOTE `fastjsonschema` caches the resolved references by the schema objects, so compile a copy not shared with other schemas
+        self._validate = fastjsonschema.compile(
+            copy.deepcopy(schema),
+            use_default=False,
+            use_formats=False,
+            detailed_exceptions=False,
+        )
+        self._fallback_validator = jsonschema.Draft7Validator(schema)
+
+    def validate(self, instance: Any) -> None:
+        try:
+            self._validate(instance)
+            return
+        except fastjsonschema.JsonSchemaValueException:
+            pass
+
+        # raise the detailed error outside of the `except` block, so it is not chained to the compiled validator error
+        self._fallback_validator.validate(instance)
+
+        logger.warning(
+            "The compiled JSON schema validator rejected an instance accepted by jsonschema."
+        )
+
+
 @lru_cache(maxsize=128)
-def get_json_schema_validator() -> jsonschema.Draft7Validator:
+def get_json_schema_validator() -> jsonschema.Draft7Validator | CompiledSchemaValidator:
     """Creates a JSON schema validator to check whether the provided delta
     file is valid. The function result is cached.
 
+    The validator backend is set by the `QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND` envvar,
+    either "jsonschema" (default) or "compiled".
+
     Returns:
-        jsonschema.Draft7Validator -- JSON Schema validator
+        jsonschema.Draft7Validator | CompiledSchemaValidator -- JSON Schema validator
     """
     with open("./schemas/deltafile_01.json") as f:
         schema_dict = json.load(f)
 
     jsonschema.Draft7Validator.check_schema(schema_dict)
 
-    return jsonschema.Draft7Validator(schema_dict)
+    if QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND == "compiled":
+        return CompiledSchemaValidator(schema_dict)
+    elif QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND == "jsonschema":
+        return jsonschema.Draft7Validator(schema_dict)
+    else:
+        raise NotImplementedError(
+            f"Unknown deltafile validator backend: {QFIELDCLOUD_DELTAFILE_VALIDATOR_BACKEND}"
+        )
 
 
 def delta_file_args_loader(args: DeltaOptions) -> DeltaFile | None:
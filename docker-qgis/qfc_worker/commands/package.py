@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
 import logging
 from pathlib import Path
+from typing import Any
 from uuid import UUID
 
 from libqfieldsync.offline_converter import ExportType, OfflineConverter
@@ -14,7 +16,9 @@ from qgis.core import QgsCoordinateTransform, QgsCsException, QgsRectangle
 import qfc_worker.utils
 from qfc_worker.commands_base import QfcBaseCommand
 from qfc_worker.utils import (
+    get_file_sha256,
     get_layers_data,
+    get_relative_name,
     layers_data_to_string,
     open_qgis_project,
 )
@@ -147,6 +151,79 @@ def extract_layer_data(the_qgis_file_name: str | Path) -> dict:
     return layers_by_id
 
 
+def build_package_manifest(
+    project_dir: Path,
+    package_dir: Path,
+    layers_by_id: dict,
+    packaged_layers_by_id: dict,
+    previous_manifest_file: Path,
+) -> dict[str, Any]:
+    """Build the manifest of the package and decide which package files are reused from the previous package.
+
+    A package file is reused if the previous package has a file with the same name and checksum.
+    Reused files are not uploaded again, the server references the already stored files of the previous package instead.
+    The manifest maps each layer to its source file and to the package file it has been exported to.
+
+    NOTE this is not incremental packaging. The offline converter exports all the offline layers in a single pass,
+    so every layer is converted on every run and only the byte-for-byte identical package files skip the upload.
+    """
+    previous_manifest: dict[str, Any] = {
+        "package_job_id": None,
+        "files": {},
+    }
+
+    if previous_manifest_file.exists():
+        with open(previous_manifest_file) as f:
+            previous_manifest.update(json.load(f))
+
+    files = {}
+    for path in sorted(package_dir.rglob("*")):
+        if not path.is_file():
+            continue
+
+        filename = path.relative_to(package_dir).as_posix()
+        sha256 = get_file_sha256(path)
+        previous_file = previous_manifest["files"].get(filename)
+
+        files[filename] = {
+            "sha256": sha256,
+            "size": path.stat().st_size,
+            "reused": bool(previous_file and previous_file["sha256"] == sha256),
+        }
+
+    layers = {}
+    for layer_id, packaged_layer_data in packaged_layers_by_id.items():
+        layer_data = layers_by_id.get(layer_id) or {}
+        source = get_relative_name(layer_data.get("filename"), project_dir)
+        artifact = get_relative_name(packaged_layer_data.get("filename"), package_dir)
+
+        if artifact not in files:
+            # e.g. online layers, they are kept as they are in the packaged project
+            artifact_upload = "no_artifact"
+        elif files[artifact]["reused"]:
+            artifact_upload = "skipped_unchanged"
+        else:
+            artifact_upload = "uploaded"
+
+        layers[layer_id] = {
+            "name": packaged_layer_data.get("name"),
+            "source": source,
+            "artifact": artifact,
+            "artifact_upload": artifact_upload,
+        }
+
+    reused_count = sum(1 for file_data in files.values() if file_data["reused"])
+    logger.info(
+        f"Reusing {reused_count} of {len(files)} package files from the previous package {previous_manifest['package_job_id']}."
+    )
+
+    return {
+        "previous_package_job_id": previous_manifest["package_job_id"],
+        "files": files,
+        "layers": layers,
+    }
+
+
 class PackageCommand(QfcBaseCommand):
     def add_arguments(self, parser: argparse.ArgumentParser) -> None:
         parser.add_argument("project_id", type=UUID, help="Project ID")
@@ -157,12 +234,19 @@ class PackageCommand(QfcBaseCommand):
             choices=(OfflinerType.QGISCORE, OfflinerType.PYTHONMINI),
             default=OfflinerType.QGISCORE,
         )
+        parser.add_argument(
+            "--previous-manifest-file",
+            type=Path,
+            default=Path("/io/previous_package_manifest.json"),
+            help="Path to the manifest JSON file of the previous package",
+        )
 
     def get_workflow(  # type: ignore
         self,
         project_id: UUID,
         project_file: str,
         offliner_type: OfflinerType,
+        previous_manifest_file: Path,
     ) -> Workflow:
         workflow = Workflow(
             id="package_project",
@@ -225,12 +309,32 @@ class PackageCommand(QfcBaseCommand):
                     name="Stop QGIS Application",
                     method=qfc_worker.utils.stop_app,
                 ),
+                Step(
+                    id="package_manifest",
+                    name="Package Manifest",
+                    arguments={
+                        "project_dir": WorkDirPath("files"),
+                        "package_dir": WorkDirPath("export", mkdir=True),
+                        "layers_by_id": StepOutput("qgis_layers_data", "layers_by_id"),
+                        "packaged_layers_by_id": StepOutput(
+                            "qfield_layer_data", "layers_by_id"
+                        ),
+                        "previous_manifest_file": previous_manifest_file,
+                    },
+                    method=build_package_manifest,
+                    return_names=["package_manifest"],
+                    outputs=["package_manifest"],
+                ),
                 Step(
                     id="upload_packaged_project",
                     name="Upload Packaged Project",
                     arguments={
                         "project_id": project_id,
                         "package_dir": WorkDirPath("export", mkdir=True),
+                        "package_manifest": StepOutput(
+                            "package_manifest", "package_manifest"
+                        ),
+                        "reused_files_dir": Path("/io/reused_package_files"),
                     },
                     method=qfc_worker.utils.upload_package,
                 ),
@@ -1,11 +1,15 @@
 import argparse
+import hashlib
+import json
 import logging
 from pathlib import Path
 from typing import Any, TypedDict, cast
 from uuid import UUID
 from xml.etree import ElementTree
 
+from libqfieldsync.layer import LayerSource
 from qgis.core import (
+    Qgis,
     QgsCoordinateReferenceSystem,
     QgsGeometry,
     QgsMapRendererCustomPainterJob,
@@ -23,13 +27,14 @@ from qfc_worker.exceptions import (
     ProjectFileNotFoundException,
 )
 from qfc_worker.utils import (
+    MapDetails,
     download_project,
     get_layers_data,
     get_qgis_version_from_project_file,
     get_qgis_xml_error_context,
+    get_relative_name,
     layers_data_to_string,
-    open_qgis_project_as_readonly,
-    open_qgis_project_temporarily,
+    open_qgis_project_with_map_details,
     reproject_extent,
     start_app,
     stop_app,
@@ -126,23 +131,19 @@ def _get_area_of_interest(project: QgsProject) -> QgsRectangle | None:
         return None
 
 
-def _extract_project_details(project: QgsProject) -> ProjectDetails:
+def _extract_project_details(
+    project: QgsProject, map_details: MapDetails
+) -> ProjectDetails:
     """Extract project details"""
     logger.info("Extract project details…")
-    logger.info("Reading QGIS project file…")
 
     details: ProjectDetails = cast(ProjectDetails, {})
-    tmp_project_details = open_qgis_project_temporarily(project.fileName())
-    tmp_project = tmp_project_details["project"]
-
-    # NOTE force delete the `QgsProject`, otherwise the `QgsApplication` might be deleted by the time the project is garbage collected
-    del tmp_project
 
     extent_wkt = ""
     project_crs = project.crs()
     try:
         reprojected_extent = reproject_extent(
-            tmp_project_details["map_settings"].extent(), project_crs
+            map_details["map_settings"].extent(), project_crs
         )
         extent_wkt = reprojected_extent.asWktPolygon()
     except ValueError as error:
@@ -157,7 +158,7 @@ def _extract_project_details(project: QgsProject) -> ProjectDetails:
     if area_of_interest:
         area_of_interest_wkt = area_of_interest.asWktPolygon()
 
-    details["background_color"] = tmp_project_details["background_color"]
+    details["background_color"] = map_details["background_color"]
     details["extent"] = extent_wkt
     details["area_of_interest"] = area_of_interest_wkt
     details["crs"] = project_crs.authid()
@@ -182,20 +183,70 @@ def _extract_project_details(project: QgsProject) -> ProjectDetails:
     return details
 
 
+def _get_thumbnail_cache_key(
+    project: QgsProject,
+    project_dir: Path,
+    thumbnail_cache_file: Path,
+) -> tuple[str, bool]:
+    """Calculate the key of the thumbnail inputs and check whether it matches the key of the current thumbnail.
+
+    The key is calculated from the versions of the QGIS project file and of the project files used as layer sources, as provided by the server.
+    Layers with sources out of the project files, e.g. databases or web services, do not change the key.
+    """
+    thumbnail_cache: dict[str, Any] = {
+        "cache_key": None,
+        "file_versions": {},
+    }
+
+    if thumbnail_cache_file.exists():
+        with open(thumbnail_cache_file) as f:
+            thumbnail_cache.update(json.load(f))
+
+    filenames = {get_relative_name(project.fileName(), project_dir)}
+    for layer in project.mapLayers().values():
+        filenames.add(get_relative_name(LayerSource(layer).filename, project_dir))
+
+    file_versions = thumbnail_cache["file_versions"]
+    hasher = hashlib.sha256()
+    # the rendering might differ between QGIS versions
+    hasher.update(Qgis.version().encode())
+
+    for filename in sorted(filename for filename in filenames if filename):
+        hasher.update(f"{filename}\0{file_versions.get(filename, '')}\n".encode())
+
+    cache_key = hasher.hexdigest()
+    is_thumbnail_cached = cache_key == thumbnail_cache["cache_key"]
+
+    if is_thumbnail_cached:
+        logger.info(
+            "The thumbnail inputs did not change, reusing the current thumbnail."
+        )
+
+    return cache_key, is_thumbnail_cached
+
+
 def _generate_thumbnail(
-    the_qgis_file_name: str,
+    map_details: MapDetails,
     thumbnail_filename: Path,
     thumbnail_timeout_s: int = THUMBNAIL_TIMEOUT_S,
-) -> Path | None:
+    is_thumbnail_cached: bool = False,
+) -> tuple[Path | None, bool]:
     """Create a thumbnail for the project
 
     As from https://docs.qgis.org/3.16/en/docs/pyqgis_developer_cookbook/composer.html#simple-rendering
+
+    Returns:
+        the thumbnail filename, if any, and whether the thumbnail has been completely rendered, i.e. not cancelled by the timeout.
     """
+    if is_thumbnail_cached:
+        logger.info("Skip generating the project thumbnail image.")
+
+        return None, False
+
     logger.info("Generate project thumbnail image…")
 
-    tmp_project_details = open_qgis_project_temporarily(the_qgis_file_name)
-    tmp_project = tmp_project_details["project"]
-    map_settings = tmp_project_details["map_settings"]
+    # NOTE the map settings are read while opening the project in the `opening_check` step, so the project is not opened again
+    map_settings = map_details["map_settings"]
 
     if map_settings.extent().isEmpty():
         logger.warning(
@@ -208,17 +259,17 @@ def _generate_thumbnail(
     if map_settings.extent().isEmpty():
         logger.warning("Project has empty extent, no thumbnail can be generated.")
 
-        # NOTE force delete the `QgsProject`, otherwise the `QgsApplication` might be deleted by the time the project is garbage collected.
-        del tmp_project
-
-        return None
+        return None, False
 
     img = QImage(map_settings.outputSize(), QImage.Format.Format_ARGB32)
     painter = QPainter(img)
     job = QgsMapRendererCustomPainterJob(map_settings, painter)
+    is_timeout_reached = False
 
     def on_timeout():
-        nonlocal job
+        nonlocal job, is_timeout_reached
+
+        is_timeout_reached = True
 
         logger.warning(
             f"Thumbnail generation timeout {thumbnail_timeout_s} seconds reached, cancelling the job..."
@@ -256,25 +307,40 @@ def _generate_thumbnail(
     del job
     del painter
     del img
-    # NOTE force delete the `QgsProject`, otherwise the `QgsApplication` might be deleted by the time the project is garbage collected
-    del tmp_project
 
     if is_thumbnail_generated:
-        logger.info("Project thumbnail image generated!")
+        # NOTE the partially rendered image is still better than no thumbnail, but it should be rendered again by the next job
+        is_thumbnail_complete = not is_timeout_reached
 
-        return thumbnail_filename
+        if is_thumbnail_complete:
+            logger.info("Project thumbnail image generated!")
+        else:
+            logger.warning("Project thumbnail image only partially generated.")
+
+        return thumbnail_filename, is_thumbnail_complete
     else:
         logger.warning("Project thumbnail image could not be generated.")
 
-        return None
+        return None, False
 
 
 class ProcessProjectfileCommand(QfcBaseCommand):
     def add_arguments(self, parser: argparse.ArgumentParser) -> None:
         parser.add_argument("project_id", type=UUID, help="Project ID")
         parser.add_argument("project_file", type=str, help="QGIS project file path")
+        parser.add_argument(
+            "--thumbnail-cache-file",
+            type=Path,
+            default=Path("/io/thumbnail_cache.json"),
+            help="Path to the JSON file with the key of the current thumbnail and the project file versions",
+        )
 
-    def get_workflow(self, project_id: UUID, project_file: str) -> Workflow:  # type: ignore
+    def get_workflow(  # type: ignore
+        self,
+        project_id: UUID,
+        project_file: str,
+        thumbnail_cache_file: Path,
+    ) -> Workflow:
         workflow = Workflow(
             id="process_projectfile",
             name="Process Projectfile",
@@ -310,31 +376,47 @@ class ProcessProjectfileCommand(QfcBaseCommand):
                     name="Opening Check",
                     arguments={
                         "the_qgis_file_name": WorkDirPathAsStr("files", project_file),
-                        "force_reload": True,
                         "disable_feature_count": True,
                     },
-                    method=open_qgis_project_as_readonly,
-                    return_names=["project"],
+                    method=open_qgis_project_with_map_details,
+                    return_names=["project", "map_details"],
                 ),
                 Step(
                     id="project_details",
                     name="Project Details",
                     arguments={
                         "project": StepOutput("opening_check", "project"),
+                        "map_details": StepOutput("opening_check", "map_details"),
                     },
                     method=_extract_project_details,
                     return_names=["project_details"],
                     outputs=["project_details"],
                 ),
+                Step(
+                    id="thumbnail_cache_key",
+                    name="Thumbnail Cache Key",
+                    arguments={
+                        "project": StepOutput("opening_check", "project"),
+                        "project_dir": WorkDirPath("files"),
+                        "thumbnail_cache_file": thumbnail_cache_file,
+                    },
+                    method=_get_thumbnail_cache_key,
+                    return_names=["thumbnail_cache_key", "is_thumbnail_cached"],
+                    outputs=["thumbnail_cache_key", "is_thumbnail_cached"],
+                ),
                 Step(
                     id="generate_thumbnail_image",
                     name="Generate Thumbnail Image",
                     arguments={
-                        "the_qgis_file_name": WorkDirPathAsStr("files", project_file),
+                        "map_details": StepOutput("opening_check", "map_details"),
                         "thumbnail_filename": WorkDirPath("thumbnail.png"),
+                        "is_thumbnail_cached": StepOutput(
+                            "thumbnail_cache_key", "is_thumbnail_cached"
+                        ),
                     },
                     method=_generate_thumbnail,
-                    return_names=["thumbnail_filename"],
+                    return_names=["thumbnail_filename", "is_thumbnail_complete"],
+                    outputs=["is_thumbnail_complete"],
                 ),
                 Step(
                     id="upload_thumbnail",
@@ -0,0 +1,99 @@
+import io
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from qfc_worker.utils import (
+    _strip_feature_count_from_lines,
+    strip_feature_count_from_project_xml,
+)
+
+PROJECT_XML_LINES = [
+    b"<qgis>\n",
+    b'  <legendlayer drawingOrder="-1" showFeatureCount="1" name="bees">\n',
+    b"  </legendlayer>\n",
+    b'  <Option type="QString" name="showFeatureCount" value="1"/>\n',
+    b'  <Option type="QString" name="otherOption" value="1"/>\n',
+    b"</qgis>\n",
+]
+
+
+class StripFeatureCountFromLinesTestCase(unittest.TestCase):
+    def test_feature_count_is_disabled(self):
+        output = io.BytesIO()
+
+        is_changed = _strip_feature_count_from_lines(PROJECT_XML_LINES, output)
+
+        self.assertTrue(is_changed)
+        self.assertEqual(
+            output.getvalue().splitlines(keepends=True),
+            [
+                b"<qgis>\n",
+                b'  <legendlayer drawingOrder="-1" showFeatureCount="0" name="bees">\n',
+                b"  </legendlayer>\n",
+                b'  <Option type="QString" name="showFeatureCount" value="0"/>\n',
+                b'  <Option type="QString" name="otherOption" value="1"/>\n',
+                b"</qgis>\n",
+            ],
+        )
+
+    def test_disabled_feature_count_is_not_changed(self):
+        lines = [
+            b'<legendlayer showFeatureCount="0" name="bees">\n',
+            b'<Option name="showFeatureCount" value="0"/>\n',
+        ]
+        output = io.BytesIO()
+
+        is_changed = _strip_feature_count_from_lines(lines, output)
+
+        self.assertFalse(is_changed)
+        self.assertEqual(output.getvalue(), b"".join(lines))
+
+
+class StripFeatureCountFromProjectXmlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def _create_qgz(self, qgs_lines: list[bytes]) -> Path:
+        qgz_path = Path(self.tmp_dir.name).joinpath("project.qgz")
+
+        with zipfile.ZipFile(qgz_path, "w") as zout:
+            zout.writestr("project.qgs", b"".join(qgs_lines))
+            zout.writestr("project.qgd", b"auxiliary data")
+
+        return qgz_path
+
+    def test_qgz_feature_count_is_disabled(self):
+        qgz_path = self._create_qgz(PROJECT_XML_LINES)
+
+        strip_feature_count_from_project_xml(str(qgz_path))
+
+        with zipfile.ZipFile(qgz_path) as zin:
+            self.assertEqual(sorted(zin.namelist()), ["project.qgd", "project.qgs"])
+            self.assertEqual(zin.read("project.qgd"), b"auxiliary data")
+
+            qgs_content = zin.read("project.qgs")
+
+        self.assertNotIn(b'showFeatureCount="1"', qgs_content)
+        self.assertIn(b'name="showFeatureCount" value="0"', qgs_content)
+        self.assertIn(b'name="otherOption" value="1"', qgs_content)
+
+    def test_qgz_without_feature_count_is_kept(self):
+        qgz_path = self._create_qgz([b"<qgis>\n", b"</qgis>\n"])
+        mtime_ns = qgz_path.stat().st_mtime_ns
+
+        strip_feature_count_from_project_xml(str(qgz_path))
+
+        self.assertEqual(qgz_path.stat().st_mtime_ns, mtime_ns)
+        self.assertEqual(list(Path(self.tmp_dir.name).iterdir()), [qgz_path])
+
+    def test_qgs_feature_count_is_disabled(self):
+        qgs_path = Path(self.tmp_dir.name).joinpath("project.qgs")
+        qgs_path.write_bytes(b"".join(PROJECT_XML_LINES))
+
+        strip_feature_count_from_project_xml(str(qgs_path))
+
+        self.assertNotIn(b'showFeatureCount="1"', qgs_path.read_bytes())
+        self.assertIn(b'name="showFeatureCount" value="0"', qgs_path.read_bytes())
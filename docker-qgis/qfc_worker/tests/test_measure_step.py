@@ -0,0 +1,57 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from qfc_worker.workflow import (
+    RSS_SAMPLING_INTERVAL_S,
+    Step,
+    get_rss_bytes,
+    measure_step,
+)
+
+
+class QfcTestCase(unittest.TestCase):
+    def _step(self) -> Step:
+        return Step(id="step", name="Step", arguments={}, method=lambda: None)
+
+    def test_get_rss_bytes(self):
+        rss_bytes = get_rss_bytes()
+
+        self.assertIsNotNone(rss_bytes)
+        self.assertGreater(rss_bytes, 0)
+
+    def test_measure_step_peak_rss_is_per_step(self):
+        allocation_size = 256 * 1024 * 1024
+
+        with tempfile.TemporaryDirectory() as workdir:
+            allocating_step = self._step()
+
+            with measure_step(allocating_step, Path(workdir)):
+                data = b"\x01" * allocation_size
+                time.sleep(RSS_SAMPLING_INTERVAL_S * 3)
+                del data
+
+            other_step = self._step()
+
+            with measure_step(other_step, Path(workdir)):
+                time.sleep(RSS_SAMPLING_INTERVAL_S * 3)
+
+        self.assertGreaterEqual(
+            allocating_step.metrics["peak_rss_bytes"], allocation_size
+        )
+        self.assertLess(
+            other_step.metrics["peak_rss_bytes"],
+            allocating_step.metrics["peak_rss_bytes"],
+        )
+
+    def test_measure_step_stores_metrics_when_the_step_fails(self):
+        step = self._step()
+
+        with tempfile.TemporaryDirectory() as workdir:
+            with self.assertRaises(ValueError):
+                with measure_step(step, Path(workdir)):
+                    raise ValueError()
+
+        self.assertIsNotNone(step.metrics["peak_rss_bytes"])
+        self.assertGreaterEqual(step.metrics["cpu_time_s"], 0)
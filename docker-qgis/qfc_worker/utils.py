@@ -5,16 +5,17 @@ import io
 import logging
 import os
 import re
+import shutil
 import socket
 import subprocess
 import tempfile
 import xml.etree.ElementTree as ET
 import zipfile
-from collections.abc import Callable, Iterator
+from collections.abc import Callable, Iterable, Iterator
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, NamedTuple, TextIO, TypedDict, cast
+from typing import IO, Any, NamedTuple, TextIO, TypedDict
 from uuid import UUID
 
 from libqfieldsync.layer import LayerSource
@@ -30,17 +31,14 @@ from qgis.core import (
     QgsCoordinateTransform,
     QgsCsException,
     QgsFieldConstraints,
-    QgsLayerTree,
     QgsMapLayer,
     QgsMapSettings,
     QgsProject,
-    QgsProjectArchive,
     QgsProviderRegistry,
     QgsRectangle,
     QgsReferencedRectangle,
     QgsSettings,
     QgsWkbTypes,
-    QgsZipUtils,
 )
 from qgis.PyQt import QtCore, QtGui
 from qgis.PyQt.QtCore import QSize, QtMsgType
@@ -212,6 +210,7 @@ def open_qgis_project(
     force_reload: bool = False,
     disable_feature_count: bool = False,
     flags: Qgis.ProjectReadFlags = Qgis.ProjectReadFlags(),
+    on_project_read: Callable[[QDomDocument], None] | None = None,
 ) -> QgsProject:
     logging.info('Loading the QGIS file "%s"…', the_qgis_file_name)
 
@@ -232,15 +231,22 @@ def open_qgis_project(
     if disable_feature_count:
         strip_feature_count_from_project_xml(the_qgis_file_name)
 
-    with set_bad_layer_handler(project):
-        if not project.read(str(the_qgis_file_name), flags):
-            logging.error('Failed to load the QGIS file "%s"!', the_qgis_file_name)
+    if on_project_read:
+        project.readProject.connect(on_project_read)
 
-            project.setFileName("")
+    try:
+        with set_bad_layer_handler(project):
+            if not project.read(str(the_qgis_file_name), flags):
+                logging.error('Failed to load the QGIS file "%s"!', the_qgis_file_name)
 
-            raise Exception(
-                f"Unable to open project with QGIS file: {the_qgis_file_name}"
-            )
+                project.setFileName("")
+
+                raise Exception(
+                    f"Unable to open project with QGIS file: {the_qgis_file_name}"
+                )
+    finally:
+        if on_project_read:
+            project.readProject.disconnect(on_project_read)
 
     logging.info("Project loaded.")
 
@@ -260,20 +266,11 @@ def open_qgis_project_as_readonly(
     )
 
 
-class OpenQgisProjectTemporarilySettings(TypedDict):
-    layer_tree: QgsLayerTree | None
-    output_size: tuple[int, int]
-
-
-class OpenQgisProjectTemporarilyDetailsInner(TypedDict):
+class MapDetails(TypedDict):
     background_color: str
     map_settings: QgsMapSettings
 
 
-class OpenQgisProjectTemporarilyDetails(OpenQgisProjectTemporarilyDetailsInner):
-    project: QgsProject
-
-
 def reproject_extent(
     extent: QgsRectangle,
     source_crs: QgsCoordinateReferenceSystem,
@@ -350,147 +347,182 @@ def reproject_extent(
     return transformed_extent
 
 
-def open_qgis_project_temporarily(
-    qgis_filename: str,
-) -> OpenQgisProjectTemporarilyDetails:
-    """Opens a QGIS project temporarily to extract some details from it and returns the details and the project instance.
+def read_map_details(
+    project: QgsProject,
+    doc: QDomDocument,
+    output_size: tuple[int, int] = (100, 100),
+) -> MapDetails:
+    """Reads the background color and the map canvas settings of a project, as stored in the QGIS project file.
+
+    Must be called while the project is being read, as the map canvas settings are only available in the project XML.
 
     Args:
-        qgis_filename: the path of the QGIS project file (.qgs or .qgz)
+        project: the project being read
+        doc: the XML document of the project, as passed to `QgsProject.readProject`
+        output_size: the size of the rendered map image in pixels
 
     Returns:
-        a dictionary with the project details and the project instance
+        the background color and the map settings to render the project
     """
     map_settings = QgsMapSettings()
 
-    def on_project_read_wrapper(
-        tmp_project: QgsProject,
-        map_settings: QgsMapSettings,
-        settings: OpenQgisProjectTemporarilySettings,
-        details: OpenQgisProjectTemporarilyDetailsInner,
-    ) -> Callable[[QDomDocument], None]:
-        def on_project_read(doc: QDomDocument) -> None:
-            r, _success = tmp_project.readNumEntry("Gui", "/CanvasColorRedPart", 255)
-            g, _success = tmp_project.readNumEntry("Gui", "/CanvasColorGreenPart", 255)
-            b, _success = tmp_project.readNumEntry("Gui", "/CanvasColorBluePart", 255)
-            background_color = QColor(r, g, b)
-            map_settings.setBackgroundColor(background_color)
-
-            nodes = doc.elementsByTagName("mapcanvas")
-
-            for i in range(nodes.size()):
-                node = nodes.item(i)
-                element = node.toElement()
-                if (
-                    element.hasAttribute("name")
-                    and element.attribute("name") == "theMapCanvas"
-                ):
-                    map_settings.readXml(node)
-
-            map_settings.setRotation(0)
-            map_settings.setTransformContext(tmp_project.transformContext())
-            map_settings.setPathResolver(tmp_project.pathResolver())
-
-            output_size = settings["output_size"]
-            map_settings.setOutputSize(QSize(output_size[0], output_size[1]))
-
-            layer_tree = settings["layer_tree"]
-            if layer_tree:
-                map_settings.setLayers(reversed(list(layer_tree.customLayerOrder())))
-
-            if map_settings.extent().isEmpty():
-                # set to full extent if empty
-                map_settings.setExtent(map_settings.fullExtent())
-
-            details["background_color"] = background_color.name()
-            details["map_settings"] = map_settings
-
-        return on_project_read
-
-    details = cast(OpenQgisProjectTemporarilyDetailsInner, {})
-    tmp_project = QgsProject()
-    tmp_layer_tree = tmp_project.layerTreeRoot()
-
-    tmp_project.readProject.connect(
-        on_project_read_wrapper(
-            tmp_project,
-            map_settings,
-            {
-                "layer_tree": tmp_layer_tree,
-                "output_size": (100, 100),
-            },
-            details,
-        )
-    )
-    tmp_project.read(qgis_filename, qgis_project_readonly_flags)
+    r, _success = project.readNumEntry("Gui", "/CanvasColorRedPart", 255)
+    g, _success = project.readNumEntry("Gui", "/CanvasColorGreenPart", 255)
+    b, _success = project.readNumEntry("Gui", "/CanvasColorBluePart", 255)
+    background_color = QColor(r, g, b)
+    map_settings.setBackgroundColor(background_color)
 
-    details = cast(
-        OpenQgisProjectTemporarilyDetails,
-        {
-            **details,
-            "project": tmp_project,
-        },
+    nodes = doc.elementsByTagName("mapcanvas")
+
+    for i in range(nodes.size()):
+        node = nodes.item(i)
+        element = node.toElement()
+        if element.hasAttribute("name") and element.attribute("name") == "theMapCanvas":
+            map_settings.readXml(node)
+
+    map_settings.setRotation(0)
+    map_settings.setTransformContext(project.transformContext())
+    map_settings.setPathResolver(project.pathResolver())
+    map_settings.setOutputSize(QSize(output_size[0], output_size[1]))
+
+    layer_tree = project.layerTreeRoot()
+    if layer_tree:
+        map_settings.setLayers(reversed(list(layer_tree.customLayerOrder())))
+
+    if map_settings.extent().isEmpty():
+        # set to full extent if empty
+        map_settings.setExtent(map_settings.fullExtent())
+
+    return {
+        "background_color": background_color.name(),
+        "map_settings": map_settings,
+    }
+
+
+def open_qgis_project_with_map_details(
+    the_qgis_file_name: str,
+    disable_feature_count: bool = False,
+) -> tuple[QgsProject, MapDetails]:
+    """Opens the QGIS project as readonly and reads its map canvas settings while loading it.
+
+    The returned project and map settings can be used both to extract the project details and to render the project,
+    so the QGIS project file is opened only once.
+
+    Args:
+        the_qgis_file_name: the path of the QGIS project file (.qgs or .qgz)
+        disable_feature_count: disable the feature count of the layers in the legend before opening the project
+
+    Returns:
+        the project and its map details
+    """
+    project = QgsProject.instance()
+    map_details: list[MapDetails] = []
+
+    def on_project_read(doc: QDomDocument) -> None:
+        map_details.append(read_map_details(project, doc))
+
+    open_qgis_project(
+        the_qgis_file_name,
+        force_reload=True,
+        disable_feature_count=disable_feature_count,
+        flags=qgis_project_readonly_flags,
+        on_project_read=on_project_read,
     )
 
-    return details
+    return project, map_details[-1]
+
+
+LEGEND_LAYER_FEATURE_COUNT_RE = re.compile(
+    rb'(<legendlayer\b[^>]*?\bshowFeatureCount=")[^"]*(")'
+)
+LAYER_TREE_FEATURE_COUNT_RE = re.compile(
+    rb'(<Option\b(?=[^>]*\bname="showFeatureCount")[^>]*?\bvalue=")[^"]*(")'
+)
+
+
+class _DiscardSink:
+    """Binary writable sink that discards everything written to it."""
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+def _strip_feature_count_from_lines(
+    lines: Iterable[bytes], output: IO[bytes] | _DiscardSink
+) -> bool:
+    """Writes the XML lines with the feature count disabled and returns whether any line has been changed."""
+    is_changed = False
+
+    for line in lines:
+        new_line = LEGEND_LAYER_FEATURE_COUNT_RE.sub(rb"\g<1>0\g<2>", line)
+        new_line = LAYER_TREE_FEATURE_COUNT_RE.sub(rb"\g<1>0\g<2>", new_line)
+
+        is_changed = is_changed or new_line != line
+
+        output.write(new_line)
+
+    return is_changed
 
 
 def strip_feature_count_from_project_xml(the_qgis_file_name: str) -> None:
     """Rewrites project XML file with feature count disabled.
 
+    The XML is streamed line by line, as QGIS writes each XML element tag on a separate line.
+    The file is replaced only when the feature count was enabled for any layer.
+
     Args:
         the_qgis_file_name: filename of the QGIS filename (.qgs or .qgz)
     """
-    archive = None
-    xml_file = the_qgis_file_name
-    if QgsZipUtils.isZipFile(the_qgis_file_name):
-        logging.info("The QGIS file is zipped as .qgz, unzipping…")
+    project_path = Path(the_qgis_file_name)
 
-        archive = QgsProjectArchive()
+    with tempfile.NamedTemporaryFile(dir=project_path.parent, delete=False) as tmp_f:
+        tmp_path = Path(tmp_f.name)
 
-        if archive.unzip(the_qgis_file_name):
-            logging.info("The QGIS file is unzipped successfully!")
-            xml_file = archive.projectFile()
-        else:
-            logging.error("The QGIS file is unzipping failed!")
-
-            raise Exception(f"Failed to unzip {the_qgis_file_name} file!")
-
-    logging.info("Parsing QGIS file XML…")
+    try:
+        if zipfile.is_zipfile(project_path):
+            logging.info("The QGIS file is zipped as .qgz, streaming the XML…")
 
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
+            is_changed = _strip_feature_count_from_qgz(project_path, tmp_path)
+        else:
+            logging.info("Streaming the QGIS file XML…")
 
-    logging.info("QGIS project parsed!")
+            with open(project_path, "rb") as f, open(tmp_path, "wb") as tmp_f:
+                is_changed = _strip_feature_count_from_lines(f, tmp_f)
 
-    for node in root.findall(".//legendlayer"):
-        node.set("showFeatureCount", "0")
+        if is_changed:
+            tmp_path.replace(project_path)
 
-    for node in root.findall(
-        './/layer-tree-layer/customproperties/Option[@type="Map"]/Option[@name="showFeatureCount"]'
-    ):
-        node.set("value", "0")
+            logging.info("The QGIS file re-written with feature count disabled!")
+        else:
+            logging.info("The feature count is not enabled, the QGIS file is kept.")
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-    logging.info("Writing the QGIS project XML into a file…")
 
-    if archive:
-        tmp_filename = tempfile.NamedTemporaryFile().name
-        tree.write(tmp_filename, short_empty_elements=False)
+def _strip_feature_count_from_qgz(project_path: Path, output_path: Path) -> bool:
+    """Writes the .qgz archive with the feature count disabled in its .qgs file and returns whether it has been changed."""
+    with zipfile.ZipFile(project_path) as zin:
+        qgs_infos = [info for info in zin.infolist() if info.filename.endswith(".qgs")]
 
-        if not archive.clearProjectFile():
-            raise Exception("Failed to clear project path from the archive!")
+        if len(qgs_infos) != 1:
+            raise Exception(f"Failed to find the .qgs file in {project_path}!")
 
-        if not Path(tmp_filename).rename(xml_file):
-            raise Exception("Failed to move the temp xml file into archive dir!")
+        with zin.open(qgs_infos[0]) as f:
+            # first pass only checks whether the feature count is enabled, without keeping the XML in memory
+            is_changed = _strip_feature_count_from_lines(f, _DiscardSink())
 
-        archive.addFile(xml_file)
+        if not is_changed:
+            return False
 
-        if not archive.zip(the_qgis_file_name):
-            raise Exception(f"Failed to zip QGIS file {the_qgis_file_name}!")
-    else:
-        tree.write(xml_file, short_empty_elements=False)
+        with zipfile.ZipFile(output_path, "w") as zout:
+            for info in zin.infolist():
+                with zin.open(info) as f, zout.open(info, "w") as out_f:
+                    if info == qgs_infos[0]:
+                        _strip_feature_count_from_lines(f, out_f)
+                    else:
+                        shutil.copyfileobj(f, out_f)
 
-    logging.info("The QGIS file re-written!")
+    return True
 
 
 def download_project(
@@ -535,8 +567,29 @@ def download_project(
     return destination
 
 
-def upload_package(project_id: str, package_dir: Path) -> None:
+def upload_package(
+    project_id: str,
+    package_dir: Path,
+    package_manifest: dict | None = None,
+    reused_files_dir: Path | None = None,
+) -> None:
     client = sdk.Client()
+
+    if package_manifest:
+        # the reused files are already stored with the previous package, the server references them instead.
+        # They are moved out of the package dir and kept in the `reused_files_dir`, so the server can still store them
+        # if the previous package has been deleted in the meantime.
+        for filename, file_data in package_manifest["files"].items():
+            if not file_data["reused"]:
+                continue
+
+            if reused_files_dir:
+                reused_file = reused_files_dir.joinpath(filename)
+                reused_file.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(package_dir.joinpath(filename), reused_file)
+            else:
+                package_dir.joinpath(filename).unlink()
+
     list_local_files(project_id, package_dir)
 
     logging.info("Uploading packaged project files…")
@@ -925,6 +978,30 @@ def get_file_md5sum(filename: str) -> str:
     return hasher.hexdigest()
 
 
+def get_relative_name(filename: str | None, root_dir: Path) -> str | None:
+    """Returns the POSIX path of the file relative to the root directory, or `None` if the file is out of it."""
+    if not filename:
+        return None
+
+    try:
+        return Path(filename).resolve().relative_to(root_dir.resolve()).as_posix()
+    except ValueError:
+        return None
+
+
+def get_file_sha256(filename: str | Path) -> str:
+    BLOCKSIZE = 65536
+    hasher = hashlib.sha256()
+
+    with open(filename, "rb") as f:
+        chunk = f.read(BLOCKSIZE)
+        while chunk:
+            hasher.update(chunk)
+            chunk = f.read(BLOCKSIZE)
+
+    return hasher.hexdigest()
+
+
 def files_list_to_string(files: list[dict[str, Any]]) -> str:
     table = [
         [
@@ -1,8 +1,11 @@
 import inspect
 import io
 import json
+import os
 import sys
 import tempfile
+import threading
+import time
 import traceback
 import uuid
 from collections.abc import Callable
@@ -19,6 +22,9 @@ from qfc_worker.exceptions import (
     WorkflowValidationException,
 )
 
+# how often the resident set size is sampled during the step execution, see `measure_step`
+RSS_SAMPLING_INTERVAL_S = 0.1
+
 
 class Workflow:
     def __init__(
@@ -160,6 +166,8 @@ class Step:
         self.outputs = outputs or []
         # stage of the step execution: 0 = not started, 1 = in progress, 2 = completed
         self.stage = 0
+        # resource usage of the step execution, see `measure_step`
+        self.metrics: dict[str, Any] = {}
 
 
 class StepOutput:
@@ -206,6 +214,100 @@ def logger_context(step: Step):
         print(f"::>>>::{log_uuid} {step.stage}", file=sys.stderr)
 
 
+def get_network_bytes() -> tuple[int, int] | None:
+    """Returns the bytes received and sent over all non-loopback network interfaces, or `None` if not available.
+
+    Within a docker container the network namespace is dedicated, so these are the bytes transferred by the worker.
+    """
+    try:
+        with open("/proc/net/dev") as f:
+            lines = f.readlines()[2:]
+    except OSError:
+        return None
+
+    bytes_received = 0
+    bytes_sent = 0
+    for line in lines:
+        interface, data = line.split(":", 1)
+
+        if interface.strip() == "lo":
+            continue
+
+        values = data.split()
+        bytes_received += int(values[0])
+        bytes_sent += int(values[8])
+
+    return bytes_received, bytes_sent
+
+
+def get_rss_bytes() -> int | None:
+    """Returns the resident set size of the current process in bytes, or `None` if not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except OSError:
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@contextmanager
+def measure_step(step: Step, workdir: Path):
+    """Measures the resources used by the step execution and stores them in `step.metrics`, even if the step fails.
+
+    The steps are executed within the worker process, so:
+    - `cpu_time_s` is the CPU time used by the worker process during the step, the CPU time of child processes is not included;
+    - `peak_rss_bytes` is the highest resident set size of the worker process during the step, sampled every `RSS_SAMPLING_INTERVAL_S`.
+      Allocations shorter than the sampling interval might be missed.
+    """
+    started_at = time.perf_counter()
+    cpu_started_at = time.process_time()
+    network_bytes_before = get_network_bytes()
+    peak_rss_bytes = get_rss_bytes()
+    stop_sampling = threading.Event()
+
+    def sample_rss() -> None:
+        nonlocal peak_rss_bytes
+
+        while not stop_sampling.wait(RSS_SAMPLING_INTERVAL_S):
+            rss_bytes = get_rss_bytes()
+
+            if rss_bytes is not None and peak_rss_bytes is not None:
+                peak_rss_bytes = max(peak_rss_bytes, rss_bytes)
+
+    sampling_thread = threading.Thread(target=sample_rss, daemon=True)
+    sampling_thread.start()
+
+    try:
+        yield
+    finally:
+        stop_sampling.set()
+        sampling_thread.join()
+
+        rss_bytes_after = get_rss_bytes()
+        if rss_bytes_after is not None and peak_rss_bytes is not None:
+            peak_rss_bytes = max(peak_rss_bytes, rss_bytes_after)
+
+        network_bytes_after = get_network_bytes()
+
+        step.metrics = {
+            "wall_time_s": round(time.perf_counter() - started_at, 3),
+            "cpu_time_s": round(time.process_time() - cpu_started_at, 3),
+            "peak_rss_bytes": peak_rss_bytes,
+            "bytes_received": None,
+            "bytes_sent": None,
+            "files_count": sum(1 for path in workdir.rglob("*") if path.is_file()),
+        }
+
+        if network_bytes_before and network_bytes_after:
+            step.metrics["bytes_received"] = (
+                network_bytes_after[0] - network_bytes_before[0]
+            )
+            step.metrics["bytes_sent"] = (
+                network_bytes_after[1] - network_bytes_before[1]
+            )
+
+
 def json_default(obj):
     obj_str = type(obj).__qualname__
 
@@ -258,7 +360,8 @@ def run_workflow(
                     elif isinstance(value, WorkDirPathBase):
                         arguments[name] = value.eval(root_workdir)
 
-                return_values = step.method(**arguments)
+                with measure_step(step, root_workdir):
+                    return_values = step.method(**arguments)
 
                 # ensure the return values are always a tuple
                 if len(step.return_names) <= 1:
@@ -309,6 +412,7 @@ def run_workflow(
                 "name": step.name,
                 "stage": step.stage,
                 "returns": {},
+                "metrics": step.metrics,
             }
 
             if step.stage == 2:
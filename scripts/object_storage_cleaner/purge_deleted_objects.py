@@ -5,6 +5,11 @@ This script scans an object storage bucket for "logically deleted" objects (obje
 latest version is a Delete Marker) and optionally permanently deletes all versions
 of those objects to reclaim storage space.
 
+The bucket is split in shards by key prefix (e.g. one shard per `projects/<uuid>/`),
+which are listed by a pool of lister threads, while the permanent deletions are sent
+by a separate pool of deleter threads. The progress of each shard can be saved in a
+checkpoint file, so an interrupted run resumes where it stopped.
+
 Usage:
     python purge_deleted_objects.py <bucket> --retention-period "30 days" [options]
 """
@@ -12,17 +17,24 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import json
 import logging
+import os
 import re
 import signal
 import sys
-from collections.abc import Iterable, Iterator
-from dataclasses import dataclass
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import TYPE_CHECKING, Any, Literal
 
 import boto3
 from botocore.client import BaseClient
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
@@ -33,6 +45,12 @@ DELETE_BATCH_SIZE = 1000
 # AWS S3 limit for list object versions max keys up to 1000 (https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/list_object_versions.html)
 LIST_OBJECT_VERSIONS_MAX_KEYS = 1000
 
+# How often the checkpoint file is written while the shards are processed, in seconds
+CHECKPOINT_INTERVAL_S = 10
+
+# Set when the run is interrupted, the listers stop after their current page
+stop_event = threading.Event()
+
 if TYPE_CHECKING:
     from mypy_boto3_s3.type_defs import (
         DeleteObjectsOutputTypeDef,
@@ -58,6 +76,129 @@ class LogicallyDeletedObject:
     versions: list[dict[str, Any]]
 
 
+@dataclass(frozen=True)
+class Shard:
+    """A part of the bucket listed independently from the others.
+
+    If `delimiter` is set, only the keys directly under `prefix` belong to the shard,
+    the keys in its "subfolders" belong to other shards.
+    """
+
+    prefix: str
+    delimiter: str | None = None
+
+    @property
+    def name(self) -> str:
+        """Glob-like name of the shard, e.g. `projects/*` for the keys directly under `projects/`, `projects/**` for all."""
+        if self.delimiter:
+            return f"{self.prefix}*"
+
+        return f"{self.prefix}**"
+
+
+@dataclass
+class ShardProgress:
+    """The progress of a shard, as stored in the checkpoint file."""
+
+    # The last key which is completely processed, the listing resumes after it
+    key_marker: str | None = None
+    completed: bool = False
+    keys_count: int = 0
+    versions_count: int = 0
+    deleted_keys_count: int = 0
+    deleted_size_bytes: int = 0
+    deleted_versions_count: int = 0
+    elapsed_s: float = 0.0
+
+
+@dataclass
+class Checkpoint:
+    """Resumable state of a run, saved as JSON in the checkpoint file."""
+
+    bucket: str
+    prefix: str | None
+    dry_run: bool
+    shards: dict[str, ShardProgress] = field(default_factory=dict)
+    saved_at: float = field(default_factory=time.monotonic, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def load(
+        cls, path: str | None, bucket: str, prefix: str | None, dry_run: bool
+    ) -> Checkpoint:
+        """Loads the checkpoint file, or returns an empty checkpoint if it does not exist.
+
+        Args:
+            path: Optional path of the checkpoint file.
+            bucket: The bucket name of the run.
+            prefix: The prefix of the run.
+            dry_run: Whether the run is a dry-run.
+
+        Returns:
+            The checkpoint of the run.
+        """
+        checkpoint = cls(bucket=bucket, prefix=prefix, dry_run=dry_run)
+
+        if not path or not os.path.exists(path):
+            return checkpoint
+
+        with open(path) as f:
+            data = json.load(f)
+
+        if (data["bucket"], data["prefix"], data["dry_run"]) != (
+            bucket,
+            prefix,
+            dry_run,
+        ):
+            raise RuntimeError(
+                f"Checkpoint '{path}' was written by a run with different arguments "
+                f"(bucket: {data['bucket']}, prefix: {data['prefix']}, dry-run: {data['dry_run']})."
+            )
+
+        for name, progress in data["shards"].items():
+            checkpoint.shards[name] = ShardProgress(**progress)
+
+        return checkpoint
+
+    def get_progress(self, shard: Shard) -> ShardProgress:
+        with self.lock:
+            return self.shards.setdefault(shard.name, ShardProgress())
+
+    def update_progress(self, shard: Shard, **kwargs: Any) -> None:
+        with self.lock:
+            progress = self.shards.setdefault(shard.name, ShardProgress())
+
+            for key, value in kwargs.items():
+                setattr(progress, key, value)
+
+    def save(self, path: str | None) -> None:
+        """Atomically writes the checkpoint file.
+
+        Args:
+            path: Optional path of the checkpoint file, nothing is written if not set.
+        """
+        self.saved_at = time.monotonic()
+
+        if not path:
+            return
+
+        with self.lock:
+            data = {
+                "bucket": self.bucket,
+                "prefix": self.prefix,
+                "dry_run": self.dry_run,
+                "shards": {
+                    name: asdict(progress) for name, progress in self.shards.items()
+                },
+            }
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        os.replace(tmp_path, path)
+
+
 def format_bytes(num_bytes: int) -> str:
     """Convert a byte count to a human-readable string."""
     units = ["B", "KB", "MB", "GB", "TB", "PB"]
@@ -76,7 +217,11 @@ def format_bytes(num_bytes: int) -> str:
 
 
 def iter_all_versions(
-    s3_client: BaseClient, bucket: str, prefix: str | None = None
+    s3_client: BaseClient,
+    bucket: str,
+    prefix: str | None = None,
+    delimiter: str | None = None,
+    key_marker: str | None = None,
 ) -> Iterator[ObjectVersionOrDeleteMarker]:
     """
     Iterate over all object versions and delete markers from object storage, paginated.
@@ -84,12 +229,14 @@ def iter_all_versions(
     Object storage's `list_object_versions` returns `Versions` and `DeleteMarkers` as separate
     lists within each page. This function merges and sorts them by Key locally
     to ensure that all history (versions + markers) for a specific Key is yielded
-    contiguously before the iterator moves to the next Key.
+    contiguously before the iterator moves to the next Key, with the latest version first.
 
     Args:
         s3_client: The configured boto3 object storage client.
         bucket: The bucket name.
         prefix: Optional key prefix to limit the scan.
+        delimiter: Optional delimiter to skip the keys in the "subfolders" of the prefix.
+        key_marker: Optional key to start the listing after.
 
     Yields:
         ObjectVersionOrDeleteMarker: A dictionary representing either a Version or a Delete Marker.
@@ -102,6 +249,12 @@ def iter_all_versions(
     if prefix:
         paginate_kwargs["Prefix"] = prefix
 
+    if delimiter:
+        paginate_kwargs["Delimiter"] = delimiter
+
+    if key_marker:
+        paginate_kwargs["KeyMarker"] = key_marker
+
     for page in paginator.paginate(**paginate_kwargs):
         # Type from mypy_boto3_s3.type_defs
         page: ListObjectVersionsOutputTypeDef
@@ -119,8 +272,11 @@ def iter_all_versions(
             delete_marker["IsDeleteMarker"] = True
             versions.append(delete_marker)
 
-        # Sort by Key to keep versions of the same object together
-        versions.sort(key=lambda v: (v["Key"], v["LastModified"]), reverse=True)
+        # Sort by Key to keep versions of the same object together, pages are in ascending Key order.
+        # Within a Key, the latest version comes first, then the older ones from the newest to the oldest.
+        # Note the `LastModified` resolution might be too coarse to tell apart a version and its delete marker.
+        versions.sort(key=lambda v: v["LastModified"], reverse=True)
+        versions.sort(key=lambda v: (v["Key"], not v.get("IsLatest", False)))
 
         yield from versions
 
@@ -229,23 +385,17 @@ def delete_versions_batch(
         logger.error(f"Failed to delete versions batch: {err}")
 
 
-def iter_logically_deleted(
+def iter_key_histories(
     version_iterator: Iterator[ObjectVersionOrDeleteMarker],
-    retention_cutoff_ts: datetime | None = None,
-) -> Iterator[LogicallyDeletedObject]:
+) -> Iterator[tuple[str, list[ObjectVersionOrDeleteMarker]]]:
     """
-    Consumes an iterator of all object versions and yields ONLY the objects that are logically deleted.
-
-    This function relies on the input iterator being pre-sorted by `key`. It groups all versions
-    belonging to the same key into a list, and then passes that complete history to
-    `analyze_key_history` to determine if the object is currently in a deleted state.
+    Groups an iterator of object versions sorted by `key` into the complete history of each key.
 
     Args:
         version_iterator: An iterator of version dictionaries, MUST be sorted by `key`.
-        retention_cutoff_ts: Optional cutoff timestamp. If provided, the object is only returned if it was deleted *before* this timestamp. Recent deletions are ignored.
 
     Yields:
-        LogicallyDeletedObject: A summary object for every key that is currently deleted.
+        A tuple of the key and all its versions.
     """
     # We maintain a buffer of versions for the "current" key we are processing.
     # Since the input iterator is sorted, all versions for "Key A" will arrive sequentially
@@ -254,104 +404,281 @@ def iter_logically_deleted(
     current_versions: list[ObjectVersionOrDeleteMarker] = []
 
     for version in version_iterator:
-        # Case 1: First item in the entire iterator
-        if current_key is None:
-            current_key = version["Key"]
+        # Case 1: Same key as before -> Add to buffer
+        if version["Key"] == current_key:
             current_versions.append(version)
             continue
 
-        # Case 2: Same key as before -> Add to buffer
-        if version["Key"] == current_key:
-            current_versions.append(version)
+        # Case 2: New key detected -> Yield the previous buffer
+        if current_key is not None:
+            yield current_key, current_versions
+
+        # Reset buffer for the new key
+        current_key = version["Key"]
+        current_versions = [version]
+
+    # Case 3: End of iterator -> Yield the final buffer remaining in memory
+    if current_key is not None and current_versions:
+        yield current_key, current_versions
 
-        # Case 3: New key detected -> Process the previous buffer
-        else:
-            # We have collected all versions for 'current_key'. Now analyze it.
-            result = analyze_key_history(
-                current_key, current_versions, retention_cutoff_ts
-            )
-            if result:
-                yield result
 
-            # Reset buffer for the new key
-            current_key = version["Key"]
-            current_versions = [version]
+def iter_logically_deleted(
+    version_iterator: Iterator[ObjectVersionOrDeleteMarker],
+    retention_cutoff_ts: datetime | None = None,
+) -> Iterator[LogicallyDeletedObject]:
+    """
+    Consumes an iterator of all object versions and yields ONLY the objects that are logically deleted.
 
-    # Case 4: End of iterator -> Process the final buffer remaining in memory
-    if current_key and current_versions:
-        result = analyze_key_history(current_key, current_versions, retention_cutoff_ts)
+    This function relies on the input iterator being pre-sorted by `key`. It groups all versions
+    belonging to the same key into a list, and then passes that complete history to
+    `analyze_key_history` to determine if the object is currently in a deleted state.
+
+    Args:
+        version_iterator: An iterator of version dictionaries, MUST be sorted by `key`.
+        retention_cutoff_ts: Optional cutoff timestamp. If provided, the object is only returned if it was deleted *before* this timestamp. Recent deletions are ignored.
+
+    Yields:
+        LogicallyDeletedObject: A summary object for every key that is currently deleted.
+    """
+    for key, versions in iter_key_histories(version_iterator):
+        result = analyze_key_history(key, versions, retention_cutoff_ts)
         if result:
             yield result
 
 
-def action_scan(objects_iterator: Iterable[LogicallyDeletedObject]) -> None:
+def iter_common_prefixes(
+    s3_client: BaseClient, bucket: str, prefix: str, delimiter: str
+) -> Iterator[str]:
     """
-    Consume an iterator of logically deleted objects and log the details.
+    Iterate over the "subfolders" directly under a prefix, including the ones containing only deleted objects.
 
     Args:
-        objects_iterator: The iterator of logically deleted objects.
+        s3_client: The configured boto3 object storage client.
+        bucket: The bucket name.
+        prefix: The key prefix to list the "subfolders" of.
+        delimiter: The delimiter of the "subfolders", usually `/`.
+
+    Yields:
+        The prefix of each "subfolder", ending with the delimiter.
     """
-    logger.info("Scanning for logically deleted objects...")
-
-    # Counters for summary logging
-    key_count = 0
-    total_size_bytes = 0
-    total_versions_count = 0
-
-    for obj in objects_iterator:
-        # Update counters
-        key_count += 1
-        total_size_bytes += obj.total_size_bytes
-        total_versions_count += obj.versions_count
-
-        # Log details for each key
-        logger.info(
-            f"Found: {obj.key} | Deleted At: {obj.deleted_at} | "
-            f"Wasted Size: {format_bytes(obj.total_size_bytes)} | {obj.versions_count} versions"
-        )
+    paginator = s3_client.get_paginator("list_object_versions")
+    paginate_kwargs = {
+        "Bucket": bucket,
+        "Delimiter": delimiter,
+        "MaxKeys": LIST_OBJECT_VERSIONS_MAX_KEYS,
+    }
+    if prefix:
+        paginate_kwargs["Prefix"] = prefix
 
-    # Log summary
-    logger.info(f"Total deleted keys found: {key_count}")
-    logger.info(f"Total size wasted: {format_bytes(total_size_bytes)}")
-    logger.info(f"Total versions wasted: {total_versions_count}")
+    for page in paginator.paginate(**paginate_kwargs):
+        for common_prefix in page.get("CommonPrefixes", []):
+            yield common_prefix["Prefix"]
 
 
-def action_permanently_delete_versions(
+def discover_shards(
     s3_client: BaseClient,
     bucket: str,
-    objects_iterator: Iterable[LogicallyDeletedObject],
-) -> None:
+    prefix: str | None,
+    depth: int,
+    delimiter: str = "/",
+) -> list[Shard]:
     """
-    Consume an iterator of logically deleted objects and delete the versions in batches.
+    Split the keys under a prefix in shards, one per "subfolder" `depth` levels below the prefix.
+
+    E.g. with depth 2 and no prefix, each `projects/<uuid>/` is a shard, and the keys directly
+    under `projects/` and the bucket root are shards of their own.
+
+    Args:
+        s3_client: The configured boto3 object storage client.
+        bucket: The bucket name.
+        prefix: Optional key prefix to limit the scan.
+        depth: The number of "subfolder" levels to split, 0 means a single shard.
+        delimiter: The delimiter of the "subfolders", usually `/`.
+
+    Returns:
+        The shards covering all the keys under the prefix exactly once.
+    """
+    shards: list[Shard] = []
+    level_prefixes = [prefix or ""]
+
+    for _level in range(depth):
+        next_level_prefixes: list[str] = []
+
+        for level_prefix in level_prefixes:
+            shards.append(Shard(level_prefix, delimiter))
+            next_level_prefixes.extend(
+                iter_common_prefixes(s3_client, bucket, level_prefix, delimiter)
+            )
+
+        level_prefixes = next_level_prefixes
+
+    shards.extend(Shard(level_prefix) for level_prefix in level_prefixes)
+
+    return shards
+
+
+def process_shard(
+    s3_client: BaseClient,
+    bucket: str,
+    shard: Shard,
+    retention_cutoff_ts: datetime | None,
+    checkpoint: Checkpoint,
+    delete_executor: ThreadPoolExecutor | None,
+    delete_slots: threading.Semaphore,
+) -> ShardProgress:
+    """
+    List a shard and permanently delete the versions of its logically deleted objects.
+
+    The listing resumes after the key marker of the shard in the checkpoint. The key marker only moves
+    past a key once its versions are permanently deleted, so a resumed run never skips a key.
 
     Args:
         s3_client: The configured S3 client.
         bucket: The bucket name.
-        objects_iterator: The iterator of logically deleted objects.
+        shard: The shard to process.
+        retention_cutoff_ts: Optional cutoff timestamp, objects deleted after it are ignored.
+        checkpoint: The checkpoint of the run, updated with the progress of the shard.
+        delete_executor: The pool of deleter threads, or None for dry-run.
+        delete_slots: Limits the number of delete batches waiting in the pool.
+
+    Returns:
+        The final progress of the shard.
     """
+    progress = checkpoint.get_progress(shard)
+
+    if progress.completed:
+        logger.debug(f"Shard {shard.name} already completed, skipping.")
+        return progress
+
+    started_at = time.monotonic()
+    elapsed_before_s = progress.elapsed_s
+    resumed_versions_count = progress.versions_count
+
+    # Counters up to and including the last listed key
+    stats = ShardProgress(**asdict(progress))
+    # Counters of the key marker right before the versions currently in `batch`
+    batch_start_stats = ShardProgress(**asdict(progress))
     batch: list[ObjectVersionOrDeleteMarker] = []
+    # Submitted delete batches with the counters of the key marker they complete, in listing order
+    pending: deque[tuple[Future[None], ShardProgress]] = deque()
+    committed = ShardProgress(**asdict(progress))
+
+    def submit_batch(
+        versions: list[ObjectVersionOrDeleteMarker], marker: ShardProgress
+    ):
+        assert delete_executor
+
+        delete_slots.acquire()
+        future = delete_executor.submit(
+            delete_versions_batch, s3_client, bucket, versions
+        )
+        future.add_done_callback(lambda _future: delete_slots.release())
+        pending.append((future, marker))
+
+    def commit() -> None:
+        nonlocal committed
+
+        while pending and pending[0][0].done():
+            future, marker = pending.popleft()
+            # re-raise unexpected errors, the key marker must not move past a failed batch
+            future.result()
+            committed = marker
+
+        if not pending:
+            committed = batch_start_stats if batch else stats
+
+        checkpoint.update_progress(
+            shard,
+            **{
+                **asdict(committed),
+                "elapsed_s": elapsed_before_s + time.monotonic() - started_at,
+            },
+        )
+
+    version_iterator = iter_all_versions(
+        s3_client, bucket, shard.prefix, shard.delimiter, progress.key_marker
+    )
+
+    for key, versions in iter_key_histories(version_iterator):
+        if stop_event.is_set():
+            break
+
+        stats_before_key = ShardProgress(**asdict(stats))
+
+        stats.key_marker = key
+        stats.keys_count += 1
+        stats.versions_count += len(versions)
+
+        obj = analyze_key_history(key, versions, retention_cutoff_ts)
+
+        if obj:
+            stats.deleted_keys_count += 1
+            stats.deleted_size_bytes += obj.total_size_bytes
+            stats.deleted_versions_count += obj.versions_count
+
+            logger.info(
+                f"Found: {obj.key} | Deleted At: {obj.deleted_at} | "
+                f"Wasted Size: {format_bytes(obj.total_size_bytes)} | {obj.versions_count} versions"
+            )
+
+            if delete_executor:
+                # Flush the batch if the versions of this key do not fit in it
+                if batch and len(batch) + len(obj.versions) > DELETE_BATCH_SIZE:
+                    submit_batch(batch, stats_before_key)
+                    batch = []
+
+                if not batch:
+                    batch_start_stats = stats_before_key
+
+                batch.extend(obj.versions)
 
-    for obj in objects_iterator:
-        for version in obj.versions:
-            batch.append(version)
+                # Keys with more versions than a batch can hold are split in several batches
+                while len(batch) > DELETE_BATCH_SIZE:
+                    submit_batch(batch[:DELETE_BATCH_SIZE], stats_before_key)
+                    batch = batch[DELETE_BATCH_SIZE:]
 
-            # Flush batch if full
-            if len(batch) == DELETE_BATCH_SIZE:
-                delete_versions_batch(s3_client, bucket, batch)
-                batch.clear()
+        commit()
 
     # Flush remaining
     if batch:
-        delete_versions_batch(s3_client, bucket, batch)
+        submit_batch(batch, ShardProgress(**asdict(stats)))
+        batch = []
 
+    for future, _marker in pending:
+        future.result()
 
-def get_s3_client(bucket: str, profile: str | None) -> BaseClient:
+    commit()
+
+    if stop_event.is_set():
+        return committed
+
+    checkpoint.update_progress(shard, completed=True)
+    progress = checkpoint.get_progress(shard)
+
+    elapsed_s = time.monotonic() - started_at
+    listed_versions_count = progress.versions_count - resumed_versions_count
+
+    logger.info(
+        f"Shard {shard.name} done in {elapsed_s:.2f}s: "
+        f"{progress.keys_count} keys, {progress.versions_count} versions listed "
+        f"({listed_versions_count / max(elapsed_s, 1e-6):.0f} versions/s), "
+        f"{progress.deleted_keys_count} deleted keys, {progress.deleted_versions_count} versions, "
+        f"{format_bytes(progress.deleted_size_bytes)} wasted"
+    )
+
+    return progress
+
+
+def get_s3_client(
+    bucket: str, profile: str | None, max_pool_connections: int = 10
+) -> BaseClient:
     """
     Create an object storage client and validate that the bucket has versioning enabled.
 
     Args:
         bucket: The name of the object storage bucket.
         profile: Optional AWS profile name.
+        max_pool_connections: The maximum number of connections shared by the threads using the client.
 
     Returns:
         A configured boto3 object storage client.
@@ -361,7 +688,9 @@ def get_s3_client(bucket: str, profile: str | None) -> BaseClient:
     if profile:
         session_kwargs["profile_name"] = profile
 
-    client = boto3.Session(**session_kwargs).client("s3")
+    client = boto3.Session(**session_kwargs).client(
+        "s3", config=Config(max_pool_connections=max_pool_connections)
+    )
 
     # Validate bucket versioning is enabled
     try:
@@ -379,6 +708,113 @@ def get_s3_client(bucket: str, profile: str | None) -> BaseClient:
     return client
 
 
+def run_shards(
+    s3_client: BaseClient,
+    bucket: str,
+    shards: list[Shard],
+    retention_cutoff_ts: datetime | None,
+    dry_run: bool,
+    checkpoint: Checkpoint,
+    checkpoint_path: str | None,
+    workers: int,
+    delete_workers: int,
+) -> None:
+    """
+    Process the shards with a pool of lister threads and a pool of deleter threads, and log a summary.
+
+    Args:
+        s3_client: The configured S3 client.
+        bucket: The bucket name.
+        shards: The shards to process.
+        retention_cutoff_ts: Optional cutoff timestamp, objects deleted after it are ignored.
+        dry_run: Only scan for logically deleted objects, without deleting them.
+        checkpoint: The checkpoint of the run.
+        checkpoint_path: Optional path where the checkpoint is saved periodically.
+        workers: Number of lister threads.
+        delete_workers: Number of deleter threads.
+    """
+    if dry_run:
+        logger.info("Scanning for logically deleted objects...")
+
+    logger.info(
+        f"Processing {len(shards)} shards with {workers} listers and {0 if dry_run else delete_workers} deleters..."
+    )
+
+    started_at = time.monotonic()
+    failed_shards: list[Shard] = []
+    delete_slots = threading.Semaphore(delete_workers * 2)
+
+    with (
+        ThreadPoolExecutor(workers, thread_name_prefix="lister") as list_executor,
+        ThreadPoolExecutor(
+            delete_workers, thread_name_prefix="deleter"
+        ) as delete_executor,
+    ):
+        futures = {
+            list_executor.submit(
+                process_shard,
+                s3_client,
+                bucket,
+                shard,
+                retention_cutoff_ts,
+                checkpoint,
+                None if dry_run else delete_executor,
+                delete_slots,
+            ): shard
+            for shard in shards
+        }
+
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(
+                not_done, timeout=CHECKPOINT_INTERVAL_S, return_when=FIRST_COMPLETED
+            )
+
+            for future in done:
+                try:
+                    future.result()
+                except Exception as err:  # noqa: BLE001
+                    logger.error(
+                        f"Failed to process shard {futures[future].name}: {err}"
+                    )
+                    failed_shards.append(futures[future])
+
+            if time.monotonic() - checkpoint.saved_at >= CHECKPOINT_INTERVAL_S:
+                checkpoint.save(checkpoint_path)
+
+    checkpoint.save(checkpoint_path)
+
+    elapsed_s = time.monotonic() - started_at
+    shard_names = {shard.name for shard in shards}
+    progresses = [
+        progress for name, progress in checkpoint.shards.items() if name in shard_names
+    ]
+    completed_count = sum(1 for progress in progresses if progress.completed)
+
+    # Log summary
+    logger.info(
+        f"Completed shards: {completed_count}/{len(shards)} in {elapsed_s:.2f}s"
+    )
+    logger.info(
+        f"Total keys listed: {sum(p.keys_count for p in progresses)} "
+        f"({sum(p.versions_count for p in progresses)} versions)"
+    )
+    logger.info(
+        f"Total deleted keys found: {sum(p.deleted_keys_count for p in progresses)}"
+    )
+    logger.info(
+        f"Total size wasted: {format_bytes(sum(p.deleted_size_bytes for p in progresses))}"
+    )
+    logger.info(
+        f"Total versions wasted: {sum(p.deleted_versions_count for p in progresses)}"
+    )
+
+    if failed_shards:
+        raise RuntimeError(
+            f"Failed to process {len(failed_shards)} shards, run again to retry them."
+        )
+
+
 def parse_retention_period(value: str) -> datetime:
     """
     Parse a duration string (e.g., '3 seconds', '30 days', '2 weeks') and return a datetime object.
@@ -459,6 +895,28 @@ def main() -> int:
         action="store_true",
         help="Skip permanently delete confirmation prompt",
     )
+    parser.add_argument(
+        "--shard-depth",
+        type=int,
+        default=2,
+        help="Split the scan in one shard per 'subfolder' this many levels below the prefix, e.g. 2 for `projects/<uuid>/`. Use 0 for a single shard.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of threads listing the shards in parallel",
+    )
+    parser.add_argument(
+        "--delete-workers",
+        type=int,
+        default=4,
+        help="Number of threads sending the delete batches in parallel",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Path to a checkpoint file to save the progress of each shard to, and to resume from if it exists",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -476,30 +934,40 @@ def main() -> int:
     )
 
     try:
-        # 1. Setup Connection
-        client = get_s3_client(args.bucket, args.profile)
+        # 1. Setup Connection, with a pooled connection for each thread
+        client = get_s3_client(
+            args.bucket,
+            args.profile,
+            max_pool_connections=args.workers + args.delete_workers,
+        )
 
-        # 2. Build Pipeline
-        raw_iterator = iter_all_versions(client, args.bucket, args.prefix)
+        checkpoint = Checkpoint.load(
+            args.checkpoint, args.bucket, args.prefix, args.dry_run
+        )
 
-        # Transform
-        clean_iterator = iter_logically_deleted(raw_iterator, args.retention_cutoff_ts)
+        if not args.dry_run and not args.force:
+            confirmation_input = input(
+                f"Permanently delete from '{args.bucket}'? (yes/no): "
+            ).lower()
 
-        # 3. Execute
-        if args.dry_run:
-            action_scan(clean_iterator)
-            return 0
+            if confirmation_input != "yes":
+                return 0
 
-        else:
-            if not args.force:
-                confirmation_input = input(
-                    f"Permanently delete from '{args.bucket}'? (yes/no): "
-                ).lower()
+        # 2. Split the bucket in shards
+        shards = discover_shards(client, args.bucket, args.prefix, args.shard_depth)
 
-                if confirmation_input != "yes":
-                    return 0
-
-            action_permanently_delete_versions(client, args.bucket, clean_iterator)
+        # 3. Execute
+        run_shards(
+            client,
+            args.bucket,
+            shards,
+            args.retention_cutoff_ts,
+            args.dry_run,
+            checkpoint,
+            args.checkpoint,
+            args.workers,
+            args.delete_workers,
+        )
 
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -510,8 +978,13 @@ def main() -> int:
 
 
 def handle_sigint(sig: int, frame: object) -> None:
-    logger.info("\n\nScan interrupted by user.")
-    sys.exit(0)
+    if stop_event.is_set():
+        sys.exit(1)
+
+    logger.info(
+        "Interrupted by user, waiting for the pending deletions and saving the checkpoint..."
+    )
+    stop_event.set()
 
 
 if __name__ == "__main__":
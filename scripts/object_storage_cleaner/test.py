@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import argparse
+import json
 import os
 import subprocess
 import sys
+import tempfile
 import time
 import unittest
 import uuid
@@ -11,7 +13,12 @@ from datetime import datetime, timedelta, timezone
 from typing import TYPE_CHECKING, cast
 
 import boto3
-from purge_deleted_objects import parse_retention_period
+from purge_deleted_objects import (
+    Shard,
+    iter_all_versions,
+    iter_key_histories,
+    parse_retention_period,
+)
 
 if TYPE_CHECKING:
     from mypy_boto3_s3.client import S3Client
@@ -708,6 +715,175 @@ class TestObjectStorageCleaner(unittest.TestCase):
         versions = self.list_versions(prefixA)
         self.assertEqual(len(versions), 0)
 
+    def test_sharded_run_with_checkpoint(self):
+        """
+        test that the keys of all shards are processed once, and a completed run is not processed again.
+        """
+        for i in range(5):
+            self.create_file(f"{self.unique_prefix}projects/p{i}/active.txt", "a" * 10)
+            self.create_file(
+                f"{self.unique_prefix}projects/p{i}/deleted.txt", "a" * 100
+            )
+            self.delete_file(f"{self.unique_prefix}projects/p{i}/deleted.txt")
+
+        self.create_file(f"{self.unique_prefix}deleted.txt", "a" * 100)
+        self.delete_file(f"{self.unique_prefix}deleted.txt")
+
+        time.sleep(1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_path = os.path.join(tmpdir, "checkpoint.json")
+
+            # 1. Run with dry-run, splitting in one shard per project
+            result = self.run_script(
+                [
+                    "--dry-run",
+                    "--prefix",
+                    self.unique_prefix,
+                    "--retention-period",
+                    "1 second",
+                    "--workers",
+                    "3",
+                    "--checkpoint",
+                    checkpoint_path,
+                ]
+            )
+            self.assertIn("Completed shards: 7/7", result.stdout)
+            self.assertIn("Total keys listed: 11 (17 versions)", result.stdout)
+            self.assertIn("Total deleted keys found: 6", result.stdout)
+            self.assertIn("Total size wasted: 600.00 B", result.stdout)
+            self.assertIn("Total versions wasted: 12", result.stdout)
+
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+
+            self.assertTrue(checkpoint["dry_run"])
+            self.assertIn(f"{self.unique_prefix}projects/p0/**", checkpoint["shards"])
+            self.assertTrue(
+                all(shard["completed"] for shard in checkpoint["shards"].values())
+            )
+
+            # 2. Run without dry-run, resuming the dry-run checkpoint is not allowed
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.join(os.path.dirname(__file__), "purge_deleted_objects.py"),
+                    self.bucket_name,
+                    "--force",
+                    "--prefix",
+                    self.unique_prefix,
+                    "--retention-period",
+                    "1 second",
+                    "--checkpoint",
+                    checkpoint_path,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            self.assertNotEqual(result.returncode, 0)
+
+            # 3. Run without dry-run
+            checkpoint_path = os.path.join(tmpdir, "delete_checkpoint.json")
+            args = [
+                "--force",
+                "--prefix",
+                self.unique_prefix,
+                "--retention-period",
+                "1 second",
+                "--workers",
+                "3",
+                "--delete-workers",
+                "2",
+                "--checkpoint",
+                checkpoint_path,
+            ]
+            result = self.run_script(args)
+            self.assertIn("Total deleted keys found: 6", result.stdout)
+
+            # 4. Verify only the active files are left
+            versions = self.list_versions(self.unique_prefix)
+            self.assertEqual(
+                sorted(v["Key"] for v in versions),
+                [f"{self.unique_prefix}projects/p{i}/active.txt" for i in range(5)],
+            )
+
+            # 5. Run again, the completed shards are skipped
+            self.create_file(f"{self.unique_prefix}projects/p0/deleted.txt", "a" * 100)
+            self.delete_file(f"{self.unique_prefix}projects/p0/deleted.txt")
+
+            time.sleep(1)
+
+            result = self.run_script(args)
+            self.assertIn("Completed shards: 7/7", result.stdout)
+            self.assertNotIn("Permanently deleted", result.stdout)
+            self.assertEqual(len(self.list_versions(self.unique_prefix)), 7)
+
+    def test_resume_from_checkpoint(self):
+        """
+        test that a run resumes after the key marker of the checkpoint.
+        """
+        for name in ("a", "b", "c"):
+            self.create_file(f"{self.unique_prefix}{name}.txt", "a" * 100)
+            self.delete_file(f"{self.unique_prefix}{name}.txt")
+
+        time.sleep(1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_path = os.path.join(tmpdir, "checkpoint.json")
+
+            # 1. Simulate an interrupted run which processed the keys up to `b.txt`
+            with open(checkpoint_path, "w") as f:
+                json.dump(
+                    {
+                        "bucket": self.bucket_name,
+                        "prefix": self.unique_prefix,
+                        "dry_run": False,
+                        "shards": {
+                            f"{self.unique_prefix}**": {
+                                "key_marker": f"{self.unique_prefix}b.txt",
+                                "completed": False,
+                                "keys_count": 2,
+                                "versions_count": 4,
+                                "deleted_keys_count": 2,
+                                "deleted_size_bytes": 200,
+                                "deleted_versions_count": 4,
+                                "elapsed_s": 1.0,
+                            }
+                        },
+                    },
+                    f,
+                )
+
+            # 2. Resume the run
+            result = self.run_script(
+                [
+                    "--force",
+                    "--prefix",
+                    self.unique_prefix,
+                    "--retention-period",
+                    "1 second",
+                    "--shard-depth",
+                    "0",
+                    "--checkpoint",
+                    checkpoint_path,
+                ]
+            )
+            self.assertIn("Total deleted keys found: 3", result.stdout)
+            self.assertIn("Total versions wasted: 6", result.stdout)
+
+            # 3. Verify only the keys after the key marker are deleted
+            versions = self.list_versions(self.unique_prefix)
+            self.assertEqual(
+                sorted({v["Key"] for v in versions}),
+                [f"{self.unique_prefix}a.txt", f"{self.unique_prefix}b.txt"],
+            )
+
+            with open(checkpoint_path) as f:
+                shard = json.load(f)["shards"][f"{self.unique_prefix}**"]
+
+            self.assertTrue(shard["completed"])
+            self.assertEqual(shard["key_marker"], f"{self.unique_prefix}c.txt")
+
     def test_parse_retention_period_valid_inputs(self):
         """Test that parse_retention_period correctly parses valid duration strings."""
         # Test various valid formats
@@ -767,5 +943,90 @@ class TestObjectStorageCleaner(unittest.TestCase):
         self.assertEqual(result.tzinfo, timezone.utc)
 
 
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeS3Client:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_paginator(self, operation_name):
+        return FakePaginator(self.pages)
+
+
+class TestIterAllVersions(unittest.TestCase):
+    def test_key_history_spanning_pages(self):
+        """Test that the versions of a key split in two pages are grouped together, latest first."""
+        t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        pages = [
+            {
+                "Versions": [
+                    {
+                        "Key": "a",
+                        "VersionId": "a1",
+                        "IsLatest": True,
+                        "LastModified": t0,
+                        "Size": 1,
+                    },
+                    {
+                        "Key": "b",
+                        "VersionId": "b2",
+                        "IsLatest": False,
+                        "LastModified": t0,
+                        "Size": 1,
+                    },
+                ],
+                # same `LastModified` resolution as the data version
+                "DeleteMarkers": [
+                    {
+                        "Key": "b",
+                        "VersionId": "b3",
+                        "IsLatest": True,
+                        "LastModified": t0,
+                    },
+                ],
+            },
+            {
+                "Versions": [
+                    {
+                        "Key": "b",
+                        "VersionId": "b1",
+                        "IsLatest": False,
+                        "LastModified": t0 - timedelta(seconds=1),
+                        "Size": 1,
+                    },
+                    {
+                        "Key": "c",
+                        "VersionId": "c1",
+                        "IsLatest": True,
+                        "LastModified": t0,
+                        "Size": 1,
+                    },
+                ],
+            },
+        ]
+
+        histories = [
+            (key, [v["VersionId"] for v in versions])
+            for key, versions in iter_key_histories(
+                iter_all_versions(FakeS3Client(pages), "bucket")
+            )
+        ]
+
+        self.assertEqual(
+            histories,
+            [("a", ["a1"]), ("b", ["b3", "b2", "b1"]), ("c", ["c1"])],
+        )
+
+    def test_shard_names(self):
+        self.assertEqual(Shard("projects/").name, "projects/**")
+        self.assertEqual(Shard("projects/", "/").name, "projects/*")
+
+
 if __name__ == "__main__":
     unittest.main()